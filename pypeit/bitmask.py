@@ -134,6 +134,13 @@ class BitMask:
 #            raise TypeError('Provided bit names must be strings!')
         return _flag
 
+    def _bit_value(self, flag):
+        """Combined value of the provided bit(s)."""
+        value = 0
+        for f in self._prep_flags(flag):
+            value |= (1 << self.bits[f])
+        return value
+
     def keys(self):
         """
         Return a list of the bits; 'NULL' keywords are ignored.
@@ -213,16 +220,10 @@ class BitMask:
             TypeError: Raised if the provided *flag* does not contain
                 one or more strings.
         """
-        _flag = self._prep_flags(flag)
-
-        out = value & (1 << self.bits[_flag[0]]) != 0
-        if len(_flag) == 1:
-            return out
-
-        nn = len(_flag)
-        for i in range(1,nn):
-            out |= (value & (1 << self.bits[_flag[i]]) != 0)
-        return out
+        # Any of the bits is on if the value shares at least one bit
+        # with their combination, which only requires one pass over
+        # the array
+        return value & self._bit_value(flag) != 0
 
     def flagged_bits(self, value):
         """
@@ -311,16 +312,65 @@ class BitMask:
         if flag is None:
             raise ValueError('Provided bit name cannot be None.')
 
-        _flag = self._prep_flags(flag)
+        return value | self._bit_value(flag)
 
-        out = value | (1 << self.bits[_flag[0]])
-        if len(_flag) == 1:
-            return out
+    def turn_on_where(self, value, indx, flag):
+        """
+        Turn on a bit, in place, for the elements of a bitmask array
+        selected by a boolean array.
 
-        nn = len(_flag)
-        for i in range(1,nn):
-            out |= (1 << self.bits[_flag[i]])
-        return out
+        This is equivalent to ``value[indx] = self.turn_on(value[indx],
+        flag)``, but it avoids the copies made by the boolean indexing
+        and keeps the bitmask in its own integer type.
+
+        Args:
+            value (numpy.ndarray): Bitmask array, modified in place.
+            indx (numpy.ndarray): Boolean array with the same shape as
+                `value` selecting the elements to flag.
+            flag (list, numpy.ndarray, or str): Bit name(s) to turn on.
+
+        Returns:
+            numpy.ndarray: The modified bitmask array.
+
+        Raises:
+            KeyError: Raised by the dict data type if the input *flag*
+                is not one of the valid :attr:`flags`.
+            Exception: Raised if the provided *flag* is not a string.
+        """
+        if flag is None:
+            raise ValueError('Provided bit name cannot be None.')
+        numpy.bitwise_or(value, value.dtype.type(self._bit_value(flag)), out=value, where=indx)
+        return value
+
+    def turn_off_where(self, value, indx, flag):
+        """
+        Turn off a bit, in place, for the elements of a bitmask array
+        selected by a boolean array.
+
+        This is equivalent to ``value[indx] = self.turn_off(value[indx],
+        flag)``, but it avoids the copies made by the boolean indexing
+        and keeps the bitmask in its own integer type.
+
+        Args:
+            value (numpy.ndarray): Bitmask array, modified in place.
+            indx (numpy.ndarray, bool): Boolean array with the same
+                shape as `value` selecting the elements to unflag.  Use
+                True to select all elements.
+            flag (list, numpy.ndarray, or str): Bit name(s) to turn off.
+
+        Returns:
+            numpy.ndarray: The modified bitmask array.
+
+        Raises:
+            KeyError: Raised by the dict data type if the input *flag*
+                is not one of the valid :attr:`flags`.
+            Exception: Raised if the provided *flag* is not a string.
+        """
+        if flag is None:
+            raise ValueError('Provided bit name cannot be None.')
+        numpy.bitwise_and(value, numpy.invert(value.dtype.type(self._bit_value(flag))), out=value,
+                          where=indx)
+        return value
 
     def turn_off(self, value, flag):
         """
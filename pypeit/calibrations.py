@@ -3,6 +3,7 @@
 from __future__ import absolute_import, division, print_function
 
 import os
+import glob
 import numpy as np
 
 from abc import ABCMeta
@@ -672,13 +673,16 @@ class Calibrations(object):
         self.arc_files = self.fitstbl.frame_paths(arc_rows)
         binspec, binspat = parse.parse_binning(self.spectrograph.get_meta_value(
             self.arc_files[0], 'binning'))
+        # Earlier wavelength calibration to track the drift of?
+        prev_wv_calib = self.find_prev_wv_calib() if self.par['wavelengths']['drift_track'] else None
         # Instantiate
         self.waveCalib = wavecalib.WaveCalib(self.msarc, self.tslits_dict, self.spectrograph, self.par['wavelengths'],
                                              binspectral=binspec, det=self.det,
                                              master_key=self.arc_master_key,
                                              master_dir=self.master_dir,
                                              reuse_masters=self.reuse_masters,
-                                             redux_path=self.redux_path, msbpm=self.msbpm)
+                                             redux_path=self.redux_path, msbpm=self.msbpm,
+                                             prev_wv_calib=prev_wv_calib)
         # Load from disk (MasterFrame)?
         self.wv_calib, _ = self.waveCalib.master(prev_build=prev_build)
         # Build?
@@ -700,6 +704,41 @@ class Calibrations(object):
         # Return
         return self.wv_calib, self.maskslits
 
+    def find_prev_wv_calib(self):
+        """
+        Find the wavelength calibration of an earlier calibration group
+        with the same setup and detector as the current arc
+
+        Calibrations derived during this run take precedence over the
+        MasterWaveCalib files in the master directory.
+
+        Requirements:
+          arc_master_key, master_dir
+
+        Returns:
+            dict or None: The earlier wavelength calibration, or None if
+            there is none
+        """
+        setup, det = self.arc_master_key.split('_')[0], self.arc_master_key.split('_')[-1]
+        for master_key in reversed(list(self.calib_dict.keys())):
+            if master_key == self.arc_master_key or master_key.split('_')[0] != setup \
+                    or master_key.split('_')[-1] != det:
+                continue
+            if self.calib_dict[master_key].get('wavecalib') is not None:
+                msgs.info('Tracking the drift of the wavelength calibration {0:s}'.format(master_key))
+                return self.calib_dict[master_key]['wavecalib']
+        if self.master_dir is None:
+            return None
+        ms_name = masterframe.master_name('wv_calib', self.arc_master_key, self.master_dir)
+        prev_files = [f for f in glob.glob(masterframe.master_name('wv_calib', '{0:s}_*_{1:s}'.format(setup, det),
+                                                                   self.master_dir)) if f != ms_name]
+        if len(prev_files) == 0:
+            return None
+        # Use the most recent one
+        prev_file = max(prev_files, key=os.path.getmtime)
+        msgs.info('Tracking the drift of the wavelength calibration in {0:s}'.format(prev_file))
+        return wavecalib.load_wv_calib(prev_file)[0]
+
     def get_tilts(self):
         """
         Load or generate the tilts image
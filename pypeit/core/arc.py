@@ -105,6 +105,58 @@ def fit2darc(all_wv,all_pix,all_orders,nspec, nspec_coeff=4,norder_coeff=4,sigre
 
 
 
+def fit_multislit(slit_pos, wave_cen, disp, order=2):
+    """Fit a model of the central wavelength and dispersion of multislit wavelength solutions versus slit position.
+    This is the multislit analog of fit2darc: slits on a mask share the same dispersion, with a smooth variation of
+    the central wavelength with the slit position, such that the solutions of a few slits predict those of the rest.
+
+    Parameters
+    ----------
+    slit_pos: np.array
+      Spatial position of the solved slits
+    wave_cen: np.array
+      Wavelength at the central spectral pixel of each solved slit
+    disp: np.array
+      Dispersion (Angstrom/pixel) at the center of each solved slit
+    order: int
+      Order of the polynomial in slit position. It is reduced to the number of solved slits minus one if there are
+      too few slits.
+
+    Returns
+    -------
+    fit_dict: dict
+      The coefficients of the fits and the normalization of the slit positions. See eval_multislit
+    """
+    order = int(np.fmin(order, slit_pos.size-1))
+    min_pos, max_pos = np.min(slit_pos), np.max(slit_pos)
+    coeff_wave_cen = utils.func_fit(slit_pos, wave_cen, 'legendre', order, minx=min_pos, maxx=max_pos)
+    coeff_disp = utils.func_fit(slit_pos, disp, 'legendre', order, minx=min_pos, maxx=max_pos)
+    return dict(coeff_wave_cen=coeff_wave_cen, coeff_disp=coeff_disp, order=order, min_pos=min_pos,
+                max_pos=max_pos, func='legendre')
+
+
+def eval_multislit(fit_dict, slit_pos):
+    """Evaluate the multislit model of fit_multislit
+
+    Parameters
+    ----------
+    fit_dict: dict
+      Output of fit_multislit
+    slit_pos: float or np.array
+      Spatial position of the slit(s)
+
+    Returns
+    -------
+    wave_cen, disp: float or np.array
+      Predicted wavelength at the central spectral pixel and dispersion
+    """
+    wave_cen = utils.func_val(fit_dict['coeff_wave_cen'], slit_pos, fit_dict['func'],
+                              minx=fit_dict['min_pos'], maxx=fit_dict['max_pos'])
+    disp = utils.func_val(fit_dict['coeff_disp'], slit_pos, fit_dict['func'],
+                          minx=fit_dict['min_pos'], maxx=fit_dict['max_pos'])
+    return wave_cen, disp
+
+
 def fit2darc_global_qa(fit_dict, outfile=None):
     """ QA on 2D fit of the wavelength solution.
 
@@ -213,6 +213,153 @@ def unpack_spec(spectra, all_wave=False):
     return fluxes, sigs, wave
 
 
+def _compact_rows(values, keep):
+    """ Left-align the kept entries of each row of a 2D array
+
+    Returns
+    -------
+    compact : ndarray
+      Same shape as values; entries beyond the kept ones are 0
+    nkeep : ndarray
+      Number of kept entries in each row
+    """
+    nkeep = np.sum(keep, axis=1)
+    compact = np.zeros_like(values)
+    compact[np.arange(values.shape[1])[None,:] < nkeep[:,None]] = values[keep]
+    return compact, nkeep
+
+
+def _interp_rows(x, xp, fp, npix):
+    """ Linearly interpolate each row of a stack of tabulated functions
+
+    Parameters
+    ----------
+    x : ndarray, shape (nx,)
+      Points at which to interpolate, the same for all rows
+    xp, fp : ndarray, shape (nrow, ncol)
+      Tabulated functions, with only the first npix entries of each row used
+    npix : ndarray, shape (nrow,)
+
+    Returns
+    -------
+    values : ndarray, shape (nrow, nx)
+      Interpolated values, 0 outside the range of each row
+    """
+    nrow, ncol = xp.shape
+    rows = np.arange(nrow)[:,None]
+    inrow = np.arange(ncol)[None,:] < npix[:,None]
+    # Locate x in all rows with one search by moving each row into its own interval
+    xmin = min(np.min(x), np.min(xp[inrow]))
+    span = max(np.max(x), np.max(xp[inrow])) - xmin + 1.
+    offset = rows*span
+    start = np.cumsum(npix) - npix
+    idx = np.searchsorted((xp - xmin + offset)[inrow], x[None,:] - xmin + offset) - start[:,None]
+    idx = np.clip(idx, 1, npix[:,None]-1)
+    xl, xr = xp[rows,idx-1], xp[rows,idx]
+    fl, fr = fp[rows,idx-1], fp[rows,idx]
+    values = fl + (x[None,:] - xl)*(fr - fl)/(xr - xl)
+    outside = (x[None,:] < xp[:,:1]) | (x[None,:] > xp[rows[:,0],npix-1][:,None])
+    values[outside] = 0.
+    return values
+
+
+def rebin_arrays(waves, fluxes, sigs, new_wave):
+    """ Rebin a stack of spectra onto a new wavelength grid
+
+    Array version of linetools.spectra.utils.rebin with do_sig=True and
+    grow_bad_sig=True, applied to all the spectra at once.  Counts (and
+    flambda) are conserved, pixels with sig <= 0 are grown onto the new grid
+    and the edge pixels of each spectrum are given sig = 0.
+
+    Parameters
+    ----------
+    waves : masked ndarray, shape (nexp, npix)
+      Wavelengths.  Masked pixels (e.g. padding) are ignored.
+    fluxes : ndarray, shape (nexp, npix)
+    sigs : ndarray, shape (nexp, npix)
+    new_wave : ndarray, shape (nwave,)
+      New wavelength grid
+
+    Returns
+    -------
+    new_fluxes : ndarray, shape (nexp, nwave)
+    new_sigs : ndarray, shape (nexp, nwave)
+    """
+    nexp = waves.shape[0]
+    nnew = new_wave.size
+    rows = np.arange(nexp)
+    col = np.arange(waves.shape[1])[None,:]
+    # Left-align the good pixels of each spectrum
+    wave, npix = _compact_rows(np.ma.getdata(waves).astype(float), np.invert(np.ma.getmaskarray(waves)))
+    flux, _ = _compact_rows(np.ma.getdata(fluxes), np.invert(np.ma.getmaskarray(waves)))
+    sig, _ = _compact_rows(np.ma.getdata(sigs), np.invert(np.ma.getmaskarray(waves)))
+    inrow = col < npix[:,None]
+
+    # Endpoints of original pixels
+    wvh = (wave + np.roll(wave, -1, axis=1)) / 2.
+    wvh[rows,npix-1] = wave[rows,npix-1] + (wave[rows,npix-1] - wave[rows,npix-2]) / 2.
+    dwv = wvh - np.roll(wvh, 1, axis=1)
+    dwv[:,0] = 2 * (wvh[:,0] - wave[:,0])
+    med_dwv = np.nanmedian(np.where(inrow, dwv, np.nan), axis=1)
+
+    # Deal with nan
+    gdf = inrow & np.isfinite(flux)
+    if np.any(inrow & np.invert(gdf)):
+        msgs.warn("Ignoring pixels with NAN or INF in flux")
+    var = sig**2
+    bad_sig = (sig <= 0.) | np.isnan(sig) | np.isinf(var)
+    var[bad_sig] = 0.
+    wave, _ = _compact_rows(wave, gdf)
+    wvh, _ = _compact_rows(wvh, gdf)
+    dwv, _ = _compact_rows(dwv, gdf)
+    flux, _ = _compact_rows(flux, gdf)
+    var, ngd = _compact_rows(var, gdf)
+    inrow = col < ngd[:,None]
+
+    # Cumulative Sum
+    cumsum = np.cumsum(np.where(inrow, flux*dwv, 0.), axis=1)
+    cumvar = np.cumsum(np.where(inrow, var*dwv, 0.), axis=1, dtype=np.float64)
+
+    # Endpoints of new pixels
+    nwvh = (new_wave + np.roll(new_wave, -1)) / 2.
+    nwvh[nnew - 1] = new_wave[nnew - 1] + (new_wave[nnew - 1] - new_wave[nnew - 2]) / 2.
+    # Pad starting point
+    bwv = np.zeros(nnew + 1)
+    bwv[0] = new_wave[0] - (new_wave[1] - new_wave[0]) / 2.
+    bwv[1:] = nwvh
+
+    # Rebinned flux and var
+    new_fx = np.diff(_interp_rows(bwv, wvh, cumsum, ngd), axis=1)
+    new_var = np.diff(_interp_rows(bwv, wvh, cumvar, ngd), axis=1)
+
+    # Normalize (preserve counts and flambda)
+    new_dwv = bwv - np.roll(bwv, 1)
+    new_fx /= new_dwv[1:]
+    # Preserve S/N (crudely)
+    new_var /= (np.median(new_dwv)/med_dwv)[:,None] * new_dwv[1:]
+
+    new_sig = np.zeros_like(new_var)
+    gd = new_var > 0.
+    new_sig[gd] = np.sqrt(new_var[gd])
+    # Grow the bad pixels onto the nearby new pixels
+    brow, bcol = np.where(inrow & (var <= 0.))
+    bwave, bdwv = wave[brow,bcol], dwv[brow,bcol]
+    nearidxs = np.searchsorted(new_wave, bwave)
+    pndwv = np.append(new_dwv, new_dwv[-1])
+    pnwv = np.append(new_wave, new_wave[-1] + new_dwv[-1])
+    ldiff = np.abs(new_wave[nearidxs-1] - bwave) - (pndwv[1:][nearidxs] + bdwv)/2
+    rdiff = np.abs(bwave - pnwv[nearidxs]) - (pndwv[1:][nearidxs] + bdwv)/2
+    grow = ((ldiff < 0) | (rdiff < 0)) & (nearidxs < nnew)
+    new_sig[brow[grow],nearidxs[grow]] = 0.
+
+    # Zero out edge pixels -- not to be trusted
+    if not np.all(np.any(gd, axis=1)):
+        msgs.error("Not a single good pixel in a rebinned spectrum!  Something went wrong...")
+    new_sig[rows,np.argmax(gd, axis=1)] = 0.
+    new_sig[rows,nnew-1-np.argmax(gd[:,::-1], axis=1)] = 0.
+    return new_fx, new_sig
+
+
 def sn_weights(flux, sig, mask, wave, dv_smooth=10000.0, const_weights=False, debug=False, verbose=False):
     """ Calculate the S/N of each input spectrum and create an array of (S/N)^2 weights to be used
     for coadding.
@@ -311,6 +458,7 @@ def grow_mask(initial_mask, n_grow=1):
     ----------
     initial_mask : ndarray
         Initial mask for the flux + variance arrays.  True = Good. Bad = False.
+        For a 2D array the mask is grown along each row.
     n_grow : int, optional
         Number of pixels to grow the initial mask by
         on each side. Defaults to 1 pixel
@@ -324,16 +472,11 @@ def grow_mask(initial_mask, n_grow=1):
         msgs.error("n_grow must be an integer")
     # Init
     grow_mask = np.ma.copy(initial_mask)
-    npix = grow_mask.size
-
-    # Loop on spectra
-    bad_pix = np.where(np.invert(initial_mask))[0]
-    for idx in bad_pix:
-        msk_p = idx + np.arange(-1*n_grow, n_grow+1)
-        # Restrict
-        gdp = (msk_p >= 0) & (msk_p < npix)
-        # Apply
-        grow_mask[msk_p[gdp]] = False
+
+    # Flag the pixels within n_grow of a bad pixel, along the last axis
+    for shift in range(1, n_grow+1):
+        grow_mask[...,shift:] &= initial_mask[...,:-shift]
+        grow_mask[...,:-shift] &= initial_mask[...,shift:]
     # Return
     return grow_mask
 
@@ -411,7 +554,65 @@ def median_flux(spec, smask, nsig=3., niter=5, **kwargs):
 
 '''
 
-# TODO Rewrite this routine to take flux, wave, sig and not an Xspectrum object
+def scale_arrays(fluxes, sigs, smask, rms_sn, iref=0, scale_method='auto', hand_scale=None,
+                 SN_MAX_MEDSCALE=2., SN_MIN_MEDSCALE=0.5, **kwargs):
+    """ Scale a stack of spectra to the reference spectrum
+
+    The median ratios of all spectra to the reference are computed in one
+    pass.
+
+    Parameters
+    ----------
+    fluxes : ndarray, shape (nexp, nwave)
+      Registered spectra; modified in place
+    sigs : ndarray, shape (nexp, nwave)
+      Errors; modified in place
+    smask : ndarray, shape (nexp, nwave)
+       True = Good, False = Bad.
+    rms_sn : ndarray
+      Root mean square signal-to-noise estimate for each spectrum. Computed by sn_weights routine.
+    iref, scale_method, hand_scale, SN_MAX_MEDSCALE, SN_MIN_MEDSCALE :
+      See :func:`scale_spectra`
+
+    Returns
+    -------
+    scales : list
+      Scale value applied to each spectrum, empty if none were applied
+    omethod : str
+      Method applied
+    """
+    rms_sn_stack = np.sqrt(np.mean(rms_sn**2))
+
+    if scale_method == 'hand':
+        omethod = 'hand'
+        # Input?
+        if hand_scale is None:
+            msgs.error("Need to provide hand_scale parameter, one value per spectrum")
+        scales = np.array(hand_scale[:fluxes.shape[0]], dtype=float)
+    elif ((rms_sn_stack <= SN_MAX_MEDSCALE) and (rms_sn_stack > SN_MIN_MEDSCALE)) or scale_method=='median':
+        omethod = 'median_flux'
+    elif rms_sn_stack <= SN_MIN_MEDSCALE:
+        return [], 'none_SN'
+    elif (rms_sn_stack > SN_MAX_MEDSCALE) or scale_method=='poly':
+        msgs.work("Should be using poly here, not median")
+        omethod = 'median_flux'
+    else:
+        msgs.error("Scale method not recognized! Check documentation for available options")
+
+    if omethod == 'median_flux':
+        # Median ratio (reference to spectrum), all spectra at once
+        allok = smask[iref,:] & smask & (fluxes[iref,:] > 0.) & (fluxes > 0)
+        ratio = np.ma.array(np.divide(fluxes[iref,:], fluxes, out=np.zeros_like(fluxes, dtype=float),
+                                      where=allok), mask=np.invert(allok))
+        _, med_scale, _ = stats.sigma_clipped_stats(ratio, sigma=3., maxiters=5, axis=1)
+        scales = np.minimum(np.ma.getdata(med_scale), 10.0)
+        scales[iref] = 1.
+    # Apply
+    fluxes *= scales[:,None]
+    sigs *= scales[:,None]
+    return list(scales), omethod
+
+
 def scale_spectra(spectra, smask, rms_sn, iref=0, scale_method='auto', hand_scale=None,
                   SN_MAX_MEDSCALE=2., SN_MIN_MEDSCALE=0.5, **kwargs):
     """
@@ -446,60 +647,14 @@ def scale_spectra(spectra, smask, rms_sn, iref=0, scale_method='auto', hand_scal
        'median'
        'none_SN'
     """
-    # Init
-    med_ref = None
-    # Check for wavelength registration
-    #gdp = np.all(~spectra.data['flux'].mask, axis=0)
-    #gidx = np.where(gdp)[0]
-    #if not np.isclose(spectra.data['wave'][0,gidx[0]],spectra.data['wave'][1,gidx[0]]):
-    #    msgs.error("Input spectra are not registered!")
-    # Loop on exposures
-
-    rms_sn_stack = np.sqrt(np.mean(rms_sn**2))
-
-    scales = []
-    for qq in range(spectra.nspec):
-        if scale_method == 'hand':
-            omethod = 'hand'
-            # Input?
-            if hand_scale is None:
-                msgs.error("Need to provide hand_scale parameter, one value per spectrum")
-            spectra.data['flux'][qq,:] *= hand_scale[qq]
-            spectra.data['sig'][qq,:] *= hand_scale[qq]
-            #arrsky[*, j] = HAND_SCALE[j]*sclsky[*, j]
-            scales.append(hand_scale[qq])
-            #
-        elif ((rms_sn_stack <= SN_MAX_MEDSCALE) and (rms_sn_stack > SN_MIN_MEDSCALE)) or scale_method=='median':
-            omethod = 'median_flux'
-            if qq == iref:
-                scales.append(1.)
-                continue
-            # Median ratio (reference to spectrum)
-            med_scale = median_ratio_flux(spectra, smask, qq, iref)
-            # Apply
-            med_scale= np.minimum(med_scale, 10.0)
-            spectra.data['flux'][qq,:] *= med_scale
-            spectra.data['sig'][qq,:] *= med_scale
-            #
-            scales.append(med_scale)
-        elif rms_sn_stack <= SN_MIN_MEDSCALE:
-            omethod = 'none_SN'
-        elif (rms_sn_stack > SN_MAX_MEDSCALE) or scale_method=='poly':
-            msgs.work("Should be using poly here, not median")
-            omethod = 'median_flux'
-            if qq == iref:
-                scales.append(1.)
-                continue
-            # Median ratio (reference to spectrum)
-            med_scale = median_ratio_flux(spectra, smask, qq, iref)
-            # Apply
-            med_scale= np.minimum(med_scale, 10.0)
-            spectra.data['flux'][qq,:] *= med_scale
-            spectra.data['sig'][qq,:] *= med_scale
-            #
-            scales.append(med_scale)
-        else:
-            msgs.error("Scale method not recognized! Check documentation for available options")
+    fluxes, sigs, wave = unpack_spec(spectra)
+    # Scale copies (filled() may return views of the spectra) and apply below
+    scales, omethod = scale_arrays(fluxes.copy(), sigs.copy(), smask, rms_sn, iref=iref, scale_method=scale_method,
+                                   hand_scale=hand_scale, SN_MAX_MEDSCALE=SN_MAX_MEDSCALE,
+                                   SN_MIN_MEDSCALE=SN_MIN_MEDSCALE)
+    for qq, scale in enumerate(scales):
+        spectra.data['flux'][qq,:] *= scale
+        spectra.data['sig'][qq,:] *= scale
     # Finish
     return scales, omethod
 
@@ -555,15 +710,18 @@ def bspline_cr(spectra, n_grow_mask=1, cr_nsig=5., debug=False):
         debugger.set_trace()
 
 
-def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
+def clean_cr_arrays(waves, fluxes, sigs, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
     debug=False, cr_everyn=6, cr_bsigma=5., cr_two_alg='bspline', **kwargs):
-    """ Sigma-clips the flux arrays to remove obvious CR
+    """ Sigma-clips a stack of registered spectra to remove obvious CR
 
     Parameters
     ----------
-    spectra :
-    smask : ndarray
-      Data mask. True  = Good, False = bad
+    waves : ndarray, shape (nwave,) or (nexp, nwave)
+      Wavelengths
+    fluxes : ndarray, shape (nexp, nwave)
+    sigs : ndarray, shape (nexp, nwave)
+    smask : ndarray, shape (nexp, nwave)
+      Data mask. True  = Good, False = bad.  Modified in place.
     n_grow_mask : int, optional
         Number of pixels to grow the initial mask by
         on each side. Defaults to 1 pixel
@@ -574,19 +732,23 @@ def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
     -------
     """
     # Init
-    fluxes, sigs, wave = unpack_spec(spectra)
-    npix = wave.size
+    nexp = fluxes.shape[0]
+    waves = np.broadcast_to(waves, fluxes.shape)
+    wave = waves[0,:]
 
-    def rej_bad(smask, badchi, n_grow_mask, ispec):
+    def rej_bad(smask, badchi, n_grow_mask):
+        # Spectra with rejected pixels
+        rej = np.any(badchi, axis=1)
         # Grow?
         if n_grow_mask > 0:
             badchi = grow_mask(badchi, n_grow=n_grow_mask)
         # Mask
-        smask[ispec,badchi] = False
-        msgs.info("Rejecting {:d} CRs in exposure {:d}".format(np.sum(badchi),ispec))
+        smask[badchi & rej[:,None]] = False
+        for ispec in np.where(rej)[0]:
+            msgs.info("Rejecting {:d} CRs in exposure {:d}".format(np.sum(badchi[ispec]),ispec))
         return
 
-    if spectra.nspec == 2:
+    if nexp == 2:
         msgs.info("Only 2 exposures.  Using custom procedure")
         if cr_two_alg == 'diff':
             diff = fluxes[0,:] - fluxes[1,:]
@@ -632,7 +794,7 @@ def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
             msgs.info("Rejecting {:d} CRs in exposure 1".format(np.sum(cr1)))
         elif cr_two_alg == 'bspline':
             # Package Data for convenience
-            waves = spectra.data['wave'].flatten()  # Packed 0,1
+            waves = waves.flatten()  # Packed 0,1
             flux = fluxes.flatten()
             sig = sigs.flatten()
             #
@@ -649,7 +811,7 @@ def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
                 diff = fluxes[ii,:] - spec_fit
                 cr = (diff > cr_nsig*sigs[ii,:]) & (sigs[ii,:]>0.)
                 if debug:
-                    debugger.plot1d(spectra.data['wave'][0,:], spectra.data['flux'][ii,:], spec_fit, xtwo=spectra.data['wave'][0,cr], ytwo=spectra.data['flux'][ii,cr], mtwo='s')
+                    debugger.plot1d(wave, fluxes[ii,:], spec_fit, xtwo=wave[cr], ytwo=fluxes[ii,cr], mtwo='s')
                 if n_grow_mask > 0:
                     cr = grow_mask(cr, n_grow=n_grow_mask)
                 # Mask
@@ -661,7 +823,7 @@ def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
                     diff = spec_fit - fluxes[ii,:]
                     rej_low = (diff > nrej_low*sigs[ii,:]) & (sigs[ii,:]>0.)
                     if False:
-                        debugger.plot1d(spectra.data['wave'][0,:], spectra.data['flux'][ii,:], spec_fit, xtwo=spectra.data['wave'][0,rej_low], ytwo=spectra.data['flux'][ii,rej_low], mtwo='s')
+                        debugger.plot1d(wave, fluxes[ii,:], spec_fit, xtwo=wave[rej_low], ytwo=fluxes[ii,rej_low], mtwo='s')
                     msgs.info("Removing {:d} low values in exposure {:d}".format(np.sum(rej_low),ii))
                     smask[ii,rej_low] = False
             else:
@@ -679,44 +841,64 @@ def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
         refflux = np.ma.median(mflux,axis=0)
         diff = fluxes - refflux.filled(0.)
 
-        # Loop on spectra
-        for ispec in range(spectra.nspec):
-            # Generate ivar
-            gds = (smask[ispec,:]) & (sigs[ispec,:] > 0.)
-            ivar = np.zeros(npix)
-            ivar[gds] = 1./sigs[ispec,gds]**2
-            # Single pixel events
-            chi2 = diff[ispec]**2 * ivar
-            badchi = (ivar > 0.0) & (chi2 > cr_nsig**2)
-            if np.any(badchi) > 0:
-                rej_bad(smask, badchi, n_grow_mask, ispec)
-            # Dual pixels [CRs usually affect 2 (or more) pixels]
-            tchi2 = chi2 + np.roll(chi2,1)
-            badchi = (ivar > 0.0) & (tchi2 > 2*cr_nsig**2)
-            if np.any(badchi) > 0:
-                rej_bad(smask, badchi, n_grow_mask, ispec)
+        # Generate ivar, all spectra at once
+        gds = smask & (sigs > 0.)
+        ivar = np.zeros(fluxes.shape)
+        ivar[gds] = 1./sigs[gds]**2
+        # Single pixel events
+        chi2 = diff**2 * ivar
+        badchi = (ivar > 0.0) & (chi2 > cr_nsig**2)
+        # Dual pixels [CRs usually affect 2 (or more) pixels]
+        tchi2 = chi2 + np.roll(chi2,1,axis=1)
+        badchi2 = (ivar > 0.0) & (tchi2 > 2*cr_nsig**2)
+        rej_bad(smask, badchi, n_grow_mask)
+        rej_bad(smask, badchi2, n_grow_mask)
     # Return
     return
 
 
-def one_d_coadd(spectra, smask, weights, debug=False, **kwargs):
-    """ Performs a weighted coadd of the spectra in 1D.
+def clean_cr(spectra, smask, n_grow_mask=1, cr_nsig=7., nrej_low=5.,
+    debug=False, cr_everyn=6, cr_bsigma=5., cr_two_alg='bspline', **kwargs):
+    """ Sigma-clips the flux arrays to remove obvious CR
 
     Parameters
     ----------
-    spectra : XSpectrum1D
-    smask: mask
-        True = Good, False = Bad
-    weights : ndarray
-      Should be masked
+    spectra :
+    smask : ndarray
+      Data mask. True  = Good, False = bad
+    n_grow_mask : int, optional
+        Number of pixels to grow the initial mask by
+        on each side. Defaults to 1 pixel
+    cr_nsig : float, optional
+      Number of sigma for rejection for CRs
 
     Returns
     -------
-    coadd : XSpectrum1D
-
     """
-    # Setup
     fluxes, sigs, wave = unpack_spec(spectra)
+    clean_cr_arrays(spectra.data['wave'].filled(0.), fluxes, sigs, smask, n_grow_mask=n_grow_mask,
+                    cr_nsig=cr_nsig, nrej_low=nrej_low, debug=debug, cr_everyn=cr_everyn,
+                    cr_bsigma=cr_bsigma, cr_two_alg=cr_two_alg)
+    return
+
+
+def one_d_coadd_arrays(fluxes, sigs, smask, weights):
+    """ Weighted coadd of a stack of registered spectra
+
+    Parameters
+    ----------
+    fluxes : ndarray, shape (nexp, nwave)
+    sigs : ndarray, shape (nexp, nwave)
+    smask : ndarray, shape (nexp, nwave)
+        True = Good, False = Bad
+    weights : ndarray, shape (nexp, nwave)
+
+    Returns
+    -------
+    new_flux : ndarray, shape (nwave,)
+    new_sig : ndarray, shape (nwave,)
+      Masked pixels are 0.
+    """
     variances = (sigs > 0.) * sigs**2
     inv_variances = (sigs > 0.)/(sigs**2 + (sigs==0.))
 
@@ -731,8 +913,28 @@ def one_d_coadd(spectra, smask, weights, debug=False, **kwargs):
     new_var = np.ma.sum((mweights**2.)*var, axis=0) / ((sum_weights + (sum_weights == 0.0).astype(int))**2.)
 
     # Replace masked values with zeros
-    new_flux = new_flux.filled(0.)
-    new_sig = np.sqrt(new_var.filled(0.))
+    return new_flux.filled(0.), np.sqrt(new_var.filled(0.))
+
+
+def one_d_coadd(spectra, smask, weights, debug=False, **kwargs):
+    """ Performs a weighted coadd of the spectra in 1D.
+
+    Parameters
+    ----------
+    spectra : XSpectrum1D
+    smask: mask
+        True = Good, False = Bad
+    weights : ndarray
+      Should be masked
+
+    Returns
+    -------
+    coadd : XSpectrum1D
+
+    """
+    # Setup
+    fluxes, sigs, wave = unpack_spec(spectra)
+    new_flux, new_sig = one_d_coadd_arrays(fluxes, sigs, smask, weights)
 
     # New obj (for passing around)
     wave_in = wave if isinstance(wave,units.quantity.Quantity) else wave*units.AA
@@ -745,7 +947,7 @@ def one_d_coadd(spectra, smask, weights, debug=False, **kwargs):
     return new_spec
 
 
-def load_spec(files, iextensions=None, extract='OPT', flux=True):
+def load_spec(files, iextensions=None, extract='OPT', flux=True, hdulists=None):
     """ Load a list of spectra into one XSpectrum1D object
 
     Parameters
@@ -759,6 +961,9 @@ def load_spec(files, iextensions=None, extract='OPT', flux=True):
       Extraction method ('opt', 'box')
     flux : bool, optional
       Apply to fluxed spectra?
+    hdulists : dict, optional
+      Already opened files (astropy.io.fits.HDUList) keyed by filename.
+      Used to load many objects without re-reading the files.
 
     Returns
     -------
@@ -778,7 +983,9 @@ def load_spec(files, iextensions=None, extract='OPT', flux=True):
     spectra_list = []
     for ii, fname in enumerate(files):
         msgs.info("Loading extension {:d} of spectrum {:s}".format(extensions[ii], fname))
-        spectrum = load.load_1dspec(fname, exten=extensions[ii], extract=extract, flux=flux)
+        hdulist = None if hdulists is None else hdulists.get(fname)
+        spectrum = load.load_1dspec(fname, exten=extensions[ii], extract=extract, flux=flux,
+                                    hdulist=hdulist)
         # Polish a bit -- Deal with NAN, inf, and *very* large values that will exceed
         #   the floating point precision of float32 for var which is sig**2 (i.e. 1e38)
         bad_flux = np.any([np.isnan(spectrum.flux), np.isinf(spectrum.flux),
@@ -824,6 +1031,31 @@ def get_std_dev(irspec, rmask, ispec1d, s2n_min=2., wvmnx=None, **kwargs):
     fluxes, sigs, wave = unpack_spec(irspec)
     iflux = ispec1d.data['flux'][0,:].filled(0.)
     isig = ispec1d.data['sig'][0,:].filled(0.)
+    return std_dev_arrays(wave, fluxes, sigs, rmask, iflux, isig, s2n_min=s2n_min, wvmnx=wvmnx)
+
+
+def std_dev_arrays(wave, fluxes, sigs, rmask, iflux, isig, s2n_min=2., wvmnx=None, **kwargs):
+    """ Standard deviation of a stack of spectra about their coadd
+
+    Parameters
+    ----------
+    wave : ndarray, shape (nwave,)
+    fluxes : ndarray, shape (nexp, nwave)
+    sigs : ndarray, shape (nexp, nwave)
+    rmask : ndarray, shape (nexp, nwave)
+       True = Good. False = Bad.
+    iflux : ndarray, shape (nwave,)
+      Coadded flux
+    isig : ndarray, shape (nwave,)
+      Coadded error
+    s2n_min, wvmnx :
+      See :func:`get_std_dev`
+
+    Returns
+    -------
+    std_dev : float
+    dev_sig : ndarray
+    """
     cmask = rmask.copy()  # Starting mask
     # Mask locally
     mfluxes = np.ma.array(fluxes, mask=np.invert(rmask))
@@ -837,7 +1069,7 @@ def get_std_dev(irspec, rmask, ispec1d, s2n_min=2., wvmnx=None, **kwargs):
     if wvmnx is not None:
         msgs.info("Restricting std_dev calculation to wavelengths {}".format(wvmnx))
         bad_wv = np.any([(wave < wvmnx[0]), (wave > wvmnx[1])], axis=0)
-        cmask[bad_wv] = False
+        cmask[:,bad_wv] = False
     # Only calculate on regions with 2 or more spectra
     sum_msk = np.sum(cmask, axis=0)
     gdp = (sum_msk > 1) & (isig > 0.)
@@ -850,210 +1082,188 @@ def get_std_dev(irspec, rmask, ispec1d, s2n_min=2., wvmnx=None, **kwargs):
     return std_dev, dev_sig
 
 
-def coadd_spectra(spectra, wave_grid_method='concatenate', niter=5,
-                  flux_scale=None,
-                  scale_method='auto', do_offset=False, sigrej_final=3.,
-                  do_var_corr=True, qafile=None, outfile=None,
-                  do_cr=True, debug=False,**kwargs):
-    """
+def coadd_arrays(waves, fluxes, sigs, wave_grid_method='concatenate', niter=5,
+                 scale_method='auto', do_offset=False, sigrej_final=3., do_var_corr=True,
+                 do_cr=True, **kwargs):
+    """ Rebin, scale, clean and iteratively coadd a stack of 1D spectra
 
-    Args:
-        spectra:
-        wave_grid_method:
-        niter:
-        flux_scale (dict):  Use input info to scale the final spectrum to a photometric magnitude
-        scale_method:
-        do_offset:
-        sigrej_final:
-        do_var_corr:
-        qafile:
-        outfile:
-        do_cr:
-        debug:
-        **kwargs:
-    """
-    # Init
-    if niter <= 0:
-        msgs.error('Not prepared for zero iterations')
+    Array engine behind :func:`coadd_spectra`;  all of the exposures are
+    handled together at each step.
 
-    # Single spectrum?
-    if spectra.nspec == 1:
-        msgs.info('Only one spectrum.  Writing, as desired, and ending..')
-        if outfile is not None:
-            write_to_disk(spectra, outfile)
-        return spectra
+    Parameters
+    ----------
+    waves : masked ndarray, shape (nexp, npix)
+      Wavelengths in Angstroms, masked where padded
+    fluxes : ndarray, shape (nexp, npix)
+    sigs : ndarray, shape (nexp, npix)
+    wave_grid_method, niter, scale_method, do_offset, sigrej_final, do_var_corr, do_cr :
+      See :func:`coadd_spectra`
 
+    Returns
+    -------
+    new_wave : ndarray, shape (nwave,)
+    new_flux : ndarray, shape (nwave,)
+    new_sig : ndarray, shape (nwave,)
+    rfluxes : ndarray, shape (nexp, nwave)
+      Rebinned and scaled spectra
+    rsigs : ndarray, shape (nexp, nwave)
+    rmask : ndarray, shape (nexp, nwave)
+      True = Good, False = Bad
+    """
     if 'echelle' in kwargs:
         echelle = kwargs['echelle']
     else:
         echelle =  False
+    if do_offset:
+        msgs.error("do_offset is not implemented")
 
     # Final wavelength array
-    new_wave = new_wave_grid(spectra.data['wave'], wave_method=wave_grid_method, **kwargs)
+    new_wave = new_wave_grid(waves, wave_method=wave_grid_method, **kwargs)
 
-    # Rebin
-    rspec = spectra.rebin(new_wave*units.AA, all=True, do_sig=True, grow_bad_sig=True,
-                          masking='none')
+    # Rebin, with the grid sorted as XSpectrum1D would
+    rfluxes, rsigs = rebin_arrays(waves, fluxes, sigs, new_wave)
+    srt = np.argsort(new_wave)
+    new_wave, rfluxes, rsigs = new_wave[srt], rfluxes[:,srt], rsigs[:,srt]
 
     # Define mask -- THIS IS THE ONLY ONE TO USE
-    rmask = rspec.data['sig'].filled(0.) > 0.0
-
-    fluxes, sigs, wave = unpack_spec(rspec)
-
+    rmask = rsigs > 0.0
 
     # S/N**2, weights
-    rms_sn, weights = sn_weights(fluxes, sigs, rmask, wave)
+    rms_sn, weights = sn_weights(rfluxes, rsigs, rmask, new_wave)
 
-    # Scale (modifies rspec in place)
+    # Scale (modifies rfluxes, rsigs in place)
     if echelle:
         if scale_method is None:
             msgs.warn('No scaling betweeen different exposures/orders.')
         else:
             msgs.work('Need add a function to scale Echelle spectra.')
-            #scales, omethod = scale_spectra(rspec, rmask, sn2, scale_method='median', **kwargs)
     else:
-        scales, omethod = scale_spectra(rspec, rmask, rms_sn, scale_method=scale_method, **kwargs)
+        scales, omethod = scale_arrays(rfluxes, rsigs, rmask, rms_sn, scale_method=scale_method,
+                                       **kwargs)
 
     # Clean bad CR :: Should be run *after* scaling
     if do_cr:
-        clean_cr(rspec, rmask, **kwargs)
+        clean_cr_arrays(new_wave, rfluxes, rsigs, rmask, **kwargs)
 
     # Initial coadd
-    spec1d = one_d_coadd(rspec, rmask, weights)
+    new_flux, new_sig = one_d_coadd_arrays(rfluxes, rsigs, rmask, weights)
 
     # Init standard deviation
-    # FW: Not sure why calling this function as you initial the std_dev = 0. in the following.
-    std_dev, _ = get_std_dev(rspec, rmask, spec1d, **kwargs)
+    std_dev, _ = std_dev_arrays(new_wave, rfluxes, rsigs, rmask, new_flux, new_sig, **kwargs)
     msgs.info("Initial std_dev = {:g}".format(std_dev))
 
     iters = 0
     std_dev = 0.
     var_corr = 1.
+    # Cap S/N ratio at SN_MAX to prevent overly aggressive rejection
+    SN_MAX = 20.0
+    #; evaluate at 1-sigma and then scale
+    gauss_prob = 1.0 - 2.0*(1.-scipy.stats.norm.cdf(1.))
+    rows = np.arange(rfluxes.shape[0])
 
     # Scale the standard deviation
     while np.absolute(std_dev - 1.) >= 0.1 and iters < niter:
         iters += 1
         msgs.info("Iterating on coadding... iter={:d}".format(iters))
 
-        # Setup (strip out masks, if any)
-        tspec = spec1d.copy()
-        tspec.unmask()
-        newvar = tspec.data['sig'][0,:].filled(0.)**2  # JFH Interpolates over bad values?
-        newflux = tspec.data['flux'][0,:].filled(0.)
-        newflux_now = newflux  # JFH interpolates
-        # Convenient for coadding
-        uspec = rspec.copy()
-        uspec.unmask()
-
-        # Loop on images to update noise model for rejection
-        for qq in range(rspec.nspec):
-
-            # Grab full spectrum (unmasked)
-            iflux = uspec.data['flux'][qq,:].filled(0.)
-            sig = uspec.data['sig'][qq,:].filled(0.)
-            ivar = np.zeros_like(sig)
-            gd = sig > 0.
-            ivar[gd] = 1./sig[gd]**2
-
-            # var_tot
-            var_tot = newvar + utils.calc_ivar(ivar)
-            ivar_real = utils.calc_ivar(var_tot)
-            # smooth out possible outliers in noise
-            #var_med = medfilt(var_tot, 5)
-            #var_smooth = medfilt(var_tot, 99)#, boundary = 'reflect')
-            var_med = scipy.ndimage.filters.median_filter(var_tot, size=5, mode='reflect')
-            var_smooth = scipy.ndimage.filters.median_filter(var_tot, size=99, mode='reflect')
-            # conservatively always take the largest variance
-            var_final = np.maximum(var_med, var_smooth)
-            ivar_final = utils.calc_ivar(var_final)
-            # Cap S/N ratio at SN_MAX to prevent overly aggressive rejection
-            SN_MAX = 20.0
-            ivar_cap = np.minimum(ivar_final,(SN_MAX/(newflux_now + (newflux_now <= 0.0)))**2)
-            #; adjust rejection to reflect the statistics of the distribtuion
-            #; of errors. This fixes cases where for not totally understood
-            #; reasons the noise model is not quite right and
-            #; many pixels are rejected.
-
-            #; Is the model offset relative to the data? If so take it out
-            if do_offset:
-                diff1 = iflux-newflux_now
-                #idum = np.where(arrmask[*, j] EQ 0, nnotmask)
-                debugger.set_trace() # GET THE MASK RIGHT!
-                nnotmask = np.sum(rmask)
-                nmed_diff = np.maximum(nnotmask//20, 10)
-                #; take out the smoothly varying piece
-                #; JXP -- This isnt going to work well if the data has a bunch of
-                #; null values in it
-                w = np.ones(5, 'd')
-                diff_med = scipy.ndimage.filters.median_filter(diff1*(rmask), size = nmed_diff, mode='reflect')
-                diff_sm = np.convolve(diff_med, w/w.sum(),mode='same')
-                chi2 = (diff1-diff_sm)**2*ivar_real
-                goodchi = (rmask) & (ivar_real > 0.0) & (chi2 <= 36.0) # AND masklam, ngd)
-                if np.sum(goodchi) == 0:
-                    goodchi = np.array([True]*iflux.size)
-#                debugger.set_trace()  # Port next line to Python to use this
-                #djs_iterstat, (arrflux[goodchi, j]-newflux_now[goodchi]) $
-                #   , invvar = ivar_real[goodchi], mean = offset_mean $
-                #   , median = offset $
-            else:
-                offset = 0.
-            chi2 = (iflux-newflux_now - offset)**2*ivar_real
-            goodchi = rmask[qq,:] & (ivar_real > 0.0) & (chi2 <= 36.0) # AND masklam, ngd)
-            ngd = np.sum(goodchi)
-            if ngd == 0:
-                goodchi = np.array([True]*iflux.size)
-            #; evalute statistics of chi2 for good pixels and excluding
-            #; extreme 6-sigma outliers
-            chi2_good = chi2[goodchi]
-            chi2_srt = chi2_good.copy()
-            chi2_srt.sort()
-            #; evaluate at 1-sigma and then scale
-            gauss_prob = 1.0 - 2.0*(1.-scipy.stats.norm.cdf(1.)) #gaussint(-double(1.0d))
-            sigind = int(np.round(gauss_prob*ngd))
-            chi2_sigrej = chi2_srt[sigind]
-            one_sigma = np.minimum(np.maximum(np.sqrt(chi2_sigrej),1.0),5.0)
-            sigrej_eff = sigrej_final*one_sigma
-            chi2_cap = (iflux-newflux_now - offset)**2*ivar_cap
-            # Grow??
-            #Is this correct? This is not growing mask
-            #chi_mask = (chi2_cap > sigrej_eff**2) & (~rmask[qq,:])
-            chi_mask = (chi2_cap > sigrej_eff**2) | np.invert(rmask[qq,:])
-            nrej = np.sum(chi_mask)
-            # Apply
-            if nrej > 0:
-                msgs.info("Rejecting {:d} pixels in exposure {:d}".format(nrej,qq))
-                #print(rspec.data['wave'][qq,chi_mask])
-                rmask[qq,chi_mask] = False
-                #rspec.select = qq
-                #rspec.add_to_mask(chi_mask)
-            #outmask[*, j] = (arrmask[*, j] EQ 1) OR (chi2_cap GT sigrej_eff^2)
-
-        # Incorporate saving of each dev/sig panel onto one page? Currently only saves last fit
-        #qa_plots(wavelengths, masked_fluxes, masked_vars, new_wave, new_flux, new_var)
+        # Update the noise model of all the exposures for rejection
+        ivar = (rsigs > 0.) * utils.calc_ivar(rsigs**2)
+        var_tot = new_sig[None,:]**2 + utils.calc_ivar(ivar)
+        ivar_real = utils.calc_ivar(var_tot)
+        # smooth out possible outliers in noise
+        var_med = scipy.ndimage.filters.median_filter(var_tot, size=(1,5), mode='reflect')
+        var_smooth = scipy.ndimage.filters.median_filter(var_tot, size=(1,99), mode='reflect')
+        # conservatively always take the largest variance
+        ivar_final = utils.calc_ivar(np.maximum(var_med, var_smooth))
+        ivar_cap = np.minimum(ivar_final, (SN_MAX/(new_flux + (new_flux <= 0.0)))**2)
+
+        #; adjust rejection to reflect the statistics of the distribtuion
+        #; of errors, evaluated on the good pixels excluding extreme
+        #; 6-sigma outliers
+        diff2 = (rfluxes - new_flux[None,:])**2
+        chi2 = diff2*ivar_real
+        goodchi = rmask & (ivar_real > 0.0) & (chi2 <= 36.0)
+        ngd = np.sum(goodchi, axis=1)
+        goodchi[ngd == 0,:] = True
+        chi2_srt = np.sort(np.where(goodchi, chi2, np.inf), axis=1)
+        sigind = np.round(gauss_prob*ngd).astype(int)
+        chi2_sigrej = chi2_srt[rows,sigind]
+        one_sigma = np.minimum(np.maximum(np.sqrt(chi2_sigrej),1.0),5.0)
+        sigrej_eff = sigrej_final*one_sigma
+        chi2_cap = diff2*ivar_cap
+        chi_mask = (chi2_cap > sigrej_eff[:,None]**2) | np.invert(rmask)
+        nrej = np.sum(chi_mask, axis=1)
+        # Apply
+        for qq in np.where(nrej > 0)[0]:
+            msgs.info("Rejecting {:d} pixels in exposure {:d}".format(nrej[qq],qq))
+        rmask &= np.invert(chi_mask)
 
         # Coadd anew
-        spec1d = one_d_coadd(rspec, rmask, weights, **kwargs)
+        new_flux, new_sig = one_d_coadd_arrays(rfluxes, rsigs, rmask, weights)
         # Calculate std_dev
-        std_dev, _ = get_std_dev(rspec, rmask, spec1d, **kwargs)
-        #var_corr = var_corr * std_dev
+        std_dev, _ = std_dev_arrays(new_wave, rfluxes, rsigs, rmask, new_flux, new_sig, **kwargs)
         msgs.info("Desired variance correction: {:g}".format(var_corr))
         msgs.info("New standard deviation: {:g}".format(std_dev))
 
         if do_var_corr:
             msgs.info("Correcting variance")
-            for ispec in range(rspec.nspec):
-                rspec.data['sig'][ispec] *= np.sqrt(std_dev)
-            spec1d = one_d_coadd(rspec, rmask, weights)
+            rsigs *= np.sqrt(std_dev)
+            new_flux, new_sig = one_d_coadd_arrays(rfluxes, rsigs, rmask, weights)
 
     if iters == 0:
         msgs.warn("No iterations on coadding done")
-        #qa_plots(wavelengths, masked_fluxes, masked_vars, new_wave, new_flux, new_var)
-    else: #if iters > 0:
+    else:
         msgs.info("Final correction to initial variances: {:g}".format(var_corr))
 
+    return new_wave, new_flux, new_sig, rfluxes, rsigs, rmask
+
+
+def coadd_spectra(spectra, wave_grid_method='concatenate', niter=5,
+                  flux_scale=None,
+                  scale_method='auto', do_offset=False, sigrej_final=3.,
+                  do_var_corr=True, qafile=None, outfile=None,
+                  do_cr=True, debug=False,**kwargs):
+    """
+
+    Args:
+        spectra:
+        wave_grid_method:
+        niter:
+        flux_scale (dict):  Use input info to scale the final spectrum to a photometric magnitude
+        scale_method:
+        do_offset:
+        sigrej_final:
+        do_var_corr:
+        qafile:
+        outfile:
+        do_cr:
+        debug:
+        **kwargs:
+    """
+    # Init
+    if niter <= 0:
+        msgs.error('Not prepared for zero iterations')
+
+    # Single spectrum?
+    if spectra.nspec == 1:
+        msgs.info('Only one spectrum.  Writing, as desired, and ending..')
+        if outfile is not None:
+            write_to_disk(spectra, outfile)
+        return spectra
+
+    # Coadd
+    new_wave, new_flux, new_sig, rfluxes, rsigs, rmask = coadd_arrays(
+        spectra.data['wave'], spectra.data['flux'].filled(0.), spectra.data['sig'].filled(0.),
+        wave_grid_method=wave_grid_method, niter=niter, scale_method=scale_method,
+        do_offset=do_offset, sigrej_final=sigrej_final, do_var_corr=do_var_corr, do_cr=do_cr,
+        **kwargs)
+    spec1d = XSpectrum1D.from_tuple((new_wave*units.AA, new_flux, new_sig), masking='none')
+
     # QA
     if qafile is not None:
         msgs.info("Writing QA file: {:s}".format(qafile))
+        rspec = XSpectrum1D(np.tile(new_wave, (rfluxes.shape[0],1))*units.AA, rfluxes, sig=rsigs,
+                            masking='none')
         coaddspec_qa(spectra, rspec, rmask, spec1d, qafile=qafile,debug=debug)
 
     # Scale the flux??
@@ -128,7 +128,7 @@ def det_error_msg(exten, sdet):
                " Maybe you chose the wrong detector to coadd? "
                "Set with --det= or check file contents with pypeit_show_2dspec Science/spec2d_XXX --list".format(sdet))
 
-def load_coadd2d_stacks(spec2d_files, det):
+def load_coadd2d_stacks(spec2d_files, det, stream=False):
     """
 
     Args:
@@ -137,6 +137,13 @@ def load_coadd2d_stacks(spec2d_files, det):
         det: int
            detector in question
 
+    Optional Args:
+    --------------
+        stream: bool, default = False
+           Do not read the image planes. The sub-images of each slit are instead read from the spec2d and master
+           files when that slit is coadded (see load_slit_stacks), so that the full (nimgs, nspec, nspat) stacks are
+           never held in memory.
+
     Returns:
         stack_dict: dict
            Dictionary containing all the images and keys required for perfomring 2d coadds.
@@ -174,6 +181,11 @@ def load_coadd2d_stacks(spec2d_files, det):
     # TODO Sort this out with the correct detector extensions etc.
     # Read in the image stacks
     for ifile in range(nfiles):
+        if stream:
+            sobjs, head = load.load_specobjs(spec1d_files[ifile])
+            head1d_list.append(head)
+            specobjs_list.append(sobjs)
+            continue
         waveimg = waveimage.load_waveimage(waveimgfiles[ifile])
         tilts = wavetilts.load_tilts(tiltfiles[ifile])
         hdu = fits.open(spec2d_files[ifile])
@@ -231,7 +243,6 @@ def load_coadd2d_stacks(spec2d_files, det):
     tslits_dict, _ = traceslits.load_tslits(tracefiles[0])
     spectrograph = util.load_spectrograph(tslits_dict['spectrograph'])
     slitmask = pixels.tslits2mask(tslits_dict)
-    slitmask_stack = np.einsum('i,jk->ijk', np.ones(nfiles), slitmask)
 
     # Fill the master key dict
     head2d = head2d_list[0]
@@ -243,18 +254,87 @@ def load_coadd2d_stacks(spec2d_files, det):
     master_key_dict['trace'] = head2d['TRACMKEY']  + '_{:02d}'.format(det)
     master_key_dict['flat']  = head2d['FLATMKEY']  + '_{:02d}'.format(det)
     stack_dict = dict(specobjs_list=specobjs_list, tslits_dict=tslits_dict,
-                      slitmask_stack=slitmask_stack,
-                      sciimg_stack=sciimg_stack, sciivar_stack=sciivar_stack,
-                      skymodel_stack=skymodel_stack, mask_stack=mask_stack,
-                      tilts_stack=tilts_stack, waveimg_stack=waveimg_stack,
+                      slitmask=slitmask,
                       head1d_list = head1d_list, head2d_list=head2d_list,
                       redux_path=redux_path, master_path=master_path, master_dir=master_dir,
                       master_key_dict=master_key_dict,
                       spectrograph = tslits_dict['spectrograph'])
+    if stream:
+        stack_dict.update(det=det, spec2d_files=spec2d_files, waveimgfiles=waveimgfiles, tiltfiles=tiltfiles)
+    else:
+        stack_dict.update(sciimg_stack=sciimg_stack, sciivar_stack=sciivar_stack,
+                          skymodel_stack=skymodel_stack, mask_stack=mask_stack,
+                          tilts_stack=tilts_stack, waveimg_stack=waveimg_stack)
 
     return stack_dict
 
 
+def slit_bounding_box(slitmask, islit):
+    """
+    Utility routine to determine the sub-image containing all of the pixels on a slit.
+
+    Args:
+        slitmask: int ndarray, shape (nspec, nspat)
+            Image with the slit number of each pixel, -1 for pixels off the slits
+        islit: int
+            Slit in question
+
+    Returns:
+        (spec_slice, spat_slice): tuple of slice
+            Slices of the image covering the slit
+    """
+    thismask = slitmask == islit
+    spec_on = np.where(np.any(thismask, axis=1))[0]
+    spat_on = np.where(np.any(thismask, axis=0))[0]
+    if spec_on.size == 0:
+        msgs.error('Slit {:d} has no pixels on the detector'.format(islit))
+    return slice(spec_on[0], spec_on[-1]+1), slice(spat_on[0], spat_on[-1]+1)
+
+
+def load_slit_stacks(stack_dict, islit):
+    """
+    Grab the image stacks of the sub-image containing a slit. If the stack_dict was loaded with stream=True the
+    sub-images are read from the spec2d and master files, so that only nimgs sub-images are in memory at a time.
+
+    Args:
+        stack_dict: dict
+           Dictionary returned by load_coadd2d_stacks
+        islit: int
+           Slit in question
+
+    Returns:
+        slit_dict: dict
+           Dictionary with the sub-image stacks sciimg_stack, sciivar_stack, skymodel_stack, mask_stack,
+           tilts_stack, waveimg_stack and thismask_stack, each with shape (nimgs, nspec_slit, nspat_slit),
+           and the slices spec_slice and spat_slice of the full images that they cover.
+    """
+    spec_slice, spat_slice = slit_bounding_box(stack_dict['slitmask'], islit)
+    thismask = stack_dict['slitmask'][spec_slice, spat_slice] == islit
+    nimgs = len(stack_dict['specobjs_list'])
+    keys = ['sciimg_stack', 'sciivar_stack', 'skymodel_stack', 'mask_stack', 'tilts_stack', 'waveimg_stack']
+    if 'sciimg_stack' in stack_dict:
+        slit_dict = {key: stack_dict[key][:, spec_slice, spat_slice] for key in keys}
+    else:
+        sdet = parse.get_dnum(stack_dict['det'], prefix=False)
+        slit_dict = {key: np.zeros((nimgs,) + thismask.shape, dtype=float) for key in keys}
+        for ifile in range(nimgs):
+            with fits.open(stack_dict['spec2d_files'][ifile], memmap=True) as hdu:
+                names = [hdu[i].name for i in range(len(hdu))]
+                for key, ext in zip(keys[:4], ['PROCESSED', 'IVARMODEL', 'SKY', 'MASK']):
+                    exten = 'DET{:s}-{:s}'.format(sdet, ext)
+                    if exten not in names:
+                        msgs.error("Extension {:s} was not found in {:s}. Maybe you chose the wrong detector to "
+                                   "coadd?".format(exten, stack_dict['spec2d_files'][ifile]))
+                    slit_dict[key][ifile] = hdu[names.index(exten)].section[spec_slice, spat_slice]
+            for key, mfiles in zip(keys[4:], [stack_dict['tiltfiles'], stack_dict['waveimgfiles']]):
+                with fits.open(mfiles[ifile], memmap=True) as hdu:
+                    slit_dict[key][ifile] = hdu[0].section[spec_slice, spat_slice]
+    slit_dict['thismask_stack'] = np.repeat(thismask[None,:,:], nimgs, axis=0)
+    slit_dict['spec_slice'] = spec_slice
+    slit_dict['spat_slice'] = spat_slice
+    return slit_dict
+
+
 
 
 def get_wave_ind(wave_grid, wave_min, wave_max):
@@ -316,6 +396,50 @@ def broadcast_weights(weights, shape):
 
     return weights_stack
 
+def coadd2d_slits(stack_dict, objid, wave_grid, nproc=1):
+    """
+    Perform the 2d coadd of each slit in a stack of images. The slits are coadded independently, in parallel
+    when nproc > 1. Only the sub-image containing each slit enters its coadd (see load_slit_stacks).
+
+    Args:
+        stack_dict: dict
+           Dictionary returned by load_coadd2d_stacks
+        objid: int ndarray, shape (nimgs,)
+           Object ids of the brightest object in each exposure, used to determine the weights and reference traces
+        wave_grid: float ndarray
+           Wavelength grid onto which the slits are rectified
+
+    Optional Args:
+    --------------
+        nproc: int, default = 1
+           Number of worker threads
+
+    Returns:
+        coadd_list: list
+           The dictionary returned by coadd2d for each slit, in slit order, such that the result does not depend on
+           nproc.
+    """
+    nslits = stack_dict['tslits_dict']['slit_left'].shape[1]
+
+    def _coadd_slit(islit):
+        msgs.info('Performing 2d coadd for slit: {:d}/{:d}'.format(islit,nslits-1))
+        # Determine the wavelength dependent optimal weights and grab the reference trace
+        rms_sn, weights, trace_stack, wave_stack = optimal_weights(stack_dict['specobjs_list'], islit, objid)
+        # Only the sub-image containing the slit enters the coadd
+        slit_dict = load_slit_stacks(stack_dict, islit)
+        spec_slice, spat_slice = slit_dict['spec_slice'], slit_dict['spat_slice']
+        trace_stack = trace_stack[:, spec_slice] - spat_slice.start
+        if weights.ndim == 2:
+            weights = weights[:, spec_slice]
+        # Perform the 2d coadd
+        return coadd2d(trace_stack, slit_dict['sciimg_stack'], slit_dict['sciivar_stack'],
+                       slit_dict['skymodel_stack'], (slit_dict['mask_stack'] == 0),
+                       slit_dict['tilts_stack'], slit_dict['waveimg_stack'], slit_dict['thismask_stack'],
+                       weights = weights, wave_grid=wave_grid)
+
+    return utils.parallel_map(_coadd_slit, [(islit,) for islit in range(nslits)], nproc=nproc)
+
+
 def coadd2d(trace_stack, sciimg_stack, sciivar_stack, skymodel_stack, inmask_stack, tilts_stack, waveimg_stack,
             thismask_stack, weights=None, loglam_grid=None, wave_grid=None):
     """
@@ -648,24 +772,11 @@ def extract_coadd2d(stack_dict, master_dir, ir_redux=False, par=None, std=False,
     wave_grid = spectrograph.wavegrid()
     wave_grid_mid = spectrograph.wavegrid(midpoint=True)
 
-    coadd_list = []
-    nspec_vec = np.zeros(nslits,dtype=int)
-    nspat_vec = np.zeros(nslits,dtype=int)
     # ToDO Generalize this to be a loop over detectors, such tha the coadd_list is an ordered dict (perhaps) with
     # all the slits on all detectors
-    for islit in range(nslits):
-        msgs.info('Performing 2d coadd for slit: {:d}/{:d}'.format(islit,nslits-1))
-        # Determine the wavelength dependent optimal weights and grab the reference trace
-        rms_sn, weights, trace_stack, wave_stack = optimal_weights(stack_dict['specobjs_list'], islit, objid)
-        thismask_stack = stack_dict['slitmask_stack'] == islit
-        # Perform the 2d coadd
-        coadd_dict = coadd2d(trace_stack, stack_dict['sciimg_stack'], stack_dict['sciivar_stack'],
-                             stack_dict['skymodel_stack'], (stack_dict['mask_stack'] == 0),
-                             stack_dict['tilts_stack'], stack_dict['waveimg_stack'], thismask_stack,
-                             weights = weights, wave_grid=wave_grid)
-        coadd_list.append(coadd_dict)
-        nspec_vec[islit]=coadd_dict['nspec']
-        nspat_vec[islit]=coadd_dict['nspat']
+    coadd_list = coadd2d_slits(stack_dict, objid, wave_grid, nproc=par['scienceimage']['nproc'])
+    nspec_vec = np.array([coadd_dict['nspec'] for coadd_dict in coadd_list], dtype=int)
+    nspat_vec = np.array([coadd_dict['nspat'] for coadd_dict in coadd_list], dtype=int)
 
     # Determine the size of the psuedo image
     nspat_pad = 10
@@ -114,40 +114,17 @@ def extract_asymbox2(image,left_in,right_in,ycen = None,weight_image = None):
     nspat = idims[1]
     nspec = idims[0]
 
-    maxwindow = np.max(right - left)
-    tempx = np.int(maxwindow + 3.0)
-
-    bigleft = np.outer(left[:], np.ones(tempx))
-    bigright = np.outer(right[:], np.ones(tempx))
-    spot = np.outer(np.ones(npix * nTrace), np.arange(tempx)) + bigleft - 1
-    bigy = np.outer(ycen_out[:], np.ones(tempx, dtype='int'))
+    weight, bigy, fullspot = asymbox2_weights(left, right, ycen_out, nspec, nspat)
+    tempx = weight.shape[-1]
 
-    fullspot = np.array(np.fmin(np.fmax(np.round(spot + 1) - 1, 0), nspat - 1), int)
-    fracleft = np.fmax(np.fmin(fullspot - bigleft, 0.5), -0.5)
-    fracright = np.fmax(np.fmin(bigright - fullspot, 0.5), -0.5)
-    del bigleft
-    del bigright
-    bool_mask1 = (spot >= -0.5) & (spot < (nspat - 0.5))
-    bool_mask2 = (bigy >= 0) & (bigy <= (nspec - 1))
-    weight = (np.fmin(np.fmax(fracleft + fracright, 0), 1)) * bool_mask1 * bool_mask2
-    del spot
-    del fracleft
-    del fracright
-    bigy = np.fmin(np.fmax(bigy, 0), nspec - 1)
-
-    if weight_image != None:
-        temp = np.array([weight_image[x1, y1] * image[x1, y1] for (x1, y1) in zip(bigy.flatten(), fullspot.flatten())])
-        temp2 = np.reshape(weight.flatten() * temp, (nTrace, npix, tempx))
+    if weight_image is not None:
+        temp2 = np.reshape(weight*(weight_image[bigy, fullspot]*image[bigy, fullspot]), (nTrace, npix, tempx))
         fextract = np.sum(temp2, axis=2)
-        temp_wi = np.array([weight_image[x1, y1] for (x1, y1) in zip(bigy.flatten(), fullspot.flatten())])
-        temp2_wi = np.reshape(weight.flatten() * temp_wi, (nTrace, npix, tempx))
+        temp2_wi = np.reshape(weight*weight_image[bigy, fullspot], (nTrace, npix, tempx))
         f_ivar = np.sum(temp2_wi, axis=2)
         fextract = fextract / (f_ivar + (f_ivar == 0)) * (f_ivar > 0)
     else:
-        # Might be more pythonic way to code this. I needed to switch the flattening order in order to get
-        # this to work
-        temp = np.array([image[x1, y1] for (x1, y1) in zip(bigy.flatten(), fullspot.flatten())])
-        temp2 = np.reshape(weight.flatten() * temp, (nTrace, npix, tempx))
+        temp2 = np.reshape(weight*image[bigy, fullspot], (nTrace, npix, tempx))
         fextract = np.sum(temp2, axis=2)
 
     # IDL version model functionality not implemented yet
@@ -159,6 +136,50 @@ def extract_asymbox2(image,left_in,right_in,ycen = None,weight_image = None):
     return fextract.T
 
 
+def asymbox2_weights(left, right, ycen, nspec, nspat):
+    """ Pixel indices and weights of the window used by extract_asymbox2 at each position.
+
+    The window at every position is sampled with the same number of pixels, tempx, which is set by the
+    widest window. The extracted flux is then np.sum(weight*image[bigy, fullspot], axis=-1).
+    Computing these once allows several images to be extracted with the same traces.
+
+    Parameters
+    ----------
+    left :  float ndarray
+        Left boundary of the region to be extracted, any shape
+    right :  float ndarray
+        Right boundary of the region to be extracted, same shape as left
+    ycen :  int ndarray
+        Spectral pixel of each position, same shape as left
+    nspec : int
+        Number of spectral pixels in the image
+    nspat : int
+        Number of spatial pixels in the image
+
+    Returns
+    -------
+    weight, bigy, fullspot:  ndarray, each with shape left.shape + (tempx,)
+        Weights, spectral and spatial pixel indices of each pixel in the window
+    """
+    maxwindow = np.max(right - left)
+    tempx = int(maxwindow + 3.0)
+
+    bigleft = left[..., np.newaxis]
+    bigright = right[..., np.newaxis]
+    spot = np.arange(tempx) + bigleft - 1
+    bigy = np.repeat(ycen[..., np.newaxis], tempx, axis=-1)
+
+    fullspot = np.array(np.fmin(np.fmax(np.round(spot + 1) - 1, 0), nspat - 1), int)
+    fracleft = np.fmax(np.fmin(fullspot - bigleft, 0.5), -0.5)
+    fracright = np.fmax(np.fmin(bigright - fullspot, 0.5), -0.5)
+    bool_mask1 = (spot >= -0.5) & (spot < (nspat - 0.5))
+    bool_mask2 = (bigy >= 0) & (bigy <= (nspec - 1))
+    weight = (np.fmin(np.fmax(fracleft + fracright, 0), 1)) * bool_mask1 * bool_mask2
+    bigy = np.fmin(np.fmax(bigy, 0), nspec - 1)
+
+    return weight, bigy, fullspot
+
+
 def extract_boxcar(image,trace_in, radius_in, ycen = None):
     """ Extract the total flux within a boxcar window at many positions. The ycen position is optional. If it is not provied, it is assumed to be integers
      in the spectral direction (as is typical for traces). Traces are expected to run vertically to be consistent with other
@@ -282,22 +303,66 @@ def extract_optimal(sciimg,ivar, mask, waveimg, skyimg, rn2_img, oprof, box_radi
     28-May-2018  Ported to python by J. Hennawi
     """
 
-    imgminsky = sciimg - skyimg
-    nspat = imgminsky.shape[1]
-    nspec = imgminsky.shape[0]
+    extract_optimal_batch(sciimg, ivar, mask, waveimg, skyimg, rn2_img, oprof[:, :, np.newaxis], box_radius,
+                          [specobj])
+
+    return None
+
+
+def extract_optimal_batch(sciimg, ivar, mask, waveimg, skyimg, rn2_img, oprof, box_radius, sobjs,
+                          objmask_radius=None):
+
+    """ Optimal and boxcar extraction of several objects on a slit in one vectorized pass.
+
+    The images are only accessed on the sub-image spanned by the object profiles and the boxcar apertures, and
+    the extractions of all the objects are computed together on this sub-image. For each object the results are
+    the same as those of extract_optimal called with that object's profile and mask.
+
+    Parameters
+    ----------
+    sciimg : float ndarray shape (nspec, nspat)
+       Science frame
+    ivar: float ndarray shape (nspec, nspat)
+       inverse variance of science frame. Can be a model or deduced from the image itself.
+    mask: boolean ndarray shape (nspec, nspat)
+       mask indicating which pixels are good. Good pixels = True, Bad Pixels = False
+    waveimg :  float ndarray
+        Wavelength image. float 2-d array with shape (nspec, nspat)
+    skyimg: float ndarray shape (nspec, nspat)
+        Image containing our model of the sky
+    rn2_img: float ndarray shape (nspec, nspat)
+        Image containing the read noise squared (including digitization noise due to gain, i.e. this is an effective read noise)
+    oprof: float ndarray shape (nspec, nspat, nobj)
+        Stacked images containing the profiles of the objects that we are extracting
+    box_radius: float
+        Size of boxcar window in floating point pixels in the spatial direction.
+    sobjs: list of SpecObj objects or SpecObjs object, length nobj
+        Containers that hold the object, trace, and extraction information for the objects in question.
+    objmask_radius: float, default = None
+        If set, the mask of each object is further restricted to the pixels within objmask_radius of its trace,
+        i.e. mask & (spat_img >= trace - objmask_radius) & (spat_img <= trace + objmask_radius)
+
+    Returns
+    -------
+    Return value is None. The boxcar and optimal dictionaries of each specobj are filled in place with the
+    extraction parameters.
+    """
 
+    nspec, nspat = sciimg.shape
+    nobj = len(sobjs)
     spec_vec = np.arange(nspec)
     spat_vec = np.arange(nspat)
 
-    # TODO This makes no sense for difference imaging? Not sure we need NIVAR anyway
-    var_no = np.abs(skyimg - np.sqrt(2.0) * np.sqrt(rn2_img)) + rn2_img
-
-    ispec, ispat = np.where(oprof > 0.0)
+    trace_spat = np.column_stack([sobjs[iobj].trace_spat for iobj in range(nobj)])
+    trace_spec = np.column_stack([sobjs[iobj].trace_spec for iobj in range(nobj)])
 
-    # Exit gracefully if we have no positive object profiles, since that means something was wrong with object fitting
-    if not np.any(oprof > 0.0):
+    # Columns spanned by the positive part of each object profile
+    pos_cols = np.any(oprof > 0.0, axis=0)
+    for iobj in np.where(np.invert(np.any(pos_cols, axis=0)))[0]:
+        # Exit gracefully if we have no positive object profiles, since that means something was wrong with object fitting
         msgs.warn('Object profile is zero everywhere. This aperture is junk.')
         junk = np.zeros(nspec)
+        specobj = sobjs[iobj]
         # Fill in the optimally extraction tags
         specobj.optimal['WAVE'] = junk
         specobj.optimal['COUNTS'] = junk
@@ -320,30 +385,59 @@ def extract_optimal(sciimg,ivar, mask, waveimg, skyimg, rn2_img, oprof, box_radi
         specobj.boxcar['COUNTS_RN'] = junk
         specobj.boxcar['BOX_RADIUS'] = 0.0
 
+    igood = np.where(np.any(pos_cols, axis=0))[0]
+    if igood.size == 0:
         return None
+    ngood = igood.size
+    trace_spat = trace_spat[:, igood]
+    trace_spec = trace_spec[:, igood]
+
+    # The optimal extraction of each object is restricted to the columns spanned by its profile
+    mincol = np.argmax(pos_cols[:, igood], axis=0)
+    maxcol = nspat - np.argmax(pos_cols[::-1, igood], axis=0)
+
+    # Shared sub-image, which also covers the boxcar apertures. The first column is kept even, so that the
+    # rounding of half pixels in the boxcar window is not changed by the offset
+    c0 = int(np.fmax(np.fmin(mincol.min(), np.floor(np.min(trace_spat - box_radius)) - 1), 0))
+    c0 -= c0 % 2
+    c1 = int(np.fmin(np.fmax(maxcol.max(), np.ceil(np.max(trace_spat + box_radius)) + 2), nspat))
+    nsub = c1 - c0
+    sub_vec = spat_vec[c0:c1]
+
+    img_sub = sciimg[:, c0:c1] - skyimg[:, c0:c1]
+    sky_sub = skyimg[:, c0:c1]
+    rn2_sub = rn2_img[:, c0:c1]
+    wave_sub = waveimg[:, c0:c1]
+    ivar_sub = ivar[:, c0:c1]
+    # TODO This makes no sense for difference imaging? Not sure we need NIVAR anyway
+    var_no = np.abs(sky_sub - np.sqrt(2.0) * np.sqrt(rn2_sub)) + rn2_sub
+
+    # Mask of each object, shape (nspec, nsub, ngood)
+    mask_obj = np.repeat(mask[:, c0:c1, np.newaxis], ngood, axis=2)
+    if objmask_radius is not None:
+        spat_sub = sub_vec[np.newaxis, :, np.newaxis]
+        mask_obj &= (spat_sub >= (trace_spat[:, np.newaxis, :] - objmask_radius)) & \
+                    (spat_sub <= (trace_spat[:, np.newaxis, :] + objmask_radius))
+    colmask = (sub_vec[:, np.newaxis] >= mincol[np.newaxis, :]) & (sub_vec[:, np.newaxis] < maxcol[np.newaxis, :])
+    mask_sub = mask_obj & colmask[np.newaxis, :, :]
+
+    # Broadcast the images over the objects
+    ivar3 = np.fmax(ivar_sub,0.0)[:, :, np.newaxis] # enforce positivity since these are used as weights
+    vno3 = np.fmax(var_no,0.0)[:, :, np.newaxis]
+    rn23 = rn2_sub[:, :, np.newaxis]
+    img3 = img_sub[:, :, np.newaxis]
+    sky3 = sky_sub[:, :, np.newaxis]
+    wave3 = wave_sub[:, :, np.newaxis]
 
-    mincol = np.min(ispat)
-    maxcol = np.max(ispat) + 1
-    nsub = maxcol - mincol
-
-    mask_sub = mask[:,mincol:maxcol]
-    wave_sub = waveimg[:,mincol:maxcol]
-    ivar_sub = np.fmax(ivar[:,mincol:maxcol],0.0) # enforce positivity since these are used as weights
-    vno_sub = np.fmax(var_no[:,mincol:maxcol],0.0)
-
-    rn2_sub = rn2_img[:,mincol:maxcol]
-    img_sub = imgminsky[:,mincol:maxcol]
-    sky_sub = skyimg[:,mincol:maxcol]
-    oprof_sub = oprof[:,mincol:maxcol]
     # enforce normalization and positivity of object profiles
+    oprof_sub = np.where(colmask[np.newaxis, :, :], oprof[:, c0:c1, :][:, :, igood], 0.0)
     norm = np.nansum(oprof_sub,axis = 1)
-    norm_oprof = np.outer(norm, np.ones(nsub))
-    oprof_sub = np.fmax(oprof_sub/norm_oprof, 0.0)
+    oprof_sub = np.fmax(oprof_sub/norm[:, np.newaxis, :], 0.0)
 
     ivar_denom = np.nansum(mask_sub*oprof_sub, axis=1)
-    mivar_num = np.nansum(mask_sub*ivar_sub*oprof_sub**2, axis=1)
+    mivar_num = np.nansum(mask_sub*ivar3*oprof_sub**2, axis=1)
     mivar_opt = mivar_num/(ivar_denom + (ivar_denom == 0.0))
-    flux_opt = np.nansum(mask_sub*ivar_sub*img_sub*oprof_sub, axis=1)/(mivar_num + (mivar_num == 0.0))
+    flux_opt = np.nansum(mask_sub*ivar3*img3*oprof_sub, axis=1)/(mivar_num + (mivar_num == 0.0))
     # Optimally extracted noise variance (sky + read noise) only. Since
     # this variance is not the same as that used for the weights, we
     # don't get the usual cancellation. Additional denom factor is the
@@ -351,87 +445,101 @@ def extract_optimal(sciimg,ivar, mask, waveimg, skyimg, rn2_img, oprof, box_radi
     # are only weighting by the profile (ivar_sub=1) because
     # otherwise the result depends on the signal (bad).
     nivar_num =np.nansum(mask_sub*oprof_sub**2, axis=1) # Uses unit weights
-    nvar_opt = ivar_denom*((mask_sub*vno_sub*oprof_sub**2).sum(axis=1))/(nivar_num**2 + (nivar_num**2 == 0.0))
+    nvar_opt = ivar_denom*((mask_sub*vno3*oprof_sub**2).sum(axis=1))/(nivar_num**2 + (nivar_num**2 == 0.0))
     nivar_opt = 1.0/(nvar_opt + (nvar_opt == 0.0))
     # Optimally extract sky and (read noise)**2 in a similar way
-    sky_opt = ivar_denom*(np.nansum(mask_sub*sky_sub*oprof_sub**2, axis=1))/(nivar_num**2 + (nivar_num**2 == 0.0))
-    rn2_opt = ivar_denom*(np.nansum(mask_sub*rn2_sub*oprof_sub**2, axis=1))/(nivar_num**2 + (nivar_num**2 == 0.0))
+    sky_opt = ivar_denom*(np.nansum(mask_sub*sky3*oprof_sub**2, axis=1))/(nivar_num**2 + (nivar_num**2 == 0.0))
+    rn2_opt = ivar_denom*(np.nansum(mask_sub*rn23*oprof_sub**2, axis=1))/(nivar_num**2 + (nivar_num**2 == 0.0))
     rn_opt = np.sqrt(rn2_opt)
     rn_opt[np.isnan(rn_opt)]=0.0
 
-    tot_weight = np.nansum(mask_sub*ivar_sub*oprof_sub, axis=1)
+    tot_weight = np.nansum(mask_sub*ivar3*oprof_sub, axis=1)
     mask_opt = (tot_weight > 0.0) & (mivar_num > 0.0) & (ivar_denom > 0.0)
-    frac_use = np.nansum((mask_sub*ivar_sub > 0.0)*oprof_sub, axis=1)
+    frac_use = np.nansum((mask_sub*ivar3 > 0.0)*oprof_sub, axis=1)
     # Use the same weights = oprof^2*mivar for the wavelenghts as the flux.
     # Note that for the flux, one of the oprof factors cancels which does
     # not for the wavelengths.
-    wave_opt = np.nansum(mask_sub*ivar_sub*wave_sub*oprof_sub**2, axis=1)/(mivar_num + (mivar_num == 0.0))
+    wave_opt = np.nansum(mask_sub*ivar3*wave3*oprof_sub**2, axis=1)/(mivar_num + (mivar_num == 0.0))
     # Interpolate wavelengths over masked pixels
     badwvs = (mivar_num <= 0) | (np.isfinite(wave_opt) == False) | (wave_opt <= 0.0)
+    f_wave = None
     if badwvs.any():
         oprof_smash = np.nansum(oprof_sub**2, axis=1)
         # Can we use the profile average wavelengths instead?
         oprof_good = badwvs & (oprof_smash > 0.0)
         if oprof_good.any():
-            wave_opt[oprof_good] = np.nansum(wave_sub[oprof_good,:]*oprof_sub[oprof_good,:]**2, axis=1)/np.nansum(oprof_sub[oprof_good,:]**2, axis=1)
+            ispec, iobj = np.where(oprof_good)
+            wave_opt[oprof_good] = np.nansum(wave_sub[ispec,:]*oprof_sub[ispec,:,iobj]**2, axis=1)/np.nansum(oprof_sub[ispec,:,iobj]**2, axis=1)
         oprof_bad = badwvs & ((oprof_smash <= 0.0) | (np.isfinite(oprof_smash) == False) | (wave_opt <= 0.0) | (np.isfinite(wave_opt) == False))
         if oprof_bad.any():
             # For pixels with completely bad profile values, interpolate from trace.
             f_wave = scipy.interpolate.RectBivariateSpline(spec_vec,spat_vec, waveimg)
-            wave_opt[oprof_bad] = f_wave(specobj.trace_spec[oprof_bad], specobj.trace_spat[oprof_bad],grid=False)
+            wave_opt[oprof_bad] = f_wave(trace_spec[oprof_bad], trace_spat[oprof_bad],grid=False)
 
-    flux_model = np.outer(flux_opt,np.ones(nsub))*oprof_sub
-    chi2_num = np.nansum((img_sub - flux_model)**2*ivar_sub*mask_sub,axis=1)
-    chi2_denom = np.fmax(np.nansum(ivar_sub*mask_sub > 0.0, axis=1) - 1.0, 1.0)
+    flux_model = flux_opt[:, np.newaxis, :]*oprof_sub
+    chi2_num = np.nansum((img3 - flux_model)**2*ivar3*mask_sub,axis=1)
+    chi2_denom = np.fmax(np.nansum(ivar3*mask_sub > 0.0, axis=1) - 1.0, 1.0)
     chi2 = chi2_num/chi2_denom
 
-    # Fill in the optimally extraction tags
-    specobj.optimal['WAVE'] = wave_opt    # Optimally extracted wavelengths
-    specobj.optimal['COUNTS'] = flux_opt    # Optimally extracted flux
-    specobj.optimal['COUNTS_IVAR'] = mivar_opt   # Inverse variance of optimally extracted flux using modelivar image
-    specobj.optimal['COUNTS_SIG'] = np.sqrt(utils.calc_ivar(mivar_opt))
-    specobj.optimal['COUNTS_NIVAR'] = nivar_opt  # Optimally extracted noise variance (sky + read noise) only
-    specobj.optimal['MASK'] = mask_opt    # Mask for optimally extracted flux
-    specobj.optimal['COUNTS_SKY'] = sky_opt      # Optimally extracted sky
-    specobj.optimal['COUNTS_RN'] = rn_opt        # Square root of optimally extracted read noise squared
-    specobj.optimal['FRAC_USE'] = frac_use    # Fraction of pixels in the object profile subimage used for this extraction
-    specobj.optimal['CHI2'] = chi2            # Reduced chi2 of the model fit for this spectral pixel
-
-    # Fill in the boxcar extraction tags
-    flux_box  = extract_boxcar(imgminsky*mask, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
+    # Boxcar extraction. The window weights only depend on the traces, so they are computed once and applied to
+    # the masked images of all the objects
+    left = (trace_spat - box_radius) - c0
+    right = (trace_spat + box_radius) - c0
+    weight, bigy, fullspot = asymbox2_weights(left, right, np.rint(trace_spec).astype(int), nspec, nsub)
+    mask_box_pix = mask_obj[bigy, fullspot, np.arange(ngood)[np.newaxis, :, np.newaxis]]
+
+    def boxcar(image):
+        return np.sum(weight*(image[bigy, fullspot]*mask_box_pix), axis=2)
+
+    flux_box = boxcar(img_sub)
     # Denom is computed in case the trace goes off the edge of the image
-    box_denom = extract_boxcar(waveimg*mask > 0.0, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
-    wave_box  = extract_boxcar(waveimg*mask, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)/(box_denom + (box_denom == 0.0))
-    varimg = 1.0/(ivar + (ivar == 0.0))
-    var_box  = extract_boxcar(varimg*mask, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
-    nvar_box  = extract_boxcar(var_no*mask, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
-    sky_box  = extract_boxcar(skyimg*mask, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
-    rn2_box  = extract_boxcar(rn2_img*mask, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
+    box_denom = np.sum(weight*((wave_sub[bigy, fullspot]*mask_box_pix) > 0.0), axis=2)
+    wave_box = boxcar(wave_sub)/(box_denom + (box_denom == 0.0))
+    var_box = boxcar(1.0/(ivar_sub + (ivar_sub == 0.0)))
+    nvar_box = boxcar(var_no)
+    sky_box = boxcar(sky_sub)
+    rn2_box = boxcar(rn2_sub)
     rn_posind = (rn2_box > 0.0)
     rn_box = np.zeros(rn2_box.shape,dtype=float)
     rn_box[rn_posind] = np.sqrt(rn2_box[rn_posind])
-    pixtot  = extract_boxcar(ivar*0 + 1.0, specobj.trace_spat,box_radius, ycen = specobj.trace_spec)
+    pixtot = np.sum(weight*(ivar_sub*0 + 1.0)[bigy, fullspot], axis=2)
     # If every pixel is masked then mask the boxcar extraction
-    mask_box = (extract_boxcar(ivar*mask == 0.0, specobj.trace_spat,box_radius, ycen = specobj.trace_spec) != pixtot)
+    mask_box = (np.sum(weight*((ivar_sub[bigy, fullspot]*mask_box_pix) == 0.0), axis=2) != pixtot)
 
     bad_box = (wave_box <= 0.0) | (np.isfinite(wave_box) == False) | (box_denom == 0.0)
     # interpolate bad wavelengths over masked pixels
     if bad_box.any():
-        f_wave = scipy.interpolate.RectBivariateSpline(spec_vec, spat_vec, waveimg)
-        wave_box[bad_box] = f_wave(specobj.trace_spec[bad_box], specobj.trace_spat[bad_box],grid=False)
+        if f_wave is None:
+            f_wave = scipy.interpolate.RectBivariateSpline(spec_vec, spat_vec, waveimg)
+        wave_box[bad_box] = f_wave(trace_spec[bad_box], trace_spat[bad_box],grid=False)
 
     ivar_box = 1.0/(var_box + (var_box == 0.0))
     nivar_box = 1.0/(nvar_box + (nvar_box == 0.0))
 
-    specobj.boxcar['WAVE'] = wave_box
-    specobj.boxcar['COUNTS'] = flux_box*mask_box
-    specobj.boxcar['COUNTS_IVAR'] = ivar_box*mask_box
-    specobj.boxcar['COUNTS_SIG'] = np.sqrt(utils.calc_ivar(ivar_box*mask_box))
-    specobj.boxcar['COUNTS_NIVAR'] = nivar_box*mask_box
-    specobj.boxcar['MASK'] = mask_box
-    specobj.boxcar['COUNTS_SKY'] = sky_box
-    specobj.boxcar['COUNTS_RN'] = rn_box
-    specobj.boxcar['BOX_RADIUS'] = box_radius
+    for ii, iobj in enumerate(igood):
+        specobj = sobjs[iobj]
+        # Fill in the optimally extraction tags
+        specobj.optimal['WAVE'] = wave_opt[:, ii]    # Optimally extracted wavelengths
+        specobj.optimal['COUNTS'] = flux_opt[:, ii]    # Optimally extracted flux
+        specobj.optimal['COUNTS_IVAR'] = mivar_opt[:, ii]   # Inverse variance of optimally extracted flux using modelivar image
+        specobj.optimal['COUNTS_SIG'] = np.sqrt(utils.calc_ivar(mivar_opt[:, ii]))
+        specobj.optimal['COUNTS_NIVAR'] = nivar_opt[:, ii]  # Optimally extracted noise variance (sky + read noise) only
+        specobj.optimal['MASK'] = mask_opt[:, ii]    # Mask for optimally extracted flux
+        specobj.optimal['COUNTS_SKY'] = sky_opt[:, ii]      # Optimally extracted sky
+        specobj.optimal['COUNTS_RN'] = rn_opt[:, ii]        # Square root of optimally extracted read noise squared
+        specobj.optimal['FRAC_USE'] = frac_use[:, ii]    # Fraction of pixels in the object profile subimage used for this extraction
+        specobj.optimal['CHI2'] = chi2[:, ii]            # Reduced chi2 of the model fit for this spectral pixel
+
+        # Fill in the boxcar extraction tags
+        specobj.boxcar['WAVE'] = wave_box[:, ii]
+        specobj.boxcar['COUNTS'] = flux_box[:, ii]*mask_box[:, ii]
+        specobj.boxcar['COUNTS_IVAR'] = ivar_box[:, ii]*mask_box[:, ii]
+        specobj.boxcar['COUNTS_SIG'] = np.sqrt(utils.calc_ivar(ivar_box[:, ii]*mask_box[:, ii]))
+        specobj.boxcar['COUNTS_NIVAR'] = nivar_box[:, ii]*mask_box[:, ii]
+        specobj.boxcar['MASK'] = mask_box[:, ii]
+        specobj.boxcar['COUNTS_SKY'] = sky_box[:, ii]
+        specobj.boxcar['COUNTS_RN'] = rn_box[:, ii]
+        specobj.boxcar['BOX_RADIUS'] = box_radius
 
     return None
 
@@ -633,6 +741,45 @@ def return_gaussian(sigma_x, norm_obj, fwhm, med_sn2, obj_string, show_profile,
     return profile_model
 
 
+def apodization_limit(bset, limit, step, deriv_max, stop):
+    """
+    Find the limit beyond which an object profile is apodized with an exponential.
+
+    Starting from limit, the limit is moved by step until the logarithmic derivative of the profile reaches
+    deriv_max, or the limit passes stop. This is the vectorized equivalent of stepping the limit one at a time;
+    the steps are accumulated in the same order so the returned limit is identical.
+
+    Args:
+        bset (:class:`pypeit.core.pydl.bspline`):
+            B-spline fit to the object profile
+        limit (float):
+            Starting value of the limit
+        step (float):
+            Step size. Positive for the left limit, negative for the right limit.
+        deriv_max (float):
+            Target value of the logarithmic derivative
+        stop (float):
+            Limit at which to stop the search
+
+    Returns:
+        tuple: The limit, the profile evaluated at the limit (as a 1-element array), and the logarithmic
+        derivative at the limit.
+    """
+    nstep = np.fmax(int(np.ceil((stop - limit)/step)), 0) + 2
+    while True:
+        lim_vec = np.cumsum(np.concatenate(([limit], np.full(nstep, step))))[1:]
+        past = (lim_vec >= stop) if step > 0 else (lim_vec <= stop)
+        if past[-1]:
+            break
+        nstep += 2
+    fit_vec, _ = bset.value(np.concatenate((lim_vec, lim_vec*0.9)))
+    fit1, fit2 = np.split(fit_vec, 2)
+    deriv = (np.log(fit2) - np.log(fit1))/(0.1*lim_vec)
+    done = ((deriv <= deriv_max) if step > 0 else (deriv >= deriv_max)) | past
+    ifirst = np.argmax(done)
+    return lim_vec[ifirst], fit1[ifirst:ifirst+1], deriv[ifirst]
+
+
 def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux, fluxivar,
                 inmask=None, thisfwhm=4.0, max_trace_corr=2.0, sn_gauss=4.0, #, wvmnx = (2900.0,30000.0),
                 maskwidth=None, prof_nsigma=None, no_deriv=False, gauss=False, obj_string='',
@@ -714,7 +861,7 @@ def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux,
     nspec = image.shape[0]
 
     # dspat is the spatial position along the image centered on the object trace
-    dspat = spat_img - np.outer(trace_in, np.ones(nspat))
+    dspat = spat_img - trace_in[:, np.newaxis]
     # create some images we will need
     sn2_img = np.zeros((nspec,nspat))
     spline_img = np.zeros((nspec,nspat))
@@ -833,7 +980,7 @@ def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux,
     msgs.info("Gaussian vs b-spline of width " + "{:6.2f}".format(thisfwhm) + " pixels")
     area = 1.0
     # sigma_x represents the profile argument, i.e. (x-x0)/sigma
-    sigma_x = (dspat/(np.outer(sigma, np.ones(nspat))) - np.outer(trace_corr, np.ones(nspat)))
+    sigma_x = dspat/sigma[:, np.newaxis] - trace_corr[:, np.newaxis]
 
     # If we have too few pixels to fit a profile or S/N is too low, just use a Gaussian profile
     if((ngood < 10) or (med_sn2 < sn_gauss**2) or (gauss is True)):
@@ -937,25 +1084,34 @@ def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux,
     inside = si[inside[isort]]
     pb = np.ones(inside.size)
 
+    # The trace and width corrections below are all fit on the same pixels as a function of xtemp using the same
+    # breakpoints, so the B-spline basis only needs to be computed once
+    xtemp_inside = xtemp.flat[inside]
+    norm_obj_inside = norm_obj.flat[inside]
+    norm_ivar_inside = norm_ivar.flat[inside]
+    nbkpts = (np.log10(np.fmax(med_sn2, 11.0))).astype(int)
+    xx = np.sum(xtemp, 1)/nspat
+    basis_set = pydl.bspline(xtemp_inside[norm_ivar_inside > 0], nord=4, nbkpts=nbkpts)
+    trace_fullbkpt = basis_set.breakpoints
+    trace_action = basis_set.action(xtemp_inside)
+
     for iiter in range(1,sigma_iter + 1):
-        mode_zero, _ = bset.value(sigma_x.flat[inside])
+        # Evaluate the profile and its shifted and stretched versions in a single call
+        sigma_x_inside = sigma_x.flat[inside]
+        mode_all, _ = bset.value(np.concatenate((sigma_x_inside, sigma_x_inside - 0.5, sigma_x_inside + 0.5,
+                                                 sigma_x_inside/1.3)))
+        mode_zero, mode_min05, mode_plu05, mode_by13 = np.split(mode_all, 4)
         mode_zero = mode_zero*pb
 
-        mode_min05, _ = bset.value(sigma_x.flat[inside]-0.5)
-        mode_plu05, _ = bset.value(sigma_x.flat[inside]+0.5)
-        mode_shift = (mode_min05  - mode_plu05)*pb*((sigma_x.flat[inside] > (l_limit + 0.5)) &
-                                                (sigma_x.flat[inside] < (r_limit - 0.5)))
+        mode_shift = (mode_min05  - mode_plu05)*pb*((sigma_x_inside > (l_limit + 0.5)) &
+                                                (sigma_x_inside < (r_limit - 0.5)))
 
-        mode_by13, _ = bset.value(sigma_x.flat[inside]/1.3)
         mode_stretch = mode_by13*pb/1.3 - mode_zero
 
-        nbkpts = (np.log10(np.fmax(med_sn2, 11.0))).astype(int)
-
-        xx = np.sum(xtemp, 1)/nspat
         profile_basis = np.column_stack((mode_zero,mode_shift))
 
-        mode_shift_out = utils.bspline_profile(xtemp.flat[inside], norm_obj.flat[inside], norm_ivar.flat[inside], profile_basis
-                                      ,maxiter=1,kwargs_bspline= {'nbkpts':nbkpts})
+        mode_shift_out = utils.bspline_profile(xtemp_inside, norm_obj_inside, norm_ivar_inside, profile_basis,
+                                               maxiter=1, fullbkpt=trace_fullbkpt, bspline_action=trace_action)
         # Check to see if the mode fit failed, if so punt and return a Gaussian
         if not np.any(mode_shift_out[1]):
             msgs.info('B-spline fit to trace correction failed for fit to ninside = {:}'.format(ninside) + ' pixels')
@@ -976,8 +1132,8 @@ def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux,
         trace_corr = trace_corr + delta_trace_corr
 
         profile_basis = np.column_stack((mode_zero,mode_stretch))
-        mode_stretch_out = utils.bspline_profile(xtemp.flat[inside], norm_obj.flat[inside], norm_ivar.flat[inside], profile_basis,
-                                            maxiter=1,fullbkpt = mode_shift_set.breakpoints)
+        mode_stretch_out = utils.bspline_profile(xtemp_inside, norm_obj_inside, norm_ivar_inside, profile_basis,
+                                                 maxiter=1, fullbkpt=trace_fullbkpt, bspline_action=trace_action)
         if not np.any(mode_stretch_out[1]):
             msgs.info('B-spline fit to width correction failed for fit to ninside = {:}'.format(ninside) + ' pixels')
             msgs.info("Returning Gaussian profile")
@@ -1002,7 +1158,7 @@ def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux,
         sigma = sigma*(1.0 + sigma_factor)
         area = area * h0/(1.0 + sigma_factor)
 
-        sigma_x = dspat/(np.outer(sigma, np.ones(nspat))) - np.outer(trace_corr, np.ones(nspat))
+        sigma_x = dspat/sigma[:, np.newaxis] - trace_corr[:, np.newaxis]
 
         # Update the profile B-spline fit for the next iteration
         if iiter < sigma_iter-1:
@@ -1086,21 +1242,10 @@ def fit_profile(image, ivar, waveimg, thismask, spat_img, trace_in, wave, flux,
     r_deriv_max = np.fmin(r_deriv_vec.max(), 1.0)
 
 
-    while True:
-        l_limit += 0.1
-        l_fit, _ = bset.value(np.asarray([l_limit]))
-        l2, _ = bset.value(np.asarray([l_limit])* 0.9)
-        l_deriv = (np.log(l2[0]) - np.log(l_fit[0]))/(0.1*l_limit)
-        if (l_deriv <= l_deriv_max) | (l_limit >= -1.0):
-            break
-
-    while True:
-        r_limit -= 0.1
-        r_fit, _ = bset.value(np.asarray([r_limit]))
-        r2, _ = bset.value(np.asarray([r_limit])* 0.9)
-        r_deriv = (np.log(r2[0]) - np.log(r_fit[0]))/(0.1*r_limit)
-        if (r_deriv >= r_deriv_max) | (r_limit <= 1.0):
-            break
+    # Step l_limit (r_limit) inward in increments of 0.1 until the logarithmic derivative reaches l_deriv_max
+    # (r_deriv_max) or we hit -1.0 (1.0). All the steps are evaluated at once.
+    l_limit, l_fit, l_deriv = apodization_limit(bset, l_limit, 0.1, l_deriv_max, -1.0)
+    r_limit, r_fit, r_deriv = apodization_limit(bset, r_limit, -0.1, r_deriv_max, 1.0)
 
     # JXP kludge
     if prof_nsigma is not None:
@@ -1379,7 +1524,7 @@ def create_skymask_fwhm(sobjs, thismask):
 def objfind(image, thismask, slit_left, slit_righ, inmask=None, fwhm=3.0,
             hand_extract_dict=None, std_trace=None, ncoeff=5, nperslit=None, bg_smth=5.0,
             extract_maskwidth=4.0, sig_thresh=10.0, peak_thresh=0.0, abs_thresh=0.0, trim_edg=(5,5),
-            skymask_nthresh=1.0, specobj_dict=None,
+            skymask_nthresh=1.0, specobj_dict=None, seed_sobjs=None,
             show_peaks=False, show_fits=False, show_trace=False, qa_title=''):
 
     """ Find the location of objects in a slitmask slit or a echelle order.
@@ -1451,6 +1596,11 @@ def objfind(image, thismask, slit_left, slit_righ, inmask=None, fwhm=3.0,
          Dictionary containing meta-data for the objects that will be propgated into the SpecObj objects, i.e. setup,
          slitid, detector, object type, and pipeline. The default is None, in which case the following dictionary will be used.
          specobj_dict = {'setup': None, 'slitid': 999, 'det': 1, 'objtype': 'unknown', 'pypeline': 'unknown'}
+    seed_sobjs: SpecObjs object, default = None
+         Objects found on this slit/order in a previous pass of object finding, i.e. on the frame before sky subtraction.
+         Objects detected again within 0.6*fwhm of a seed use the seed trace as their initial guess and skip the
+         flux weighted tracing, going straight to the Gaussian weighted refinement. Objects without a matching seed
+         are traced from scratch.
 
     Returns
     -------
@@ -1713,9 +1863,25 @@ def objfind(image, thismask, slit_left, slit_righ, inmask=None, fwhm=3.0,
     if len(sobjs) > 0:
         # Note the transpose is here to pass in the trace_spat correctly.
         xinit_fweight = np.copy(sobjs.trace_spat.T)
-        xfit_fweight, _, _, _= iter_tracefit(image, xinit_fweight,ncoeff,inmask = inmask, fwhm=fwhm,idx = sobjs.idx,
-                                             show_fits=show_fits)
-        xinit_gweight = np.copy(xfit_fweight)
+        # Objects which were already traced in a previous pass only need the Gaussian weighted refinement
+        seeded = np.zeros(nobj_reg, dtype=bool)
+        if seed_sobjs is not None and len(seed_sobjs) > 0:
+            seed_pixpos = seed_sobjs.spat_pixpos
+            seed_fwhm = seed_sobjs.fwhm
+            for iobj in range(nobj_reg):
+                sep = np.abs(seed_pixpos - sobjs[iobj].spat_pixpos)
+                iseed = sep.argmin()
+                if sep[iseed] <= 0.6*seed_fwhm[iseed]:
+                    seeded[iobj] = True
+                    xinit_fweight[:, iobj] = seed_sobjs[iseed].trace_spat
+            msgs.info('Using {:d} of {:d} objects from the previous pass as seeds for tracing'.format(
+                np.sum(seeded), nobj_reg))
+        xinit_gweight = np.copy(xinit_fweight)
+        if np.any(np.invert(seeded)):
+            unseeded = np.invert(seeded)
+            xfit_fweight, _, _, _= iter_tracefit(image, xinit_fweight[:, unseeded],ncoeff,inmask = inmask, fwhm=fwhm,
+                                                 idx = sobjs.idx[unseeded], show_fits=show_fits)
+            xinit_gweight[:, unseeded] = xfit_fweight
         xfit_gweight, _ , _, _= iter_tracefit(image, xinit_gweight,ncoeff,inmask = inmask, fwhm=fwhm,gweight = True,
                                               idx = sobjs.idx, show_fits=show_fits)
 
@@ -2010,7 +2176,8 @@ def ech_objfind(image, ivar, slitmask, slit_left, slit_righ, inmask=None, fof_li
                 std_trace=None, ncoeff=5, npca=None, coeff_npoly=None, min_snr=-np.inf, nabove_min_snr=1,
                 pca_explained_var=99.0, box_radius=2.0, fwhm=3.0, hand_extract_dict=None, nperslit=5, bg_smth=5.0,
                 extract_maskwidth=3.0, sig_thresh = 10.0, peak_thresh=0.0, abs_thresh=0.0, specobj_dict=None,
-                trim_edg=(5,5), show_peaks=False, show_fits=False, show_trace=False, show_single_trace=False, debug=False):
+                trim_edg=(5,5), seed_sobjs=None, show_peaks=False, show_fits=False, show_trace=False,
+                show_single_trace=False, debug=False):
     """
     Object finding routine for Echelle spectrographs. This routine:
        1) runs object finding on each order individually
@@ -2064,6 +2231,9 @@ def ech_objfind(image, ivar, slitmask, slit_left, slit_righ, inmask=None, fof_li
     box_radius: float,
       box_car extraction radius in arcseconds for SNR calculation and trimming
     sig_thresh: threshord for finding objects
+    seed_sobjs: SpecObjs object, default = None
+       Objects found in a previous pass of object finding. The seeds on each order are passed to objfind for that
+       order (see objfind). The objects are then linked across orders and their traces refined as without seeds.
     show_peaks: whether plotting the QA of peak finding of your object in each order
     show_fits: Plot trace fitting
     show_trace: whether display the resulting traces on top of the image
@@ -2137,12 +2307,14 @@ def ech_objfind(image, ivar, slitmask, slit_left, slit_righ, inmask=None, fof_li
             std_in = std_trace[:,iord]
         except TypeError:
             std_in = None
+        seed_iord = None if seed_sobjs is None or len(seed_sobjs) == 0 \
+            else seed_sobjs[seed_sobjs.ech_orderindx == iord]
         sobjs_slit, skymask_objfind[thismask] = \
             objfind(image, thismask, slit_left[:,iord], slit_righ[:,iord], inmask=inmask_iord,std_trace=std_in,
                     ncoeff=ncoeff, fwhm=fwhm,hand_extract_dict=hand_extract_dict, nperslit=nperslit, bg_smth=bg_smth,
                     extract_maskwidth=extract_maskwidth, sig_thresh=sig_thresh, peak_thresh=peak_thresh, abs_thresh=abs_thresh,
                     trim_edg=trim_edg, show_peaks=show_peaks,show_fits=show_fits, show_trace=show_single_trace,
-                    specobj_dict=specobj_dict)
+                    specobj_dict=specobj_dict, seed_sobjs=seed_iord)
         # ToDO make the specobjs _set_item_ work with expressions like this spec[:].orderindx = iord
         for spec in sobjs_slit:
             spec.ech_orderindx = iord
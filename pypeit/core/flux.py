@@ -3,10 +3,14 @@
 from __future__ import (print_function, absolute_import, division, unicode_literals)
 
 import glob
+import hashlib
 import numpy as np
 import os
+import shutil
 import scipy
 
+from collections import OrderedDict
+
 from pkg_resources import resource_filename
 
 from astropy import units
@@ -17,6 +21,8 @@ from astropy.io import ascii
 from astropy.io import fits
 from astropy.stats import sigma_clipped_stats
 
+from scipy.spatial import cKDTree
+
 from matplotlib import pyplot as plt
 
 from linetools.spectra.xspectrum1d import XSpectrum1D
@@ -33,6 +39,18 @@ MAGFUNC_MIN = -25.0
 SN2_MAX = (20.0) ** 2
 PYPEIT_FLUX_SCALE = 1e-17
 
+# Bump this whenever the format or contents of the binary standard star spectra change
+STD_SPECTRA_VERSION = 1
+# In-memory stores of the standard star catalogues, the extinction curves and the standard
+# star spectra already loaded
+_std_catalogues = []
+_extinction_data = {}
+_std_spectra = {}
+# LRU cache of the B-spline basis of the sensitivity function fits, keyed by wavelength grid,
+# breakpoints and breakpoint spacing
+SENSFUNC_BASIS_CACHE_SIZE = 16
+_sensfunc_basis = OrderedDict()
+
 def apply_sensfunc(spec_obj, sens_dict, airmass, exptime, extinct_correct=True, telluric_correct = False,
                    longitude=None, latitude=None):
     """ Apply the sensitivity function to the data
@@ -65,17 +83,8 @@ def apply_sensfunc(spec_obj, sens_dict, airmass, exptime, extinct_correct=True,
             wave = np.copy(np.array(extract['WAVE_GRID']))
         except KeyError:
             wave = np.copy(np.array(extract['WAVE']))
-        wave_sens = sens_dict['wave']
-        sensfunc = sens_dict['sensfunc'].copy()
-
-        # Did the user request a telluric correction from the same file?
-        if telluric_correct and 'telluric' in sens_dict.keys():
-            # This assumes there is a separate telluric key in this dict.
-            telluric = sens_dict['telluric']
-            msgs.info('Applying telluric correction')
-            sensfunc = sensfunc*(telluric > 1e-10)/(telluric + (telluric < 1e-10))
 
-        sensfunc_obs = scipy.interpolate.interp1d(wave_sens, sensfunc, bounds_error = False, fill_value='extrapolate')(wave)
+        sensfunc_obs = sensfunc_on_grid(wave, sens_dict, telluric_correct=telluric_correct)
 
         if extinct_correct:
             if longitude is None or latitude is None:
@@ -89,22 +98,183 @@ def apply_sensfunc(spec_obj, sens_dict, airmass, exptime, extinct_correct=True,
         else:
             senstot = sensfunc_obs.copy()
 
-        flam = extract['COUNTS'] * senstot/ exptime
-        flam_sig = (senstot/exptime)/ (np.sqrt(extract['COUNTS_IVAR']))
-        flam_var = extract['COUNTS_IVAR'] / (senstot / exptime) **2
+        extract['FLAM'], extract['FLAM_SIG'], extract['FLAM_IVAR'] \
+                = flam_from_counts(extract['COUNTS'], extract['COUNTS_IVAR'], senstot, exptime)
+
+
+def sensfunc_on_grid(wave, sens_dict, telluric_correct=False):
+    """
+    Interpolate a sensitivity function onto a wavelength grid
+
+    Parameters
+    ----------
+    wave : ndarray
+      Wavelengths (Angstroms) of the spectrum to be fluxed
+    sens_dict : dict
+      Sens Function dict
+    telluric_correct : bool, optional
+      Also divide out the telluric absorption held in sens_dict['telluric'], if present
+
+    Returns
+    -------
+    sensfunc_obs : ndarray
+      Sensitivity function at the input wavelengths
+    """
+    wave_sens = sens_dict['wave']
+    sensfunc = sens_dict['sensfunc'].copy()
+
+    # Did the user request a telluric correction from the same file?
+    if telluric_correct and 'telluric' in sens_dict.keys():
+        # This assumes there is a separate telluric key in this dict.
+        telluric = sens_dict['telluric']
+        msgs.info('Applying telluric correction')
+        sensfunc = sensfunc*(telluric > 1e-10)/(telluric + (telluric < 1e-10))
+
+    return scipy.interpolate.interp1d(wave_sens, sensfunc, bounds_error = False, fill_value='extrapolate')(wave)
+
+
+def flam_from_counts(counts, counts_ivar, senstot, exptime):
+    """
+    Convert counts to flux density
+
+    Works on a single spectrum or on a stack of spectra sharing the last axis.
+
+    Parameters
+    ----------
+    counts : ndarray
+    counts_ivar : ndarray
+    senstot : ndarray
+      Sensitivity function at the wavelengths of the spectra, including the
+      extinction correction if any
+    exptime : float
+      Exposure time in seconds
 
-        # Mask bad pixels
-        msgs.info(" Masking bad pixels")
-        msk = np.zeros_like(senstot).astype(bool)
-        msk[senstot <= 0.] = True
-        msk[extract['COUNTS_IVAR'] <= 0.] = True
-        flam[msk] = 0.
-        flam_sig[msk] = 0.
-        flam_var[msk] = 0.
+    Returns
+    -------
+    flam, flam_sig, flam_ivar : ndarray
+      Flux density, its error and its inverse variance.  Pixels with a
+      non-positive sensitivity or inverse variance are set to 0.
+    """
+    flam = counts * senstot/ exptime
+    flam_sig = (senstot/exptime)/ (np.sqrt(counts_ivar))
+    flam_var = counts_ivar / (senstot / exptime) **2
 
-        extract['FLAM'] = flam
-        extract['FLAM_SIG'] = flam_sig
-        extract['FLAM_IVAR'] = flam_var
+    # Mask bad pixels
+    msgs.info(" Masking bad pixels")
+    msk = np.zeros(np.broadcast(counts, senstot).shape, dtype=bool)
+    msk[np.broadcast_to(senstot <= 0., msk.shape)] = True
+    msk[counts_ivar <= 0.] = True
+    flam[msk] = 0.
+    flam_sig[msk] = 0.
+    flam_var[msk] = 0.
+    return flam, flam_sig, flam_var
+
+
+def flux_spec1d_files(spec1d_files, sens_dict, longitude, latitude, flux_files=None,
+                      extinct_correct=True, telluric_correct=False, echelle=False):
+    """
+    Flux calibrate many spec1d files in one pass
+
+    The sensitivity function and the extinction curve are evaluated once
+    for each distinct wavelength grid, the calibration is applied to all the
+    spectra of a file at once, and only the FLAM, FLAM_SIG and FLAM_IVAR
+    columns of the spec1d tables are (over)written.
+
+    Parameters
+    ----------
+    spec1d_files : list
+      spec1d files to flux
+    sens_dict : dict
+      Sens Function dict, keyed by '0' or, for echelle, by the order index
+    longitude : float
+      longitude in degree for observatory
+    latitude : float
+      latitude in degree for observatory
+    flux_files : list, optional
+      Output files, one per spec1d file.  Each spec1d file is first copied to
+      its output file.  If None, the spec1d files are updated in place.
+    extinct_correct : bool, optional
+    telluric_correct : bool, optional
+    echelle : bool, optional
+      Use the sensitivity function of the order (ECHOINDX) of each spectrum.
+      Spectra of orders without a sensitivity function are not fluxed.
+
+    Returns
+    -------
+    flux_files : list
+      The fluxed files
+    """
+    if flux_files is None:
+        flux_files = spec1d_files
+    if len(flux_files) != len(spec1d_files):
+        msgs.error('You must provide one output file per spec1d file')
+    extinct = load_extinction_data(longitude, latitude) if extinct_correct else None
+
+    # Sensitivity function and extinction magnitudes on each grid
+    grids = {}
+    for spec1d_file, flux_file in zip(spec1d_files, flux_files):
+        if os.path.abspath(flux_file) != os.path.abspath(spec1d_file):
+            shutil.copyfile(spec1d_file, flux_file)
+        with fits.open(flux_file, mode='update') as hdulist:
+            airmass = float(hdulist[0].header['AIRMASS'])
+            exptime = hdulist[0].header['EXPTIME']
+            if extinct_correct and airmass < 1.:
+                msgs.error("Bad airmass value in extinction_correction")
+            # Collect the extracted spectra
+            spectra = []
+            for iext in range(1, len(hdulist)):
+                hdu = hdulist[iext]
+                names = hdu.columns.names
+                sens_key = str(hdu.header['ECHOINDX']) if echelle else '0'
+                if sens_key not in sens_dict:
+                    msgs.warn('No sensitivity function for order {0} in {1}; skipping {2}'.format(
+                              sens_key, flux_file, hdu.name))
+                    continue
+                for prefix in ['BOX', 'OPT']:
+                    if prefix+'_COUNTS' not in names:
+                        continue
+                    wave_key = prefix+'_WAVE_GRID' if prefix+'_WAVE_GRID' in names else prefix+'_WAVE'
+                    wave = np.asarray(hdu.data[wave_key], dtype=float)
+                    grid_key = (sens_key, wave.tobytes())
+                    if grid_key not in grids:
+                        grids[grid_key] = (sensfunc_on_grid(wave, sens_dict[sens_key],
+                                                            telluric_correct=telluric_correct),
+                                           None if extinct is None
+                                                else extinction_magnitudes(wave * units.AA, extinct))
+                    sensfunc_obs, mag_ext = grids[grid_key]
+                    senstot = sensfunc_obs.copy() if mag_ext is None \
+                                    else sensfunc_obs * 10.0 ** (0.4 * mag_ext * airmass)
+                    spectra.append((iext, prefix, senstot))
+            msgs.info('Fluxing {0} spectra in {1}'.format(len(spectra), flux_file))
+            if len(spectra) == 0:
+                continue
+
+            # Flux all the spectra of the same length at once
+            new_cols = {}
+            npix = np.array([senstot.size for _, _, senstot in spectra])
+            for n in np.unique(npix):
+                indx = np.where(npix == n)[0]
+                counts = np.array([hdulist[spectra[i][0]].data[spectra[i][1]+'_COUNTS'] for i in indx])
+                counts_ivar = np.array([hdulist[spectra[i][0]].data[spectra[i][1]+'_COUNTS_IVAR']
+                                        for i in indx])
+                senstot = np.array([spectra[i][2] for i in indx])
+                fluxed = flam_from_counts(counts, counts_ivar, senstot, exptime)
+                for j, i in enumerate(indx):
+                    iext, prefix, _ = spectra[i]
+                    hdu = hdulist[iext]
+                    for key, arr in zip(['FLAM', 'FLAM_SIG', 'FLAM_IVAR'], fluxed):
+                        name = prefix + '_' + key
+                        if name in hdu.columns.names:
+                            hdu.data[name] = arr[j]
+                        else:
+                            new_cols.setdefault(iext, []).append(
+                                        fits.Column(array=arr[j], name=name, format=arr.dtype))
+            # Tables fluxed for the first time need the new columns
+            for iext, cols in new_cols.items():
+                hdu = hdulist[iext]
+                hdulist[iext] = fits.BinTableHDU.from_columns(hdu.columns + fits.ColDefs(cols),
+                                                              header=hdu.header, name=hdu.name)
+    return flux_files
 
 
 def get_standard_spectrum(star_type=None, star_mag=None, ra=None, dec=None):
@@ -498,6 +668,88 @@ def standard_sensfunc(wave, flux, ivar, flux_std, msk_bad=None, msk_star=None, m
     wave_obs = wave.copy()
     flux_obs = flux.copy()
     ivar_obs = ivar.copy()
+    magfunc, logivar_obs, masktot, msk_fit_sens, magfunc_poly, msk_tell, msk_star \
+            = sensfunc_magfunc(wave_obs, flux_obs, ivar_obs, flux_std, msk_bad=msk_bad, msk_star=msk_star,
+                               msk_tell=msk_tell, maxiter=maxiter, upper=upper, lower=lower,
+                               poly_norder=poly_norder, BALM_MASK_WID=BALM_MASK_WID, polycorrect=polycorrect)
+
+    if not telluric:
+        # Apply mask to ivar
+        #logivar_obs[~msk_fit_sens] = 0.
+
+        init_breakpoints, bkspace = sensfunc_breakpoints(wave_obs, masktot, resolution, nresln)
+        msgs.info("Bspline fit on magfunc. ")
+        logfit1, bset1 = fit_sensfunc_bspline(wave_obs, magfunc, logivar_obs, msk_fit_sens, init_breakpoints,
+                                              bkspace, upper=upper, lower=lower, maxiter=maxiter)
+
+        if debug:
+            logfit_bkpt, _ = bset1.value(init_breakpoints)
+            # Check for calibration
+            plt.figure(1)
+            plt.plot(wave_obs, magfunc, drawstyle='steps-mid', color='black', label='magfunc')
+            plt.plot(wave_obs, logfit1, color='cornflowerblue', label='logfit1')
+            plt.plot(wave_obs[~msk_fit_sens], magfunc[~msk_fit_sens], '+', color='red', markersize=5.0,
+                     label='masked magfunc')
+            plt.plot(wave_obs[~msk_fit_sens], logfit1[~msk_fit_sens], '+', color='red', markersize=5.0,
+                     label='masked logfit1')
+            plt.plot(init_breakpoints, logfit_bkpt, '.', color='green', markersize=4.0, label='breakpoints')
+            plt.plot(init_breakpoints, np.interp(init_breakpoints, wave_obs, magfunc), '.', color='green',
+                     markersize=4.0,
+                     label='breakpoints')
+            plt.plot(wave_obs, 1.0 / np.sqrt(logivar_obs), color='orange', label='sigma')
+            plt.legend()
+            plt.xlabel('Wavelength [ang]')
+            plt.ylim(0.0, 1.2 * MAGFUNC_MAX)
+            plt.title('1st Bspline fit')
+            plt.show()
+        # Create sensitivity function
+        magfunc = sensfunc_polycorrect(logfit1, magfunc_poly, ivar_obs, msk_fit_sens, polycorrect)
+
+    # Calculate sensfunc
+    sensfunc = 10.0 ** (0.4 * magfunc)
+
+    if debug:
+        plt.figure()
+        magfunc_raw = 2.5 * np.log10(np.maximum(flux_std, TINY)) - 2.5 * np.log10(np.maximum(flux_obs, TINY))
+        plt.plot(wave_obs[masktot],magfunc_raw[masktot] , 'k-',lw=3,label='Raw Magfunc')
+        plt.plot(wave_obs[masktot],magfunc_poly[masktot] , 'c-',lw=3,label='Polynomial Fit')
+        plt.plot(wave_obs[np.invert(msk_tell)], magfunc_raw[np.invert(msk_tell)], 's',
+                 color='0.7',label='Telluric Region')
+        plt.plot(wave_obs[np.invert(msk_star)], magfunc_raw[np.invert(msk_star)], 'r+',label='Recombination Line region')
+        plt.plot(wave_obs[masktot], magfunc[masktot],'b-',label='Final Magfunc')
+        plt.legend(fancybox=True, shadow=True)
+        plt.xlim([0.995*np.min(wave_obs[masktot]),1.005*np.max(wave_obs[masktot])])
+        plt.ylim([0.,1.2*np.max(magfunc[masktot])])
+        plt.show()
+        plt.close()
+
+    return sensfunc, masktot
+
+
+def sensfunc_magfunc(wave_obs, flux_obs, ivar_obs, flux_std, msk_bad=None, msk_star=None, msk_tell=None,
+                     maxiter=35, upper=2, lower=2, poly_norder=5, BALM_MASK_WID=50., polycorrect=True):
+    """
+    Magnitude difference between the standard star model and the observed star,
+    to be fit by the sensitivity function.
+
+    See :func:`standard_sensfunc` for the parameters.
+
+    Returns
+    -------
+    magfunc : ndarray
+      Magnitude difference, with the Hydrogen recombination lines replaced by a
+      polynomial fit if polycorrect=True
+    logivar_obs : ndarray
+      Inverse variance of magfunc
+    masktot : ndarray
+      Good pixels of magfunc
+    msk_fit_sens : ndarray
+      Pixels to fit, i.e. masktot without the telluric and recombination line regions
+    magfunc_poly : ndarray
+      Polynomial fit to magfunc
+    msk_tell, msk_star : ndarray
+      Telluric and recombination line masks.  True is good.
+    """
     # preparing arrays
     if np.all(~np.isfinite(ivar_obs)):
         msgs.warn("NaN are present in the inverse variance")
@@ -558,98 +810,196 @@ def standard_sensfunc(wave, flux, ivar, flux_std, msk_bad=None, msk_star=None, m
         ## if half more than half of your spectrum is masked (or polycorrect=False) then do not correct it with polyfit
         msgs.warn('No polynomial corrections performed on Hydrogen Recombination line regions')
 
-    if not telluric:
-        # Apply mask to ivar
-        #logivar_obs[~msk_fit_sens] = 0.
+    return magfunc, logivar_obs, masktot, msk_fit_sens, magfunc_poly, msk_tell, msk_star
+
+
+def sensfunc_breakpoints(wave_obs, masktot, resolution, nresln, std_pix=None):
+    """
+    Breakpoints of the B-spline fit of the sensitivity function
+
+    Parameters
+    ----------
+    wave_obs : ndarray
+      Sorted wavelengths
+    masktot : ndarray
+      Good pixels.  No breakpoints are placed in the masked regions.
+    resolution : float
+      Spectral resolution
+    nresln : float
+      Breakpoint spacing in units of the resolution element
+    std_pix : float, optional
+      Pixel size in Angstrom.  Measured from wave_obs if not provided.
 
-        # ToDo
-        # Compute an effective resolution for the standard. This could be improved
-        # to setup an array of breakpoints based on the resolution. At the
-        # moment we are using only one number
-        msgs.work("Should pull resolution from arc line analysis")
-        msgs.work("At the moment the resolution is taken as the PixelScale")
-        msgs.work("This needs to be changed!")
+    Returns
+    -------
+    init_breakpoints : ndarray
+    bkspace : float
+      Breakpoint spacing in Angstrom
+    """
+    # ToDo
+    # Compute an effective resolution for the standard. This could be improved
+    # to setup an array of breakpoints based on the resolution. At the
+    # moment we are using only one number
+    msgs.work("Should pull resolution from arc line analysis")
+    msgs.work("At the moment the resolution is taken as the PixelScale")
+    msgs.work("This needs to be changed!")
+    if std_pix is None:
         std_pix = np.median(np.abs(wave_obs - np.roll(wave_obs, 1)))
-        std_res = np.median(wave_obs/resolution) # median resolution in units of Angstrom.
-        #std_res = std_pix
-        #resln = std_res
-        if (nresln * std_res) < std_pix:
-            msgs.warn("Bspline breakpoints spacing shoud be larger than 1pixel")
-            msgs.warn("Changing input nresln to fix this")
-            nresln = std_res / std_pix
-
-        # Fit magfunc with bspline
-        kwargs_bspline = {'bkspace': std_res * nresln}
-        kwargs_reject = {'maxrej': 5}
-        msgs.info("Initialize bspline for flux calibration")
-        init_bspline = pydl.bspline(wave_obs, bkspace=kwargs_bspline['bkspace'])
-        fullbkpt = init_bspline.breakpoints
-
-        # TESTING turning off masking for now
-        # remove masked regions from breakpoints
-        msk_obs = np.ones_like(wave_obs).astype(bool)
-        msk_obs[~masktot] = False
-        msk_bkpt = scipy.interpolate.interp1d(wave_obs, msk_obs, kind='nearest', fill_value='extrapolate')(fullbkpt)
-        init_breakpoints = fullbkpt[msk_bkpt > 0.999]
-
-        # init_breakpoints = fullbkpt
-        msgs.info("Bspline fit on magfunc. ")
-        bset1, bmask = pydl.iterfit(wave_obs, magfunc, invvar=logivar_obs, inmask=msk_fit_sens, upper=upper, lower=lower,
-                                    fullbkpt=init_breakpoints, maxiter=maxiter, kwargs_bspline=kwargs_bspline,
-                                    kwargs_reject=kwargs_reject)
-        logfit1, _ = bset1.value(wave_obs)
-        logfit_bkpt, _ = bset1.value(init_breakpoints)
+    std_res = np.median(wave_obs/resolution) # median resolution in units of Angstrom.
+    #std_res = std_pix
+    #resln = std_res
+    if (nresln * std_res) < std_pix:
+        msgs.warn("Bspline breakpoints spacing shoud be larger than 1pixel")
+        msgs.warn("Changing input nresln to fix this")
+        nresln = std_res / std_pix
+
+    bkspace = std_res * nresln
+    msgs.info("Initialize bspline for flux calibration")
+    init_bspline = pydl.bspline(wave_obs, bkspace=bkspace)
+    fullbkpt = init_bspline.breakpoints
+
+    # TESTING turning off masking for now
+    # remove masked regions from breakpoints
+    msk_obs = np.ones_like(wave_obs).astype(bool)
+    msk_obs[~masktot] = False
+    msk_bkpt = scipy.interpolate.interp1d(wave_obs, msk_obs, kind='nearest', fill_value='extrapolate')(fullbkpt)
+    return fullbkpt[msk_bkpt > 0.999], bkspace
+
+
+def fit_sensfunc_bspline(wave_obs, magfunc, logivar_obs, inmask, breakpoints, bkspace, upper=2, lower=2,
+                         maxiter=35):
+    """
+    Iterative B-spline fit of magfunc
 
-        if debug:
-            # Check for calibration
-            plt.figure(1)
-            plt.plot(wave_obs, magfunc, drawstyle='steps-mid', color='black', label='magfunc')
-            plt.plot(wave_obs, logfit1, color='cornflowerblue', label='logfit1')
-            plt.plot(wave_obs[~msk_fit_sens], magfunc[~msk_fit_sens], '+', color='red', markersize=5.0,
-                     label='masked magfunc')
-            plt.plot(wave_obs[~msk_fit_sens], logfit1[~msk_fit_sens], '+', color='red', markersize=5.0,
-                     label='masked logfit1')
-            plt.plot(init_breakpoints, logfit_bkpt, '.', color='green', markersize=4.0, label='breakpoints')
-            plt.plot(init_breakpoints, np.interp(init_breakpoints, wave_obs, magfunc), '.', color='green',
-                     markersize=4.0,
-                     label='breakpoints')
-            plt.plot(wave_obs, 1.0 / np.sqrt(logivar_obs), color='orange', label='sigma')
-            plt.legend()
-            plt.xlabel('Wavelength [ang]')
-            plt.ylim(0.0, 1.2 * MAGFUNC_MAX)
-            plt.title('1st Bspline fit')
-            plt.show()
-        # Create sensitivity function
-        magfunc = np.maximum(np.minimum(logfit1, MAGFUNC_MAX), MAGFUNC_MIN)
-        if ((sum(msk_fit_sens) > 0.5 * len(msk_fit_sens)) & polycorrect):
-            msk_clean = ((magfunc==MAGFUNC_MAX) | (magfunc==MAGFUNC_MIN)) & \
-                        (magfunc_poly>MAGFUNC_MIN) & (magfunc_poly<MAGFUNC_MAX)
-            magfunc[msk_clean] = magfunc_poly[msk_clean]
-            msk_badpix = np.isfinite(ivar_obs)& (ivar_obs>0)
-            magfunc[~msk_badpix] = magfunc_poly[~msk_badpix]
-        else:
-            ## if half more than half of your spectrum is masked (or polycorrect=False) then do not correct it with polyfit
-            msgs.warn('No polynomial corrections performed on Hydrogen Recombination line regions')
+    The B-spline basis for a given wavelength grid and set of breakpoints is
+    kept in memory, so that it is computed once for all the rejection
+    iterations and all the standards observed with the same setup.  The
+    least recently used bases are dropped beyond SENSFUNC_BASIS_CACHE_SIZE.
 
-    # Calculate sensfunc
-    sensfunc = 10.0 ** (0.4 * magfunc)
+    Parameters
+    ----------
+    wave_obs : ndarray
+      Sorted wavelengths
+    magfunc : ndarray
+    logivar_obs : ndarray
+      Inverse variance of magfunc
+    inmask : ndarray
+      Pixels to fit
+    breakpoints : ndarray
+      Full set of breakpoints, see :func:`sensfunc_breakpoints`
+    bkspace : float
+    upper, lower : float
+      Rejection thresholds
+    maxiter : int
+      Maximum number of rejection iterations
 
-    if debug:
-        plt.figure()
-        magfunc_raw = logflux_std - logflux_obs
-        plt.plot(wave_obs[masktot],magfunc_raw[masktot] , 'k-',lw=3,label='Raw Magfunc')
-        plt.plot(wave_obs[masktot],magfunc_poly[masktot] , 'c-',lw=3,label='Polynomial Fit')
-        plt.plot(wave_obs[np.invert(msk_tell)], magfunc_raw[np.invert(msk_tell)], 's',
-                 color='0.7',label='Telluric Region')
-        plt.plot(wave_obs[np.invert(msk_star)], magfunc_raw[np.invert(msk_star)], 'r+',label='Recombination Line region')
-        plt.plot(wave_obs[masktot], magfunc[masktot],'b-',label='Final Magfunc')
-        plt.legend(fancybox=True, shadow=True)
-        plt.xlim([0.995*np.min(wave_obs[masktot]),1.005*np.max(wave_obs[masktot])])
-        plt.ylim([0.,1.2*np.max(magfunc[masktot])])
-        plt.show()
-        plt.close()
+    Returns
+    -------
+    logfit : ndarray
+      Fit evaluated at wave_obs
+    bset : :class:`pypeit.core.pydl.bspline`
+    """
+    kwargs_bspline = {'bkspace': bkspace}
+    kwargs_reject = {'maxrej': 5}
+    key = (wave_obs.size, float(wave_obs[0]), float(wave_obs[-1]),
+           hashlib.sha1(np.ascontiguousarray(wave_obs)).hexdigest(), breakpoints.size,
+           hashlib.sha1(np.ascontiguousarray(breakpoints)).hexdigest(), float(bkspace))
+    if key in _sensfunc_basis:
+        _sensfunc_basis.move_to_end(key)
+    else:
+        _sensfunc_basis[key] = pydl.bspline(wave_obs, fullbkpt=breakpoints, **kwargs_bspline).action(wave_obs)
+        while len(_sensfunc_basis) > SENSFUNC_BASIS_CACHE_SIZE:
+            _sensfunc_basis.popitem(last=False)
+    action = _sensfunc_basis[key]
+    bset, bmask = pydl.iterfit(wave_obs, magfunc, invvar=logivar_obs, inmask=inmask, upper=upper, lower=lower,
+                               fullbkpt=breakpoints, maxiter=maxiter, bspline_action=action,
+                               kwargs_bspline=kwargs_bspline, kwargs_reject=kwargs_reject)
+    if np.all(bset.mask):
+        logfit, _ = bset.value(wave_obs, action=action[0], lower=action[1], upper=action[2])
+    else:
+        logfit, _ = bset.value(wave_obs)
+    return logfit, bset
+
+
+def sensfunc_polycorrect(logfit, magfunc_poly, ivar_obs, msk_fit_sens, polycorrect=True):
+    """
+    Clip the B-spline fit of magfunc and replace the bad pixels by the polynomial fit
+
+    Returns
+    -------
+    magfunc : ndarray
+    """
+    magfunc = np.maximum(np.minimum(logfit, MAGFUNC_MAX), MAGFUNC_MIN)
+    if ((sum(msk_fit_sens) > 0.5 * len(msk_fit_sens)) & polycorrect):
+        msk_clean = ((magfunc==MAGFUNC_MAX) | (magfunc==MAGFUNC_MIN)) & \
+                    (magfunc_poly>MAGFUNC_MIN) & (magfunc_poly<MAGFUNC_MAX)
+        magfunc[msk_clean] = magfunc_poly[msk_clean]
+        msk_badpix = np.isfinite(ivar_obs)& (ivar_obs>0)
+        magfunc[~msk_badpix] = magfunc_poly[~msk_badpix]
+    else:
+        ## if half more than half of your spectrum is masked (or polycorrect=False) then do not correct it with polyfit
+        msgs.warn('No polynomial corrections performed on Hydrogen Recombination line regions')
+    return magfunc
+
+
+def joint_standard_sensfunc(waves, fluxes, ivars, flux_stds, msk_bads=None, msk_stars=None, msk_tells=None,
+                            maxiter=35, upper=2, lower=2, poly_norder=5, BALM_MASK_WID=50., nresln=20.,
+                            resolution=2700., polycorrect=True):
+    """
+    Fit a single, smooth sensitivity function to several standards observed with the same setup.
+
+    Each standard is prepared as in :func:`standard_sensfunc` (with
+    telluric=False) and one B-spline is fit to all of them.
+
+    Parameters
+    ----------
+    waves, fluxes, ivars, flux_stds : list of ndarray
+      Wavelengths, counts/s, inverse variances and true fluxes of each standard
+    msk_bads, msk_stars, msk_tells : list of ndarray, optional
+      Masks of each standard.  True is good.
+    Other parameters are as in :func:`standard_sensfunc`
+
+    Returns
+    -------
+    sensfuncs : list of ndarray
+      The sensitivity function on the wavelengths of each standard
+    masktots : list of ndarray
+      Good pixels of each standard
+    """
+    nstd = len(waves)
+    if msk_bads is None:
+        msk_bads = [None]*nstd
+    if msk_stars is None:
+        msk_stars = [None]*nstd
+    if msk_tells is None:
+        msk_tells = [None]*nstd
+    prepared = [sensfunc_magfunc(np.array(wave, dtype=float), np.copy(flux), np.copy(ivar), flux_std,
+                                 msk_bad=msk_bad, msk_star=msk_star, msk_tell=msk_tell, maxiter=maxiter,
+                                 upper=upper, lower=lower, poly_norder=poly_norder,
+                                 BALM_MASK_WID=BALM_MASK_WID, polycorrect=polycorrect)
+                for wave, flux, ivar, flux_std, msk_bad, msk_star, msk_tell
+                    in zip(waves, fluxes, ivars, flux_stds, msk_bads, msk_stars, msk_tells)]
+
+    # Fit all the standards at once
+    wave_all = np.concatenate(waves).astype(float)
+    srt = np.argsort(wave_all, kind='stable')
+    wave_all = wave_all[srt]
+    magfunc_all, logivar_all, masktot_all, msk_fit_all = \
+            [np.concatenate([prep[i] for prep in prepared])[srt] for i in range(4)]
+    std_pix = np.median([np.median(np.abs(wave - np.roll(wave, 1))) for wave in waves])
+    init_breakpoints, bkspace = sensfunc_breakpoints(wave_all, masktot_all, resolution, nresln, std_pix=std_pix)
+    msgs.info("Bspline fit on magfunc of {:d} standards".format(nstd))
+    _, bset = fit_sensfunc_bspline(wave_all, magfunc_all, logivar_all, msk_fit_all, init_breakpoints, bkspace,
+                                   upper=upper, lower=lower, maxiter=maxiter)
+
+    # Sensitivity function of each standard
+    sensfuncs = []
+    for wave, ivar, prep in zip(waves, ivars, prepared):
+        logfit, _ = bset.value(np.array(wave, dtype=float))
+        magfunc = sensfunc_polycorrect(logfit, prep[4], ivar, prep[3], polycorrect)
+        sensfuncs.append(10.0 ** (0.4 * magfunc))
+    return sensfuncs, [prep[2] for prep in prepared]
 
-    return sensfunc, masktot
 
 def extinction_correction(wave, airmass, extinct):
     """
@@ -674,6 +1024,32 @@ def extinction_correction(wave, airmass, extinct):
     # Checks
     if airmass < 1.:
         msgs.error("Bad airmass value in extinction_correction")
+    mag_ext = extinction_magnitudes(wave, extinct)
+    # Evaluate
+    flux_corr = 10.0 ** (0.4 * mag_ext * airmass)
+    # Return
+    return flux_corr
+
+
+def extinction_magnitudes(wave, extinct):
+    """
+    Interpolate the extinction curve onto a wavelength grid
+
+    Wavelengths beyond the extinction data take the last valid value.
+
+    Parameters
+    ----------
+    wave : ndarray
+      Wavelengths for interpolation. Should be sorted
+      Assumes Angstroms
+    extinct : Table
+      Table of extinction values
+
+    Returns
+    -------
+    mag_ext : ndarray
+      Extinction (mag per unit airmass) at the input wavelengths
+    """
     # Interpolate
     f_mag_ext = scipy.interpolate.interp1d(extinct['wave'],extinct['mag_ext'], bounds_error=False, fill_value=0.)
     mag_ext = f_mag_ext(wave)#.to('AA').value)
@@ -691,10 +1067,7 @@ def extinction_correction(wave, airmass, extinct):
         msgs.warn("Extrapolating at high wavelengths using last valid value")
     else:
         msgs.info("Extinction data covered the whole spectra. Correct it!")
-    # Evaluate
-    flux_corr = 10.0 ** (0.4 * mag_ext * airmass)
-    # Return
-    return flux_corr
+    return mag_ext
 
 
 def find_standard_file(ra, dec, toler=20.*units.arcmin, check=False):
@@ -729,21 +1102,15 @@ def find_standard_file(ra, dec, toler=20.*units.arcmin, check=False):
             - 'ra': str -- RA(J2000)
             - 'dec': str -- DEC(J2000)
     """
-    # Priority
-    std_sets = [load_calspec, load_esofil, load_xshooter]
-    std_file_fmt = [1, 2, 3]  # 1=Calspec style FITS binary table; 2=ESO ASCII format; 3= XSHOOTER ASCII format.
-
     # SkyCoord
     obj_coord = coordinates.SkyCoord(ra, dec, unit=(units.hourangle, units.deg))
-    # Loop on standard sets
+    obj_xyz = obj_coord.cartesian.xyz.value
+    # Loop on standard sets, in order of priority
     closest = dict(sep=999 * units.deg)
-    for qq, sset in enumerate(std_sets):
-        # Stars
-        path, star_tbl = sset()
-        star_coords = coordinates.SkyCoord(star_tbl['RA_2000'], star_tbl['DEC_2000'],
-                                           unit=(units.hourangle, units.deg))
-        # Match
-        idx, d2d, d3d = coordinates.match_coordinates_sky(obj_coord, star_coords, nthneighbor=1)
+    for qq, (path, star_tbl, fmt, tree) in enumerate(load_std_catalogues()):
+        # Match on the unit sphere;  convert the chord to an angle
+        chord, idx = tree.query(obj_xyz)
+        d2d = np.rad2deg(2*np.arcsin(np.minimum(chord/2., 1.))) * units.deg
         if d2d < toler:
             if check:
                 return True
@@ -751,7 +1118,7 @@ def find_standard_file(ra, dec, toler=20.*units.arcmin, check=False):
                 # Generate a dict
                 _idx = int(idx)
                 std_dict = dict(cal_file=os.path.join(path,star_tbl[_idx]['File']),
-                                name=star_tbl[_idx]['Name'], fmt=std_file_fmt[qq],
+                                name=star_tbl[_idx]['Name'], fmt=fmt,
                                 std_ra=star_tbl[_idx]['RA_2000'],
                                 std_dec=star_tbl[_idx]['DEC_2000'])
                 # Return
@@ -759,10 +1126,8 @@ def find_standard_file(ra, dec, toler=20.*units.arcmin, check=False):
                 return std_dict
         else:
             # Save closest found so far
-            imind2d = np.argmin(d2d)
-            mind2d = d2d[imind2d]
-            if mind2d < closest['sep']:
-                closest['sep'] = mind2d
+            if d2d < closest['sep']:
+                closest['sep'] = d2d
                 closest.update(dict(name=star_tbl[int(idx)]['Name'],
                                     ra=star_tbl[int(idx)]['RA_2000'],
                                     dec=star_tbl[int(idx)]['DEC_2000']))
@@ -778,6 +1143,29 @@ def find_standard_file(ra, dec, toler=20.*units.arcmin, check=False):
     return None
 
 
+def load_std_catalogues():
+    """
+    Load the standard star catalogues, in order of priority, with a KD
+    tree on the unit vectors of the star positions.  They are read once
+    per process.
+
+    Returns
+    -------
+    catalogues : list
+      List of (path, star_tbl, fmt, tree) tuples, with path and star_tbl
+      as returned by :func:`load_calspec`, the file format flag fmt
+      (1=Calspec style FITS binary table; 2=ESO ASCII format; 3=XSHOOTER
+      ASCII format) and the scipy.spatial.cKDTree of the stars
+    """
+    if len(_std_catalogues) == 0:
+        for sset, fmt in zip([load_calspec, load_esofil, load_xshooter], [1, 2, 3]):
+            path, star_tbl = sset()
+            star_coords = coordinates.SkyCoord(star_tbl['RA_2000'], star_tbl['DEC_2000'],
+                                               unit=(units.hourangle, units.deg))
+            _std_catalogues.append((path, star_tbl, fmt, cKDTree(star_coords.cartesian.xyz.value.T)))
+    return _std_catalogues
+
+
 def load_calspec():
     """
     Load the list of calspec standards
@@ -860,11 +1248,13 @@ def load_extinction_data(longitude, latitude, toler=5. * units.deg):
     mosaic_coord = coordinates.SkyCoord(longitude, latitude, frame='gcrs', unit=units.deg)
     # Read list
     extinct_path = resource_filename('pypeit', '/data/extinction/')
-    extinct_summ = extinct_path + 'README'
-    extinct_files = Table.read(extinct_summ, comment='#', format='ascii')
-    # Coords
-    ext_coord = coordinates.SkyCoord(extinct_files['Lon'], extinct_files['Lat'], frame='gcrs',
-                                     unit=units.deg)
+    if 'README' not in _extinction_data:
+        extinct_files = Table.read(extinct_path + 'README', comment='#', format='ascii')
+        # Coords
+        ext_coord = coordinates.SkyCoord(extinct_files['Lon'], extinct_files['Lat'], frame='gcrs',
+                                         unit=units.deg)
+        _extinction_data['README'] = (extinct_files, ext_coord)
+    extinct_files, ext_coord = _extinction_data['README']
     # Match
     idx, d2d, d3d = coordinates.match_coordinates_sky(mosaic_coord, ext_coord, nthneighbor=1)
     if d2d < toler:
@@ -874,13 +1264,15 @@ def load_extinction_data(longitude, latitude, toler=5. * units.deg):
         msgs.warn("No file found for extinction corrections.  Applying none")
         msgs.warn("You should generate a site-specific file")
         return None
-    # Read
-    extinct = Table.read(extinct_path + extinct_file, comment='#', format='ascii',
-                         names=('iwave', 'mag_ext'))
-    wave = Column(np.array(extinct['iwave']) * units.AA, name='wave')
-    extinct.add_column(wave)
-    # Return
-    return extinct[['wave', 'mag_ext']]
+    # Read, once per site
+    if extinct_file not in _extinction_data:
+        extinct = Table.read(extinct_path + extinct_file, comment='#', format='ascii',
+                             names=('iwave', 'mag_ext'))
+        wave = Column(np.array(extinct['iwave']) * units.AA, name='wave')
+        extinct.add_column(wave)
+        _extinction_data[extinct_file] = extinct[['wave', 'mag_ext']]
+    # Return a copy, such that the stored curve cannot be modified by the caller
+    return _extinction_data[extinct_file].copy()
 
 def load_filter_file(filter):
     """
@@ -960,24 +1352,106 @@ def load_standard_file(std_dict):
         msgs.info("Loading standard star file: {:s}".format(fil))
         msgs.info("Fluxes are flambda, normalized to 1e-17")
 
-    if std_dict['fmt'] == 3: # XSHOOTER files
+    wave, flam = load_standard_spectrum(fil, std_dict['fmt'])
+    std_dict['wave'] = wave * units.AA
+    std_dict['flux'] = flam * units.erg / units.s / units.cm ** 2 / units.AA
+    return
+
+
+def read_standard_spectrum(fil, fmt):
+    """Parse a standard star spectrum from its archived file
+
+    Parameters
+    ----------
+    fil : str
+      Standard star file
+    fmt : int
+      File format;  see :func:`load_standard_file`
+
+    Returns
+    -------
+    wave, flux : ndarray, ndarray
+      Wavelengths in Angstroms and flambda, cgs with scaling of 1e-17
+    """
+    if fmt == 3: # XSHOOTER files
         std_spec = Table.read(fil, format='ascii')
         # Load
-        std_dict['wave'] = std_spec['col1'] * units.AA
-        std_dict['flux'] = 10*std_spec['col2'] / PYPEIT_FLUX_SCALE  * units.erg / units.s / units.cm ** 2 / units.AA
-    elif std_dict['fmt'] == 1: # Calspec
-        std_spec = fits.open(fil)[1].data
-        # Load
-        std_dict['wave'] = std_spec['WAVELENGTH'] * units.AA
-        std_dict['flux'] = std_spec['FLUX'] / PYPEIT_FLUX_SCALE * units.erg / units.s / units.cm ** 2 / units.AA
-    elif std_dict['fmt'] == 2: # ESO files
+        wave = np.array(std_spec['col1'])
+        flux = 10*np.array(std_spec['col2']) / PYPEIT_FLUX_SCALE
+    elif fmt == 1: # Calspec
+        with fits.open(fil) as hdu:
+            std_spec = hdu[1].data
+            # Load
+            wave = np.array(std_spec['WAVELENGTH'])
+            flux = np.array(std_spec['FLUX']) / PYPEIT_FLUX_SCALE
+    elif fmt == 2: # ESO files
         std_spec = Table.read(fil, format='ascii')
         # Load
-        std_dict['wave'] = std_spec['col1'] * units.AA
-        std_dict['flux'] = 10*std_spec['col2'] * units.erg / units.s / units.cm ** 2 / units.AA
+        wave = np.array(std_spec['col1'])
+        flux = 10*np.array(std_spec['col2'])
     else:
         msgs.error("Bad Standard Star Format")
-    return
+    return wave, flux
+
+
+def std_spectrum_file(fil):
+    """Binary copy of a standard star spectrum
+
+    Parameters
+    ----------
+    fil : str
+      Archived standard star file
+
+    Returns
+    -------
+    binary_file : str
+    """
+    from pypeit.core.wavecal.waveio import cache_path
+    std_path = os.path.abspath(resource_filename('pypeit', 'data/standards'))
+    relfile = os.path.relpath(os.path.abspath(fil), std_path)
+    return os.path.join(cache_path(), 'standards_v{0:d}'.format(STD_SPECTRA_VERSION), relfile + '.npz')
+
+
+def load_standard_spectrum(fil, fmt):
+    """Load a standard star spectrum, once per process
+
+    The spectrum is read from a binary copy in the PypeIt cache (see
+    :func:`pypeit.core.wavecal.waveio.cache_path`), which is written the
+    first time the archived file is parsed and rewritten if it is older
+    than the archived file.
+
+    Parameters
+    ----------
+    fil : str
+      Standard star file
+    fmt : int
+      File format;  see :func:`load_standard_file`
+
+    Returns
+    -------
+    wave, flux : ndarray, ndarray
+      Wavelengths in Angstroms and flambda, cgs with scaling of 1e-17.
+      These are copies of the stored arrays.
+    """
+    key = (os.path.abspath(fil), fmt)
+    if key not in _std_spectra:
+        binary_file = std_spectrum_file(fil)
+        if os.path.isfile(binary_file) and os.path.getmtime(binary_file) >= os.path.getmtime(fil):
+            with np.load(binary_file) as data:
+                _std_spectra[key] = (data['wave'], data['flux'])
+        else:
+            wave, flux = read_standard_spectrum(fil, fmt)
+            _std_spectra[key] = (wave, flux)
+            try:
+                if not os.path.isdir(os.path.dirname(binary_file)):
+                    os.makedirs(os.path.dirname(binary_file))
+                tmpfile = binary_file.replace('.npz', '.tmp{0:d}.npz'.format(os.getpid()))
+                np.savez(tmpfile, wave=wave, flux=flux)
+                os.replace(tmpfile, binary_file)
+            except OSError:
+                msgs.warn('Could not write the binary copy of {0:s} to {1:s}'.format(fil, binary_file))
+    wave, flux = _std_spectra[key]
+    return wave.copy(), flux.copy()
 
 
 def find_standard(specobj_list):
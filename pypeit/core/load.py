@@ -14,6 +14,7 @@ from astropy.table import Table
 from linetools.spectra.xspectrum1d import XSpectrum1D
 from linetools.spectra.utils import collate
 import linetools.utils
+import linetools.spectra.io
 
 
 from pypeit import msgs
@@ -255,7 +256,7 @@ def ech_load_spec(files,objid=None,order=None,extract='OPT',flux=True):
     # Return
     return spectra
 
-def load_1dspec(fname, exten=None, extract='OPT', objname=None, flux=False):
+def load_1dspec(fname, exten=None, extract='OPT', objname=None, flux=False, hdulist=None):
     """
     Parameters
     ----------
@@ -270,6 +271,8 @@ def load_1dspec(fname, exten=None, extract='OPT', objname=None, flux=False):
       Identify extension based on input object name
     flux : bool, optional
       Return fluxed spectra?
+    hdulist : astropy.io.fits.HDUList, optional
+      The already opened file;  avoids re-reading it for every object
 
     Returns
     -------
@@ -279,7 +282,8 @@ def load_1dspec(fname, exten=None, extract='OPT', objname=None, flux=False):
 
     # Identify extension from objname?
     if objname is not None:
-        hdulist = fits.open(fname)
+        if hdulist is None:
+            hdulist = fits.open(fname)
         hdu_names = [hdu.name for hdu in hdulist]
         exten = hdu_names.index(objname)
         if exten < 0:
@@ -297,11 +301,17 @@ def load_1dspec(fname, exten=None, extract='OPT', objname=None, flux=False):
     # Use the WAVE_GRID (for 2d coadds) if it exists, otherwise use WAVE
     rsp_kwargs['wave_tag'] = '{:s}_WAVE_GRID'.format(extract)
     # Load
+    def _read(**kwargs):
+        if hdulist is None:
+            return XSpectrum1D.from_file(fname, exten=exten, **kwargs)
+        spec = linetools.spectra.io.parse_FITS_binary_table(hdulist, exten=exten, **kwargs)
+        spec.meta['headers'][0] = hdulist[0].header
+        return spec
     try:
-        spec = XSpectrum1D.from_file(fname, exten=exten, **rsp_kwargs)
+        spec = _read(**rsp_kwargs)
     except ValueError:
         rsp_kwargs['wave_tag'] = '{:s}_WAVE'.format(extract)
-        spec = XSpectrum1D.from_file(fname, exten=exten, **rsp_kwargs)
+        spec = _read(**rsp_kwargs)
 
     # Return
     return spec
@@ -245,22 +245,19 @@ def lacosmic(det, sciframe, saturation, nonlinear, varframe=None, maxiter=1, gro
 #    msgs.work("Include these parameters in the settings files to be adjusted by the user")
     # Set the settings
     scicopy = sciframe.copy()
-    crmask = np.cast['bool'](np.zeros(sciframe.shape))
+    crmask = np.zeros(sciframe.shape, dtype=bool)
     sigcliplow = sigclip * sigfrac
 
     # Determine if there are saturated pixels
-    satpix = np.zeros_like(sciframe)
 #    satlev = settings_det['saturation']*settings_det['nonlinear']
     satlev = saturation*nonlinear
-    wsat = np.where(sciframe >= satlev)
-    if wsat[0].size == 0: satpix = None
-    else:
-        satpix[wsat] = 1.0
-        satpix = np.cast['bool'](satpix)
+    satpix = sciframe >= satlev
+    if not np.any(satpix):
+        satpix = None
 
     # Define the kernels
     laplkernel = np.array([[0.0, -1.0, 0.0], [-1.0, 4.0, -1.0], [0.0, -1.0, 0.0]])  # Laplacian kernal
-    growkernel = np.ones((3,3))
+    growkernel = np.ones((3,3), dtype=bool)
     for i in range(1, maxiter+1):
         msgs.info("Convolving image with Laplacian kernel")
         # Subsample, convolve, clip negative values, and rebin to original size
@@ -325,7 +322,7 @@ def lacosmic(det, sciframe, saturation, nonlinear, varframe=None, maxiter=1, gro
         msgs.info("Finding neighboring pixels affected by cosmic rays")
 
         # We grow these cosmics a first time to determine the immediate neighborhod  :
-        growcosmics = np.cast['bool'](signal.convolve2d(np.cast['float32'](cosmics), growkernel, mode="same", boundary="symm"))
+        growcosmics = ndimage.binary_dilation(cosmics, structure=growkernel)
 
         # From this grown set, we keep those that have sp > sigmalim
         # so obviously not requiring sp/f > objlim, otherwise it would be pointless
@@ -333,7 +330,7 @@ def lacosmic(det, sciframe, saturation, nonlinear, varframe=None, maxiter=1, gro
 
         # Now we repeat this procedure, but lower the detection limit to sigmalimlow :
 
-        finalsel = np.cast['bool'](signal.convolve2d(np.cast['float32'](growcosmics), growkernel, mode="same", boundary="symm"))
+        finalsel = ndimage.binary_dilation(growcosmics, structure=growkernel)
         finalsel = np.logical_and(sp > sigcliplow, finalsel)
 
         # Unmask saturated pixels:
@@ -364,13 +361,12 @@ def lacosmic(det, sciframe, saturation, nonlinear, varframe=None, maxiter=1, gro
 
     sigsmth = ndimage.filters.gaussian_filter(sigimg,1.5)
     sigsmth[np.where(np.isnan(sigsmth))]=0.0
-    sigmask = np.cast['bool'](np.zeros(sciframe.shape))
-    sigmask[np.where(sigsmth>sigclip)] = True
+    sigmask = sigsmth > sigclip
     crmask = np.logical_and(crmask, sigmask)
     msgs.info("Growing cosmic ray mask by 1 pixel")
-    crmask = grow_masked(crmask.astype(np.float), grow, 1.0)
+    crmask = grow_masked(crmask, grow, True)
 
-    return crmask.astype(bool)
+    return crmask
 
 
 def cr_screen(a, mask_value=0.0, spatial_axis=1):
@@ -414,30 +410,41 @@ def cr_screen(a, mask_value=0.0, spatial_axis=1):
 
 
 def grow_masked(img, grow, growval):
+    """
+    Grow the pixels of an image with a given value by a circular
+    footprint.
+
+    Every pixel within a distance `grow` of a pixel equal to `growval`
+    is set to `growval`.  For a boolean mask with growval=True, this is
+    a binary dilation of the mask, which is performed without
+    converting the mask to another type.
+
+    Parameters
+    ----------
+    img : ndarray
+      2D image or boolean mask
+    grow : float
+      Radius of the circular footprint in pixels
+    growval : int, float or bool
+      Value of the pixels to grow
 
-    if not np.any(img == growval):
+    Returns
+    -------
+    _img : ndarray
+      Copy of img with the grown pixels set to growval.  The input is
+      returned if no pixel has this value.
+    """
+    seed = img == growval
+    if not np.any(seed):
         return img
 
-    _img = img.copy()
-    sz_x, sz_y = img.shape
+    # Circular footprint
     d = int(1+grow)
-    rsqr = grow*grow
-
-    # Grow any masked values by the specified amount
-    for x in range(sz_x):
-        for y in range(sz_y):
-            if img[x,y] != growval:
-                continue
-
-            mnx = 0 if x-d < 0 else x-d
-            mxx = x+d+1 if x+d+1 < sz_x else sz_x
-            mny = 0 if y-d < 0 else y-d
-            mxy = y+d+1 if y+d+1 < sz_y else sz_y
-
-            for i in range(mnx,mxx):
-                for j in range(mny, mxy):
-                    if (i-x)*(i-x)+(j-y)*(j-y) <= rsqr:
-                        _img[i,j] = growval
+    offset = np.arange(-d, d+1)
+    footprint = (offset[:,None]**2 + offset[None,:]**2) <= grow*grow
+
+    _img = img.copy()
+    _img[ndimage.binary_dilation(seed, structure=footprint)] = growval
     return _img
 
 
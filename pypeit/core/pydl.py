@@ -5,6 +5,7 @@
 from __future__ import (print_function, absolute_import, division, unicode_literals)
 
 import numpy as np
+import scipy.linalg
 from warnings import warn
 
 from pypeit import msgs
@@ -406,7 +407,7 @@ class bspline(object):
                      xmax=self.xmax,
                      funcname=self.funcname))
 
-    def fit(self, xdata, ydata, invvar, x2=None):
+    def fit(self, xdata, ydata, invvar, x2=None, action=None, lower=None, upper=None):
         """Calculate a B-spline in the least-squares sense.
 
         Fit is based on two variables: x which is sorted and spans a large range
@@ -423,6 +424,15 @@ class bspline(object):
             Inverse variance of `ydata`.
         x2 : :class:`numpy.ndarray`, optional
             Orthogonal dependent variable for 2d fits.
+        action : :class:`numpy.ndarray`, optional
+            Action matrix for `xdata` and the current breakpoints, as
+            returned by :func:`action`.  If not supplied it is calculated.
+        lower : :class:`numpy.ndarray`, optional
+            If the action parameter is supplied, this parameter must also
+            be supplied.
+        upper : :class:`numpy.ndarray`, optional
+            If the action parameter is supplied, this parameter must also
+            be supplied.
 
         Returns
         -------
@@ -439,25 +449,31 @@ class bspline(object):
             return (-2, yfit)
         nfull = nn * self.npoly
         bw = self.npoly * self.nord
-        a1, lower, upper = self.action(xdata, x2=x2)
-        foo = np.tile(invvar, bw).reshape(bw, invvar.size).transpose()
-        a2 = a1 * foo
-        alpha = np.zeros((bw, nfull+bw), dtype='d')
-        beta = np.zeros((nfull+bw,), dtype='d')
+        if action is not None:
+            if lower is None or upper is None:
+                raise ValueError('Must specify lower and upper if action is set.')
+            a1 = action
+        else:
+            a1, lower, upper = self.action(xdata, x2=x2)
+        a2 = a1 * invvar[:, None]
         bi = np.arange(bw, dtype='i4')
         bo = np.arange(bw, dtype='i4')
         for k in range(1, bw):
             bi = np.append(bi, np.arange(bw-k, dtype='i4')+(bw+1)*k)
             bo = np.append(bo, np.arange(bw-k, dtype='i4')+bw*k)
-        for k in range(nn-self.nord+1):
-            itop = k*self.npoly
-            ibottom = min(itop, nfull) + bw - 1
-            ict = upper[k] - lower[k] + 1
-            if ict > 0:
-                work = np.dot(a1[lower[k]:upper[k]+1, :].T, a2[lower[k]:upper[k]+1, :])
-                wb = np.dot(ydata[lower[k]:upper[k]+1], a2[lower[k]:upper[k]+1, :])
-                alpha.T.flat[bo+itop*bw] += work.flat[bi]
-                beta[itop:ibottom+1] += wb
+        # Normal equations, summed over the data within each breakpoint interval at once
+        k = np.arange(nn-self.nord+1)
+        k = k[upper[k] - lower[k] + 1 > 0]
+        itop = k*self.npoly
+        bounds = np.stack([lower[k], upper[k]+1], axis=1).ravel()
+        work = np.add.reduceat(np.append(a1[:, :, None]*a2[:, None, :], np.zeros((1, bw, bw)), axis=0),
+                               bounds, axis=0)[::2]
+        wb = np.add.reduceat(np.append(ydata[:, None]*a2, np.zeros((1, bw)), axis=0), bounds, axis=0)[::2]
+        alpha = np.zeros((nfull+bw)*bw, dtype='d')
+        beta = np.zeros((nfull+bw,), dtype='d')
+        np.add.at(alpha, (bo[None, :]+itop[:, None]*bw).ravel(), work.reshape(k.size, -1)[:, bi].ravel())
+        np.add.at(beta, (itop[:, None]+np.arange(bw)[None, :]).ravel(), wb.ravel())
+        alpha = alpha.reshape(nfull+bw, bw).T
         min_influence = 1.0e-10 * invvar.sum() / nfull
         errb = cholesky_band(alpha, mininf=min_influence)  # ,verbose=True)
         if isinstance(errb[0], int) and errb[0] == -1:
@@ -568,13 +584,12 @@ class bspline(object):
         """
         gb = self.breakpoints[self.mask]
         n = gb.size - self.nord
-        indx = np.zeros((x.size,), dtype=int)
-        ileft = self.nord - 1
-        for i in range(x.size):
-            while x[i] > gb[ileft+1] and ileft < n - 1:
-                ileft += 1
-            indx[i] = ileft
-        return indx
+        # Vectorized version of stepping ileft along the breakpoints
+        # for each successive x.  The running maximum reproduces the
+        # sequential search exactly, including for unsorted input.
+        indx = np.clip(np.searchsorted(gb, x, side='left') - 1, self.nord - 1, n - 1)
+        indx[np.isnan(x)] = self.nord - 1
+        return np.maximum.accumulate(indx) if indx.size > 0 else indx
 
     def bsplvn(self, x, ileft):
         """To be documented.
@@ -658,10 +673,13 @@ class bspline(object):
         else:
             goodcoeff = self.coeff[coeffbk]
         # maskthis = np.zeros(xwork.shape,dtype=xwork.dtype)
-        for i in range(n-self.nord+1):
-            ict = upper[i] - lower[i] + 1
-            if ict > 0:
-                yfit[lower[i]:upper[i]+1] = np.dot(action[lower[i]:upper[i]+1, :], (goodcoeff.flatten('F'))[i*self.npoly+spot])
+        # Evaluate all the breakpoint intervals at once
+        i = np.arange(n-self.nord+1)
+        i = i[upper[i] - lower[i] + 1 > 0]
+        ict = upper[i] - lower[i] + 1
+        rows = np.arange(ict.sum()) - np.repeat(np.cumsum(ict) - ict - lower[i], ict)
+        coeff = goodcoeff.flatten('F')[np.repeat(i*self.npoly, ict)[:, None] + spot[None, :]]
+        yfit[rows] = np.sum(action[rows, :]*coeff, axis=1)
         yy = yfit.copy()
         yy[xsort] = yfit
         mask = np.ones(x.shape, dtype='bool')
@@ -864,6 +882,13 @@ def cholesky_band(l, mininf=0.0):
 #        msgs.warn('Found {:d}'.format(len(negative.nonzero()[0])) +
 #                  ' bad entries: ' + str(negative.nonzero()[0]))
 #        return (negative.nonzero()[0], l)
+    # The first n columns are the lower banded form of a symmetric matrix, as used by LAPACK.
+    # Only fall back to the explicit loop below to find where the decomposition fails.
+    try:
+        lower[:, :n] = scipy.linalg.cholesky_banded(lower[:, :n], lower=True)
+        return (-1, lower)
+    except (np.linalg.LinAlgError, ValueError):
+        lower = l.copy()
     kn = bw - 1
     spot = np.arange(kn, dtype='i4') + 1
     bi = np.arange(kn, dtype='i4')
@@ -901,6 +926,9 @@ def cholesky_solve(a, bb):
     b = bb.copy()
     bw = a.shape[0]
     n = b.shape[0] - bw
+    if np.all(np.isfinite(a[:, :n])) and np.all(np.isfinite(b[:n])):
+        b[:n] = scipy.linalg.cho_solve_banded((a[:, :n], True), b[:n])
+        return (-1, b)
     kn = bw - 1
     spot = np.arange(kn, dtype='i4') + 1
     for j in range(n):
@@ -913,7 +941,8 @@ def cholesky_solve(a, bb):
 
 
 def iterfit(xdata, ydata, invvar=None, inmask = None, upper=5, lower=5, x2=None,
-            maxiter=10, nord = 4, bkpt = None, fullbkpt = None, kwargs_bspline={}, kwargs_reject={}):
+            maxiter=10, nord = 4, bkpt = None, fullbkpt = None, bspline_action=None,
+            kwargs_bspline={}, kwargs_reject={}):
     """Iteratively fit a b-spline set to data, with rejection.
 
     Parameters
@@ -934,6 +963,12 @@ def iterfit(xdata, ydata, invvar=None, inmask = None, upper=5, lower=5, x2=None,
     maxiter : :class:`int`, optional
         Maximum number of rejection iterations, default 10.  Set this to
         zero to disable rejection.
+    bspline_action : :func:`tuple`, optional
+        Precomputed (action, lower, upper) as returned by
+        :func:`bspline.action` for the sorted `xdata` and the breakpoints of
+        this fit (i.e. `fullbkpt`).  It is only used while none of the
+        breakpoints have been masked.  Otherwise the action is computed once
+        and reused over the rejection iterations.
 
     Returns
     -------
@@ -1010,6 +1045,9 @@ def iterfit(xdata, ydata, invvar=None, inmask = None, upper=5, lower=5, x2=None,
         x2work = None
     iiter = 0
     error = -1
+    # The action only changes when breakpoints are masked
+    action = None
+    action_mask = None
     # JFH fixed major bug here. Codes were not iterating
     qdone = False
     while (error != 0 or qdone is False) and iiter <= maxiter:
@@ -1033,8 +1071,14 @@ def iterfit(xdata, ydata, invvar=None, inmask = None, upper=5, lower=5, x2=None,
                         ct = 0
                     else:
                         sset.mask[goodbk[ileft]] = False
-            error, yfit = sset.fit(xwork, ywork, invwork*maskwork,
-                                   x2=x2work)
+            if action_mask is None or not np.array_equal(action_mask, sset.mask):
+                if bspline_action is not None and np.all(sset.mask):
+                    action = bspline_action
+                else:
+                    action = sset.action(xwork, x2=x2work)
+                action_mask = np.copy(sset.mask)
+            error, yfit = sset.fit(xwork, ywork, invwork*maskwork, x2=x2work,
+                                   action=action[0], lower=action[1], upper=action[2])
         iiter += 1
         inmask_rej = maskwork
         if error == -2:
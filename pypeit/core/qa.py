@@ -6,9 +6,12 @@ import os
 import datetime
 import getpass
 import glob
+import multiprocessing
 import numpy as np
 import yaml
 
+from concurrent.futures import ProcessPoolExecutor
+
 # CANNOT INCLUDE msgs IN THIS MODULE AS
 #  THE HTML GENERATION OCCURS FROM msgs
 #from pypeit import msgs
@@ -18,6 +21,70 @@ import yaml
 #except NameError:  # For Python 3
 #    basestring = str
 
+# Pool of processes rendering the QA plots in the background, see start_qa_queue()
+_qa_executor = None
+_qa_futures = []
+
+
+def _init_qa_worker():
+    """ The QA workers only write files """
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def start_qa_queue(nproc):
+    """
+    Render the QA plots passed to submit_qa() in a pool of background processes
+
+    Parameters
+    ----------
+    nproc : int
+      Number of processes.  If 0, submit_qa() renders the plots immediately.
+    """
+    global _qa_executor
+    if _qa_executor is not None or nproc < 1:
+        return
+    # Spawn, such that the workers do not inherit the threads and the plotting state of the reduction
+    _qa_executor = ProcessPoolExecutor(max_workers=nproc, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_qa_worker)
+
+
+def submit_qa(func, *args, **kwargs):
+    """
+    Render a QA plot, in the background if the QA queue is running
+
+    Parameters
+    ----------
+    func : callable
+      Module-level function making the plot.  It and its arguments, i.e.
+      the data products to plot, must be picklable.
+    args, kwargs :
+      Passed to func
+    """
+    if _qa_executor is None:
+        func(*args, **kwargs)
+    else:
+        _qa_futures.append(_qa_executor.submit(func, *args, **kwargs))
+
+
+def finish_qa_queue():
+    """
+    Wait for the QA plots submitted to the queue and stop its processes
+
+    Returns
+    -------
+    errors : list
+      Exceptions raised while rendering the QA plots
+    """
+    global _qa_executor
+    errors = [future.exception() for future in _qa_futures]
+    del _qa_futures[:]
+    if _qa_executor is not None:
+        _qa_executor.shutdown(wait=True)
+        _qa_executor = None
+    return [error for error in errors if error is not None]
+
+
 def set_qa_filename(root, method, det=None, slit=None, prefix=None, out_dir=None):
     """
     Parameters
@@ -683,6 +683,12 @@ def local_skysub_extract(sciimg, sciivar, tilts, waveimg, global_sky, rn2_img, t
             msgs.info('--------------------------REDUCING: Iteration # ' + '{:2d}'.format(iiter) + ' of ' +
                       '{:2d}'.format(niter) + '---------------------------------------------------')
             img_minsky = sciimg - skyimage
+            if iiter > 1:
+                # For later iterations, the profile fits are based on the optimal extractions with the last profiles.
+                # These only depend on each object's own profile and trace, so all the objects are extracted at once
+                extract.extract_optimal_batch(sciimg, modelivar, outmask, waveimg, skyimage, rn2_img, obj_profiles,
+                                              box_rad, [sobjs[iobj] for iobj in group],
+                                              objmask_radius=2.0*box_rad)
             for ii in range(objwork):
                 iobj = group[ii]
                 if iiter == 1:
@@ -707,12 +713,7 @@ def local_skysub_extract(sciimg, sciivar, tilts, waveimg, global_sky, rn2_img, t
                                 box_denom + (box_denom == 0.0))
                     fluxivar = mask_box / (mvar_box + (mvar_box == 0.0))
                 else:
-                    # For later iterations, profile fitting is based on an optimal extraction
-                    last_profile = obj_profiles[:, :, ii]
-                    trace = np.outer(sobjs[iobj].trace_spat, np.ones(nspat))
-                    objmask = ((spat_img >= (trace - 2.0 * box_rad)) & (spat_img <= (trace + 2.0 * box_rad)))
-                    extract.extract_optimal(sciimg, modelivar, (outmask & objmask), waveimg, skyimage, rn2_img, last_profile,
-                                    box_rad, sobjs[iobj])
+                    # For later iterations, profile fitting is based on the optimal extraction above
                     # If the extraction is bad do not update
                     if sobjs[iobj].optimal['MASK'].any():
                         flux = sobjs[iobj].optimal['COUNTS']
@@ -831,13 +832,10 @@ def local_skysub_extract(sciimg, sciivar, tilts, waveimg, global_sky, rn2_img, t
             msgs.info('Extracting obj # {:d}'.format(iobj + 1) + ' of {:d}'.format(nobj) +
                       ' with objid = {:d}'.format(sobjs[iobj].objid) + ' on slit # {:d}'.format(sobjs[iobj].slitid) +
                       ' at x = {:5.2f}'.format(sobjs[iobj].spat_pixpos))
-            this_profile = obj_profiles[:, :, ii]
-            trace = np.outer(sobjs[iobj].trace_spat, np.ones(nspat))
-            objmask = ((spat_img >= (trace - 2.0 * box_rad)) & (spat_img <= (trace + 2.0 * box_rad)))
-            extract.extract_optimal(sciimg, modelivar * thismask, (outmask & objmask), waveimg, skyimage, rn2_img, this_profile,
-                            box_rad, sobjs[iobj])
             sobjs[iobj].min_spat = min_spat
             sobjs[iobj].max_spat = max_spat
+        extract.extract_optimal_batch(sciimg, modelivar * thismask, outmask, waveimg, skyimage, rn2_img, obj_profiles,
+                                      box_rad, [sobjs[iobj] for iobj in group], objmask_radius=2.0*box_rad)
 
 
     # If requested display the model fits for this slit
@@ -1045,8 +1043,7 @@ def ech_local_skysub_extract(sciimg, sciivar, mask, tilts, waveimg, global_sky,
         # Set the bit for pixels which were masked by the extraction.
         # For extractmask, True = Good, False = Bad
         iextract = (mask == 0) & (extractmask == False)
-        # Undefined inverse variances
-        outmask[iextract] = bitmask.turn_on(outmask[iextract], 'EXTRACT')
+        bitmask.turn_on_where(outmask, iextract, 'EXTRACT')
 
         # Return
         return skymodel, objmodel, ivarmodel, outmask, sobjs
@@ -3,14 +3,17 @@ from __future__ import (print_function, absolute_import, division, unicode_liter
 
 
 import inspect
+import hashlib
 
 import numpy as np
 import copy
+from collections import OrderedDict
 
 from matplotlib import pyplot as plt
 from matplotlib import gridspec
 
 from scipy import interpolate
+from scipy import signal
 
 from astropy import units
 from astropy.coordinates import solar_system, ICRS
@@ -26,11 +29,26 @@ from pypeit import utils
 
 from pypeit import debugger
 
+# Archive sky spectra and their line widths, kept for the duration of the process
+_sky_spectra = {}
+_sky_lines = {}
+# LRU cache of the archive sky spectra prepared for flexure, keyed by
+# (sky_file, smoothing sigma bin, wavelength grid)
+FLEX_ARCHIVE_CACHE_SIZE = 64
+_flex_archive = OrderedDict()
+# LRU cache of the heliocentric/barycentric velocities, keyed by target,
+# time, observatory and frame
+GEOMOTION_CACHE_SIZE = 64
+_geomotion_vel = OrderedDict()
+
 
 def load_sky_spectrum(sky_file):
     """
     Load a sky spectrum into an XSpectrum1D object
 
+    The spectrum is read once per process; do not modify the returned
+    object.
+
     Args:
         sky_file: str
 
@@ -38,172 +56,362 @@ def load_sky_spectrum(sky_file):
         sky_spec: XSpectrum1D
           spectrum
     """
-    sky_spec = xspectrum1d.XSpectrum1D.from_file(sky_file)
-    return sky_spec
+    if sky_file not in _sky_spectra:
+        _sky_spectra[sky_file] = xspectrum1d.XSpectrum1D.from_file(sky_file)
+    return _sky_spectra[sky_file]
 
 
-def flex_shift(obj_skyspec, arx_skyspec, mxshft=20):
-    """ Calculate shift between object sky spectrum and archive sky spectrum
+def flex_archive_grid(sky_file, keep_wave, toler=0.5):
+    """ Find a cached archive grid matching a wavelength grid
 
     Parameters
     ----------
-    obj_skyspec
-    arx_skyspec
+    sky_file : str
+      Archive sky spectrum
+    keep_wave : Quantity
+      Wavelength grid of the object sky spectrum
+    toler : float, optional
+      Maximum difference between the grids, in pixels
 
     Returns
     -------
-    flex_dict: dict
-      Contains flexure info
+    keep_wave : Quantity
+      The cached grid, if one matches, otherwise the input grid
     """
-    flex_dict = {}
-    # Determine the brightest emission lines
-    msgs.warn("If we use Paranal, cut down on wavelength early on")
-    arx_amp, arx_amp_cont, arx_cent, arx_wid, _, arx_w, arx_yprep, nsig = arc.detect_lines(arx_skyspec.flux.value)
-    obj_amp, obj_amp_cont, obj_cent, obj_wid, _, obj_w, obj_yprep, nsig_obj= arc.detect_lines(obj_skyspec.flux.value)
+    wave = keep_wave.value
+    max_diff = toler*np.median(np.abs(np.diff(wave)))
+    for key in reversed(_flex_archive.keys()):
+        grid = _flex_archive[key][0]
+        if key[0] == sky_file and grid.size == wave.size and np.all(np.abs(grid.value-wave) < max_diff):
+            return grid
+    return keep_wave
+
+
+def flex_archive_spec(sky_file, arx_skyspec, keep_wave, smooth_sig_pix):
+    """ Archive sky spectrum prepared for the flexure cross-correlation
+
+    The result of :func:`flex_prep_spec` is cached by the archive file,
+    smoothing and wavelength grid, with the least recently used entries
+    dropped beyond FLEX_ARCHIVE_CACHE_SIZE.
+
+    Returns
+    -------
+    arx_skyspec : XSpectrum1D or None
+    arx_sky_flux : ndarray or None
+    """
+    key = (sky_file, float(smooth_sig_pix), keep_wave.size,
+           hashlib.sha1(np.ascontiguousarray(keep_wave.value)).hexdigest())
+    if key in _flex_archive:
+        _flex_archive.move_to_end(key)
+        return _flex_archive[key][1:]
+    arx_prep = flex_prep_spec(arx_skyspec, keep_wave, archive=True, smooth_sig_pix=smooth_sig_pix)
+    _flex_archive[key] = (keep_wave,) + arx_prep
+    while len(_flex_archive) > FLEX_ARCHIVE_CACHE_SIZE:
+        _flex_archive.popitem(last=False)
+    return arx_prep
+
+
+def flex_sky_lines(skyspec, nkeep=5):
+    """ Measure the widths of the brightest emission lines in a sky spectrum
+
+    Parameters
+    ----------
+    skyspec : XSpectrum1D
+    nkeep : int, optional
+      Number of the brightest lines to use
+
+    Returns
+    -------
+    med_sig2 : float
+      Median Gaussian sigma**2 of the lines (Angstrom**2)
+    res : ndarray
+      Resolution (lambda/delta lambda_FWHM) of the lines
+    disp : float
+      Median dispersion (Angstrom per pixel) at the lines
+    """
+    amp, amp_cont, cent, wid, _, w, yprep, nsig = arc.detect_lines(skyspec.flux.value)
 
-    # Keep only 5 brightest amplitude lines (xxx_keep is array of
-    # indices within arx_w of the 5 brightest)
-    arx_keep = np.argsort(arx_amp[arx_w])[-5:]
-    obj_keep = np.argsort(obj_amp[obj_w])[-5:]
+    # Keep only the brightest amplitude lines (keep is array of
+    # indices within w of the nkeep brightest)
+    keep = np.argsort(amp[w])[-nkeep:]
 
     # Calculate wavelength (Angstrom per pixel)
-    arx_disp = np.append(arx_skyspec.wavelength.value[1]-arx_skyspec.wavelength.value[0],
-                         arx_skyspec.wavelength.value[1:]-arx_skyspec.wavelength.value[:-1])
-    #arx_disp = (np.amax(arx_sky.wavelength.value)-np.amin(arx_sky.wavelength.value))/arx_sky.wavelength.size
-    obj_disp = np.append(obj_skyspec.wavelength.value[1]-obj_skyspec.wavelength.value[0],
-                         obj_skyspec.wavelength.value[1:]-obj_skyspec.wavelength.value[:-1])
-    #obj_disp = (np.amax(obj_sky.wavelength.value)-np.amin(obj_sky.wavelength.value))/obj_sky.wavelength.size
+    wave = skyspec.wavelength.value
+    disp = np.append(wave[1]-wave[0], wave[1:]-wave[:-1])
 
     # Calculate resolution (lambda/delta lambda_FWHM)..maybe don't need
     # this? can just use sigmas
-    arx_idx = (arx_cent+0.5).astype(np.int)[arx_w][arx_keep]   # The +0.5 is for rounding
-    arx_res = arx_skyspec.wavelength.value[arx_idx]/\
-              (arx_disp[arx_idx]*(2*np.sqrt(2*np.log(2)))*arx_wid[arx_w][arx_keep])
-    obj_idx = (obj_cent+0.5).astype(np.int)[obj_w][obj_keep]   # The +0.5 is for rounding
-    obj_res = obj_skyspec.wavelength.value[obj_idx]/ \
-              (obj_disp[obj_idx]*(2*np.sqrt(2*np.log(2)))*obj_wid[obj_w][obj_keep])
-    #obj_res = (obj_sky.wavelength.value[0]+(obj_disp*obj_cent[obj_w][obj_keep]))/(
-    #    obj_disp*(2*np.sqrt(2*np.log(2)))*obj_wid[obj_w][obj_keep])
-
-    if not np.all(np.isfinite(obj_res)):
-        msgs.warn('Failed to measure the resolution of the object spectrum, likely due to error '
-                   'in the wavelength image.')
-        return None
-    msgs.info("Resolution of Archive={0} and Observation={1}".format(np.median(arx_res),
-                                                                     np.median(obj_res)))
+    idx = (cent+0.5).astype(int)[w][keep]   # The +0.5 is for rounding
+    res = wave[idx]/(disp[idx]*(2*np.sqrt(2*np.log(2)))*wid[w][keep])
 
     # Determine sigma of gaussian for smoothing
-    arx_sig2 = np.power(arx_disp[arx_idx]*arx_wid[arx_w][arx_keep], 2)
-    obj_sig2 = np.power(obj_disp[obj_idx]*obj_wid[obj_w][obj_keep], 2)
+    sig2 = np.power(disp[idx]*wid[w][keep], 2)
+    return np.median(sig2), res, np.median(disp[idx])
 
-    arx_med_sig2 = np.median(arx_sig2)
-    obj_med_sig2 = np.median(obj_sig2)
 
-    if obj_med_sig2 >= arx_med_sig2:
-        smooth_sig = np.sqrt(obj_med_sig2-arx_med_sig2)  # Ang
-        smooth_sig_pix = smooth_sig / np.median(arx_disp[arx_idx])
-        arx_skyspec = arx_skyspec.gauss_smooth(smooth_sig_pix*2*np.sqrt(2*np.log(2)))
-    else:
-        msgs.warn("Prefer archival sky spectrum to have higher resolution")
-        smooth_sig_pix = 0.
-        msgs.warn("New Sky has higher resolution than Archive.  Not smoothing")
-        #smooth_sig = np.sqrt(arx_med_sig**2-obj_med_sig**2)
-
-    #Determine region of wavelength overlap
-    min_wave = max(np.amin(arx_skyspec.wavelength.value), np.amin(obj_skyspec.wavelength.value))
-    max_wave = min(np.amax(arx_skyspec.wavelength.value), np.amax(obj_skyspec.wavelength.value))
-
-    #Smooth higher resolution spectrum by smooth_sig (flux is conserved!)
-#    if np.median(obj_res) >= np.median(arx_res):
-#        msgs.warn("New Sky has higher resolution than Archive.  Not smoothing")
-        #obj_sky_newflux = ndimage.gaussian_filter(obj_sky.flux, smooth_sig)
-#    else:
-        #tmp = ndimage.gaussian_filter(arx_sky.flux, smooth_sig)
-#        arx_skyspec = arx_skyspec.gauss_smooth(smooth_sig_pix*2*np.sqrt(2*np.log(2)))
-        #arx_sky.flux = ndimage.gaussian_filter(arx_sky.flux, smooth_sig)
-
-    # Define wavelengths of overlapping spectra
-    keep_idx = np.where((obj_skyspec.wavelength.value>=min_wave) &
-                         (obj_skyspec.wavelength.value<=max_wave))[0]
-    #keep_wave = [i for i in obj_sky.wavelength.value if i>=min_wave if i<=max_wave]
-
-    #Rebin both spectra onto overlapped wavelength range
+def flex_overlap(obj_skyspec, arx_skyspec):
+    """ Wavelengths of the object sky spectrum that overlap the archive
+
+    Returns
+    -------
+    keep_wave : Quantity or None
+      None if there are too few overlapping pixels
+    """
+    obj_wave = obj_skyspec.wavelength.value
+    min_wave = max(np.amin(arx_skyspec.wavelength.value), np.amin(obj_wave))
+    max_wave = min(np.amax(arx_skyspec.wavelength.value), np.amax(obj_wave))
+    keep_idx = np.where((obj_wave >= min_wave) & (obj_wave <= max_wave))[0]
     if len(keep_idx) <= 50:
         msgs.warn("Not enough overlap between sky spectra")
         return None
-    else: #rebin onto object ALWAYS
-        keep_wave = obj_skyspec.wavelength[keep_idx]
-        arx_skyspec = arx_skyspec.rebin(keep_wave)
-        obj_skyspec = obj_skyspec.rebin(keep_wave)
-        # Trim edges (rebinning is junk there)
-        arx_skyspec.data['flux'][0,:2] = 0.
-        arx_skyspec.data['flux'][0,-2:] = 0.
-        obj_skyspec.data['flux'][0,:2] = 0.
-        obj_skyspec.data['flux'][0,-2:] = 0.
+    return obj_skyspec.wavelength[keep_idx]
+
+
+def flex_prep_spec(skyspec, keep_wave, archive=False, smooth_sig_pix=0.):
+    """ Rebin a sky spectrum onto the flexure grid, normalize it and
+    remove its continuum
+
+    Parameters
+    ----------
+    skyspec : XSpectrum1D
+    keep_wave : Quantity
+      Wavelength grid for the cross-correlation
+    archive : bool, optional
+      The spectrum is the archive sky spectrum
+    smooth_sig_pix : float, optional
+      Gaussian sigma (archive pixels) used to smooth the spectrum before
+      rebinning
+
+    Returns
+    -------
+    skyspec : XSpectrum1D or None
+      Rebinned and normalized spectrum.  None if the normalization failed.
+    sky_flux : ndarray
+      Continuum subtracted flux
+    """
+    if smooth_sig_pix > 0.:
+        skyspec = skyspec.gauss_smooth(smooth_sig_pix*2*np.sqrt(2*np.log(2)))
+    # Rebin onto the object grid ALWAYS
+    skyspec = skyspec.rebin(keep_wave)
+    # Trim edges (rebinning is junk there)
+    skyspec.data['flux'][0,:2] = 0.
+    skyspec.data['flux'][0,-2:] = 0.
 
     # Normalize spectra to unit average sky count
-    norm = np.sum(obj_skyspec.flux.value)/obj_skyspec.npix
-    obj_skyspec.flux = obj_skyspec.flux / norm
-    norm2 = np.sum(arx_skyspec.flux.value)/arx_skyspec.npix
-    arx_skyspec.flux = arx_skyspec.flux / norm2
+    norm = np.sum(skyspec.flux.value)/skyspec.npix
+    skyspec.flux = skyspec.flux / norm
+    if archive and (norm < 0.):
+        msgs.warn('Bad normalization of archive in flexure. You are probably using wavelengths '
+                   'well beyond the archive.')
+        return None, None
     if (norm < 0.):
         msgs.warn("Bad normalization of object in flexure algorithm")
         msgs.warn("Will try the median")
-        norm = np.median(obj_skyspec.flux.value)
+        norm = np.median(skyspec.flux.value)
         if (norm < 0.):
             msgs.warn("Improper sky spectrum for flexure.  Is it too faint??")
-            return None
-    if (norm2 < 0.):
-        msgs.warn('Bad normalization of archive in flexure. You are probably using wavelengths '
-                   'well beyond the archive.')
-        return None
-
-    # Deal with bad pixels
-    msgs.work("Need to mask bad pixels")
+            return None, None
 
     # Deal with underlying continuum
-    msgs.work("Consider taking median first [5 pixel]")
-    everyn = obj_skyspec.npix // 20
+    everyn = skyspec.npix // 20
     bspline_par = dict(everyn=everyn)
-    mask, ct = utils.robust_polyfit(obj_skyspec.wavelength.value, obj_skyspec.flux.value, 3,
+    mask, ct = utils.robust_polyfit(skyspec.wavelength.value, skyspec.flux.value, 3,
                                     function='bspline', sigma=3., bspline_par=bspline_par)
-    obj_sky_cont = utils.func_val(ct, obj_skyspec.wavelength.value, 'bspline')
-    obj_sky_flux = obj_skyspec.flux.value - obj_sky_cont
-    mask, ct_arx = utils.robust_polyfit(arx_skyspec.wavelength.value, arx_skyspec.flux.value, 3,
-                                        function='bspline', sigma=3., bspline_par=bspline_par)
-    arx_sky_cont = utils.func_val(ct_arx, arx_skyspec.wavelength.value, 'bspline')
-    arx_sky_flux = arx_skyspec.flux.value - arx_sky_cont
+    sky_cont = utils.func_val(ct, skyspec.wavelength.value, 'bspline')
+    return skyspec, skyspec.flux.value - sky_cont
+
 
-    # Consider sharpness filtering (e.g. LowRedux)
-    msgs.work("Consider taking median first [5 pixel]")
+def flex_xcorr(arx_sky_flux, obj_sky_flux, mxshft=20):
+    """ Cross-correlate a set of sky spectra with the archive in one pass
 
-    #Cross correlation of spectra
-    #corr = np.correlate(arx_skyspec.flux, obj_skyspec.flux, "same")
-    corr = np.correlate(arx_sky_flux, obj_sky_flux, "same")
+    Parameters
+    ----------
+    arx_sky_flux : ndarray
+      Continuum subtracted archive flux, shape (nspec,) or (nobj, nspec)
+    obj_sky_flux : ndarray
+      Continuum subtracted object flux, shape (nobj, nspec)
+    mxshft : int, optional
+      Maximum shift (pixels) searched for the correlation peak
+
+    Returns
+    -------
+    shift : ndarray
+      Shift in pixels for each object
+    flex_dicts : list
+      Per object dicts with the correlation fit (polyfit, subpix, corr, corr_cen)
+    """
+    # Same as np.correlate(arx, obj, 'same') row by row
+    corr = signal.fftconvolve(np.atleast_2d(arx_sky_flux), obj_sky_flux[:,::-1], mode='same', axes=1)
 
-    #Create array around the max of the correlation function for fitting for subpixel max
     # Restrict to pixels within maxshift of zero lag
-    lag0 = corr.size//2
-    #mxshft = settings.argflag['reduce']['flexure']['maxshift']
-    max_corr = np.argmax(corr[lag0-mxshft:lag0+mxshft]) + lag0-mxshft
-    subpix_grid = np.linspace(max_corr-3., max_corr+3., 7.)
-
-    #Fit a 2-degree polynomial to peak of correlation function
-    fit = utils.func_fit(subpix_grid, corr[subpix_grid.astype(np.int)], 'polynomial', 2)
-    max_fit = -0.5*fit[1]/fit[2]
-
-    #Calculate and apply shift in wavelength
-    shift = float(max_fit)-lag0
-    msgs.info("Flexure correction of {:g} pixels".format(shift))
-    #model = (fit[2]*(subpix_grid**2.))+(fit[1]*subpix_grid)+fit[0]
-
-    flex_dict = dict(polyfit=fit, shift=shift, subpix=subpix_grid,
-                     corr=corr[subpix_grid.astype(np.int)],
-                     sky_spec=obj_skyspec,
-                     arx_spec=arx_skyspec,
-                     corr_cen=corr.size/2, smooth=smooth_sig_pix)
-    # Return
-    return flex_dict
+    lag0 = corr.shape[1]//2
+    max_corr = np.argmax(corr[:,lag0-mxshft:lag0+mxshft], axis=1) + lag0-mxshft
+
+    shift = np.zeros(corr.shape[0])
+    flex_dicts = []
+    for iobj in range(corr.shape[0]):
+        #Create array around the max of the correlation function for fitting for subpixel max
+        subpix_grid = np.linspace(max_corr[iobj]-3., max_corr[iobj]+3., 7)
+        #Fit a 2-degree polynomial to peak of correlation function
+        fit = utils.func_fit(subpix_grid, corr[iobj,subpix_grid.astype(int)], 'polynomial', 2)
+        max_fit = -0.5*fit[1]/fit[2]
+        shift[iobj] = float(max_fit)-lag0
+        flex_dicts.append(dict(polyfit=fit, subpix=subpix_grid, corr=corr[iobj,subpix_grid.astype(int)],
+                               corr_cen=corr.shape[1]/2))
+    return shift, flex_dicts
+
+
+def flex_shift_batch(obj_skyspecs, arx_skyspec, mxshft=20, smooth_bin=None, sky_file=None):
+    """ Calculate the shifts between a set of object sky spectra and
+    the archive sky spectrum
+
+    The archive lines are measured once.  All object spectra are rebinned
+    onto the overlap grid of the first usable spectrum, the archive is
+    smoothed and rebinned once per resolution bin and all spectra are
+    cross-correlated with the archive in one pass.  The shifts are returned
+    in pixels of each object spectrum.
+
+    Parameters
+    ----------
+    obj_skyspecs : list
+      List of XSpectrum1D object sky spectra
+    arx_skyspec : XSpectrum1D
+      Archive sky spectrum
+    mxshft : int, optional
+      Maximum shift in pixels
+    smooth_bin : float, optional
+      Bin size (archive pixels) of the smoothing sigma used to share the
+      smoothed archive between objects.  If None, the archive is prepared
+      for the exact smoothing of each object.
+    sky_file : str, optional
+      File with the archive sky spectrum.  If provided, the prepared archive
+      spectra are cached (:func:`flex_archive_spec`) and a cached grid
+      within half a pixel of the objects' grid is reused.
+
+    Returns
+    -------
+    flex_dicts : list
+      dict with the flexure info for each object, None if the shift could not
+      be measured
+    """
+    nobj = len(obj_skyspecs)
+    flex_dicts = [None]*nobj
+    # Determine the brightest emission lines
+    msgs.warn("If we use Paranal, cut down on wavelength early on")
+    if sky_file is None:
+        arx_med_sig2, arx_res, arx_disp = flex_sky_lines(arx_skyspec)
+    else:
+        if sky_file not in _sky_lines:
+            _sky_lines[sky_file] = flex_sky_lines(arx_skyspec)
+        arx_med_sig2, arx_res, arx_disp = _sky_lines[sky_file]
+
+    # Common grid and object sky spectra
+    keep_wave = None
+    smooth = np.zeros(nobj)
+    obj_prep = {}
+    for iobj, obj_skyspec in enumerate(obj_skyspecs):
+        obj_med_sig2, obj_res, obj_disp = flex_sky_lines(obj_skyspec)
+        if not np.all(np.isfinite(obj_res)):
+            msgs.warn('Failed to measure the resolution of the object spectrum, likely due to error '
+                      'in the wavelength image.')
+            continue
+        msgs.info("Resolution of Archive={0} and Observation={1}".format(np.median(arx_res),
+                                                                         np.median(obj_res)))
+        if obj_med_sig2 >= arx_med_sig2:
+            smooth[iobj] = np.sqrt(obj_med_sig2-arx_med_sig2) / arx_disp  # pixels
+            if smooth_bin is not None:
+                smooth[iobj] = np.round(smooth[iobj]/smooth_bin)*smooth_bin
+        else:
+            msgs.warn("Prefer archival sky spectrum to have higher resolution")
+            msgs.warn("New Sky has higher resolution than Archive.  Not smoothing")
+
+        #Determine region of wavelength overlap
+        obj_keep_wave = flex_overlap(obj_skyspec, arx_skyspec)
+        if obj_keep_wave is None:
+            continue
+        if keep_wave is None:
+            keep_wave = obj_keep_wave if sky_file is None else flex_archive_grid(sky_file, obj_keep_wave)
+        obj_spec, obj_flux = flex_prep_spec(obj_skyspec, keep_wave)
+        if obj_spec is not None:
+            obj_prep[iobj] = (obj_spec, obj_flux)
+    if len(obj_prep) == 0:
+        return flex_dicts
+
+    # Archive, once per resolution bin
+    arx_prep = {}
+    for iobj in obj_prep.keys():
+        if smooth[iobj] in arx_prep:
+            continue
+        if sky_file is None:
+            arx_prep[smooth[iobj]] = flex_prep_spec(arx_skyspec, keep_wave, archive=True,
+                                                    smooth_sig_pix=smooth[iobj])
+        else:
+            arx_prep[smooth[iobj]] = flex_archive_spec(sky_file, arx_skyspec, keep_wave, smooth[iobj])
+    good = [iobj for iobj in obj_prep.keys() if arx_prep[smooth[iobj]][0] is not None]
+    if len(good) == 0:
+        return flex_dicts
+
+    # Cross correlation of spectra
+    arx_sky_flux = np.array([arx_prep[smooth[iobj]][1] for iobj in good])
+    obj_sky_flux = np.array([obj_prep[iobj][1] for iobj in good])
+    shift, xcorr_dicts = flex_xcorr(arx_sky_flux, obj_sky_flux, mxshft=mxshft)
+
+    # Convert the shifts to the pixels of each object spectrum
+    keep_disp = np.median(np.diff(keep_wave.value))
+    for ii, iobj in enumerate(good):
+        obj_wave = obj_skyspecs[iobj].wavelength.value
+        obj_disp = np.median(np.diff(obj_wave[(obj_wave >= keep_wave.value[0]) & (obj_wave <= keep_wave.value[-1])]))
+        flex_dicts[iobj] = xcorr_dicts[ii]
+        flex_dicts[iobj]['shift'] = shift[ii]*keep_disp/obj_disp
+        flex_dicts[iobj]['grid_shift'] = shift[ii]
+        flex_dicts[iobj]['sky_spec'] = obj_prep[iobj][0]
+        flex_dicts[iobj]['arx_spec'] = arx_prep[smooth[iobj]][0]
+        flex_dicts[iobj]['smooth'] = smooth[iobj]
+        msgs.info("Flexure correction of {:g} pixels".format(flex_dicts[iobj]['shift']))
+    return flex_dicts
+
+
+def flex_shift(obj_skyspec, arx_skyspec, mxshft=20):
+    """ Calculate shift between object sky spectrum and archive sky spectrum
+
+    Parameters
+    ----------
+    obj_skyspec
+    arx_skyspec
+
+    Returns
+    -------
+    flex_dict: dict
+      Contains flexure info
+    """
+    return flex_shift_batch([obj_skyspec], arx_skyspec, mxshft=mxshft)[0]
+
+
+def shift_wavelengths(wave, shift):
+    """ Shift wavelength arrays by a number of pixels
+
+    Linear interpolation in pixel space, extrapolated beyond the ends.
+
+    Parameters
+    ----------
+    wave : ndarray
+      Wavelengths, shape (nspec,) or (nobj, nspec)
+    shift : float or ndarray
+      Shift in pixels, one per row of wave
+
+    Returns
+    -------
+    new_wave : ndarray
+      Shifted wavelengths with the shape of wave
+    """
+    _wave = np.atleast_2d(wave)
+    npix = _wave.shape[1]
+    pix = np.arange(npix)[None,:] + np.atleast_1d(shift)[:,None]
+    ipix = np.clip(np.floor(pix).astype(int), 0, npix-2)
+    frac = pix - ipix
+    rows = np.arange(_wave.shape[0])[:,None]
+    new_wave = _wave[rows,ipix]*(1.-frac) + _wave[rows,ipix+1]*frac
+    return new_wave.reshape(np.shape(wave))
 
 
 '''
@@ -255,15 +463,21 @@ def flexure_slit():
 '''
 
 # TODO I don't see why maskslits is needed in these routine, since if the slits are masked in arms, they won't be extracted
-def flexure_obj(specobjs, maskslits, method, sky_file, mxshft=None):
+def flexure_obj(specobjs, maskslits, method, sky_file, mxshft=None, smooth_bin=0.1):
     """Correct wavelengths for flexure, object by object
 
+    The objects in each slit are measured together with
+    :func:`flex_shift_batch`.
+
     Parameters:
     ----------
     method : str
       'boxcar' -- Recommneded
       'slitpix' --
     sky_file: str
+    smooth_bin : float, optional
+      Bin size (archive pixels) of the smoothing sigma; objects in the same
+      bin share one smoothed archive spectrum
 
     Returns:
     ----------
@@ -296,50 +510,56 @@ def flexure_obj(specobjs, maskslits, method, sky_file, mxshft=None):
         if slit not in gdslits:
             flex_list.append(flex_dict.copy())
             continue
-        for specobj in this_specobjs:
-            if specobj is None:
-                continue
-            msgs.info("Working on flexure for object # {:d}".format(specobj.objid) + "in slit # {:d}".format(specobj.slitid))
-            # Using boxcar
-            if method in ['boxcar', 'slitcen']:
-                sky_wave = specobj.boxcar['WAVE'] #.to('AA').value
-                sky_flux = specobj.boxcar['COUNTS_SKY']
-            else:
-                msgs.error("Not ready for this flexure method: {}".format(method))
-
-            # Generate 1D spectrum for object
-            obj_sky = xspectrum1d.XSpectrum1D.from_tuple((sky_wave, sky_flux))
-
-            # Calculate the shift
-            fdict = flex_shift(obj_sky, sky_spectrum, mxshft=mxshft)
-            if fdict is None:
+        this_specobjs = [specobj for specobj in this_specobjs if specobj is not None]
+        if len(this_specobjs) == 0:
+            flex_list.append(flex_dict.copy())
+            continue
+        msgs.info("Working on flexure for {:d} object(s) in slit # {:d}".format(len(this_specobjs), slit))
+        # Using boxcar
+        if method not in ['boxcar', 'slitcen']:
+            msgs.error("Not ready for this flexure method: {}".format(method))
+        sky_wave = [units.Quantity(specobj.boxcar['WAVE'], units.AA).value for specobj in this_specobjs]
+        # Generate 1D spectra for the objects
+        obj_sky = [xspectrum1d.XSpectrum1D.from_tuple((wave, specobj.boxcar['COUNTS_SKY']))
+                        for wave, specobj in zip(sky_wave, this_specobjs)]
+
+        # Calculate the shifts
+        fdicts = flex_shift_batch(obj_sky, sky_spectrum, mxshft=mxshft, smooth_bin=smooth_bin,
+                                  sky_file=sky_file)
+        for iobj in range(len(this_specobjs)):
+            if fdicts[iobj] is None:
                 msgs.warn("Flexure shift calculation failed for this spectrum.")
                 if sv_fdict is not None:
                     msgs.warn("Will used saved estimate from a previous slit/object")
-                    fdict = copy.deepcopy(sv_fdict)
+                    fdicts[iobj] = copy.deepcopy(sv_fdict)
                 else:
                     msgs.warn("No previous good solution.  Punting on this object")
-                    continue
             else:
-                sv_fdict = copy.deepcopy(fdict)
+                sv_fdict = fdicts[iobj]
+        apply = [iobj for iobj in range(len(this_specobjs)) if fdicts[iobj] is not None]
+        if len(apply) == 0:
+            flex_list.append(flex_dict.copy())
+            continue
 
-            # Simple interpolation to apply
-            npix = len(sky_wave)
-            x = np.linspace(0., 1., npix)
-            # Apply
+        # Apply, to all objects of the slit at once
+        shift = np.array([fdicts[iobj]['shift'] for iobj in apply])
+        if np.all([sky_wave[iobj].size == sky_wave[apply[0]].size for iobj in apply]):
+            new_wave = shift_wavelengths(np.array([sky_wave[iobj] for iobj in apply]), shift)
+        else:
+            new_wave = [shift_wavelengths(sky_wave[iobj], shift[ii]) for ii, iobj in enumerate(apply)]
+        for ii, iobj in enumerate(apply):
+            specobj = this_specobjs[iobj]
+            fdict = fdicts[iobj]
             for attr in ['boxcar', 'optimal']:
                 if not hasattr(specobj, attr):
                     continue
                 if 'WAVE' in getattr(specobj, attr).keys():
                     msgs.info("Applying flexure correction to {0:s} extraction for object:".format(attr) +
                               msgs.newline() + "{0:s}".format(str(specobj)))
-                    f = interpolate.interp1d(x, sky_wave, bounds_error=False, fill_value="extrapolate")
-                    getattr(specobj, attr)['WAVE'] = f(x+fdict['shift']/(npix-1))*units.AA
+                    getattr(specobj, attr)['WAVE'] = new_wave[ii]*units.AA
             # Shift sky spec too
             cut_sky = fdict['sky_spec']
-            x = np.linspace(0., 1., cut_sky.npix)
-            f = interpolate.interp1d(x, cut_sky.wavelength.value, bounds_error=False, fill_value="extrapolate")
-            twave = f(x + fdict['shift']/(cut_sky.npix-1))*units.AA
+            twave = shift_wavelengths(cut_sky.wavelength.value, fdict['grid_shift'])*units.AA
             new_sky = xspectrum1d.XSpectrum1D.from_tuple((twave, cut_sky.flux))
 
             # Update dict
@@ -436,10 +656,19 @@ def geomotion_calculate(radec, time, longitude, latitude, elevation, refframe):
     Correct the wavelength calibration solution to the desired reference frame
     """
 
+    # The same exposure is corrected once per detector
+    key = (radec.frame.name, float(radec.ra.deg), float(radec.dec.deg), time.format, float(time.value),
+           longitude, latitude, elevation, refframe)
+    if key in _geomotion_vel:
+        _geomotion_vel.move_to_end(key)
+        return _geomotion_vel[key]
     # Time
     loc = (longitude * units.deg, latitude * units.deg, elevation * units.m,)
     obstime = Time(time.value, format=time.format, scale='utc', location=loc)
-    return geomotion_velocity(obstime, radec, frame=refframe)
+    _geomotion_vel[key] = geomotion_velocity(obstime, radec, frame=refframe)
+    while len(_geomotion_vel) > GEOMOTION_CACHE_SIZE:
+        _geomotion_vel.popitem(last=False)
+    return _geomotion_vel[key]
 
 
 def geomotion_correct(specObjs, radec, time, maskslits, longitude, latitude,
@@ -472,23 +701,25 @@ def geomotion_correct(specObjs, radec, time, maskslits, longitude, latitude,
     vel_corr = np.sqrt((1. + vel/299792.458) / (1. - vel/299792.458))
 
     gdslits = np.where(~maskslits)[0]
-    # Loop on slits to apply
-    for slit in gdslits:
-        indx = (specObjs.slitid-1) == slit
-        this_specobjs = specObjs[indx]
-        # Loop on objects
-        for specobj in this_specobjs:
-            if specobj is None:
-                continue
-            # Loop on extraction methods
-            for attr in ['boxcar', 'optimal']:
-                if not hasattr(specobj, attr):
-                    continue
-                if 'WAVE' in getattr(specobj, attr).keys():
-                    msgs.info('Applying {0} correction to '.format(refframe)
-                              + '{0} extraction for object:'.format(attr)
-                              + msgs.newline() + "{0}".format(str(specobj)))
-                    getattr(specobj, attr)['WAVE'] = getattr(specobj, attr)['WAVE'] * vel_corr
+    # Collect the extractions of all the objects on good slits
+    extracts = []
+    for specobj in specObjs.specobjs[np.isin(specObjs.slitid-1, gdslits)]:
+        if specobj is None:
+            continue
+        # Loop on extraction methods
+        for attr in ['boxcar', 'optimal']:
+            if hasattr(specobj, attr) and 'WAVE' in getattr(specobj, attr).keys():
+                extracts.append(getattr(specobj, attr))
+    if len(extracts) == 0:
+        return vel, vel_corr
+    msgs.info('Applying {0} correction to {1} extractions'.format(refframe, len(extracts)))
+    # Rescale all the wavelength arrays at once
+    waves = [extract['WAVE'] for extract in extracts]
+    new_waves = np.split(np.concatenate([np.asarray(getattr(w, 'value', w), dtype=float).ravel() for w in waves])
+                         * vel_corr, np.cumsum([np.size(w) for w in waves])[:-1])
+    for extract, w, new_w in zip(extracts, waves, new_waves):
+        new_w = new_w.reshape(np.shape(w))
+        extract['WAVE'] = new_w * w.unit if isinstance(w, units.Quantity) else new_w
     # Return
     return vel, vel_corr  # Mainly for debugging
 
@@ -599,6 +830,10 @@ def flexure_qa(specobjs, maskslits, basename, det, flex_list,
                slit_cen=False, out_dir=None):
     """ QA on flexure measurement
 
+    The plots of each slit are passed to the QA queue (see
+    :func:`pypeit.core.qa.submit_qa`), and are thus rendered in the
+    background if it is running.
+
     Parameters
     ----------
     det
@@ -611,136 +846,174 @@ def flexure_qa(specobjs, maskslits, basename, det, flex_list,
     -------
 
     """
-    plt.rcdefaults()
-    plt.rcParams['font.family']= 'times new roman'
+    for qa_dict in flexure_qa_products(specobjs, maskslits, flex_list, slit_cen=slit_cen):
+        qa.submit_qa(flexure_qa_slit, qa_dict, basename, det, out_dir=out_dir)
 
-    # Grab the named of the method
-    method = inspect.stack()[0][3]
-    #
-    gdslits = np.where(np.invert(maskslits))[0]
 
-    # Loop over slits, and then over objects here
+def flexure_qa_products(specobjs, maskslits, flex_list, slit_cen=False):
+    """
+    Collect the data plotted by the flexure QA of each slit
+
+    Parameters
+    ----------
+    specobjs : SpecObjs
+    maskslits : ndarray
+    flex_list : list
+      list of dict containing flexure results
+    slit_cen : bool, optional
+      QA on slit center instead of objects
+
+    Returns
+    -------
+    qa_list : list
+      One dict of plain arrays per slit with objects, see :func:`flexure_qa_slit`
+    """
+    qa_list = []
+    gdslits = np.where(np.invert(maskslits))[0]
     for slit in gdslits:
         indx = specobjs.slitid == slit
+        if np.sum(indx) == 0:
+            continue
         this_specobjs = specobjs[indx]
         this_flex_dict = flex_list[slit]
-
-        # Setup
-        if slit_cen:
-            nobj = 1
-            ncol = 1
-        else:
-            nobj = np.sum(indx)
-            ncol = min(3, nobj)
-        #
-        if nobj == 0:
+        # Objects to plot; the index in the flexure lists and their name
+        objs = [(iobj, specobj.idx) for iobj, specobj in enumerate(this_specobjs)
+                    if specobj is not None and iobj < len(this_flex_dict['shift'])]
+        if len(objs) == 0:
             continue
-        nrow = nobj // ncol + ((nobj % ncol) > 0)
-        # Outfile, one QA file per slit
-        outfile = qa.set_qa_filename(basename, method + '_corr', det=det,slit=(slit + 1), out_dir=out_dir)
-        plt.figure(figsize=(8, 5.0))
-        plt.clf()
-        gs = gridspec.GridSpec(nrow, ncol)
-        for iobj, specobj in enumerate(this_specobjs):
-            if specobj is None:
-                continue
-            # Correlation QA
-            ax = plt.subplot(gs[iobj//ncol, iobj % ncol])
-            # Fit
-            fit = this_flex_dict['polyfit'][iobj]
-            xval = np.linspace(-10., 10, 100) + this_flex_dict['corr_cen'][iobj] #+ flex_dict['shift'][o]
-            #model = (fit[2]*(xval**2.))+(fit[1]*xval)+fit[0]
-            model = utils.func_val(fit, xval, 'polynomial')
-            mxmod = np.max(model)
-            ylim = [np.min(model/mxmod), 1.3]
-            ax.plot(xval-this_flex_dict['corr_cen'][iobj], model/mxmod, 'k-')
-            # Measurements
-            ax.scatter(this_flex_dict['subpix'][iobj]-this_flex_dict['corr_cen'][iobj],
-                       this_flex_dict['corr'][iobj]/mxmod, marker='o')
-            # Final shift
-            ax.plot([this_flex_dict['shift'][iobj]]*2, ylim, 'g:')
-            # Label
-            if slit_cen:
-                ax.text(0.5, 0.25, 'Slit Center', transform=ax.transAxes, size='large', ha='center')
-            else:
-                ax.text(0.5, 0.25, '{:s}'.format(specobj.idx), transform=ax.transAxes, size='large', ha='center')
-            ax.text(0.5, 0.15, 'flex_shift = {:g}'.format(this_flex_dict['shift'][iobj]),
-                    transform=ax.transAxes, size='large', ha='center')#, bbox={'facecolor':'white'})
-            # Axes
-            ax.set_ylim(ylim)
-            ax.set_xlabel('Lag')
-        # Finish
-        plt.tight_layout(pad=0.2, h_pad=0.0, w_pad=0.0)
-        plt.savefig(outfile, dpi=400)
-        plt.close()
-
-        # Sky line QA (just one object)
         if slit_cen:
-            iobj = 0
-        else:
-            iobj = 0
-            specobj = this_specobjs[iobj]
+            objs = objs[:1]
+        qa_dict = dict(slit=slit, slit_cen=slit_cen, iobj=[iobj for iobj, _ in objs],
+                       name=[name for _, name in objs], nobj=1 if slit_cen else int(np.sum(indx)),
+                       sky_name=None if slit_cen else this_specobjs[0].idx)
+        for key in ['polyfit', 'corr_cen', 'subpix', 'corr', 'shift']:
+            qa_dict[key] = [this_flex_dict[key][iobj] for iobj, _ in objs]
+        # Sky line QA (just one object)
+        for key in ['sky_spec', 'arx_spec']:
+            qa_dict[key] = (this_flex_dict[key][0].wavelength.to(units.AA).value,
+                            np.asarray(this_flex_dict[key][0].flux))
+        qa_list.append(qa_dict)
+    return qa_list
 
-        sky_spec = this_flex_dict['sky_spec'][iobj]
-        arx_spec = this_flex_dict['arx_spec'][iobj]
 
-        # Sky lines
-        sky_lines = np.array([3370.0, 3914.0, 4046.56, 4358.34, 5577.338, 6300.304,
-                              7340.885, 7993.332, 8430.174, 8919.610, 9439.660,
-                              10013.99, 10372.88])*units.AA
-        dwv = 20.*units.AA
-        gdsky = np.where((sky_lines > sky_spec.wvmin) & (sky_lines < sky_spec.wvmax))[0]
-        if len(gdsky) == 0:
-            msgs.warn("No sky lines for Flexure QA")
-            return
-        if len(gdsky) > 6:
-            idx = np.array([0, 1, len(gdsky)//2, len(gdsky)//2+1, -2, -1])
-            gdsky = gdsky[idx]
+def flexure_qa_slit(qa_dict, basename, det, out_dir=None):
+    """
+    Plot the flexure QA of one slit
 
-        # Outfile
-        outfile = qa.set_qa_filename(basename, method+'_sky', det=det,slit=(slit + 1), out_dir=out_dir)
-        # Figure
-        plt.figure(figsize=(8, 5.0))
-        plt.clf()
-        nrow, ncol = 2, 3
-        gs = gridspec.GridSpec(nrow, ncol)
+    Parameters
+    ----------
+    qa_dict : dict
+      Data to plot, from :func:`flexure_qa_products`
+    basename : str
+    det : int
+    out_dir : str, optional
+    """
+    plt.rcdefaults()
+    plt.rcParams['font.family']= 'times new roman'
+
+    method = 'flexure_qa'
+    slit = qa_dict['slit']
+    slit_cen = qa_dict['slit_cen']
+
+    # Setup
+    nobj = qa_dict['nobj']
+    ncol = 1 if slit_cen else min(3, nobj)
+    nrow = nobj // ncol + ((nobj % ncol) > 0)
+    # Outfile, one QA file per slit
+    outfile = qa.set_qa_filename(basename, method + '_corr', det=det,slit=(slit + 1), out_dir=out_dir)
+    plt.figure(figsize=(8, 5.0))
+    plt.clf()
+    gs = gridspec.GridSpec(nrow, ncol)
+    for ii, iobj in enumerate(qa_dict['iobj']):
+        # Correlation QA
+        ax = plt.subplot(gs[iobj//ncol, iobj % ncol])
+        # Fit
+        fit = qa_dict['polyfit'][ii]
+        xval = np.linspace(-10., 10, 100) + qa_dict['corr_cen'][ii] #+ flex_dict['shift'][o]
+        #model = (fit[2]*(xval**2.))+(fit[1]*xval)+fit[0]
+        model = utils.func_val(fit, xval, 'polynomial')
+        mxmod = np.max(model)
+        ylim = [np.min(model/mxmod), 1.3]
+        ax.plot(xval-qa_dict['corr_cen'][ii], model/mxmod, 'k-')
+        # Measurements
+        ax.scatter(qa_dict['subpix'][ii]-qa_dict['corr_cen'][ii],
+                   qa_dict['corr'][ii]/mxmod, marker='o')
+        # Final shift
+        ax.plot([qa_dict['shift'][ii]]*2, ylim, 'g:')
+        # Label
         if slit_cen:
-            plt.suptitle('Sky Comparison for Slit Center', y=1.05)
+            ax.text(0.5, 0.25, 'Slit Center', transform=ax.transAxes, size='large', ha='center')
         else:
-            plt.suptitle('Sky Comparison for {:s}'.format(specobj.idx), y=1.05)
-
-        for ii, igdsky in enumerate(gdsky):
-            skyline = sky_lines[igdsky]
-            ax = plt.subplot(gs[ii//ncol, ii % ncol])
-            # Norm
-            pix = np.where(np.abs(sky_spec.wavelength-skyline) < dwv)[0]
-            f1 = np.sum(sky_spec.flux[pix])
-            f2 = np.sum(arx_spec.flux[pix])
-            norm = f1/f2
-            # Plot
-            ax.plot(sky_spec.wavelength[pix], sky_spec.flux[pix], 'k-', label='Obj',
-                    drawstyle='steps-mid')
-            pix2 = np.where(np.abs(arx_spec.wavelength-skyline) < dwv)[0]
-            ax.plot(arx_spec.wavelength[pix2], arx_spec.flux[pix2]*norm, 'r-', label='Arx',
-                    drawstyle='steps-mid')
-            # Axes
-            ax.xaxis.set_major_locator(plt.MultipleLocator(dwv.value))
-            ax.set_xlabel('Wavelength')
-            ax.set_ylabel('Counts')
-
-        # Legend
-        plt.legend(loc='upper left', scatterpoints=1, borderpad=0.3,
-                   handletextpad=0.3, fontsize='small', numpoints=1)
-
-        # Finish
-        plt.savefig(outfile, dpi=400)
-        plt.close()
-        #plt.close()
+            ax.text(0.5, 0.25, '{:s}'.format(qa_dict['name'][ii]), transform=ax.transAxes, size='large', ha='center')
+        ax.text(0.5, 0.15, 'flex_shift = {:g}'.format(qa_dict['shift'][ii]),
+                transform=ax.transAxes, size='large', ha='center')#, bbox={'facecolor':'white'})
+        # Axes
+        ax.set_ylim(ylim)
+        ax.set_xlabel('Lag')
+    # Finish
+    plt.tight_layout(pad=0.2, h_pad=0.0, w_pad=0.0)
+    plt.savefig(outfile, dpi=400)
+    plt.close()
+
+    # Sky line QA (just one object)
+    sky_wave, sky_flux = qa_dict['sky_spec']
+    arx_wave, arx_flux = qa_dict['arx_spec']
+
+    # Sky lines
+    sky_lines = np.array([3370.0, 3914.0, 4046.56, 4358.34, 5577.338, 6300.304,
+                          7340.885, 7993.332, 8430.174, 8919.610, 9439.660,
+                          10013.99, 10372.88])
+    dwv = 20.
+    gdsky = np.where((sky_lines > np.min(sky_wave)) & (sky_lines < np.max(sky_wave)))[0]
+    if len(gdsky) == 0:
+        msgs.warn("No sky lines for Flexure QA")
+        plt.rcdefaults()
+        return
+    if len(gdsky) > 6:
+        idx = np.array([0, 1, len(gdsky)//2, len(gdsky)//2+1, -2, -1])
+        gdsky = gdsky[idx]
+
+    # Outfile
+    outfile = qa.set_qa_filename(basename, method+'_sky', det=det,slit=(slit + 1), out_dir=out_dir)
+    # Figure
+    plt.figure(figsize=(8, 5.0))
+    plt.clf()
+    nrow, ncol = 2, 3
+    gs = gridspec.GridSpec(nrow, ncol)
+    if slit_cen:
+        plt.suptitle('Sky Comparison for Slit Center', y=1.05)
+    else:
+        plt.suptitle('Sky Comparison for {:s}'.format(qa_dict['sky_name']), y=1.05)
+
+    for ii, igdsky in enumerate(gdsky):
+        skyline = sky_lines[igdsky]
+        ax = plt.subplot(gs[ii//ncol, ii % ncol])
+        # Norm
+        pix = np.where(np.abs(sky_wave-skyline) < dwv)[0]
+        f1 = np.sum(sky_flux[pix])
+        f2 = np.sum(arx_flux[pix])
+        norm = f1/f2
+        # Plot
+        ax.plot(sky_wave[pix], sky_flux[pix], 'k-', label='Obj',
+                drawstyle='steps-mid')
+        pix2 = np.where(np.abs(arx_wave-skyline) < dwv)[0]
+        ax.plot(arx_wave[pix2], arx_flux[pix2]*norm, 'r-', label='Arx',
+                drawstyle='steps-mid')
+        # Axes
+        ax.xaxis.set_major_locator(plt.MultipleLocator(dwv))
+        ax.set_xlabel('Wavelength')
+        ax.set_ylabel('Counts')
+
+    # Legend
+    plt.legend(loc='upper left', scatterpoints=1, borderpad=0.3,
+               handletextpad=0.3, fontsize='small', numpoints=1)
+
+    # Finish
+    plt.savefig(outfile, dpi=400)
+    plt.close()
 
     plt.rcdefaults()
 
-    return
-
 
 def flexure_qa_oldbuggyversion(specobjs, maskslits, basename, det, flex_list, slit_cen=False):
     """ QA on flexure measurement
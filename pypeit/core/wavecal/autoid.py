@@ -1,6 +1,5 @@
 """ Module for finding patterns in arc line spectra
 """
-from scipy.ndimage.filters import gaussian_filter
 from scipy.spatial import cKDTree
 import itertools
 import scipy
@@ -129,6 +128,9 @@ def arc_fit_qa(fit, outfile=None, ids_only=False, title=None):
     dwv_pix = np.median(np.abs(wave_soln-np.roll(wave_soln,1)))
     ax_fit.text(0.1*len(arc_spec), 0.90*ymin+(ymax-ymin),r'$\Delta\lambda$={:.3f}$\AA$ (per pix)'.format(dwv_pix), size='small')
     ax_fit.text(0.1*len(arc_spec), 0.80*ymin+(ymax-ymin),'RMS={:.3f} (pixels)'.format(rms/dwv_pix), size='small')
+    if 'recall_arxiv' in fit.keys():
+        ax_fit.text(0.1*len(arc_spec), 0.70*ymin+(ymax-ymin),'Arxiv candidates={:d}, recall={:.2f}'.format(
+            fit['ncand_arxiv'], fit['recall_arxiv']), size='small')
     # Arc Residuals
     ax_res = plt.subplot(gs[1,1])
     res = wave_fit-wave_soln_fit
@@ -516,8 +518,10 @@ def semi_brute(spec, lines, wv_cen, disp, sigdetect=30., nonlinear_counts = 1e10
     return best_dict, final_fit
 
 
-def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, det_arxiv = None, detections=None, cc_thresh=0.8,cc_local_thresh = 0.8,
-               match_toler=2.0, nlocal_cc=11, nonlinear_counts=1e10,sigdetect=5.0,fwhm=4.0, debug_xcorr=False, debug_reid=False, debug_peaks = False):
+def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, det_arxiv = None, detections=None,
+               spec_cont_sub=None, cc_thresh=0.8,cc_local_thresh = 0.8,
+               match_toler=2.0, nlocal_cc=11, nonlinear_counts=1e10,sigdetect=5.0,fwhm=4.0, shift_mnmx=(-0.05,0.05),
+               stretch_mnmx=(0.95,1.05), debug_xcorr=False, debug_reid=False, debug_peaks = False):
     """ Determine  a wavelength solution for a set of spectra based on archival wavelength solutions
 
     Parameters
@@ -535,7 +539,8 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
                 an ndarray of size determined by the number of lines that were detected.
 
        Arc line pixel locations in the spec_arxiv spectra that were used in combination with line identifications from the
-       line list to determine the wavelength solution wave_soln_arxiv.
+       line list to determine the wavelength solution wave_soln_arxiv. If None, the lines are detected in each
+       arxiv spectrum on every call; pass the 'det_arxiv' entry of waveio.load_reid_arxiv_products to avoid this.
 
     line_list: astropy table
        The arc line list used for thew wavelength solution in pypeit format.
@@ -553,6 +558,10 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
        An array containing the pixel centroids of the lines in the arc as computed by the pypeit.core.arc.detect_lines
        code. If this is set to None, the line detection will be run inside the code.
 
+    spec_cont_sub: float ndarray, default = None
+       The continuum subtracted arc, as returned by wvutils.arc_lines_from_spec with the same detection parameters.
+       If both detections and spec_cont_sub are set, the line detection is not run again inside the code.
+
     cc_thresh: float, default = 0.8
        Threshold for the *global* cross-correlation coefficient between an input spectrum and member of the archive required to
        attempt reidentification. Spectra from the archive with a lower cross-correlation are not used for reidentification
@@ -573,6 +582,13 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
        Size of pixel window used for local cross-correlation computation for each arc line. If not an odd number one will
        be added to it to make it odd.
 
+    shift_mnmx: tuple of floats, default = (-0.05,0.05)
+       Range, as a fraction of nspec, to search for the shift about the initial cross-correlation shift.
+       See wvutils.xcorr_shift_stretch
+
+    stretch_mnmx: tuple of floats, default = (0.95,1.05)
+       Range to search for the stretch. See wvutils.xcorr_shift_stretch
+
 
     debug_xcorr: bool, default = False
        Show plots useful for debugging the cross-correlation used for shift/stretch computation
@@ -641,26 +657,20 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
     if nspec_arxiv != nspec:
         msgs.error('Spectrum sizes do not match. Something is very wrong!')
 
-    # Search for lines no matter what to continuum subtract the input arc
-    tcent, ecent, cut_tcent, icut, spec_cont_sub = wvutils.arc_lines_from_spec(
-        spec, sigdetect=sigdetect,nonlinear_counts=nonlinear_counts, fwhm = fwhm, debug = debug_peaks)
-    # If the detections were not passed in measure them
-    if detections is None:
-        detections = tcent[icut]
-
-    spec_arxiv_cont_sub = np.zeros_like(spec_arxiv)
-
-    # Search for lines no matter what to continuum subtract the arxiv arc, also determine the central wavelength and
-    # dispersion of wavelength arxiv
-    det_arxiv1 = {}
-    for iarxiv in range(narxiv):
-        tcent_arxiv, ecent_arxiv, cut_tcent_arxiv, icut_arxiv, spec_cont_sub_now = wvutils.arc_lines_from_spec(
-            spec_arxiv[:,iarxiv], sigdetect=sigdetect,nonlinear_counts=nonlinear_counts, fwhm = fwhm, debug = debug_peaks)
-        spec_arxiv_cont_sub[:,iarxiv] = spec_cont_sub_now
-        det_arxiv1[str(iarxiv)] = tcent_arxiv[icut_arxiv]
+    # Search for lines to continuum subtract the input arc, unless this was already done
+    if detections is None or spec_cont_sub is None:
+        tcent, ecent, cut_tcent, icut, spec_cont_sub = wvutils.arc_lines_from_spec(
+            spec, sigdetect=sigdetect,nonlinear_counts=nonlinear_counts, fwhm = fwhm, debug = debug_peaks)
+        # If the detections were not passed in measure them
+        if detections is None:
+            detections = tcent[icut]
 
+    # Detect lines in the arxiv arcs unless they were passed in, e.g. from the precomputed arxiv products
     if det_arxiv is None:
-        det_arxiv = det_arxiv1
+        _, det_arxiv = wvutils.arxiv_lines_from_spec(spec_arxiv, sigdetect=sigdetect, nonlinear_counts=nonlinear_counts,
+                                                     fwhm=fwhm, debug=debug_peaks)
+    elif len(det_arxiv) != narxiv:
+        msgs.error('det_arxiv must have one entry for each of the {:d} arxiv spectra'.format(narxiv))
 
     wvc_arxiv = np.zeros(narxiv, dtype=float)
     disp_arxiv = np.zeros(narxiv, dtype=float)
@@ -674,11 +684,15 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
     marker = itertools.cycle(marker_tuple)
     colors = itertools.cycle(color_tuple)
 
-    # Cross-correlate with each arxiv spectrum to identify lines
-    line_indx = np.array([], dtype=np.int)
-    det_indx = np.array([], dtype=np.int)
-    line_cc = np.array([], dtype=float)
-    line_iarxiv = np.array([], dtype=np.int)
+    # Cross-correlate with each arxiv spectrum to identify lines. Every detected line can be matched at most once per
+    # arxiv spectrum, so the matches are stored in preallocated arrays
+    nmatch_max = narxiv*detections.size
+    det_indx = np.zeros(nmatch_max, dtype=int)
+    line_wv = np.zeros(nmatch_max, dtype=float)
+    line_toler = np.zeros(nmatch_max, dtype=float)
+    line_cc = np.zeros(nmatch_max, dtype=float)
+    line_iarxiv = np.zeros(nmatch_max, dtype=int)
+    nmatch = 0
     wcen = np.zeros(narxiv)
     disp = np.zeros(narxiv)
     shift_vec = np.zeros(narxiv)
@@ -690,7 +704,7 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
         # Match the peaks between the two spectra. This code attempts to compute the stretch if cc > cc_thresh
         success, shift_vec[iarxiv], stretch_vec[iarxiv], ccorr_vec[iarxiv], _, _ = \
             wvutils.xcorr_shift_stretch(spec_cont_sub, spec_arxiv[:, iarxiv], cc_thresh=cc_thresh, fwhm = fwhm, seed = random_state,
-                                        debug=debug_xcorr)
+                                        shift_mnmx=shift_mnmx, stretch_mnmx=stretch_mnmx, debug=debug_xcorr)
         # If cc < cc_thresh or if this optimization failed, don't reidentify from this arxiv spectrum
         if success != 1:
             continue
@@ -745,27 +759,33 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
         corr_local[denom > 0] = prod_smooth[denom > 0]/denom[denom > 0]
         corr_local[denom == 0.0] = -1.0
 
-        # Loop over the current slit line pixel detections and find the nearest arxiv spectrum line
-        for iline in range(detections.size):
-            # match to pixel in shifted/stretch arxiv spectrum
-            pdiff = np.abs(detections[iline] - det_arxiv_ss)
-            bstpx = np.argmin(pdiff)
-            # If a match is found within 2 pixels, consider this a successful match
-            if pdiff[bstpx] < match_toler:
-                # Using the arxiv arc wavelength solution, search for the nearest line in the line list
-                bstwv = np.abs(wvdata - wvval_arxiv[bstpx])
-                # This is a good wavelength match if it is within match_toler disperion elements
-                if bstwv[np.argmin(bstwv)] < match_toler*disp_arxiv[iarxiv]:
-                    line_indx = np.append(line_indx, np.argmin(bstwv))  # index in the line list array wvdata of this match
-                    det_indx = np.append(det_indx, iline)             # index of this line in the detected line array detections
-                    line_cc = np.append(line_cc,np.interp(detections[iline],xrng,corr_local)) # local cross-correlation at this match
-                    line_iarxiv = np.append(line_iarxiv,iarxiv)
+        # Match each of the current slit line pixel detections to the nearest line in the shifted/stretched arxiv
+        # spectrum. If a match is found within match_toler pixels, consider this a successful match
+        bstpx, pdiff = wvutils.match_nearest(det_arxiv_ss, detections)
+        igood = np.where(pdiff < match_toler)[0]
+        nnew = igood.size
+        det_indx[nmatch:nmatch+nnew] = igood                  # index of this line in the detected line array detections
+        line_wv[nmatch:nmatch+nnew] = wvval_arxiv[bstpx[igood]]  # arxiv wavelength at this match
+        line_toler[nmatch:nmatch+nnew] = match_toler*disp_arxiv[iarxiv]
+        line_cc[nmatch:nmatch+nnew] = np.interp(detections[igood], xrng, corr_local) # local cross-correlation at this match
+        line_iarxiv[nmatch:nmatch+nnew] = iarxiv
+        nmatch += nnew
+
+    # For all matches at once, search for the nearest line in the line list to the arxiv wavelength. This is a good
+    # wavelength match if it is within match_toler dispersion elements
+    line_indx, wvdiff = wvutils.match_nearest(wvdata, line_wv[:nmatch])
+    igood = wvdiff < line_toler[:nmatch]
+    line_indx = line_indx[igood]                              # index in the line list array wvdata of this match
+    det_indx = det_indx[:nmatch][igood]
+    line_cc = line_cc[:nmatch][igood]
+    line_iarxiv = line_iarxiv[:nmatch][igood]
 
     narxiv_used = np.sum(wcen != 0.0)
     # Initialise the patterns dictionary, sigdetect not used anywhere
     if (narxiv_used == 0) or (len(np.unique(line_indx)) < 3):
         patt_dict_slit = patterns.empty_patt_dict(detections.size)
         patt_dict_slit['sigdetect'] = sigdetect
+        patt_dict_slit['narxiv_used'] = narxiv_used
         return detections, spec_cont_sub, patt_dict_slit
 
 
@@ -775,6 +795,7 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
     patt_dict_slit['bwv'] = np.median(wcen[wcen != 0.0])
     patt_dict_slit['bdisp'] = np.median(disp[disp != 0.0])
     patt_dict_slit['sigdetect'] = sigdetect
+    patt_dict_slit['narxiv_used'] = narxiv_used
 
 
 
@@ -810,8 +831,55 @@ def reidentify(spec, spec_arxiv_in, wave_soln_arxiv_in, line_list, nreid_min, de
     return detections, spec_cont_sub, patt_dict_slit
 
 
+def track_drift(spec, prev_fit, line_list, cc_thresh=0.9, drift_window=0.005, cc_local_thresh=0.7, nlocal_cc=11,
+                match_toler=2.0, func='legendre', n_first=2, sigrej_first=2.0, n_final=4, sigrej_final=3.0,
+                sigdetect=5.0, fwhm=4.0, nonlinear_counts=1e10):
+    """ Update the earlier wavelength solution of a slit for a small drift of its arc
+
+    The earlier arc spectrum and wavelength solution are used as a single
+    archive spectrum for reidentify(), with the shift/stretch search
+    restricted to +/- drift_window, and the reidentified lines are refit.
+    The line detections of the earlier solution are reused for the
+    earlier arc.
+
+    Parameters
+    ----------
+    spec : ndarray, shape (nspec,)
+      Arc spectrum of the slit
+    prev_fit : dict
+      Earlier solution of the slit, as generated by fitting.iterative_fitting
+    line_list : Table
+      Line list
+    cc_thresh : float, optional
+      Threshold for the cross-correlation coefficient between spec and the
+      earlier arc spectrum below which None is returned
+    drift_window : float, optional
+      The stretch is searched within 1 +/- drift_window and the shift within
+      +/- drift_window*nspec about the cross-correlation shift
+
+    The remaining parameters are those of reidentify() and fitting.fit_slit()
+
+    Returns
+    -------
+    final_fit : dict or None
+      The updated solution, or None if the drift could not be tracked
+    """
+    if prev_fit.get('spec') is None or prev_fit.get('wave_soln') is None or len(prev_fit['spec']) != spec.size:
+        return None
+    det_arxiv = None if prev_fit.get('tcent') is None else {'0': np.asarray(prev_fit['tcent'])}
+    detections, spec_cont_sub, patt_dict = \
+        reidentify(spec, np.asarray(prev_fit['spec']), np.asarray(prev_fit['wave_soln']), line_list, 1,
+                   det_arxiv=det_arxiv, cc_thresh=cc_thresh, cc_local_thresh=cc_local_thresh, match_toler=match_toler, nlocal_cc=nlocal_cc,
+                   nonlinear_counts=nonlinear_counts, sigdetect=sigdetect, fwhm=fwhm,
+                   shift_mnmx=(-drift_window, drift_window), stretch_mnmx=(1.0-drift_window, 1.0+drift_window))
+    if not patt_dict['acceptable']:
+        return None
+    return fitting.fit_slit(spec_cont_sub, patt_dict, detections, line_list, match_toler=match_toler, func=func,
+                            n_first=n_first, sigrej_first=sigrej_first, n_final=n_final, sigrej_final=sigrej_final)
+
+
 def full_template(spec, par, ok_mask, det, binspectral, nsnippet=2, debug_xcorr=False,
-                  x_percentile=50., template_dict=None, debug=False):
+                  x_percentile=50., template_dict=None, debug=False, nproc=1):
     """
     Method of wavelength calibration using a single, comprehensive template spectrum
 
@@ -839,6 +907,7 @@ def full_template(spec, par, ok_mask, det, binspectral, nsnippet=2, debug_xcorr=
         x_percentile: float, optional
           Passed to reidentify to reduce the dynamic range of arc line amplitudes
         template_dict (dict, optional): Dict containing tempmlate items, largely for development
+        nproc (int, optional): Number of worker threads used to process the slits
 
     Returns:
         wvcalib: dict
@@ -875,13 +944,8 @@ def full_template(spec, par, ok_mask, det, binspectral, nsnippet=2, debug_xcorr=
         nslits = 1
         spec = np.reshape(spec, (nspec,1))
 
-    # Loop on slits
-    wvcalib = {}
-    for slit in range(nslits):
-        # Check
-        if slit not in ok_mask:
-            wvcalib[str(slit)] = None
-            continue
+    def _template_slit(slit):
+        """Wavelength calibrate a single slit against the template"""
         msgs.info("Processing slit {}".format(slit))
         #
         ispec = spec[:,slit]
@@ -952,8 +1016,7 @@ def full_template(spec, par, ok_mask, det, binspectral, nsnippet=2, debug_xcorr=
         gd_det = np.where(IDs > 0.)[0]
         if len(gd_det) < 4:
             msgs.warn("Not enough useful IDs")
-            wvcalib[str(slit)] = None
-            continue
+            return None
         # Fit
         try:
             final_fit = fitting.iterative_fitting(ispec, dets, gd_det,
@@ -965,9 +1028,15 @@ def full_template(spec, par, ok_mask, det, binspectral, nsnippet=2, debug_xcorr=
                                               sigrej_first=par['sigrej_first'],
                                               sigrej_final=par['sigrej_final'])
         except TypeError:
-            wvcalib[str(slit)] = None
-        else:
-            wvcalib[str(slit)] = copy.deepcopy(final_fit)
+            return None
+        return copy.deepcopy(final_fit)
+
+    # Loop on slits.  The slits are independent, so they are processed in parallel when nproc > 1 and the
+    # results are collected in slit order.
+    gdslits = [slit for slit in range(nslits) if slit in ok_mask]
+    fits = utils.parallel_map(_template_slit, [(slit,) for slit in gdslits], nproc=1 if debug else nproc)
+    wvcalib = {str(slit): None for slit in range(nslits)}
+    wvcalib.update({str(slit): final_fit for slit, final_fit in zip(gdslits, fits)})
     # Finish
     return wvcalib
 
@@ -1091,6 +1160,7 @@ class ArchiveReid:
         # Paramaters that govern reidentification
         self.reid_arxiv = self.par['reid_arxiv']
         self.nreid_min = self.par['nreid_min']
+        self.ncand_arxiv = self.par['ncand_arxiv']
         self.nlocal_cc = self.par['nlocal_cc']
         self.cc_thresh = self.par['cc_thresh']
         self.cc_local_thresh = self.par['cc_local_thresh']
@@ -1152,60 +1222,121 @@ class ArchiveReid:
         self.detections = {}
         self.wv_calib = {}
         self.bad_slits = np.array([], dtype=np.int)
-        # Reidentify each slit, and perform a fit
-        for slit in range(self.nslits):
-            # ToDO should we still be populating wave_calib with an empty dict here?
-            if slit not in self.ok_mask:
-                continue
-            msgs.info('Reidentifying and fitting slit # {0:d}/{1:d}'.format(slit,self.nslits-1))
-            # If this is a fixed format echelle, arxiv has exactly the same orders as the data and so
-            # we only pass in the relevant arxiv spectrum to make this much faster
-            ind_sp = slit if self.ech_fix_format else np.arange(narxiv,dtype=int)
-
-            sigdetect = self._parse_param(self.par, 'sigdetect', slit)
-            cc_thresh = self._parse_param(self.par, 'cc_thresh', slit)
-            self.detections[str(slit)], self.spec_cont_sub[:,slit], self.all_patt_dict[str(slit)] = \
-                reidentify(self.spec[:,slit], self.spec_arxiv[:,ind_sp], self.wave_soln_arxiv[:,ind_sp],
-                           self.tot_line_list, self.nreid_min, cc_thresh=cc_thresh, match_toler=self.match_toler,
-                           cc_local_thresh=self.cc_local_thresh, nlocal_cc=self.nlocal_cc, nonlinear_counts=self.nonlinear_counts,
-                           sigdetect=sigdetect, fwhm = self.fwhm, debug_peaks = self.debug_peaks, debug_xcorr=self.debug_xcorr,
-                           debug_reid = self.debug_reid)
-            # Check if an acceptable reidentification solution was found
-            if not self.all_patt_dict[str(slit)]['acceptable']:
-                self.wv_calib[str(slit)] = {}
+        self.narxiv = narxiv
+
+        # Compute the arxiv products up front for all the detection thresholds in use, so that the slits only
+        # read them
+        gdslits = [slit for slit in range(self.nslits) if slit in self.ok_mask]
+        for sigdetect in {self._parse_param(self.par, 'sigdetect', slit) for slit in gdslits}:
+            arxiv_products = waveio.load_reid_arxiv_products(self.reid_arxiv, self.spec.shape[0], sigdetect=sigdetect,
+                                                             fwhm=self.fwhm, nonlinear_counts=self.nonlinear_counts,
+                                                             wv_calib_arxiv=self.wv_calib_arxiv)
+            if self.ncand_arxiv is not None and 'fingerprint' not in arxiv_products.keys():
+                arxiv_products['fingerprint'] = wvutils.arc_fingerprint(arxiv_products['spec_cont_sub'])
+
+        # Reidentify each slit, and perform a fit. The slits are independent, so they are processed in parallel
+        # when nproc > 1, and the results are collected in slit order.
+        debug = self.debug_peaks or self.debug_xcorr or self.debug_reid or self.debug_fits
+        nproc = 1 if debug else self.par['nproc']
+        for slit, (detections, spec_cont_sub, patt_dict, final_fit, bad) \
+                in zip(gdslits, utils.parallel_map(self._reidentify_slit, [(slit,) for slit in gdslits], nproc=nproc)):
+            self.detections[str(slit)] = detections
+            self.spec_cont_sub[:,slit] = spec_cont_sub
+            self.all_patt_dict[str(slit)] = patt_dict
+            self.wv_calib[str(slit)] = final_fit
+            if bad:
                 self.bad_slits = np.append(self.bad_slits, slit)
-                continue
-            # Perform the fit
+            if self.debug_fits and final_fit:
+                arc_fit_qa(final_fit)
 
-            n_final = self._parse_param(self.par, 'n_final', slit)
-            final_fit = fitting.fit_slit(self.spec_cont_sub[:, slit], self.all_patt_dict[str(slit)], self.detections[str(slit)],
-                                         self.tot_line_list, match_toler=self.match_toler,func=self.func, n_first=self.n_first,
-                                         sigrej_first=self.sigrej_first, n_final=n_final,sigrej_final=self.sigrej_final)
+        # Print the final report of all lines
+        self.report_final()
 
-            # Did the fit succeed?
-            if final_fit is None:
-                # This pattern wasn't good enough
-                self.wv_calib[str(slit)] = {}
-                self.bad_slits = np.append(self.bad_slits, slit)
-                continue
-            # Is the RMS below the threshold?
-            rms_threshold = self._parse_param(self.par, 'rms_threshold', slit)
-            if final_fit['rms'] > rms_threshold:
-                msgs.warn('---------------------------------------------------' + msgs.newline() +
-                          'Reidentify report for slit {0:d}/{1:d}:'.format(slit, self.nslits-1) + msgs.newline() +
-                          '  Poor RMS ({0:.3f})! Need to add additional spectra to arxiv to improve fits'.format(
-                              final_fit['rms']) + msgs.newline() +
-                          '---------------------------------------------------')
-                self.bad_slits = np.append(self.bad_slits, slit)
-                # Note this result in new_bad_slits, but store the solution since this might be the best possible
+    def _reidentify_slit(self, slit):
+        """
+        Reidentify and fit a single slit
 
-            # Add the patt_dict and wv_calib to the output dicts
-            self.wv_calib[str(slit)] = copy.deepcopy(final_fit)
-            if self.debug_fits:
-                arc_fit_qa(self.wv_calib[str(slit)])
+        Args:
+            slit (int):
+                Slit index
 
-        # Print the final report of all lines
-        self.report_final()
+        Returns:
+            tuple: The detections, continuum subtracted arc spectrum,
+            patt_dict and final fit (an empty dict if no acceptable
+            solution was found) of the slit, and a bool that is True if
+            the slit should be flagged as bad.
+        """
+        msgs.info('Reidentifying and fitting slit # {0:d}/{1:d}'.format(slit,self.nslits-1))
+        narxiv = self.narxiv
+        # If this is a fixed format echelle, arxiv has exactly the same orders as the data and so
+        # we only pass in the relevant arxiv spectrum to make this much faster
+        ind_sp = slit if self.ech_fix_format else np.arange(narxiv,dtype=int)
+
+        sigdetect = self._parse_param(self.par, 'sigdetect', slit)
+        cc_thresh = self._parse_param(self.par, 'cc_thresh', slit)
+        # The arxiv line detections are only computed once for each set of detection parameters
+        arxiv_products = waveio.load_reid_arxiv_products(self.reid_arxiv, self.spec.shape[0], sigdetect=sigdetect,
+                                                         fwhm=self.fwhm, nonlinear_counts=self.nonlinear_counts,
+                                                         wv_calib_arxiv=self.wv_calib_arxiv)
+        # Only reidentify against the best archive candidates?
+        preselect = not self.ech_fix_format and self.ncand_arxiv is not None and self.ncand_arxiv < narxiv
+        slit_detections, slit_cont_sub = None, None
+        if preselect:
+            # The detections are reused by reidentify
+            tcent, _, _, icut, slit_cont_sub = wvutils.arc_lines_from_spec(
+                self.spec[:,slit], sigdetect=sigdetect, fwhm=self.fwhm, nonlinear_counts=self.nonlinear_counts,
+                debug=self.debug_peaks)
+            slit_detections = tcent[icut]
+            order, score = wvutils.rank_arxiv_candidates(slit_cont_sub, arxiv_products['fingerprint'])
+            ind_sp = np.sort(order[:self.ncand_arxiv])
+        det_arxiv = {str(i): arxiv_products['det_arxiv'][str(iarxiv)]
+                     for i, iarxiv in enumerate(np.atleast_1d(ind_sp))}
+        detections, spec_cont_sub, patt_dict = \
+            reidentify(self.spec[:,slit], arxiv_products['spec'][:,ind_sp], arxiv_products['wave_soln'][:,ind_sp],
+                       self.tot_line_list, self.nreid_min, det_arxiv=det_arxiv, detections=slit_detections,
+                       spec_cont_sub=slit_cont_sub, cc_thresh=cc_thresh, match_toler=self.match_toler,
+                       cc_local_thresh=self.cc_local_thresh, nlocal_cc=self.nlocal_cc, nonlinear_counts=self.nonlinear_counts,
+                       sigdetect=sigdetect, fwhm = self.fwhm, debug_peaks = self.debug_peaks, debug_xcorr=self.debug_xcorr,
+                       debug_reid = self.debug_reid)
+        if preselect:
+            # Estimate the recall of the preselection: archive spectra that were not sent to the full
+            # shift/stretch fit but whose fingerprint correlation exceeds cc_thresh might have been used
+            npass = patt_dict['narxiv_used']
+            nmiss = np.sum(score[order[self.ncand_arxiv:]] >= cc_thresh)
+            patt_dict['ncand_arxiv'] = self.ncand_arxiv
+            patt_dict['recall_arxiv'] = 1.0 if nmiss == 0 else npass/float(npass + nmiss)
+            msgs.info('Reidentified against the {0:d}/{1:d} best archive candidates; '.format(self.ncand_arxiv, narxiv)
+                      + '{0:d} passed cc_thresh, estimated recall = {1:.2f}'.format(npass, patt_dict['recall_arxiv']))
+        # Check if an acceptable reidentification solution was found
+        if not patt_dict['acceptable']:
+            return detections, spec_cont_sub, patt_dict, {}, True
+        # Perform the fit
+
+        n_final = self._parse_param(self.par, 'n_final', slit)
+        final_fit = fitting.fit_slit(spec_cont_sub, patt_dict, detections,
+                                     self.tot_line_list, match_toler=self.match_toler,func=self.func, n_first=self.n_first,
+                                     sigrej_first=self.sigrej_first, n_final=n_final,sigrej_final=self.sigrej_final)
+
+        # Did the fit succeed?
+        if final_fit is None:
+            # This pattern wasn't good enough
+            return detections, spec_cont_sub, patt_dict, {}, True
+        if preselect:
+            # For the QA
+            final_fit['ncand_arxiv'] = patt_dict['ncand_arxiv']
+            final_fit['recall_arxiv'] = patt_dict['recall_arxiv']
+        # Is the RMS below the threshold?
+        rms_threshold = self._parse_param(self.par, 'rms_threshold', slit)
+        bad = final_fit['rms'] > rms_threshold
+        if bad:
+            msgs.warn('---------------------------------------------------' + msgs.newline() +
+                      'Reidentify report for slit {0:d}/{1:d}:'.format(slit, self.nslits-1) + msgs.newline() +
+                      '  Poor RMS ({0:.3f})! Need to add additional spectra to arxiv to improve fits'.format(
+                          final_fit['rms']) + msgs.newline() +
+                      '---------------------------------------------------')
+            # Note this result in new_bad_slits, but store the solution since this might be the best possible
+
+        return detections, spec_cont_sub, patt_dict, copy.deepcopy(final_fit), bad
 
     def report_final(self):
         """Print out the final report of the wavelength calibration"""
@@ -1238,6 +1369,10 @@ class ArchiveReid:
                       '  Central dispersion            = {:g}A/pix'.format(cen_disp) + msgs.newline() +
                       '  Central wave/disp             = {:g}'.format(cen_wave/cen_disp) + msgs.newline() +
                       '  Final RMS of fit              = {:g}'.format(self.wv_calib[st]['rms']))
+            if 'ncand_arxiv' in self.all_patt_dict[st].keys():
+                msgs.info('  Archive candidates used       = {:d}'.format(self.all_patt_dict[st]['ncand_arxiv'])
+                          + msgs.newline() +
+                          '  Estimated candidate recall    = {:.2f}'.format(self.all_patt_dict[st]['recall_arxiv']))
         return
 
     def get_results(self):
@@ -1294,6 +1429,9 @@ class HolyGrail:
     use_unknowns : bool
       If True, arc lines that are known to be present in the spectra, but
       have not been attributed to an element+ion, will be included in the fit.
+    slit_spat : ndarray, optional
+      Spatial position of each slit, used by the joint multislit model
+      (see par['nseed_slits']). Default is the slit index.
 
     Returns
     -------
@@ -1306,7 +1444,7 @@ class HolyGrail:
     """
 
     def __init__(self, spec, par = None, ok_mask=None, islinelist=False, outroot=None, debug = False, verbose=False,
-                 binw=None, bind=None, nstore=1, use_unknowns=True):
+                 binw=None, bind=None, nstore=1, use_unknowns=True, slit_spat=None):
 
         # Set some default parameters
         self._spec = spec
@@ -1316,6 +1454,8 @@ class HolyGrail:
         self._nstore = nstore
         self._binw = binw
         self._bind = bind
+        self._slit_spat = np.arange(self._nslit, dtype=float) if slit_spat is None \
+                            else np.asarray(slit_spat, dtype=float)
 
         # Mask info
         if ok_mask is None:
@@ -1410,7 +1550,37 @@ class HolyGrail:
             self._ngridd = self._bind.size
         return
 
-    def run_brute_loop(self, slit, tcent_ecent, wavedata=None):
+    def run_brute_loop(self, slit, tcent_ecent, wavedata=None, nproc=1):
+        """
+        Sweep the pattern matching parameter space and keep the best solution
+
+        The sweep is done over the polygon, the number of detected lines
+        (detsrch) and linelist lines (lstsrch) to search over, and the
+        pixel tolerance.  The patterns for a given polygon, detsrch and
+        pixel tolerance are only generated once for the largest lstsrch,
+        and the solutions for smaller values of lstsrch are the subset of
+        those that span fewer linelist lines.  The lstsrch values are
+        then solved concurrently, and their results are considered in
+        the order of the sweep, so that the best solution does not
+        depend on nproc.  The sweep stops early when at least idthresh of
+        the lines on either side of the spectrum are identified, or when
+        all of the lines are fit, since no other solution can then fit
+        more lines.
+
+        Args:
+            slit (int):
+                Slit index
+            tcent_ecent (list):
+                [tcent, ecent] of the detected lines
+            wavedata (ndarray, optional):
+                Line list wavelengths.  Default is the full line list.
+            nproc (int, optional):
+                Number of worker threads used to solve the lstsrch values
+
+        Returns:
+            tuple: best_patt_dict, best_final_fit (None if no solution
+            was found)
+        """
         # Set the parameter space that gets searched
         rng_poly = [3, 4]            # Range of algorithms to check (only trigons+tetragons are supported)
         rng_list = range(3, 6)       # Number of lines to search over for the linelist
@@ -1419,36 +1589,56 @@ class HolyGrail:
         idthresh = 0.5               # Criteria for early return (at least this fraction of lines must have
                                      # an ID on either side of the spectrum)
 
+        # No solution can fit more lines than were detected
+        nlines_max = tcent_ecent[0].size
+
+        def _solve(sols, lstsrch):
+            psols, msols = sols
+            if psols is None:
+                return None, None
+            # JFH Note that results_brute and solve_slit are running on the same set of detections. I think this is the way
+            # it should be.
+            return self.solve_slit(slit, patterns.select_lstsrch(psols, lstsrch),
+                                   patterns.select_lstsrch(msols, lstsrch), tcent_ecent)
+
         best_patt_dict, best_final_fit = None, None
         # Loop through parameter space
         for poly in rng_poly:
             for detsrch in rng_detn:
-                for lstsrch in rng_list:
-                    for pix_tol in rng_pixt:
-                        # JFH Note that results_brute and solve_slit are running on the same set of detections. I think this is the way
-                        # it should be.
-                        psols, msols = self.results_brute(tcent_ecent,poly=poly, pix_tol=pix_tol,
-                                                          detsrch=detsrch, lstsrch=lstsrch,wavedata=wavedata)
-                        patt_dict, final_fit = self.solve_slit(slit, psols, msols,tcent_ecent)
-                        if final_fit is None:
-                            # This is not a good solution
-                            continue
-                        # Test if this solution is better than the currently favoured solution
-                        if best_patt_dict is None:
-                            # First time a fit is found
+                # Generate the patterns once for the largest lstsrch that can be tested
+                lstsrch_ok = [lstsrch for lstsrch in rng_list if tcent_ecent[0].size >= lstsrch]
+                sols = {}
+                for pix_tol in rng_pixt:
+                    sols[pix_tol] = (None, None) if len(lstsrch_ok) == 0 else \
+                        self.results_brute(tcent_ecent, poly=poly, pix_tol=pix_tol, detsrch=detsrch,
+                                           lstsrch=max(lstsrch_ok), wavedata=wavedata)
+                args = [(sols[pix_tol] if lstsrch in lstsrch_ok else (None, None), lstsrch)
+                        for lstsrch in rng_list for pix_tol in rng_pixt]
+                # Solve serially on demand, so that nothing is computed past an early return
+                results = utils.parallel_map(_solve, args, nproc=nproc) if nproc > 1 else (_solve(*a) for a in args)
+                for patt_dict, final_fit in results:
+                    if final_fit is None:
+                        # This is not a good solution
+                        continue
+                    # Test if this solution is better than the currently favoured solution
+                    if best_patt_dict is None:
+                        # First time a fit is found
+                        best_patt_dict, best_final_fit = copy.deepcopy(patt_dict), copy.deepcopy(final_fit)
+                        continue
+                    elif final_fit['rms'] < self._rms_threshold:
+                        # Has a better fit been identified (i.e. more lines identified)?
+                        if len(final_fit['pixel_fit']) > len(best_final_fit['pixel_fit']):
                             best_patt_dict, best_final_fit = copy.deepcopy(patt_dict), copy.deepcopy(final_fit)
-                            continue
-                        elif final_fit['rms'] < self._rms_threshold:
-                            # Has a better fit been identified (i.e. more lines identified)?
-                            if len(final_fit['pixel_fit']) > len(best_final_fit['pixel_fit']):
-                                best_patt_dict, best_final_fit = copy.deepcopy(patt_dict), copy.deepcopy(final_fit)
-                            # Decide if an early return is acceptable
-                            nlft = np.sum(best_final_fit['tcent'] < best_final_fit['nspec']/2.0)
-                            nrgt = best_final_fit['tcent'].size-nlft
-                            if np.sum(best_final_fit['pixel_fit'] < 0.5)/nlft > idthresh and\
-                                np.sum(best_final_fit['pixel_fit'] >= 0.5) / nrgt > idthresh:
-                                # At least half of the lines on either side of the spectrum have been identified
-                                return best_patt_dict, best_final_fit
+                        # Decide if an early return is acceptable
+                        nlft = np.sum(best_final_fit['tcent'] < best_final_fit['nspec']/2.0)
+                        nrgt = best_final_fit['tcent'].size-nlft
+                        if np.sum(best_final_fit['pixel_fit'] < 0.5)/nlft > idthresh and\
+                            np.sum(best_final_fit['pixel_fit'] >= 0.5) / nrgt > idthresh:
+                            # At least half of the lines on either side of the spectrum have been identified
+                            return best_patt_dict, best_final_fit
+                # Prune the rest of the sweep if the best solution cannot be beaten
+                if best_final_fit is not None and len(best_final_fit['pixel_fit']) >= nlines_max:
+                    return best_patt_dict, best_final_fit
 
         return best_patt_dict, best_final_fit
 
@@ -1462,36 +1652,45 @@ class HolyGrail:
         good_fit = np.zeros(self._nslit, dtype=np.bool)
         self._det_weak = {}
         self._det_stro = {}
-        for slit in range(self._nslit):
-            msgs.info("Working on slit: {}".format(slit))
-            if slit not in self._ok_mask:
-                continue
-            # TODO Pass in all the possible params for detect_lines to arc_lines_from_spec, and update the parset
-            # Detect lines, and decide which tcent to use
-            self._all_tcent, self._all_ecent, self._cut_tcent, self._icut, _  =\
-                wvutils.arc_lines_from_spec(self._spec[:, slit].copy(), sigdetect=self._sigdetect, nonlinear_counts = self._nonlinear_counts)
-            self._all_tcent_weak, self._all_ecent_weak, self._cut_tcent_weak, self._icut_weak, _  =\
-                wvutils.arc_lines_from_spec(self._spec[:, slit].copy(), sigdetect=self._sigdetect, nonlinear_counts = self._nonlinear_counts)
-
-            # Were there enough lines?  This mainly deals with junk slits
-            if self._all_tcent.size < min_nlines:
-                msgs.warn("Not enough lines to identify in slit {0:d}!".format(slit))
-                self._det_weak[str(slit)] = [None,None]
-                self._det_stro[str(slit)] = [None,None]
-                # Remove from ok mask
-                oklist = self._ok_mask.tolist()
-                oklist.pop(slit)
-                self._ok_mask = np.array(oklist)
-                continue
-            # Setup up the line detection dicts
-            self._det_weak[str(slit)] = [self._all_tcent_weak[self._icut_weak].copy(),self._all_ecent_weak[self._icut_weak].copy()]
-            self._det_stro[str(slit)] = [self._all_tcent[self._icut].copy(),self._all_ecent[self._icut].copy()]
-
-            # Run brute force algorithm on the weak lines
-            best_patt_dict, best_final_fit = self.run_brute_loop(slit,self._det_weak[str(slit)])
-
-            # Print preliminary report
-            good_fit[slit] = self.report_prelim(slit, best_patt_dict, best_final_fit)
+        # The slits are solved independently, in parallel when nproc > 1, and collected in slit order. The
+        # cross-slit steps that follow only start once all slits are done.
+        gdslits = [slit for slit in range(self._nslit) if slit in self._ok_mask]
+        nproc = 1 if (self._debug or self._verbose) else self._par['nproc']
+        # Only brute force a few seed slits spread over the mask?
+        nseed = self._par['nseed_slits']
+        if nseed is not None and len(gdslits) > nseed:
+            srt = np.array(gdslits)[np.argsort(self._slit_spat[gdslits], kind='stable')]
+            seeds = np.sort(srt[np.unique(np.round(np.linspace(0, srt.size-1, nseed)).astype(int))])
+        else:
+            seeds = np.array(gdslits)
+
+        def _collect(slits, results):
+            for slit, (det_stro, det_weak, best_patt_dict, best_final_fit) in zip(slits, results):
+                self._det_weak[str(slit)] = det_weak
+                self._det_stro[str(slit)] = det_stro
+                # Were there enough lines?  This mainly deals with junk slits
+                if det_stro[0] is None:
+                    # Remove from ok mask
+                    self._ok_mask = self._ok_mask[self._ok_mask != slit]
+                    continue
+                # Print preliminary report
+                good_fit[slit] = self.report_prelim(slit, best_patt_dict, best_final_fit)
+
+        # With a single slit, the workers are used for the parameter sweep instead
+        nproc_sweep = nproc if len(seeds) == 1 else 1
+        _collect(seeds, utils.parallel_map(self._brute_slit, [(slit, min_nlines, nproc_sweep) for slit in seeds],
+                                           nproc=nproc))
+        # Predict the solutions of the remaining slits with a joint model of the seeds and refine them
+        rest = [slit for slit in gdslits if slit not in seeds]
+        if len(rest) > 0:
+            solved = np.array([slit for slit in seeds if good_fit[slit]])
+            if solved.size < 2:
+                msgs.warn('Too few seed slits were solved for the multislit model; brute forcing all slits')
+                model = None
+            else:
+                model = self.fit_multislit(solved)
+            _collect(rest, utils.parallel_map(self._refine_slit, [(slit, min_nlines, model, solved)
+                                                                  for slit in rest], nproc=nproc))
 
         # Now that all slits have been inspected, cross match to generate a
         # master list of all lines in every slit, and refit all spectra
@@ -1521,6 +1720,163 @@ class HolyGrail:
         self.report_final()
         return
 
+    def _detect_slit(self, slit, min_nlines):
+        """
+        Detect the lines in a slit
+
+        Args:
+            slit (int):
+                Slit index
+            min_nlines (int):
+                Minimum number of detected lines needed to attempt a
+                solution
+
+        Returns:
+            tuple: The strong and weak line detections, each a list
+            [tcent, ecent] ([None, None] if there are too few lines)
+        """
+        msgs.info("Working on slit: {}".format(slit))
+        # TODO Pass in all the possible params for detect_lines to arc_lines_from_spec, and update the parset
+        # Detect lines, and decide which tcent to use
+        all_tcent, all_ecent, cut_tcent, icut, _ =\
+            wvutils.arc_lines_from_spec(self._spec[:, slit].copy(), sigdetect=self._sigdetect, nonlinear_counts = self._nonlinear_counts)
+        all_tcent_weak, all_ecent_weak, cut_tcent_weak, icut_weak, _ =\
+            wvutils.arc_lines_from_spec(self._spec[:, slit].copy(), sigdetect=self._sigdetect, nonlinear_counts = self._nonlinear_counts)
+        # Only used for the verbose reports, which are written when the slits are solved serially
+        self._all_tcent = all_tcent
+
+        # Were there enough lines?  This mainly deals with junk slits
+        if all_tcent.size < min_nlines:
+            msgs.warn("Not enough lines to identify in slit {0:d}!".format(slit))
+            return [None,None], [None,None]
+        # Setup up the line detections
+        det_weak = [all_tcent_weak[icut_weak].copy(), all_ecent_weak[icut_weak].copy()]
+        det_stro = [all_tcent[icut].copy(), all_ecent[icut].copy()]
+        return det_stro, det_weak
+
+    def _brute_slit(self, slit, min_nlines, nproc=1):
+        """
+        Detect the lines in a slit and run the brute force algorithm on them
+
+        Args:
+            slit (int):
+                Slit index
+            min_nlines (int):
+                Minimum number of detected lines needed to attempt a
+                solution
+            nproc (int, optional):
+                Number of worker threads used for the parameter sweep
+
+        Returns:
+            tuple: The strong and weak line detections, each a list
+            [tcent, ecent] ([None, None] if there are too few lines),
+            and the best patt_dict and final fit (None if not found).
+        """
+        det_stro, det_weak = self._detect_slit(slit, min_nlines)
+        if det_stro[0] is None:
+            return det_stro, det_weak, None, None
+        # Run brute force algorithm on the weak lines
+        best_patt_dict, best_final_fit = self.run_brute_loop(slit, det_weak, nproc=nproc)
+        return det_stro, det_weak, best_patt_dict, best_final_fit
+
+    def _refine_slit(self, slit, min_nlines, model, solved):
+        """
+        Detect the lines in a slit and refine the solution predicted by
+        the multislit model, falling back to the brute force algorithm
+        if the refinement fails
+
+        Args:
+            slit (int):
+                Slit index
+            min_nlines (int):
+                Minimum number of detected lines needed to attempt a
+                solution
+            model (dict or None):
+                Multislit model, see :func:`fit_multislit`.  If None,
+                the slit is brute forced.
+            solved (ndarray):
+                The solved slits used for the model
+
+        Returns:
+            tuple: Same as :func:`_brute_slit`
+        """
+        det_stro, det_weak = self._detect_slit(slit, min_nlines)
+        if det_stro[0] is None:
+            return det_stro, det_weak, None, None
+        if model is not None:
+            patt_dict, final_fit = self.predict_slit(slit, det_weak, model, solved)
+            if final_fit is not None and final_fit['rms'] < self._rms_threshold:
+                return det_stro, det_weak, patt_dict, final_fit
+            msgs.info('Refinement of the predicted solution failed for slit {0:d}; '.format(slit)
+                      + 'using the brute force algorithm')
+        best_patt_dict, best_final_fit = self.run_brute_loop(slit, det_weak)
+        return det_stro, det_weak, best_patt_dict, best_final_fit
+
+    def fit_multislit(self, solved):
+        """
+        Fit the joint multislit model of the central wavelength and
+        dispersion versus slit position
+
+        Args:
+            solved (ndarray):
+                Slits with a good solution
+
+        Returns:
+            dict: The model, see :func:`pypeit.core.arc.fit_multislit`
+        """
+        wave_cen = np.zeros(solved.size)
+        disp = np.zeros(solved.size)
+        for ii, slit in enumerate(solved):
+            wave_soln = self._all_final_fit[str(slit)]['wave_soln']
+            wave_cen[ii] = wave_soln[self._npix//2]
+            disp[ii] = np.median(wave_soln - np.roll(wave_soln, 1))
+        model = arc.fit_multislit(self._slit_spat[solved], wave_cen, disp)
+        msgs.info('Fit a multislit model of order {0:d} to the solutions of {1:d} slits'.format(
+                  model['order'], solved.size))
+        return model
+
+    def predict_slit(self, slit, tcent_ecent, model, solved):
+        """
+        Identify the lines of a slit with the solution predicted by the
+        multislit model, and fit them
+
+        The predicted solution is that of the nearest solved slit,
+        rescaled to the central wavelength and dispersion of the model.
+
+        Args:
+            slit (int):
+                Slit index
+            tcent_ecent (list):
+                [tcent, ecent] of the detected lines
+            model (dict):
+                Multislit model, see :func:`fit_multislit`
+            solved (ndarray):
+                The solved slits used for the model
+
+        Returns:
+            tuple: patt_dict, final_fit (None if the fit failed)
+        """
+        wave_cen, disp = arc.eval_multislit(model, self._slit_spat[slit])
+        near = solved[np.argmin(np.abs(self._slit_spat[solved] - self._slit_spat[slit]))]
+        sign = self._all_patt_dict[str(near)]['sign']
+        wave_near = self._all_final_fit[str(near)]['wave_soln']
+        disp_near = np.median(wave_near - np.roll(wave_near, 1))
+        wave_pred = wave_cen + (wave_near - wave_near[self._npix//2])*disp/disp_near
+        # Match the detections to the line list, each line to its closest detection only
+        use_tcent, _ = self.get_use_tcent(sign, tcent_ecent)
+        lindex, wdiff = wvutils.match_nearest(self._wvdata, np.interp(use_tcent, np.arange(self._npix), wave_pred))
+        mask = wdiff < self._match_toler*np.abs(disp)
+        srt = np.argsort(wdiff, kind='stable')
+        _, first = np.unique(lindex[srt], return_index=True)
+        unique = np.zeros(use_tcent.size, dtype=bool)
+        unique[srt[first]] = True
+        mask &= unique
+        patt_dict = dict(acceptable=np.sum(mask) >= 3, nmatch=np.sum(mask), ibest=-1, bwv=wave_cen, bdisp=disp,
+                         sigdetect=self._sigdetect, mask=mask, scores=None, sign=sign, IDs=self._wvdata[lindex])
+        if not patt_dict['acceptable']:
+            return patt_dict, None
+        return patt_dict, self.fit_slit(slit, patt_dict, use_tcent)
+
     def run_kdtree(self, polygon=4, detsrch=7, lstsrch=10, pixtol=5):
         """ KD Tree algorithm to wavelength calibrate spectroscopic data.
         Currently, this is only designed for ThAr lamp spectra. See the
@@ -1709,6 +2065,10 @@ class HolyGrail:
         dwvc_val = np.zeros(ncrco)
         slit_ids = np.zeros((ncrco, 2), dtype=np.int)
         cntr = 0
+        # Smooth and ceil each spectrum once, rather than once per pair in xcorr_shift
+        spec_smth = np.zeros_like(self._spec)
+        for slit in sort_idx:
+            spec_smth[:, slit] = wvutils.smooth_ceil_cont(self._spec[:, slit], 5.0, percent_ceil=90.0)
         # JFH Consider adding something in here that takes advantage of the
         for gd in range(0, sort_idx.size-1):
             for gc in range(gd+1, sort_idx.size):
@@ -1716,8 +2076,9 @@ class HolyGrail:
                 #amax = np.argmax(corr)
                 # dwvc_val[cntr] = (sort_wvc[gc]-sort_wvc[gd]) / (0.5*(sort_dsp[gc]+sort_dsp[gd])) - (amax - self._spec.shape[0] // 2)
                 # JFH replaced with more robust xcorr
-                shift_val[cntr], ccorr_val[cntr]= wvutils.xcorr_shift(self._spec[:, sort_idx[gd]],self._spec[:, sort_idx[gc]],
-                                                                      smooth=5.0, percent_ceil=90.0)
+                shift_val[cntr], ccorr_val[cntr]= wvutils.xcorr_shift(spec_smth[:, sort_idx[gd]], spec_smth[:, sort_idx[gc]],
+                                                                      smooth=None, percent_ceil=None,
+                                                                      use_raw_arc=True)
                 #dwvc_val[cntr] = (sort_wvc[gc]-sort_wvc[gd]) / (0.5*(sort_dsp[gc]+sort_dsp[gd])) - shift
                 # JFH TESTING
                 dwvc_val[cntr] = (sort_wvc_jfh[gc]-sort_wvc_jfh[gd]) / (0.5*(sort_dsp_jfh[gc]+sort_dsp_jfh[gd])) - shift_val[cntr]
@@ -2295,12 +2656,7 @@ class HolyGrail:
         # Construct the histograms
         histimgp, xed, yed = np.histogram2d(wvcenp, np.log10(dispsp), bins=[self._binw, self._bind])
         histimgm, xed, yed = np.histogram2d(wvcenm, np.log10(dispsm), bins=[self._binw, self._bind])
-        #histimgp = gaussian_filter(histimgp, 3)
-        #histimgm = gaussian_filter(histimgm, 3)
         histimg = histimgp - histimgm
-        sm_histimg = gaussian_filter(histimg, [30, 15])
-
-        #histpeaks = patterns.detect_2Dpeaks(np.abs(sm_histimg))
         histpeaks = patterns.detect_2Dpeaks(np.abs(histimg))
 
         # Find the indices of the nstore largest peaks
@@ -2319,15 +2675,6 @@ class HolyGrail:
             fx = plt.figure(1, figsize=(12, 8))
             ax_image = fx.add_axes(rect_image)
             extent = [self._binw[0], self._binw[-1], self._bind[0], self._bind[-1]]
-            # plt.subplot(221)
-            # plt.imshow((np.abs(histimg[:, ::-1].T)), extent=extent, aspect='auto')
-            # plt.subplot(222)
-            # plt.imshow((np.abs(sm_histimg[:, ::-1].T)), extent=extent, aspect='auto')
-            # plt.subplot(223)
-            # plt.imshow((np.abs(histimgp[:, ::-1].T)), extent=extent, aspect='auto')
-            # plt.subplot(224)
-            # plt.imshow((np.abs(histimgm[:, ::-1].T)), extent=extent, aspect='auto')
-            #plt.imshow((np.abs(sm_histimg[:, ::-1].T)), extent=extent, aspect='auto')
             cimg = ax_image.imshow(this_hist.T, extent=extent, aspect='auto',vmin=-2.0,vmax=5.0,
                        interpolation='nearest',origin='lower',cmap='Set1')
             nm = histimg.max() - histimg.min()
@@ -261,7 +261,32 @@ def score_quad_matches(fidx):
     return scores
 
 
-@nb.jit(nopython=True, cache=True)
+def select_lstsrch(sols, lstsrch):
+    """ Select the pattern matches that span fewer than lstsrch linelist lines
+
+    The matches found by :func:`triangles` or :func:`quadrangles` for a
+    given lstsrch are the subset of those found for a larger lstsrch
+    whose linelist pattern spans fewer than lstsrch consecutive lines,
+    so the patterns only need to be generated for the largest lstsrch.
+
+    Parameters
+    ----------
+    sols : tuple
+      (dindex, lindex, wvcen, disps) as returned by the pattern generators
+    lstsrch : int
+      Number of consecutive elements in linelist used to create a pattern
+
+    Returns
+    -------
+    sols : tuple
+      (dindex, lindex, wvcen, disps) of the selected matches
+    """
+    dindex, lindex, wvcen, disps = sols
+    gd = (lindex[:, -1].astype(int) - lindex[:, 0].astype(int)) < lstsrch
+    return dindex[gd, :], lindex[gd, :], wvcen[gd], disps[gd]
+
+
+@nb.jit(nopython=True, cache=True, nogil=True)
 def triangles(detlines, linelist, npixels, detsrch=5, lstsrch=10, pixtol=1.0):
     """ Brute force pattern recognition using triangles. A triangle contains
         (for either detlines or linelist):
@@ -376,7 +401,7 @@ def triangles(detlines, linelist, npixels, detsrch=5, lstsrch=10, pixtol=1.0):
     return dindex, lindex, wvcen, disps
 
 
-@nb.jit(nopython=True, cache=True)
+@nb.jit(nopython=True, cache=True, nogil=True)
 def quadrangles(detlines, linelist, npixels, detsrch=5, lstsrch=10, pixtol=1.0):
     """ Brute force pattern recognition using quadrangles. A quadrangle contains
         (for either detlines or linelist):
@@ -479,7 +504,7 @@ def quadrangles(detlines, linelist, npixels, detsrch=5, lstsrch=10, pixtol=1.0):
     return dindex[1:, :], lindex[1:, :], wvcen[1:], disps[1:]
 
 
-@nb.jit(nopython=True, cache=True)
+@nb.jit(nopython=True, cache=True, nogil=True)
 def curved_quadrangles(detlines, linelist, npixels, detsrch=5, lstsrch=10, pixtol=1.0):
     """ Brute force pattern recognition using curved quadrangles.
         A curved quadrangle contains (for either detlines or linelist):
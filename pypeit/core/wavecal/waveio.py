@@ -5,16 +5,20 @@ from __future__ import (print_function, absolute_import, division, unicode_liter
 import numpy as np
 import os
 import datetime
+import hashlib
 
 from pkg_resources import resource_filename
 
-from astropy.table import Table, Column, vstack
+from astropy.table import Table, Column, MaskedColumn, vstack
 from astropy.io import fits
+from scipy.spatial import cKDTree
 from linetools import utils as ltu
 from pypeit import wavecalib
 from pypeit import msgs
 import pypeit  # For path
 from pypeit.core.wavecal import defs
+from pypeit.core.wavecal import wvutils
+from pypeit.core import arc
 
 from pypeit import debugger
 
@@ -22,6 +26,22 @@ line_path = resource_filename('pypeit', '/data/arc_lines/lists/')
 nist_path = resource_filename('pypeit','/data/arc_lines/NIST/')
 reid_arxiv_path = resource_filename('pypeit','/data/arc_lines/reid_arxiv/')
 
+# Bump this whenever the contents of the precomputed reid_arxiv products change
+REID_ARXIV_PRODUCTS_VERSION = 1
+# In-memory store of the precomputed reid_arxiv products
+_reid_arxiv_products = {}
+
+# Bump this whenever the format or contents of the ThAr pattern store change
+KDTREE_STORE_VERSION = 1
+# In-memory store of the ThAr pattern KD Trees
+_kdtrees = {}
+
+# Bump this whenever the format or contents of the line list catalogue change
+LINE_CATALOGUE_VERSION = 1
+# In-memory store of the line list catalogue and of the line lists already loaded
+_line_catalogue = {}
+_line_lists = {}
+
 
 def load_template(arxiv_file, det):
     """
@@ -69,6 +89,118 @@ def load_reid_arxiv(arxiv_file):
 
     return wv_calib_arxiv, par
 
+def reid_arxiv_products_file(arxiv_file, nspec, sigdetect, fwhm, nonlinear_counts):
+    """
+    Name of the file with the precomputed products of a reid_arxiv file
+
+    The products are written to the PypeIt cache (see
+    :func:`cache_path`) and the name encodes the products version, the
+    reid_arxiv file and the parameters used to compute them.
+
+    Args:
+        arxiv_file (str):
+            reid_arxiv file, with or without its path
+        nspec (int):
+            Number of spectral pixels the arxiv spectra are resized to
+        sigdetect, fwhm, nonlinear_counts (float):
+            Line detection parameters
+
+    Returns:
+        str: Full path to the products file
+    """
+    calibfile = os.path.abspath(os.path.join(reid_arxiv_path, arxiv_file))
+    key = '{:s}_{:d}_{!r}_{!r}_{!r}'.format(calibfile, int(nspec), float(sigdetect), float(fwhm),
+                                            float(nonlinear_counts))
+    return os.path.join(cache_path(), 'reid_arxiv_v{0:d}'.format(REID_ARXIV_PRODUCTS_VERSION),
+                        '{0}_{1}.npz'.format(os.path.splitext(os.path.basename(calibfile))[0],
+                                             hashlib.md5(key.encode('utf-8')).hexdigest()[:10]))
+
+
+def load_reid_arxiv_products(arxiv_file, nspec, sigdetect=5.0, fwhm=4.0, nonlinear_counts=1e10,
+                             wv_calib_arxiv=None, write=True):
+    """
+    Load, or compute and store, the precomputed products of a reid_arxiv file
+
+    The archived arc spectra never change between runs, so the spectra
+    resized to nspec, their continuum subtracted versions and the arc
+    lines detected in them are computed once for each set of detection
+    parameters.  The products are kept in memory and written to an npz
+    file in the PypeIt cache (see :func:`reid_arxiv_products_file`).  A
+    products file is only reused if its version matches
+    REID_ARXIV_PRODUCTS_VERSION and it is newer than the reid_arxiv
+    file.
+
+    Args:
+        arxiv_file (str):
+            reid_arxiv file
+        nspec (int):
+            Number of spectral pixels of the arcs to be calibrated
+        sigdetect, fwhm, nonlinear_counts (float, optional):
+            Line detection parameters, see
+            :func:`pypeit.core.wavecal.wvutils.arc_lines_from_spec`
+        wv_calib_arxiv (dict, optional):
+            The reid_arxiv solutions, if already loaded with
+            :func:`load_reid_arxiv`
+        write (bool, optional):
+            Write the products to disk if they had to be computed.  If
+            the cache directory is not writeable, the products are only
+            kept in memory.
+
+    Returns:
+        dict: With keys 'spec' and 'wave_soln' (the arxiv spectra and
+        wavelength solutions resized to nspec), 'spec_cont_sub' (the
+        continuum subtracted arxiv spectra), all with shape (nspec,
+        narxiv), and 'det_arxiv', a dict with the pixel centroids of the
+        lines detected in each arxiv spectrum, keyed by '0', '1', ...
+    """
+    calibfile = os.path.join(reid_arxiv_path, arxiv_file)
+    prodfile = reid_arxiv_products_file(arxiv_file, nspec, sigdetect, fwhm, nonlinear_counts)
+    if prodfile in _reid_arxiv_products:
+        return _reid_arxiv_products[prodfile]
+
+    # Read the products from disk, if they are current
+    if os.path.isfile(prodfile) and os.path.getmtime(prodfile) >= os.path.getmtime(calibfile):
+        with np.load(prodfile) as data:
+            if int(data['version']) == REID_ARXIV_PRODUCTS_VERSION:
+                det_all = np.split(data['det'], data['det_offsets'])
+                products = dict(spec=data['spec'], wave_soln=data['wave_soln'],
+                                spec_cont_sub=data['spec_cont_sub'],
+                                det_arxiv={str(i): det for i, det in enumerate(det_all)})
+                msgs.info('Loaded the precomputed reid_arxiv products from {:s}'.format(prodfile))
+                _reid_arxiv_products[prodfile] = products
+                return products
+
+    # Compute them
+    if wv_calib_arxiv is None:
+        wv_calib_arxiv, _ = load_reid_arxiv(arxiv_file)
+    narxiv = np.sum([key.isdigit() for key in wv_calib_arxiv.keys()])
+    spec = arc.resize_spec(np.stack([wv_calib_arxiv[str(i)]['spec'] for i in range(narxiv)], axis=1), nspec)
+    wave_soln = arc.resize_spec(np.stack([wv_calib_arxiv[str(i)]['wave_soln'] for i in range(narxiv)], axis=1),
+                                nspec)
+    spec_cont_sub, det_arxiv = wvutils.arxiv_lines_from_spec(spec, sigdetect=sigdetect, fwhm=fwhm,
+                                                             nonlinear_counts=nonlinear_counts)
+    products = dict(spec=spec, wave_soln=wave_soln, spec_cont_sub=spec_cont_sub, det_arxiv=det_arxiv)
+    _reid_arxiv_products[prodfile] = products
+
+    if write:
+        det_all = [det_arxiv[str(i)] for i in range(narxiv)]
+        try:
+            if not os.path.isdir(os.path.dirname(prodfile)):
+                os.makedirs(os.path.dirname(prodfile))
+            # Write under a temporary name, so that a partially written file is never used
+            tmpfile = prodfile.replace('.npz', '.tmp{0:d}.npz'.format(os.getpid()))
+            np.savez(tmpfile, version=REID_ARXIV_PRODUCTS_VERSION, spec=spec, wave_soln=wave_soln,
+                     spec_cont_sub=spec_cont_sub, det=np.concatenate(det_all),
+                     det_offsets=np.cumsum([det.size for det in det_all])[:-1])
+            os.replace(tmpfile, prodfile)
+        except OSError:
+            msgs.warn('Could not write the reid_arxiv products to {:s}; they will only be kept in '
+                      'memory'.format(prodfile))
+        else:
+            msgs.info('Wrote the reid_arxiv products to {:s}'.format(prodfile))
+    return products
+
+
 def load_by_hand():
     """ By-hand line list
     Parameters
@@ -101,6 +233,10 @@ def load_by_hand():
 
 def load_line_list(line_file, add_path=False, use_ion=False, NIST=False):
     """
+    Line lists are read once per process.  Those distributed with PypeIt
+    are taken from the binary line list catalogue (see
+    :func:`load_line_catalogue`) rather than parsed from the ASCII tables.
+
     Parameters
     ----------
     line_file : str
@@ -126,6 +262,33 @@ def load_line_list(line_file, add_path=False, use_ion=False, NIST=False):
             line_file = path+'{:s}_vacuum.ascii'.format(line_file)
         else:
             line_file = path+'{:s}_lines.dat'.format(line_file)
+    key = (os.path.abspath(line_file), NIST)
+    if key not in _line_lists:
+        line_list = None
+        if os.path.dirname(key[0]) == os.path.abspath(path):
+            catalogue = load_line_catalogue()
+            if catalogue is not None:
+                line_list = line_list_from_catalogue(catalogue, os.path.basename(line_file), NIST=NIST)
+        _line_lists[key] = read_line_list(line_file, NIST=NIST) if line_list is None else line_list
+    # Return a copy, such that the stored list cannot be modified by the caller
+    return _line_lists[key].copy()
+
+
+def read_line_list(line_file, NIST=False):
+    """ Parse a line list from its ASCII table
+
+    Parameters
+    ----------
+    line_file : str
+      Full path to line_list
+    NIST : bool, optional
+      NIST formatted table?
+
+    Returns
+    -------
+    line_list : Table
+
+    """
     line_list = Table.read(line_file, format='ascii.fixed_width', comment='#')
     #  NIST?
     if NIST:
@@ -137,7 +300,7 @@ def load_line_list(line_file, add_path=False, use_ion=False, NIST=False):
                     line_list.remove_column(tkey)
         # Relative intensity -- Strip junk off the end
         reli = []
-        for imsk, idat in zip(line_list['Rel.'].mask, line_list['Rel.'].data):
+        for imsk, idat in zip(np.ma.getmaskarray(line_list['Rel.']), line_list['Rel.'].data):
             if imsk:
                 reli.append(0.)
             else:
@@ -166,6 +329,120 @@ def load_line_list(line_file, add_path=False, use_ion=False, NIST=False):
     return line_list
 
 
+def line_catalogue_file():
+    """ File of the binary line list catalogue
+
+    Returns
+    -------
+    catalogue_file : str
+    """
+    return os.path.join(cache_path(), 'line_catalogue_v{0:d}.npz'.format(LINE_CATALOGUE_VERSION))
+
+
+def line_catalogue_sources():
+    """ The ASCII line lists that make up the line list catalogue
+
+    Returns
+    -------
+    sources : list
+      List of (line_file, NIST) tuples
+    """
+    import glob
+    return [(line_file, False) for line_file in sorted(glob.glob(line_path+'*.dat'))] \
+           + [(line_file, True) for line_file in sorted(glob.glob(nist_path+'*_vacuum.ascii'))]
+
+
+def build_line_catalogue():
+    """ Parse all of the line lists distributed with PypeIt and write them
+    to the binary line list catalogue
+
+    Each line list is saved as a structured array, along with the masks
+    of its masked columns, so that the line lists are recovered exactly.
+    The file is first written under a temporary name, so that a partially
+    written catalogue is never used.
+
+    Returns
+    -------
+    catalogue_file : str
+      The file that was written
+    """
+    msgs.info('Building the line list catalogue')
+    catalogue = {}
+    for line_file, NIST in line_catalogue_sources():
+        line_list = read_line_list(line_file, NIST=NIST)
+        root = '{0:s}:{1:s}'.format('NIST' if NIST else 'lists', os.path.basename(line_file))
+        catalogue[root] = np.ma.getdata(line_list.as_array())
+        masked = [key for key in line_list.colnames if isinstance(line_list[key], MaskedColumn)]
+        if len(masked) > 0:
+            catalogue[root+':mask'] = line_list[masked].as_array().mask
+    catalogue_file = line_catalogue_file()
+    if not os.path.isdir(cache_path()):
+        os.makedirs(cache_path())
+    tmpfile = catalogue_file.replace('.npz', '.tmp{0:d}.npz'.format(os.getpid()))
+    np.savez(tmpfile, **catalogue)
+    os.replace(tmpfile, catalogue_file)
+    msgs.info('Wrote the line list catalogue to {0:s}'.format(catalogue_file))
+    return catalogue_file
+
+
+def load_line_catalogue():
+    """ Open the binary line list catalogue, building it first if needed
+
+    The catalogue is rebuilt if it is older than any of the ASCII line
+    lists.  It is opened once and kept open for later calls; the arrays
+    are read lazily, such that only the requested line lists are loaded.
+
+    Returns
+    -------
+    catalogue : numpy.lib.npyio.NpzFile or None
+      The opened catalogue, or None if it could not be built
+    """
+    catalogue_file = line_catalogue_file()
+    if catalogue_file not in _line_catalogue:
+        newest = max([os.path.getmtime(line_file) for line_file, _ in line_catalogue_sources()])
+        if not os.path.isfile(catalogue_file) or os.path.getmtime(catalogue_file) < newest:
+            try:
+                build_line_catalogue()
+            except OSError:
+                msgs.warn('Could not write the line list catalogue to {0:s}; '.format(catalogue_file)
+                          + 'the line lists will be read from their ASCII tables')
+                _line_catalogue[catalogue_file] = None
+                return None
+        _line_catalogue[catalogue_file] = np.load(catalogue_file)
+    return _line_catalogue[catalogue_file]
+
+
+def line_list_from_catalogue(catalogue, line_file, NIST=False):
+    """ Construct a line list from the line list catalogue
+
+    Parameters
+    ----------
+    catalogue : numpy.lib.npyio.NpzFile
+      Catalogue, as returned by :func:`load_line_catalogue`
+    line_file : str
+      Name of the line list file, without its path
+    NIST : bool, optional
+      NIST formatted table?
+
+    Returns
+    -------
+    line_list : Table or None
+      None if the line list is not in the catalogue
+    """
+    root = '{0:s}:{1:s}'.format('NIST' if NIST else 'lists', line_file)
+    if root not in catalogue.files:
+        return None
+    data = catalogue[root]
+    mask = catalogue[root+':mask'] if root+':mask' in catalogue.files else None
+    columns = []
+    for key in data.dtype.names:
+        if mask is not None and key in mask.dtype.names:
+            columns.append(MaskedColumn(data[key], mask=mask[key], name=key))
+        else:
+            columns.append(Column(data[key], name=key))
+    return Table(columns)
+
+
 def load_line_lists(lines, unknown=False, skip=False, all=False, NIST=False):
     """ Loads a series of line list files
 
@@ -238,8 +515,111 @@ def load_source_table():
     return sources
 
 
-def load_tree(polygon=4, numsearch=20):
-    """ Load a KDTree of ThAr patterns that is stored on disk
+def cache_path():
+    """ Directory for the files that PypeIt builds on first use
+
+    This is $PYPEIT_CACHE if set, and ~/.pypeit/cache otherwise, such
+    that nothing is written into the (possibly read-only) package
+    directory.
+
+    Returns
+    -------
+    path : str
+    """
+    return os.getenv('PYPEIT_CACHE', os.path.join(os.path.expanduser('~'), '.pypeit', 'cache'))
+
+
+def pattern_store_files(polygon, numsearch):
+    """ Files of the ThAr pattern store for a given polygon and numsearch
+
+    Parameters
+    ----------
+    polygon : int
+      Number of sides to the polygon used in pattern matching
+    numsearch : int
+      Number of consecutive lines used to generate a pattern
+
+    Returns
+    -------
+    patternfile, indexfile : str
+      The files with the flat pattern and linelist index arrays
+    """
+    root = os.path.join(cache_path(), 'ThAr_patterns_poly{0:d}_search{1:d}_v{2:d}'.format(
+        polygon, numsearch, KDTREE_STORE_VERSION))
+    return root + '.pattern.npy', root + '.index.npy'
+
+
+def build_pattern_store(polygon, numsearch, maxlinear=100.0):
+    """ Generate the ThAr patterns and write them to the pattern store
+
+    The patterns and indices are saved as flat numpy arrays that
+    :func:`load_pattern_store` memory maps.  The files are first written
+    under a temporary name, so that a partially written store is never
+    used.
+
+    Parameters
+    ----------
+    polygon : int
+      Number of sides to the polygon used in pattern matching
+    numsearch : int
+      Number of consecutive lines used to generate a pattern
+    maxlinear : float
+      Over how many Angstroms is the solution deemed to be linear
+
+    Returns
+    -------
+    patternfile, indexfile : str
+      The files that were written
+    """
+    from pypeit.core.wavecal import kdtree_generator
+    msgs.info('Building the ThAr patterns for polygon={0:d}, numsearch={1:d}'.format(polygon, numsearch))
+    pattern, index = kdtree_generator.generate_patterns(polygon, numsearch=numsearch, maxlinear=maxlinear)
+    if pattern is None:
+        msgs.error('Patterns can only be generated with 3 <= polygon <= 6')
+    if not os.path.isdir(cache_path()):
+        os.makedirs(cache_path())
+    files = pattern_store_files(polygon, numsearch)
+    for outfile, arr in zip(files, [pattern, index]):
+        tmpfile = outfile.replace('.npy', '.tmp{0:d}.npy'.format(os.getpid()))
+        np.save(tmpfile, arr)
+        os.replace(tmpfile, outfile)
+    msgs.info('Wrote the ThAr pattern store to {0:s}'.format(files[0]))
+    return files
+
+
+def load_pattern_store(polygon, numsearch):
+    """ Memory map the ThAr patterns, building the store first if needed
+
+    The store is rebuilt if it is older than the ThAr line list.
+
+    Parameters
+    ----------
+    polygon : int
+      Number of sides to the polygon used in pattern matching
+    numsearch : int
+      Number of consecutive lines used to generate a pattern
+
+    Returns
+    -------
+    pattern : ndarray
+      Read-only memory map of the patterns, shape (npattern, polygon-2)
+    index : ndarray
+      Read-only memory map of the linelist indices of each pattern
+    """
+    files = pattern_store_files(polygon, numsearch)
+    linefile = os.path.join(line_path, 'ThAr_lines.dat')
+    if not all([os.path.isfile(f) and os.path.getmtime(f) >= os.path.getmtime(linefile) for f in files]):
+        msgs.info('The requested ThAr pattern store was not found in {0:s}'.format(cache_path()) + msgs.newline() +
+                  'please be patient while it is built (or prebuild it with pypeit_build_kdtree).')
+        build_pattern_store(polygon, numsearch)
+    return np.load(files[0], mmap_mode='r'), np.load(files[1], mmap_mode='r')
+
+
+def load_tree(polygon=4, numsearch=20, leafsize=30):
+    """ Load a KDTree of ThAr patterns from the pattern store
+
+    The tree is built from the memory mapped pattern store (see
+    :func:`load_pattern_store`) and kept in memory for later calls.
 
     Parameters
     ----------
@@ -256,6 +636,8 @@ def load_tree(polygon=4, numsearch=20):
       1 2 3  (in this case line #3 is the right anchor)
       1 2 4  (in this case line #4 is the right anchor)
       1 3 4  (in this case line #4 is the right anchor)
+    leafsize : int
+      The leaf size of the tree
 
     Returns
     -------
@@ -265,23 +647,11 @@ def load_tree(polygon=4, numsearch=20):
       For each pattern in the KDTree, this array stores the corresponding index in
       the linelist
     """
-
-    import pickle
-    filename = pypeit.__path__[0] +\
-               '/data/arc_lines/lists/ThAr_patterns_poly{0:d}_search{1:d}.kdtree'.format(polygon, numsearch)
-    fileindx = pypeit.__path__[0] +\
-               '/data/arc_lines/lists/ThAr_patterns_poly{0:d}_search{1:d}.index.npy'.format(polygon, numsearch)
-    try:
-        file_load = pickle.load(open(filename, 'rb'))
-        index = np.load(fileindx)
-    except FileNotFoundError:
-        msgs.info('The requested KDTree was not found on disk' + msgs.newline() +
-                  'please be patient while the ThAr KDTree is built and saved to disk.')
-        from pypeit.core.wavecal import kdtree_generator
-        file_load, index = kdtree_generator.main(polygon, numsearch=numsearch, verbose=True,
-                                                 ret_treeindx=True, outname=filename)
-
-    return file_load, index
+    key = (polygon, numsearch, leafsize, cache_path())
+    if key not in _kdtrees:
+        pattern, index = load_pattern_store(polygon, numsearch)
+        _kdtrees[key] = (cKDTree(pattern, leafsize=leafsize), index)
+    return _kdtrees[key]
 
 
 def load_nist(ion):
@@ -55,6 +55,150 @@ def arc_lines_from_spec(spec, sigdetect=10.0, fwhm=4.0,fit_frac_fwhm = 1.25, con
     return all_tcent, all_ecent, cut_tcent, icut, arc_cont_sub
 
 
+def arxiv_lines_from_spec(spec_arxiv, sigdetect=10.0, fwhm=4.0, nonlinear_counts=1e10, debug=False):
+    """
+    Continuum subtract and detect the arc lines in a set of archival arc spectra
+
+    Parameters
+    ----------
+    spec_arxiv : ndarray, shape (nspec, narxiv)
+        Archival arc spectra
+    sigdetect, fwhm, nonlinear_counts, debug :
+        Passed to arc_lines_from_spec
+
+    Returns
+    -------
+    spec_arxiv_cont_sub : ndarray, shape (nspec, narxiv)
+        Continuum subtracted archival arc spectra
+    det_arxiv : dict
+        Pixel centroids of the lines detected in each arxiv spectrum, keyed by
+        '0', '1', ... up to str(narxiv-1)
+    """
+    spec_arxiv_cont_sub = np.zeros_like(spec_arxiv)
+    det_arxiv = {}
+    for iarxiv in range(spec_arxiv.shape[1]):
+        tcent, ecent, cut_tcent, icut, spec_cont_sub = arc_lines_from_spec(
+            spec_arxiv[:,iarxiv], sigdetect=sigdetect, nonlinear_counts=nonlinear_counts, fwhm=fwhm, debug=debug)
+        spec_arxiv_cont_sub[:,iarxiv] = spec_cont_sub
+        det_arxiv[str(iarxiv)] = tcent[icut]
+    return spec_arxiv_cont_sub, det_arxiv
+
+
+def arc_fingerprint(spec_cont_sub, smooth=4.0, percent_ceil=80.0):
+    """
+    Compact fingerprint of continuum subtracted arc spectra used to rank archive candidates
+
+    The spectra are clipped at a ceiling, to keep the strongest lines from
+    dominating, smoothed and normalized to zero mean and unit norm, such
+    that the dot product of two fingerprints is their correlation
+    coefficient.
+
+    Parameters
+    ----------
+    spec_cont_sub : ndarray, shape (nspec,) or (nspec, narxiv)
+        Continuum subtracted arc spectra
+    smooth : float, default = 4.0
+        Gaussian smoothing in pixels.  This is larger than used for the
+        shift/stretch fits to tolerate small stretches.
+    percent_ceil : float, default = 80.0
+        Ceiling of each spectrum at this percentile of its positive pixels
+
+    Returns
+    -------
+    fingerprint : ndarray, same shape as spec_cont_sub
+    """
+    y = np.array(spec_cont_sub, dtype=float).reshape(spec_cont_sub.shape[0], -1)
+    for i in range(y.shape[1]):
+        pos = y[:,i] > 0.
+        if np.any(pos):
+            y[:,i] = np.fmin(y[:,i], np.percentile(y[pos,i], percent_ceil))
+    y = scipy.ndimage.filters.gaussian_filter1d(np.fmax(y, 0.), smooth, axis=0)
+    y -= np.mean(y, axis=0)
+    norm = np.sqrt(np.sum(y*y, axis=0))
+    y /= np.where(norm > 0., norm, 1.)
+    return y.reshape(spec_cont_sub.shape)
+
+
+def rank_arxiv_candidates(spec_cont_sub, finger_arxiv, stretch_mnmx=(0.95,1.05), nstretch=5, **kwargs):
+    """
+    Rank archive spectra by their maximum fingerprint cross-correlation with an arc spectrum
+
+    This is a cheap proxy for the global cross-correlation coefficient of
+    :func:`xcorr_shift_stretch`: the input fingerprint is stretched over
+    a coarse grid and cross-correlated against all the archive
+    fingerprints at once with FFTs.
+
+    Parameters
+    ----------
+    spec_cont_sub : ndarray, shape (nspec,)
+        Continuum subtracted arc spectrum
+    finger_arxiv : ndarray, shape (nspec, narxiv)
+        Archive fingerprints from :func:`arc_fingerprint`
+    stretch_mnmx : tuple, default = (0.95, 1.05)
+        Range of stretches to consider
+    nstretch : int, default = 5
+        Number of stretches on the grid
+    kwargs :
+        Passed to :func:`arc_fingerprint`
+
+    Returns
+    -------
+    order : ndarray, int, shape (narxiv,)
+        Archive indices sorted from the best to the worst candidate
+    score : ndarray, float, shape (narxiv,)
+        Maximum fingerprint cross-correlation of each archive spectrum
+    """
+    nspec, narxiv = finger_arxiv.shape
+    finger = arc_fingerprint(spec_cont_sub, **kwargs)
+    nfft = int(2**np.ceil(np.log2(2*nspec*stretch_mnmx[1])))
+    fft_arxiv = np.fft.rfft(finger_arxiv, n=nfft, axis=0)
+    score = np.full(narxiv, -1.0)
+    for stretch in np.linspace(stretch_mnmx[0], stretch_mnmx[1], nstretch):
+        nstretched = int(nspec*stretch)
+        y = np.interp(np.arange(nstretched)/stretch, np.arange(nspec), finger)
+        y /= np.fmax(np.sqrt(np.sum(y*y)), 1e-30)
+        corr = np.fft.irfft(fft_arxiv*np.conj(np.fft.rfft(y, n=nfft))[:,None], n=nfft, axis=0)
+        score = np.fmax(score, corr.max(axis=0))
+    order = np.argsort(-score, kind='stable')
+    return order, score
+
+
+def match_nearest(ref, values):
+    """
+    Find the nearest element of a reference array for each of a set of values
+
+    This is equivalent to np.argmin(np.abs(ref - value)) for each value,
+    but uses a sorted search over all values at once.
+
+    Parameters
+    ----------
+    ref : ndarray, shape (nref,)
+        Reference values, not necessarily sorted
+    values : ndarray, shape (nval,)
+        Values to match
+
+    Returns
+    -------
+    indx : ndarray, int, shape (nval,)
+        Index in ref of the nearest element to each value
+    diff : ndarray, float, shape (nval,)
+        Absolute difference between each value and its nearest element
+    """
+    if ref.size == 0:
+        return np.zeros(values.size, dtype=int), np.full(values.size, np.inf)
+    srt = np.argsort(ref, kind='stable')
+    ref_srt = ref[srt]
+    # Candidates are the elements of ref to the left and right of each value
+    right = np.clip(np.searchsorted(ref_srt, values), 0, ref_srt.size-1)
+    left = np.clip(right-1, 0, ref_srt.size-1)
+    dleft = np.abs(values - ref_srt[left])
+    dright = np.abs(values - ref_srt[right])
+    # Take the element with the lower index in ref for ties, as np.argmin does
+    use_right = (dright < dleft) | ((dright == dleft) & (srt[right] < srt[left]))
+    isrt = np.where(use_right, right, left)
+    return srt[isrt], np.where(use_right, dright, dleft)
+
+
 def shift_and_stretch(spec, shift, stretch):
 
     """ Utility function to shift and stretch a spectrum. This operation is being implemented in many steps and
@@ -123,20 +267,107 @@ def zerolag_shift_stretch(theta, y1, y2):
     corr_norm = corr_zero/corr_denom
     return -corr_norm
 
+def xcorr_stretch_grid(y1, y2, shift_bounds, stretch_mnmx, nstep=2, ncand=3):
+
+    """ Coarse-to-fine search for the integer shifts and the stretches that maximize the zero lag cross-correlation
+    coefficient computed by zerolag_shift_stretch.
+
+    shift_and_stretch only depends on the stretch through the size int(nspec*stretch) of the stretched spectrum. For
+    a given size, the zero lag cross-correlation at all the integer shifts is the full cross-correlation of y1 with the
+    stretched y2, which is computed with a single FFT. Every nstep-th size in stretch_mnmx is visited first, and then
+    all the sizes around the ncand best ones. Candidates are ranked by the height of the cross-correlation peak
+    interpolated with a parabola, since the best integer shift can land on either side of the true peak.
+
+    Parameters
+    ----------
+    y1: ndarray, shape = (nspec,)
+      First spectrum which acts as the refrence
+    y2: ndarray,  shape = (nspec,)
+      Second spectrum which will be transformed by a shift and stretch to match y1
+    shift_bounds: tuple of floats
+      Range of shifts to search in pixels
+    stretch_mnmx: tuple of floats
+      Range of stretches to search
+    nstep: int, default = 2
+      Step in the size of the stretched spectrum for the coarse search
+    ncand: int, default = 3
+      Number of candidates that are refined and returned
+
+    Returns
+    -------
+    cands: list of tuples
+      (shift, stretch, corr) of the best candidates, sorted by decreasing interpolated peak height. shift is the integer
+      shift with the largest cross-correlation coefficient at this stretch, and corr is the cross-correlation coefficient
+      at this shift and stretch, equal to -zerolag_shift_stretch((shift, stretch), y1, y2). The list is empty if no
+      shift is in shift_bounds.
+    """
+
+    nspec = y1.size
+    corr_denom = np.sqrt(np.sum(y1*y1)*np.sum(y2*y2))
+    # Same interpolation of y2 as the stretching in shift_and_stretch
+    x1 = np.arange(nspec)/float(nspec)
+    y2_interp = scipy.interpolate.interp1d(x1, y2, kind = 'quadratic', bounds_error = False, fill_value = 0.0)
+
+    shift_min = int(np.ceil(shift_bounds[0]))
+    shift_max = int(np.floor(shift_bounds[1]))
+    nstretch_min = int(nspec*stretch_mnmx[0])
+    nstretch_max = int(nspec*stretch_mnmx[1])
+
+    peaks = {}
+    def peak(nspec_stretch):
+        y2_str = y2_interp(np.arange(nspec_stretch)/float(nspec_stretch))
+        # The shifted spectrum is only defined on the first nspec_stretch pixels
+        nuse = min(nspec, nspec_stretch)
+        corr = scipy.signal.correlate(y1[:nuse], y2_str, mode='full', method='fft')/corr_denom
+        # Element k of corr is the correlation at shift = k - (nspec_stretch - 1)
+        kmin = max(shift_min + nspec_stretch - 1, 0)
+        kmax = min(shift_max + nspec_stretch - 1, corr.size - 1)
+        if kmax < kmin:
+            return None
+        kbest = kmin + np.argmax(corr[kmin:kmax + 1])
+        height = corr[kbest]
+        if 0 < kbest < corr.size - 1:
+            # Height of the parabola through the peak and its neighbors
+            curv = corr[kbest + 1] - 2.0*corr[kbest] + corr[kbest - 1]
+            if curv < 0.0:
+                height = corr[kbest] - (corr[kbest + 1] - corr[kbest - 1])**2/(8.0*curv)
+        # A stretch inside the bounds that gives this size of the stretched spectrum
+        stretch = float(np.clip((nspec_stretch + 0.5)/nspec, stretch_mnmx[0], stretch_mnmx[1]))
+        return height, float(kbest - (nspec_stretch - 1)), stretch, corr[kbest]
+
+    def evaluate(sizes):
+        for nspec_stretch in sizes:
+            if nspec_stretch not in peaks and nstretch_min <= nspec_stretch <= nstretch_max:
+                peaks[nspec_stretch] = peak(nspec_stretch)
+
+    def best(n):
+        good = [(p, key) for key, p in peaks.items() if p is not None]
+        return sorted(good, key=lambda x: x[0][0], reverse=True)[:n]
+
+    # Coarse search
+    evaluate(list(range(nstretch_min, nstretch_max + 1, nstep)) + [nstretch_max])
+    # Fine search around the best coarse candidates
+    for _, nspec_stretch in best(ncand):
+        evaluate(range(nspec_stretch - nstep + 1, nspec_stretch + nstep))
+
+    return [(p[1], p[2], p[3]) for p, _ in best(ncand)]
+
+
 def smooth_ceil_cont(inspec1, smooth, percent_ceil = None, use_raw_arc=False,sigdetect = 10.0, fwhm = 4.0):
     """ Utility routine to smooth and apply a ceiling to spectra """
 
-    # ToDO can we improve the logic here. Technically if use_raw_arc = True and perecent_ceil=None
-    # we don't need to peak find or continuum subtract, but this makes the code pretty uggly.
-
-    # Run line detection to get the continuum subtracted arc
-    tampl1, tampl1_cont, tcent1, twid1, centerr1, w1, arc1, nsig1 = arc.detect_lines(inspec1, sigdetect=sigdetect, fwhm=fwhm)
-    if use_raw_arc == True:
-        ampl = tampl1
+    if use_raw_arc == True and percent_ceil is None:
+        # Neither the continuum subtracted arc nor the line amplitudes are needed, so skip the line detection
         use_arc = inspec1
     else:
-        ampl = tampl1_cont
-        use_arc = arc1
+        # Run line detection to get the continuum subtracted arc
+        tampl1, tampl1_cont, tcent1, twid1, centerr1, w1, arc1, nsig1 = arc.detect_lines(inspec1, sigdetect=sigdetect, fwhm=fwhm)
+        if use_raw_arc == True:
+            ampl = tampl1
+            use_arc = inspec1
+        else:
+            ampl = tampl1_cont
+            use_arc = arc1
 
     if percent_ceil is not None:
         # If this is set, set a ceiling on the greater > 10sigma peaks
@@ -220,7 +451,9 @@ def xcorr_shift_stretch(inspec1, inspec2, cc_thresh=-1.0, smooth=1.0, percent_ce
     """ Determine the shift and stretch of inspec2 relative to inspec1.  This routine computes an initial
     guess for the shift via maximimizing the cross-correlation. It then performs a two parameter search for the shift and stretch
     by optimizing the zero lag cross-correlation between the inspec1 and the transformed inspec2 (shifted and stretched via
-    wvutils.shift_and_stretch()) in a narrow window about the initial estimated shift. The convention for the shift is that
+    wvutils.shift_and_stretch()) in a narrow window about the initial estimated shift. The search is deterministic: the
+    stretches and integer shifts in the window are evaluated with FFT cross-correlations (see xcorr_stretch_grid) and the
+    shifts of the best candidates are then refined to sub-pixel precision. The convention for the shift is that
     positive shift means inspec2 is shifted to the right (higher pixel values) relative to inspec1. The convention for the stretch is
     that it is float near unity that increases the size of the inspec2 relative to the original size (which is the size of inspec1)
 
@@ -255,7 +488,8 @@ def xcorr_shift_stretch(inspec1, inspec2, cc_thresh=-1.0, smooth=1.0, percent_ce
       Range to search for the stretch in the optimization. The code may not work well if this range is significantly expanded
       because the linear approximation used to transform the arc starts to break down.
     seed: int or np.random.RandomState, optional, default = None
-       Seed for scipy.optimize.differential_evolution optimizer. If not specified, the calculation will not be repeatable
+       Not used. Kept for backwards compatibility with the previous differential evolution optimizer, since the
+       search is now deterministic
     debug = False
        Show plots to the screen useful for debugging.
 
@@ -295,14 +529,22 @@ def xcorr_shift_stretch(inspec1, inspec2, cc_thresh=-1.0, smooth=1.0, percent_ce
     if corr_cc < cc_thresh:
         return -1, shift_cc, 1.0, corr_cc, shift_cc, corr_cc
     else:
-        bounds = [(shift_cc + nspec*shift_mnmx[0],shift_cc + nspec*shift_mnmx[1]), stretch_mnmx]
-        # TODO Can we make the differential evolution run faster?
-        result = scipy.optimize.differential_evolution(zerolag_shift_stretch, args=(y1,y2), tol=1e-4,
-                                                       bounds=bounds, disp=False, polish=True, seed=seed)
-        corr_de = -result.fun
-        shift_de = result.x[0]
-        stretch_de = result.x[1]
-        if not result.success:
+        shift_bounds = (shift_cc + nspec*shift_mnmx[0],shift_cc + nspec*shift_mnmx[1])
+        # Search over the stretches and integer shifts
+        cands = xcorr_stretch_grid(y1, y2, shift_bounds, stretch_mnmx)
+        success = len(cands) > 0
+        corr_de, shift_de, stretch_de = -np.inf, shift_cc, 1.0
+        for shift_int, stretch, corr_int in cands:
+            # Refine the shift of each candidate to sub-pixel precision at its stretch
+            result = scipy.optimize.minimize_scalar(
+                lambda shift: zerolag_shift_stretch((shift, stretch), y1, y2), method='bounded',
+                bounds=(max(shift_int - 1.0, shift_bounds[0]), min(shift_int + 1.0, shift_bounds[1])),
+                options={'xatol': 1e-3})
+            success &= result.success
+            corr, shift = (-result.fun, result.x) if -result.fun > corr_int else (corr_int, shift_int)
+            if corr > corr_de:
+                corr_de, shift_de, stretch_de = corr, shift, stretch
+        if not success:
             msgs.warn('Fit for shift and stretch did not converge!')
 
         if(corr_de < corr_cc):
@@ -319,7 +561,7 @@ def xcorr_shift_stretch(inspec1, inspec2, cc_thresh=-1.0, smooth=1.0, percent_ce
             corr_out = corr_de
             shift_out = shift_de
             stretch_out = stretch_de
-            result_out = int(result.success)
+            result_out = int(success)
 
         if debug:
             x1 = np.arange(nspec)
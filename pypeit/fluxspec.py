@@ -219,6 +219,32 @@ class FluxSpec(object):
         """
         return
 
+    def flux_science_files(self, spec1d_files, flux_files=None):
+        """
+        Flux many spec1d files in one pass
+
+        Wrapper to flux.flux_spec1d_files().  Only the fluxed columns of
+        the files are written; see that function.
+
+        Args:
+            spec1d_files: list
+            flux_files: list, optional
+              Output files.  If None, the spec1d files are updated in place
+
+        Returns:
+            list: The fluxed files
+
+        """
+        flux_files = flux.flux_spec1d_files(spec1d_files, self.sens_dict,
+                                            self.spectrograph.telescope['longitude'],
+                                            self.spectrograph.telescope['latitude'],
+                                            flux_files=flux_files,
+                                            extinct_correct=self.par['extinct_correct'],
+                                            telluric_correct=self.par['telluric_correct'],
+                                            echelle=self.spectrograph.pypeline == 'Echelle')
+        self.steps.append(inspect.stack()[0][3])
+        return flux_files
+
     def _set_std_obj(self, obj_id=None):
         """
         Method which allows the user to identify the standard star
@@ -512,6 +538,7 @@ class Echelle(FluxSpec):
                 if sci_obj.ech_orderindx == iord:
                     flux.apply_sensfunc(sci_obj, sens_dict_iord, float(self.sci_header['AIRMASS']),
                                         self.sci_header['EXPTIME'], extinct_correct=self.par['extinct_correct'],
+                                        telluric_correct=self.par['telluric_correct'],
                                         longitude=self.spectrograph.telescope['longitude'],
                                         latitude=self.spectrograph.telescope['latitude'])
 
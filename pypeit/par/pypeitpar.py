@@ -904,7 +904,7 @@ class ReducePar(ParSet):
     see :ref:`pypeitpar`.
     """
     def __init__(self, spectrograph=None, detnum=None, sortroot=None, calwin=None, scidir=None,
-                 qadir=None, redux_path=None, ignore_bad_headers=None):
+                 qadir=None, redux_path=None, ignore_bad_headers=None, precision=None, qa_nproc=None):
 
         # Grab the parameter names and values from the function
         # arguments
@@ -956,6 +956,22 @@ class ReducePar(ParSet):
         dtypes['redux_path'] = str
         descr['redux_path'] = 'Path to folder for performing reductions.'
 
+        defaults['precision'] = 'double'
+        options['precision'] = ReducePar.valid_precisions()
+        dtypes['precision'] = str
+        descr['precision'] = 'Floating-point precision of the science images.  With single, the ' \
+                             'raw frames, the processed science image, its inverse variance, ' \
+                             'read noise and the sky, object and inverse variance models are ' \
+                             'held in 32-bit floats, which halves their memory footprint.  ' \
+                             'Fits are still performed in double precision.  Options are: ' \
+                             '{0}'.format(', '.join(options['precision']))
+
+        defaults['qa_nproc'] = 1
+        dtypes['qa_nproc'] = int
+        descr['qa_nproc'] = 'Number of background processes rendering the QA plots fed by the ' \
+                            'reduction, which does not wait for them.  If 0, the QA plots are ' \
+                            'made as they are produced, in the reduction itself.'
+
         # Instantiate the parameter set
         super(ReducePar, self).__init__(list(pars.keys()),
                                         values=list(pars.values()),
@@ -971,7 +987,7 @@ class ReducePar(ParSet):
 
         # Basic keywords
         parkeys = [ 'spectrograph', 'detnum', 'sortroot', 'calwin', 'scidir', 'qadir',
-                    'redux_path', 'ignore_bad_headers']
+                    'redux_path', 'ignore_bad_headers', 'precision', 'qa_nproc']
         kwargs = {}
         for pk in parkeys:
             kwargs[pk] = cfg[pk] if pk in k else None
@@ -993,8 +1009,24 @@ class ReducePar(ParSet):
                 'gemini_gmos_north_e2v', 'gemini_gmos_north_ham',
                 'lbt_mods1r', 'lbt_mods1b', 'lbt_mods2r', 'lbt_mods2b', 'vlt_fors2']
 
+    @staticmethod
+    def valid_precisions():
+        """
+        Return the valid floating-point precisions of the science images.
+        """
+        return ['double', 'single']
+
+    @staticmethod
+    def image_dtype(precision):
+        """
+        Return the numpy floating-point type of the science images for
+        the provided precision.
+        """
+        return numpy.float32 if precision == 'single' else numpy.float64
+
     def validate(self):
-        pass
+        if self.data['qa_nproc'] < 0:
+            raise ValueError('qa_nproc cannot be negative.')
 
     
 class WavelengthSolutionPar(ParSet):
@@ -1008,10 +1040,11 @@ class WavelengthSolutionPar(ParSet):
     def __init__(self, reference=None, method=None,
                  echelle = None, ech_fix_format = None, ech_nspec_coeff = None, ech_norder_coeff = None, ech_sigrej = None,
                  lamps=None, nonlinear_counts = None,
-                 sigdetect=None, fwhm=None, reid_arxiv = None, nreid_min = None, cc_thresh = None, cc_local_thresh = None,
-                 nlocal_cc = None, rms_threshold=None,match_toler=None, func=None, n_first=None, n_final =None,
+                 sigdetect=None, fwhm=None, reid_arxiv = None, nreid_min = None, ncand_arxiv = None, cc_thresh = None,
+                 cc_local_thresh = None, nlocal_cc = None, rms_threshold=None,match_toler=None, func=None, n_first=None, n_final =None,
                  sigrej_first=None, sigrej_final=None,wv_cen=None, disp=None,numsearch=None,nfitpix=None, IDpixels=None,
-                 IDwaves=None, medium=None, frame=None, nsnippet=None):
+                 IDwaves=None, medium=None, frame=None, nsnippet=None, nproc=None, nseed_slits=None,
+                 drift_track=None, drift_cc_thresh=None, drift_window=None):
         # Grab the parameter names and values from the function
         # arguments
         args, _, _, values = inspect.getargvalues(inspect.currentframe())
@@ -1118,10 +1151,53 @@ class WavelengthSolutionPar(ParSet):
                              'echelle (ESI, X-SHOOTER, NIRES) set this 1. For an echelle with a tiltable grating, it will ' \
                              'depend on the number of solutions in the arxiv.'
 
+        defaults['ncand_arxiv'] = None
+        dtypes['ncand_arxiv'] = int
+        descr['ncand_arxiv'] = 'Number of archive spectra to reidentify each slit against.  If set, the archive spectra ' \
+                               'are first ranked against each slit with a cheap cross-correlation of smoothed spectral ' \
+                               'fingerprints and only the ncand_arxiv best candidates are passed to the full ' \
+                               'shift/stretch fit and reidentification.  If None, all archive spectra are used.  ' \
+                               'Ignored for fixed format echelles.'
+
         defaults['nsnippet'] = 2
         dtypes['nsnippet'] = int
         descr['nsnippet'] = 'Number of spectra to chop the arc spectrum into when using the full_template method'
 
+        defaults['nproc'] = 1
+        dtypes['nproc'] = int
+        descr['nproc'] = 'Number of worker threads used to solve the slits (or orders) independently with the ' \
+                         'reidentify, full_template, holy-grail and basic methods.  The solutions are always ' \
+                         'assembled in slit order and the global cross-slit steps run afterwards, so the result ' \
+                         'does not depend on nproc.'
+
+        defaults['nseed_slits'] = None
+        dtypes['nseed_slits'] = int
+        descr['nseed_slits'] = 'Number of slits solved by brute force with the holy-grail method for a multislit ' \
+                               'mask (ignored for ThAr).  If set, only this many slits, spread over the mask, are ' \
+                               'brute forced, and a joint model of their central wavelength and dispersion versus ' \
+                               'slit position predicts the solutions of the remaining slits, which are then only ' \
+                               'refined.  Slits whose refinement fails are brute forced.  If None, all slits are ' \
+                               'brute forced.'
+
+        defaults['drift_track'] = False
+        dtypes['drift_track'] = bool
+        descr['drift_track'] = 'Reuse the wavelength solution of an earlier calibration group with the same setup ' \
+                               'and detector, if one exists in memory or in the master directory.  Only the small ' \
+                               'shift and stretch of each slit relative to the earlier arc are measured and the ' \
+                               'earlier line identifications are refit.  Slits whose arc cross-correlation is below ' \
+                               'drift_cc_thresh are solved from scratch with the selected method.'
+
+        defaults['drift_cc_thresh'] = 0.9
+        dtypes['drift_cc_thresh'] = float
+        descr['drift_cc_thresh'] = 'Threshold for the cross-correlation coefficient between the arc of a slit and ' \
+                                   'the arc of the earlier solution required to reuse that solution (see drift_track)'
+
+        defaults['drift_window'] = 0.005
+        dtypes['drift_window'] = float
+        descr['drift_window'] = 'Maximum drift searched when reusing an earlier solution (see drift_track).  The ' \
+                                'stretch is searched within 1 +/- drift_window and the shift within +/- ' \
+                                'drift_window times the number of spectral pixels about the cross-correlation shift.'
+
         defaults['cc_thresh'] = 0.70
         dtypes['cc_thresh'] = [float, list, numpy.ndarray]
         descr['cc_thresh'] = 'Threshold for the *global* cross-correlation coefficient between an input spectrum and member ' \
@@ -1241,10 +1317,10 @@ class WavelengthSolutionPar(ParSet):
         parkeys = [ 'reference', 'method',
                     'echelle', 'ech_fix_format', 'ech_nspec_coeff', 'ech_norder_coeff', 'ech_sigrej',
                     'lamps', 'nonlinear_counts', 'sigdetect', 'fwhm',
-                    'reid_arxiv', 'nreid_min', 'cc_thresh', 'cc_local_thresh', 'nlocal_cc',
+                    'reid_arxiv', 'nreid_min', 'ncand_arxiv', 'cc_thresh', 'cc_local_thresh', 'nlocal_cc',
                     'rms_threshold', 'match_toler', 'func', 'n_first','n_final', 'sigrej_first', 'sigrej_final',
                     'wv_cen', 'disp', 'numsearch', 'nfitpix','IDpixels', 'IDwaves', 'medium', 'frame',
-                    'nsnippet']
+                    'nsnippet', 'nproc', 'nseed_slits', 'drift_track', 'drift_cc_thresh', 'drift_window']
         kwargs = {}
         for pk in parkeys:
             kwargs[pk] = cfg[pk] if pk in k else None
@@ -1286,7 +1362,14 @@ class WavelengthSolutionPar(ParSet):
         return [ 'heliocentric', 'barycentric' ]
 
     def validate(self):
-        pass
+        if self.data['nproc'] < 1:
+            raise ValueError('nproc must be at least 1.')
+        if self.data['drift_window'] <= 0:
+            raise ValueError('drift_window must be positive.')
+        if self.data['nseed_slits'] is not None and self.data['nseed_slits'] < 2:
+            raise ValueError('nseed_slits must be at least 2.')
+        if self.data['ncand_arxiv'] is not None and self.data['ncand_arxiv'] < 1:
+            raise ValueError('ncand_arxiv must be at least 1.')
 
 
 class TraceSlitsPar(ParSet):
@@ -1876,7 +1959,7 @@ class ScienceImagePar(ParSet):
 
     def __init__(self, bspline_spacing=None, boxcar_radius=None, trace_npoly=None,
                  global_sky_std=None, sig_thresh=None, maxnumber=None, sn_gauss=None, model_full_slit=None,
-                 no_poly=None, manual=None, sky_sigrej=None):
+                 no_poly=None, manual=None, sky_sigrej=None, nproc=None, objfind_seed=None):
 
         # Grab the parameter names and values from the function
         # arguments
@@ -1951,6 +2034,19 @@ class ScienceImagePar(ParSet):
         dtypes['manual'] = list
         descr['manual'] = 'List of manual extraction parameter sets'
 
+        defaults['nproc'] = 1
+        dtypes['nproc'] = int
+        descr['nproc'] = 'Number of worker threads used to process the slits independently when ' \
+                         'finding objects, in the local sky subtraction and extraction, and in 2D ' \
+                         'coadds.  The results are always assembled in slit order, so they do not ' \
+                         'depend on nproc.'
+
+        defaults['objfind_seed'] = False
+        dtypes['objfind_seed'] = bool
+        descr['objfind_seed'] = 'If True, the objects found on the frame before sky subtraction are used ' \
+                                'as seeds for tracing in the second pass of object finding, rather than ' \
+                                'tracing all objects from scratch.'
+
         # Instantiate the parameter set
         super(ScienceImagePar, self).__init__(list(pars.keys()),
                                               values=list(pars.values()),
@@ -1965,7 +2061,7 @@ class ScienceImagePar(ParSet):
         k = cfg.keys()
         #ToDO change to updated param list
         parkeys = ['bspline_spacing', 'boxcar_radius', 'trace_npoly', 'global_sky_std', 'sig_thresh', 'maxnumber', 'sn_gauss',
-                   'model_full_slit', 'no_poly', 'manual', 'sky_sigrej']
+                   'model_full_slit', 'no_poly', 'manual', 'sky_sigrej', 'nproc', 'objfind_seed']
         kwargs = {}
         for pk in parkeys:
             kwargs[pk] = cfg[pk] if pk in k else None
@@ -1973,7 +2069,8 @@ class ScienceImagePar(ParSet):
         return cls(**kwargs)
 
     def validate(self):
-        pass
+        if self.data['nproc'] < 1:
+            raise ValueError('nproc must be at least 1.')
 
 
 class CalibrationsPar(ParSet):
@@ -74,6 +74,9 @@ class ProcessImages(object):
             string.  Will be parsed into spatial and spectral binning
             using :func:`pypeit.core.parse.parse_binning`.  If None,
             determined from the header of each file.
+        dtype (numpy floating-point type, optional):
+            Type of the loaded and processed images.  Default is
+            double precision.
 
     Attributes:
         files (:obj:`list`):
@@ -83,6 +86,8 @@ class ProcessImages(object):
             The spectrograph used to take the data.
         det (:obj:`int`):
             Detector to process
+        dtype (numpy floating-point type):
+            Type of the loaded and processed images
         frametype (:obj:`str`):
             Class attribute that is overwritten by derived classes.
         stack (:obj:`numpy.ndarray`):
@@ -117,7 +122,7 @@ class ProcessImages(object):
     frametype='Unknown'
     bitmask = ProcessImagesBitMask()  # The bit mask interpreter
 
-    def __init__(self, spectrograph, par, files=None, det=1, binning=None):
+    def __init__(self, spectrograph, par, files=None, det=1, binning=None, dtype=np.float64):
 
         # Assign the internal list of files
         self._set_files(files)
@@ -145,6 +150,7 @@ class ProcessImages(object):
         self.datasec = []
         self.oscansec = []
         self.binning = binning      # Can be None
+        self.dtype = dtype
 
         self.proc_images = None  # Will be an ndarray
 
@@ -309,7 +315,8 @@ class ProcessImages(object):
         for i in range(self.nfiles):
             # Load the image data and headers
             self.raw_images[i], self.headers[i] \
-                    = self.spectrograph.load_raw_frame(self.files[i], det=self.det)
+                    = self.spectrograph.load_raw_frame(self.files[i], det=self.det,
+                                                       dtype=self.dtype)
 
             if self.binning[i] is None:
                 self.binning[i] = self.spectrograph.get_meta_value(self.files[i], 'binning')
@@ -434,7 +441,8 @@ class ProcessImages(object):
             # Save
             if kk==0:
                 # Instantiate proc_images
-                self.proc_images = np.zeros((temp.shape[0], temp.shape[1], self.nloaded))
+                self.proc_images = np.zeros((temp.shape[0], temp.shape[1], self.nloaded),
+                                            dtype=self.dtype)
             self.proc_images[:,:,kk] = temp.copy()
         # Step
         self.steps.append(inspect.stack()[0][3])
@@ -464,6 +472,7 @@ class ProcessImages(object):
                                              n_lohi=self.proc_par['n_lohi'],
                                              sig_lohi=self.proc_par['sig_lohi'],
                                              replace=self.proc_par['replace'])
+        self.stack = self.stack.astype(self.dtype, copy=False)
         # Step
         self.steps.append(inspect.stack()[0][3])
         return self.stack
@@ -545,7 +554,8 @@ class ProcessImages(object):
                 datasec_img = self.spectrograph.get_datasec_img(self.files[0], det=self.det)
                 temp = procimg.trim_frame(temp, datasec_img < 1)
             # Init proc_images array
-            self.proc_images = np.zeros((temp.shape[0], temp.shape[1], self.nloaded))
+            self.proc_images = np.zeros((temp.shape[0], temp.shape[1], self.nloaded),
+                                        dtype=self.dtype)
             # Load it up
             for kk,image in enumerate(self.raw_images):
                 self.proc_images[:,:,kk] = procimg.trim_frame(image, datasec_img < 1) \
@@ -678,36 +688,28 @@ class ProcessImages(object):
         mask = np.zeros_like(sciimg, dtype=cls.bitmask.minimum_dtype(asuint=True))
 
         # Bad pixel mask
-        indx = bpm.astype(bool)
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'BPM')
+        cls.bitmask.turn_on_where(mask, bpm.astype(bool, copy=False), 'BPM')
 
         # Cosmic rays
-        indx = crmask.astype(bool)
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'CR')
+        cls.bitmask.turn_on_where(mask, crmask.astype(bool, copy=False), 'CR')
 
         # Saturated pixels
-        indx = sciimg >= saturation
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'SATURATION')
+        cls.bitmask.turn_on_where(mask, sciimg >= saturation, 'SATURATION')
 
         # Minimum counts
-        indx = sciimg <= mincounts
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'MINCOUNTS')
+        cls.bitmask.turn_on_where(mask, sciimg <= mincounts, 'MINCOUNTS')
 
         # Undefined counts
-        indx = np.invert(np.isfinite(sciimg))
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'IS_NAN')
+        cls.bitmask.turn_on_where(mask, np.invert(np.isfinite(sciimg)), 'IS_NAN')
 
         # Bad inverse variance values
-        indx = np.invert(sciivar > 0.0)
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'IVAR0')
+        cls.bitmask.turn_on_where(mask, np.invert(sciivar > 0.0), 'IVAR0')
 
         # Undefined inverse variances
-        indx = np.invert(np.isfinite(sciivar))
-        mask[indx] = cls.bitmask.turn_on(mask[indx], 'IVAR_NAN')
+        cls.bitmask.turn_on_where(mask, np.invert(np.isfinite(sciivar)), 'IVAR_NAN')
 
         if slitmask is not None:
-            indx = slitmask == -1
-            mask[indx] = cls.bitmask.turn_on(mask[indx], 'OFFSLITS')
+            cls.bitmask.turn_on_where(mask, slitmask == -1, 'OFFSLITS')
 
         return mask
 
@@ -715,12 +717,10 @@ class ProcessImages(object):
     def update_mask_cr(cls, mask_old, crmask_new):
 
         # Unset the CR bit from all places where it was set
-        CR_old = (cls.bitmask.unpack(mask_old, flag='CR'))[0]
         mask_new = np.copy(mask_old)
-        mask_new[CR_old] = cls.bitmask.turn_off(mask_new[CR_old], 'CR')
+        cls.bitmask.turn_off_where(mask_new, True, 'CR')
         # Now set the CR bit using the new crmask
-        indx = crmask_new.astype(bool)
-        mask_new[indx] = cls.bitmask.turn_on(mask_new[indx], 'CR')
+        cls.bitmask.turn_on_where(mask_new, crmask_new.astype(bool, copy=False), 'CR')
         return mask_new
 
 
@@ -730,13 +730,12 @@ class ProcessImages(object):
 
         # Pixels excluded from any slit.
         mask_new = np.copy(mask_old)
-        indx = slitmask == -1
-        mask_new[indx] = cls.bitmask.turn_on(mask_new[indx], 'OFFSLITS')
+        cls.bitmask.turn_on_where(mask_new, slitmask == -1, 'OFFSLITS')
         return mask_new
 
     @classmethod
     def read_stack(cls, files, bias, pixel_flat, bpm, det, proc_par, spectrograph, illum_flat=None, reject_cr=False,
-                   binning=None):
+                   binning=None, dtype=np.float64):
         """  Utility function for reading in image stacks using ProcessImages
         Parameters
             file_list:
@@ -744,11 +743,12 @@ class ProcessImages(object):
             pixel_flat:
             bpm:
             illum_flat:
+            dtype: numpy floating-point type of the image stacks
         Returns:
         """
         nfiles = len(files)
         for ifile in range(nfiles):
-            this_proc = ProcessImages(spectrograph, proc_par, [files[ifile]], det=det)
+            this_proc = ProcessImages(spectrograph, proc_par, [files[ifile]], det=det, dtype=dtype)
             # TODO I think trim should be hard wired, and am not letting it be a free parameter
             sciimg = this_proc.process(bias_subtract=bias,pixel_flat=pixel_flat, illum_flat=illum_flat, bpm=bpm,
                                        apply_gain=True, trim=True)
@@ -756,9 +756,9 @@ class ProcessImages(object):
             if ifile == 0:
                 # numpy is row major so stacking will be fastest with nfiles as the first dimensions
                 shape = (nfiles, sciimg.shape[0],sciimg.shape[1])
-                sciimg_stack  = np.zeros(shape)
-                sciivar_stack = np.zeros(shape)
-                rn2img_stack  = np.zeros(shape)
+                sciimg_stack  = np.zeros(shape, dtype=dtype)
+                sciivar_stack = np.zeros(shape, dtype=dtype)
+                rn2img_stack  = np.zeros(shape, dtype=dtype)
                 crmask_stack  = np.zeros(shape,dtype=bool)
                 mask_stack  = np.zeros(shape,this_proc.bitmask.minimum_dtype(asuint=True))
 
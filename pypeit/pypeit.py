@@ -33,6 +33,7 @@ from linetools import utils as ltu
 from configobj import ConfigObj
 from pypeit.par.util import parse_pypeit_file
 from pypeit.par import PypeItPar
+from pypeit.par import pypeitpar
 from pypeit.metadata import PypeItMetaData
 
 from pypeit import debugger
@@ -214,63 +215,72 @@ class PypeIt(object):
 
         self.tstart = time.time()
 
-        # Find the standard frames
-        is_standard = self.fitstbl.find_frames('standard')
-
-        # Find the science frames
-        is_science = self.fitstbl.find_frames('science')
-
-        # Frame indices
-        frame_indx = np.arange(len(self.fitstbl))
-
-        # Iterate over each calibration group and reduce the standards
-        for i in range(self.fitstbl.n_calib_groups):
-
-            # Find all the frames in this calibration group
-            in_grp = self.fitstbl.find_calib_group(i)
-
-            # Find the indices of the standard frames in this calibration group:
-            grp_standards = frame_indx[is_standard & in_grp]
-
-            # Reduce all the standard frames, loop on unique comb_id
-            u_combid_std= np.unique(self.fitstbl['comb_id'][grp_standards])
-            for j, comb_id in enumerate(u_combid_std):
-                frames = np.where(self.fitstbl['comb_id'] == comb_id)[0]
-                bg_frames = np.where(self.fitstbl['bkg_id'] == comb_id)[0]
-                if not self.outfile_exists(frames[0]) or self.overwrite:
-                    std_dict = self.reduce_exposure(frames, bg_frames=bg_frames)
-                    # TODO come up with sensible naming convention for save_exposure for combined files
-                    self.save_exposure(frames[0], std_dict, self.basename)
-                else:
-                    msgs.info('Output file: {:s} already exists'.format(self.fitstbl.construct_basename(frames[0])) +
-                              '. Set overwrite=True to recreate and overwrite.')
-
-        # Iterate over each calibration group again and reduce the science frames
-        for i in range(self.fitstbl.n_calib_groups):
-            # Find all the frames in this calibration group
-            in_grp = self.fitstbl.find_calib_group(i)
-
-            # Find the indices of the science frames in this calibration group:
-            grp_science = frame_indx[is_science & in_grp]
-            # Associate standards (previously reduced above) for this setup
-            std_outfile = self.get_std_outfile(frame_indx[is_standard])
-            # Reduce all the science frames; keep the basenames of the science frames for use in flux calibration
-            science_basename = [None]*len(grp_science)
-            # Loop on unique comb_id
-            u_combid = np.unique(self.fitstbl['comb_id'][grp_science])
-            for j, comb_id in enumerate(u_combid):
-                frames = np.where(self.fitstbl['comb_id'] == comb_id)[0]
-                bg_frames = np.where(self.fitstbl['bkg_id'] == comb_id)[0]
-                if not self.outfile_exists(frames[0]) or self.overwrite:
-                    sci_dict = self.reduce_exposure(frames, bg_frames=bg_frames, std_outfile=std_outfile)
-                    science_basename[j] = self.basename
-                    # TODO come up with sensible naming convention for save_exposure for combined files
-                    self.save_exposure(frames[0], sci_dict, self.basename)
-                else:
-                    msgs.warn('Output file: {:s} already exists'.format(self.fitstbl.construct_basename(frames[0])) +
-                              '. Set overwrite=True to recreate and overwrite.')
-
-            msgs.info('Finished calibration group {0}'.format(i))
+        # Render the QA plots in the background
+        qa.start_qa_queue(self.par['rdx']['qa_nproc'])
+
+        try:
+            # Find the standard frames
+            is_standard = self.fitstbl.find_frames('standard')
+
+            # Find the science frames
+            is_science = self.fitstbl.find_frames('science')
+
+            # Frame indices
+            frame_indx = np.arange(len(self.fitstbl))
+
+            # Iterate over each calibration group and reduce the standards
+            for i in range(self.fitstbl.n_calib_groups):
+
+                # Find all the frames in this calibration group
+                in_grp = self.fitstbl.find_calib_group(i)
+
+                # Find the indices of the standard frames in this calibration group:
+                grp_standards = frame_indx[is_standard & in_grp]
+
+                # Reduce all the standard frames, loop on unique comb_id
+                u_combid_std= np.unique(self.fitstbl['comb_id'][grp_standards])
+                for j, comb_id in enumerate(u_combid_std):
+                    frames = np.where(self.fitstbl['comb_id'] == comb_id)[0]
+                    bg_frames = np.where(self.fitstbl['bkg_id'] == comb_id)[0]
+                    if not self.outfile_exists(frames[0]) or self.overwrite:
+                        std_dict = self.reduce_exposure(frames, bg_frames=bg_frames)
+                        # TODO come up with sensible naming convention for save_exposure for combined files
+                        self.save_exposure(frames[0], std_dict, self.basename)
+                    else:
+                        msgs.info('Output file: {:s} already exists'.format(self.fitstbl.construct_basename(frames[0])) +
+                                  '. Set overwrite=True to recreate and overwrite.')
+
+            # Iterate over each calibration group again and reduce the science frames
+            for i in range(self.fitstbl.n_calib_groups):
+                # Find all the frames in this calibration group
+                in_grp = self.fitstbl.find_calib_group(i)
+
+                # Find the indices of the science frames in this calibration group:
+                grp_science = frame_indx[is_science & in_grp]
+                # Associate standards (previously reduced above) for this setup
+                std_outfile = self.get_std_outfile(frame_indx[is_standard])
+                # Reduce all the science frames; keep the basenames of the science frames for use in flux calibration
+                science_basename = [None]*len(grp_science)
+                # Loop on unique comb_id
+                u_combid = np.unique(self.fitstbl['comb_id'][grp_science])
+                for j, comb_id in enumerate(u_combid):
+                    frames = np.where(self.fitstbl['comb_id'] == comb_id)[0]
+                    bg_frames = np.where(self.fitstbl['bkg_id'] == comb_id)[0]
+                    if not self.outfile_exists(frames[0]) or self.overwrite:
+                        sci_dict = self.reduce_exposure(frames, bg_frames=bg_frames, std_outfile=std_outfile)
+                        science_basename[j] = self.basename
+                        # TODO come up with sensible naming convention for save_exposure for combined files
+                        self.save_exposure(frames[0], sci_dict, self.basename)
+                    else:
+                        msgs.warn('Output file: {:s} already exists'.format(self.fitstbl.construct_basename(frames[0])) +
+                                  '. Set overwrite=True to recreate and overwrite.')
+
+                msgs.info('Finished calibration group {0}'.format(i))
+        finally:
+            # Wait for the QA plots, and always stop the QA processes, such that a failed reduction does not
+            # leave them running
+            for error in qa.finish_qa_queue():
+                msgs.warn('QA plot failed: {0}'.format(error))
 
         # Finish
         self.print_end_time()
@@ -522,7 +532,9 @@ class PypeIt(object):
                                               ir_redux = self.ir_redux,
                                               par=self.par['scienceframe'],
                                               det=det,
-                                              binning=self.binning)
+                                              binning=self.binning,
+                                              dtype=pypeitpar.ReducePar.image_dtype(
+                                                  self.par['rdx']['precision']))
         # For QA on crash.
         msgs.sciexp = self.sciI
 
@@ -557,10 +569,11 @@ class PypeIt(object):
 
         if not self.std_redux:
             # Object finding, second pass on frame *with* sky subtraction. Show here if requested
+            seed_sobjs = self.sobjs_obj if self.par['scienceimage']['objfind_seed'] else None
             self.sobjs_obj, self.nobj, self.skymask = \
                 self.redux.find_objects(self.sciimg - self.initial_sky, self.sciivar, std=self.std_redux, ir_redux=self.ir_redux,
                                   std_trace=std_trace,maskslits=self.maskslits,show=self.show,
-                                        manual_extract_dict=manual_extract_dict)
+                                        manual_extract_dict=manual_extract_dict, seed_sobjs=seed_sobjs)
 
         # If there are objects, do 2nd round of global_skysub, local_skysub_extract, flexure, geo_motion
         if self.nobj > 0:
@@ -198,14 +198,36 @@ class Reduce(object):
 
     def find_objects(self, image, ivar, std=False, ir_redux=False, std_trace=None, maskslits=None,
                           show_peaks=False, show_fits=False, show_trace=False, show=False,
-                     manual_extract_dict=None):
+                     manual_extract_dict=None, seed_sobjs=None):
+        """
+        Find objects in the positive (and for IR reductions the negative) image
+
+        Args:
+            seed_sobjs (SpecObjs, optional):
+                Objects found in a previous pass of object finding on
+                this exposure, e.g. before the initial sky subtraction.
+                These are used as seeds for tracing objects which are
+                detected again.  Negative objects are used as seeds
+                for the negative image.
+
+        Returns:
+            SpecObjs, int, ndarray: Objects found, number of positive
+            objects, and the boolean skymask image
+
+        """
+
+        # Split the seeds by sign
+        seed_pos, seed_neg = None, None
+        if seed_sobjs is not None and len(seed_sobjs) > 0:
+            seed_pos = seed_sobjs[seed_sobjs.sign > 0]
+            seed_neg = seed_sobjs[seed_sobjs.sign < 0]
 
         # Positive image
         parse_manual = self.parse_manual_dict(manual_extract_dict, neg=False)
         sobjs_obj_init, nobj_init, skymask_pos = \
             self.find_objects_pypeline(image, ivar, std=std, std_trace=std_trace, maskslits=maskslits,
                                    show_peaks = show_peaks, show_fits = show_fits, show_trace = show_trace,
-                                       manual_extract_dict=parse_manual)
+                                       manual_extract_dict=parse_manual, seed_sobjs=seed_pos)
 
         # For nobj we take only the positive objects
         if ir_redux:
@@ -214,7 +236,7 @@ class Reduce(object):
             sobjs_obj_init_neg, nobj_init_neg, skymask_neg = \
                 self.find_objects_pypeline(-image, ivar, std=std, std_trace=std_trace, maskslits=maskslits,
                 show_peaks=show_peaks, show_fits=show_fits, show_trace=show_trace,
-                                           manual_extract_dict=parse_manual)
+                                           manual_extract_dict=parse_manual, seed_sobjs=seed_neg)
             skymask = skymask_pos & skymask_neg
             sobjs_obj_init.append_neg(sobjs_obj_init_neg)
         else:
@@ -229,7 +251,7 @@ class Reduce(object):
 
     def find_objects_pypeline(self, image, ivar, std=False, std_trace=None, maskslits=None,
                               show_peaks=False, show_fits=False, show_trace=False, show=False, debug=False,
-                              manual_extract_dict=None):
+                              manual_extract_dict=None, seed_sobjs=None):
 
         """
          Dummy method for object finding. Overloaded by class specific object finding.
@@ -530,7 +552,7 @@ class MultiSlit(Reduce):
 
 
     def find_objects_pypeline(self, image, ivar, std=False, std_trace = None, maskslits=None,
-                              manual_extract_dict=None,
+                              manual_extract_dict=None, seed_sobjs=None,
                               show_peaks=False, show_fits=False, show_trace=False, show=False, debug=False):
         """
         Find objects in the slits. This is currently setup only for ARMS
@@ -553,6 +575,12 @@ class MultiSlit(Reduce):
         SHOW_TRACE:  bool
           Generate QA  showing traces identified. Requires an open ginga RC modules window
 
+        SEED_SOBJS: Specobjs object
+          Objects from a previous pass of object finding used as seeds for tracing. See extract.objfind
+
+        The slits are processed in parallel when redux_par['nproc'] > 1. The output is
+        identical to the serial case, i.e. the objects are always assembled in slit order.
+
         Returns
         -------
         specobjs : Specobjs object
@@ -572,8 +600,9 @@ class MultiSlit(Reduce):
         # Instantiate the specobjs container
         sobjs = specobjs.SpecObjs()
 
-        # Loop on slits
-        for slit in gdslits:
+        sig_thresh = 30.0 if std else self.redux_par['sig_thresh']
+
+        def _objfind_slit(slit):
             qa_title ="Finding objects on slit # {:d}".format(slit)
             msgs.info(qa_title)
             thismask = (self.slitmask == slit)
@@ -581,19 +610,29 @@ class MultiSlit(Reduce):
             # Find objects
             specobj_dict = {'setup': self.setup, 'slitid': slit, 'orderindx': 999,
                             'det': self.det, 'objtype': self.objtype, 'pypeline': self.pypeline}
+            # Seeds from a previous pass on this slit
+            seed_slit = None
+            if seed_sobjs is not None and len(seed_sobjs) > 0:
+                seed_slit = seed_sobjs[seed_sobjs.slitid == slit]
 
             # TODO we need to add QA paths and QA hooks. QA should be
             # done through objfind where all the relevant information
             # is. This will be a png file(s) per slit.
 
-            sig_thresh = 30.0 if std else self.redux_par['sig_thresh']
-            #
-            sobjs_slit, skymask[thismask] = \
+            sobjs_slit, skymask_slit = \
                 extract.objfind(image, thismask, self.tslits_dict['slit_left'][:,slit],self.tslits_dict['slit_righ'][:,slit],
                 inmask=inmask, ncoeff=self.redux_par['trace_npoly'],
                 std_trace=std_trace, sig_thresh=sig_thresh, hand_extract_dict=manual_extract_dict, #self.redux_par['manual'],
-                specobj_dict=specobj_dict, show_peaks=show_peaks,show_fits=show_fits, show_trace=show_trace,
-                qa_title=qa_title, nperslit=self.redux_par['maxnumber'])
+                specobj_dict=specobj_dict, seed_sobjs=seed_slit, show_peaks=show_peaks,show_fits=show_fits,
+                show_trace=show_trace, qa_title=qa_title, nperslit=self.redux_par['maxnumber'])
+            return thismask, sobjs_slit, skymask_slit
+
+        # Interactive plots cannot be generated from the worker threads
+        nproc = 1 if (show_peaks or show_fits or show_trace) else self.redux_par['nproc']
+        # Loop on slits. Results are returned in slit order regardless of nproc
+        for thismask, sobjs_slit, skymask_slit in utils.parallel_map(_objfind_slit, [(slit,) for slit in gdslits],
+                                                                     nproc=nproc):
+            skymask[thismask] = skymask_slit
             sobjs.add_sobj(sobjs_slit)
 
         # Steps
@@ -659,29 +698,38 @@ class MultiSlit(Reduce):
         # overkill since nothing is extracted
 
         self.sobjs = sobjs.copy()
-        # Loop on slits
-        for slit in gdslits:
+
+        def _skysub_slit(slit):
             msgs.info("Local sky subtraction and extraction for slit: {:d}".format(slit))
             thisobj = (self.sobjs.slitid == slit) # indices of objects for this slit
-            if np.any(thisobj):
-                thismask = (self.slitmask == slit) # pixels for this slit
-                # True  = Good, False = Bad for inmask
-                inmask = (self.mask == 0) & thismask
-                # Local sky subtraction and extraction
-                self.skymodel[thismask], self.objmodel[thismask], self.ivarmodel[thismask], \
-                    self.extractmask[thismask] = skysub.local_skysub_extract(
-                    self.sciimg, self.sciivar, self.tilts, self.waveimg, self.global_sky, self.rn2img,
-                    thismask, self.tslits_dict['slit_left'][:,slit], self.tslits_dict['slit_righ'][:, slit],
-                    self.sobjs[thisobj], spat_pix=spat_pix, model_full_slit=self.redux_par['model_full_slit'],
-                    box_rad=self.redux_par['boxcar_radius']/self.spectrograph.detector[self.det-1]['platescale'],
-                    sigrej=self.redux_par['sky_sigrej'],
-                    model_noise=model_noise, std=std, bsp=self.redux_par['bspline_spacing'],
-                    sn_gauss=self.redux_par['sn_gauss'], inmask=inmask, show_profile=show_profile)
+            thismask = (self.slitmask == slit) # pixels for this slit
+            # True  = Good, False = Bad for inmask
+            inmask = (self.mask == 0) & thismask
+            # Local sky subtraction and extraction
+            return skysub.local_skysub_extract(
+                self.sciimg, self.sciivar, self.tilts, self.waveimg, self.global_sky, self.rn2img,
+                thismask, self.tslits_dict['slit_left'][:,slit], self.tslits_dict['slit_righ'][:, slit],
+                self.sobjs[thisobj], spat_pix=spat_pix, model_full_slit=self.redux_par['model_full_slit'],
+                box_rad=self.redux_par['boxcar_radius']/self.spectrograph.detector[self.det-1]['platescale'],
+                sigrej=self.redux_par['sky_sigrej'],
+                model_noise=model_noise, std=std, bsp=self.redux_par['bspline_spacing'],
+                sn_gauss=self.redux_par['sn_gauss'], inmask=inmask, show_profile=show_profile)
+
+        # Interactive plots cannot be generated from the worker threads
+        nproc = 1 if show_profile else self.redux_par['nproc']
+        objslits = [slit for slit in gdslits if np.any(self.sobjs.slitid == slit)]
+        # Loop on slits. The extracted objects and models are identical for any nproc. Only the pixels on each
+        # slit are returned, the slit mask is rebuilt here to avoid holding a full image per slit
+        for slit, (skymodel, objmodel, ivarmodel, extractmask) in zip(objslits, utils.parallel_map(
+                _skysub_slit, [(slit,) for slit in objslits], nproc=nproc)):
+            thismask = (self.slitmask == slit)
+            self.skymodel[thismask], self.objmodel[thismask], self.ivarmodel[thismask], \
+                self.extractmask[thismask] = skymodel, objmodel, ivarmodel, extractmask
 
         # Set the bit for pixels which were masked by the extraction.
         # For extractmask, True = Good, False = Bad
         iextract = (self.mask == 0) & (self.extractmask == False)
-        self.outmask[iextract] = processimages.ProcessImages.bitmask.turn_on(self.outmask[iextract], 'EXTRACT')
+        processimages.ProcessImages.bitmask.turn_on_where(self.outmask, iextract, 'EXTRACT')
 
         # Step
         self.steps.append(inspect.stack()[0][3])
@@ -705,7 +753,7 @@ class Echelle(Reduce):
 
     def find_objects_pypeline(self, image, ivar, std=False, std_trace = None, maskslits=None,
                               show=False, show_peaks=False, show_fits=False, show_trace = False, debug=False,
-                              manual_extract_dict=None):
+                              manual_extract_dict=None, seed_sobjs=None):
 
         # create the ouptut image for skymask
         skymask = np.zeros_like(image, dtype=bool)
@@ -722,7 +770,7 @@ class Echelle(Reduce):
                                 inmask=inmask, ncoeff=self.redux_par['trace_npoly'],
                                 hand_extract_dict=manual_extract_dict,
                                 plate_scale=plate_scale, std_trace=std_trace,
-                                specobj_dict=specobj_dict,sig_thresh=sig_thresh,
+                                specobj_dict=specobj_dict,sig_thresh=sig_thresh, seed_sobjs=seed_sobjs,
                                 show_peaks=show_peaks, show_fits=show_fits,
                                 show_trace=show_trace, debug=debug)
 
@@ -33,6 +33,9 @@ class ScienceImage(processimages.ProcessImages):
     objtype : str
       'science'
       'standard'
+    dtype : numpy floating-point type, optional
+      Type of the processed science images, sciimg, sciivar and rn2img.
+      Set by the precision in PypeItPar['rdx']
 
     Attributes
     ----------
@@ -77,7 +80,8 @@ class ScienceImage(processimages.ProcessImages):
     frametype = 'science'
 
     # TODO: Merge into a single parset, one for procing, and one for scienceimage
-    def __init__(self, spectrograph, file_list, bg_file_list = [], ir_redux=False, det=1, binning=None, par=None):
+    def __init__(self, spectrograph, file_list, bg_file_list = [], ir_redux=False, det=1, binning=None, par=None,
+                 dtype=np.float64):
 
 
         # Setup the parameters sets for this object. NOTE: This uses objtype, not frametype!
@@ -86,7 +90,7 @@ class ScienceImage(processimages.ProcessImages):
 
         # Start up by instantiating the process images class for reading in the relevant science files
         processimages.ProcessImages.__init__(self, spectrograph, self.par['process'],
-                                             files=[], det=det)
+                                             files=[], det=det, dtype=dtype)
 
         # Instantiation attributes for this object
         self.spectrograph = spectrograph
@@ -191,7 +195,8 @@ class ScienceImage(processimages.ProcessImages):
         weights = np.ones(nsci)/float(nsci)
         sciimg_stack, sciivar_stack, rn2img_stack, crmask_stack, mask_stack = \
         self.read_stack(file_list, self.bias, self.pixel_flat, self.bpm, self.det, self.par['process'], self.spectrograph,
-                            illum_flat=self.illum_flat, reject_cr=reject_cr, binning=self.binning)
+                            illum_flat=self.illum_flat, reject_cr=reject_cr, binning=self.binning,
+                            dtype=self.dtype)
 
         # ToDO The bitmask is not being properly propagated here!
 
@@ -202,9 +207,9 @@ class ScienceImage(processimages.ProcessImages):
             sci_list_out, var_list_out, outmask, nused = coadd2d.weighted_combine(
                 weights, sci_list, var_list, (mask_stack == 0),
                 sigma_clip=sigma_clip, sigma_clip_stack = sciimg_stack, sigrej=sigrej, maxiters=maxiters)
-            sciimg = sci_list_out[0]
-            sciivar = utils.calc_ivar(var_list_out[0])
-            rn2img = var_list_out[1]
+            sciimg = sci_list_out[0].astype(self.dtype, copy=False)
+            sciivar = utils.calc_ivar(var_list_out[0]).astype(self.dtype, copy=False)
+            rn2img = var_list_out[1].astype(self.dtype, copy=False)
             # assumes everything masked in the outmask is a CR in the individual images
             crmask = np.invert(outmask)
             # Create a mask for this image now
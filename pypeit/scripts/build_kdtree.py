@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+#
+# See top-level LICENSE file for Copyright information
+#
+# -*- coding: utf-8 -*-
+
+"""
+This script prebuilds the ThAr pattern store used by the KD Tree
+wavelength calibration algorithm
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+
+def parser(options=None):
+
+    parser = argparse.ArgumentParser(description='Build the ThAr pattern store used to wavelength calibrate '
+                                                 'ThAr arcs.  The store is written to $PYPEIT_CACHE, or '
+                                                 '~/.pypeit/cache if it is not set.',
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('--polygon', type=int, nargs='+', default=[3, 4, 5, 6],
+                        help='Number of sides of the polygons to build the patterns for')
+    parser.add_argument('--numsearch', type=int, nargs='+', default=[10],
+                        help='Number of consecutive lines used to generate the patterns')
+    parser.add_argument('--overwrite', default=False, action='store_true',
+                        help='Rebuild the patterns that are already in the store')
+
+    if options is None:
+        args = parser.parse_args()
+    else:
+        args = parser.parse_args(options)
+    return args
+
+
+def main(args):
+
+    import os
+
+    from pypeit.core.wavecal import waveio
+
+    for polygon in args.polygon:
+        for numsearch in args.numsearch:
+            files = waveio.pattern_store_files(polygon, numsearch)
+            if not args.overwrite and all([os.path.isfile(f) for f in files]):
+                print('Patterns for polygon={0:d}, numsearch={1:d} already exist: {2:s}'.format(
+                      polygon, numsearch, files[0]))
+                continue
+            waveio.build_pattern_store(polygon, numsearch)
@@ -15,6 +15,8 @@ def parser(options=None):
     parser = argparse.ArgumentParser(description='Script to coadd a set of spec1D files and 1 or more slits and 1 or more objects. Current defaults use Optimal + Fluxed extraction. [v1.1]')
     parser.add_argument("infile", type=str, help="Input file (YAML)")
     parser.add_argument("--debug", default=False, action='store_true', help="Turn debugging on")
+    parser.add_argument("--nproc", default=1, type=int,
+                        help="Number of processes used to coadd the objects in parallel")
 
     if options is None:
         args = parser.parse_args()
@@ -23,6 +25,15 @@ def parser(options=None):
     return args
 
 
+def coadd_object(spectra, qafile, outfile, scale_dict, gparam):
+    """ Coadd the spectra of one object;  run by main as soon as the object
+    is loaded, or in a worker process when nproc > 1
+    """
+    from pypeit.core import coadd
+    return coadd.coadd_spectra(spectra, qafile=qafile, outfile=outfile, flux_scale=scale_dict,
+                               **gparam)
+
+
 def main(args, unit_test=False, path=''):
     """ Runs the XSpecGui on an input file
     path : str, optional
@@ -40,6 +51,7 @@ def main(args, unit_test=False, path=''):
     from pypeit import msgs
     from pypeit.core import coadd
     from pypeit import specobjs
+    from pypeit import utils
 
     # Load the input file
     with open(args.infile, 'r') as infile:
@@ -66,12 +78,15 @@ def main(args, unit_test=False, path=''):
         if pypeline == 'Echelle':
             ext_final = fits.getheader(files[0], -1)
             norder = ext_final['ECHORDER'] + 1
+    # Open each file once and index the objects it holds;  all of the
+    # objects are then loaded from these
+    hdulists = {}
     fdict = {}
     for ifile in files:
         # Open file
-        hdulist = fits.open(ifile)
+        hdulists[ifile] = fits.open(ifile)
         # Grab objects
-        objects = [hdu.name for hdu in hdulist][1:]
+        objects = [hdu.name for hdu in hdulists[ifile]][1:]
         fdict[ifile] = objects
 
     # Global parameters?
@@ -94,7 +109,9 @@ def main(args, unit_test=False, path=''):
     else:
         flux_value = True
 
-    # Loop on sources
+    # Loop on sources.  With a single process each object is coadded as soon as it is
+    # loaded;  otherwise the objects are collected for the process pool
+    coadd_jobs = []
     for key in coadd_dict.keys():
         # Re-init gparam
         gparam = sv_gparam.copy()
@@ -153,7 +170,7 @@ def main(args, unit_test=False, path=''):
                 elif len(mtch_obj) == 1:
                     #Check if optimal extraction is present in all objects.
                     # If not, warn the user and set ex_value to 'box'.
-                    hdulist = fits.open(fkey)
+                    hdulist = hdulists[fkey]
                     try: #In case the optimal extraction array is a NaN array
                         if flux_value is True: # If we have a fluxed spectrum, look for flam
                             obj_opt = hdulist[mtch_obj[0]].data['OPT_FLAM']
@@ -204,8 +221,15 @@ def main(args, unit_test=False, path=''):
 
         else:
             spectra = coadd.load_spec(gdfiles, iextensions=extensions,
-                                        extract=ex_value, flux=flux_value)
-            # Coadd!
-            coadd.coadd_spectra(spectra, qafile=qafile, outfile=outfile,
-                                flux_scale=scale_dict, **gparam)
+                                        extract=ex_value, flux=flux_value, hdulists=hdulists)
+            if args.nproc is None or args.nproc <= 1:
+                coadd_object(spectra, qafile, outfile, scale_dict, gparam)
+            else:
+                coadd_jobs.append((spectra, qafile, outfile, scale_dict, gparam))
+
+    # Coadd!
+    if len(coadd_jobs) > 0:
+        utils.parallel_map(coadd_object, coadd_jobs, nproc=args.nproc, threads=False)
+    for hdulist in hdulists.values():
+        hdulist.close()
 
@@ -106,6 +106,8 @@ def parser(options=None):
     parser.add_argument("--par_outfile", default='coadd2d.par', action="store_true",
                         help="Output file to save the parameters")
     parser.add_argument("--debug", default=False, action="store_true", help="show debug plots?")
+    parser.add_argument("--stream", default=False, action="store_true",
+                        help="Read the images slit by slit instead of holding all of them in memory")
 
 
     if options is None:
@@ -190,7 +192,7 @@ def main(args):
         sci_dict[det] = {}
 
         # Read in the images stacks and other clibration/meta data for this detector
-        stack_dict = coadd2d.load_coadd2d_stacks(spec2d_files, det)
+        stack_dict = coadd2d.load_coadd2d_stacks(spec2d_files, det, stream=args.stream)
 
         sci_dict[det]['sciimg'], sci_dict[det]['sciivar'], sci_dict[det]['skymodel'], \
         sci_dict[det]['objmodel'], sci_dict[det]['ivarmodel'], sci_dict[det]['outmask'], \
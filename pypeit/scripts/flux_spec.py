@@ -81,6 +81,8 @@ def parser(options=None):
     parser.add_argument("flux_file", type=str, help="File to guide fluxing process")
     parser.add_argument("--debug", default=False, action="store_true", help="show debug plots?")
     parser.add_argument("--plot", default=False, action="store_true", help="Show the sensitivity function?")
+    parser.add_argument("--bulk", default=False, action="store_true",
+                        help="Flux all the spec1d files in one pass, writing only the fluxed columns")
     parser.add_argument("--par_outfile", default='fluxing.par', action="store_true", help="Output to save the parameters")
 
     if options is None:
@@ -140,7 +142,9 @@ def main(args, unit_test=False):
             FxSpec.show_sensfunc()
 
     # Flux?
-    if len(flux_dict) > 0:
+    if len(flux_dict) > 0 and args.bulk:
+        FxSpec.flux_science_files(flux_dict['spec1d_files'], flux_files=flux_dict['flux_files'])
+    elif len(flux_dict) > 0:
         for spec1d_file, flux_file in zip(flux_dict['spec1d_files'], flux_dict['flux_files']):
             FxSpec.flux_science(spec1d_file)
             FxSpec.write_science(flux_file)
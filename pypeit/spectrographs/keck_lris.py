@@ -740,7 +740,7 @@ class KeckLRISRLSpectrograph(KeckLRISRSpectrograph):
         self.numhead = 3
         # Uses default timeunit
 
-    def load_raw_frame(self, raw_file, det=None):
+    def load_raw_frame(self, raw_file, det=None, dtype=np.float64):
         """
         Wrapper to the raw image reader for LRIS
 
@@ -748,6 +748,8 @@ class KeckLRISRLSpectrograph(KeckLRISRSpectrograph):
             raw_file:  str, filename
             det: int, REQUIRED
               Desired detector
+            dtype: numpy floating-point type, optional
+              Type of the returned image
             **null_kwargs:
               Captured and never used
 
@@ -763,7 +765,8 @@ class KeckLRISRLSpectrograph(KeckLRISRSpectrograph):
         # Grab data (this includes flips as needed)
         data, predata, postdata, x1, y1 = lris_read_amp(hdu, det)
         # Pack
-        raw_img = np.zeros((data.shape[0]+predata.shape[0]+postdata.shape[0], data.shape[1]))
+        raw_img = np.zeros((data.shape[0]+predata.shape[0]+postdata.shape[0], data.shape[1]),
+                           dtype=dtype)
         raw_img[:predata.shape[0],:] = predata
         raw_img[predata.shape[0]:predata.shape[0]+data.shape[0],:] = data
         raw_img[-postdata.shape[0]:,:] = postdata
@@ -114,9 +114,9 @@ class Spectrograph(object):
 #    def _set_calib_par(self, user_supplied=None):
 #        pass
 
-    def load_raw_frame(self, raw_file, det=None):
+    def load_raw_frame(self, raw_file, det=None, dtype=np.float64):
         """
-        Load the image (converted to np.float) and primary header of the input file
+        Load the image (converted to dtype) and primary header of the input file
 
         The image is transposed, as needed, so that the spectral dimension
         runs along the columns
@@ -127,10 +127,12 @@ class Spectrograph(object):
               Extension in the FITS list for the data
             det: int, optional
               Desired detector
+            dtype: numpy floating-point type, optional
+              Type of the returned image
 
         Returns:
             img: ndarray
-              Converted to np.float and transposed if necessary
+              Converted to dtype and transposed if necessary
             head0: Header
 
         """
@@ -142,7 +144,7 @@ class Spectrograph(object):
                                                 det=_det)
 
         # Turn to float
-        img = raw_img.astype(np.float)
+        img = raw_img.astype(dtype)
         # Transpose?
         if self.detector[_det-1]['specaxis'] == 1:
             img = img.T
@@ -40,3 +40,15 @@ def test_detect_lines():
             = arc.detect_lines(arx_sky.flux.value)
     assert (len(arx_w[0]) > 3275)
 
+
+
+def test_fit_multislit():
+    slit_pos = np.linspace(100., 1900., 6)
+    wave_cen = 4800. + 0.25*(slit_pos-1000.) + 2e-5*(slit_pos-1000.)**2
+    disp = 1.26 + 1e-5*(slit_pos-1000.)
+    fit_dict = arc.fit_multislit(slit_pos, wave_cen, disp, order=2)
+    pred_wave_cen, pred_disp = arc.eval_multislit(fit_dict, np.array([550., 1450.]))
+    assert np.allclose(pred_wave_cen, 4800. + 0.25*np.array([-450., 450.]) + 2e-5*450.**2)
+    assert np.allclose(pred_disp, 1.26 + 1e-5*np.array([-450., 450.]))
+    # The order is reduced when there are too few slits
+    assert arc.fit_multislit(slit_pos[:2], wave_cen[:2], disp[:2], order=2)['order'] == 1
@@ -0,0 +1,76 @@
+# Module to run tests on the automated wavelength calibration routines
+
+import numpy as np
+
+from pypeit.core.wavecal import autoid, waveio, wvutils
+
+
+def test_track_drift():
+    wv_calib, _ = waveio.load_reid_arxiv('gemini_gnirs.json')
+    line_list = waveio.load_line_lists(['OH_GNIRS'])
+    prev_fit = wv_calib['4']
+    # Drifted arc
+    spec = wvutils.shift_and_stretch(prev_fit['spec'], 1.7, 1.002)
+    final_fit = autoid.track_drift(spec, prev_fit, line_list, sigdetect=5., n_final=3)
+    assert final_fit is not None
+    assert final_fit['rms'] < 0.2
+    # Pixel of each previously fit line in the drifted arc
+    pixel = (prev_fit['pixel_fit'][prev_fit['mask']]*1.002 + 1.7)
+    assert np.allclose(final_fit['wave_soln'][np.round(pixel).astype(int)],
+                       prev_fit['wave_fit'][prev_fit['mask']], atol=2*np.median(np.abs(np.diff(prev_fit['wave_soln']))))
+    # Arc of a different order
+    assert autoid.track_drift(wv_calib['0']['spec'], prev_fit, line_list, sigdetect=5., n_final=3) is None
+
+
+def test_archive_reid_candidates():
+    from pypeit.par import pypeitpar
+    wv_calib, _ = waveio.load_reid_arxiv('gemini_gnirs.json')
+    spec = np.column_stack([wvutils.shift_and_stretch(wv_calib[key]['spec'], 1.5, 1.001) for key in ['2', '4']])
+    par = pypeitpar.WavelengthSolutionPar(reid_arxiv='gemini_gnirs.json', lamps=['OH_GNIRS'], nreid_min=1,
+                                          ncand_arxiv=2, ech_fix_format=False, sigdetect=5., n_final=3)
+    patt_dict, wv_calib = autoid.ArchiveReid(spec, par=par).get_results()
+    for slit in ['0', '1']:
+        # The candidate recall is propagated to the fits for the arc QA
+        assert wv_calib[slit]['ncand_arxiv'] == patt_dict[slit]['ncand_arxiv'] == 2
+        assert wv_calib[slit]['recall_arxiv'] == patt_dict[slit]['recall_arxiv']
+        assert wv_calib[slit]['rms'] < 0.6
+
+
+def test_holy_grail_predict_slit(monkeypatch):
+    import os
+    from astropy.io import fits
+    from pypeit.par import pypeitpar
+    tbl = fits.getdata(os.path.join(waveio.reid_arxiv_path, 'shane_kast_blue_600.fits'))
+    wave0, flux0 = tbl['wave'], tbl['flux']
+    npix = wave0.size
+    disp = np.median(np.diff(wave0))
+    # Synthetic multislit arc, with a central wavelength and dispersion that vary smoothly with slit position
+    slit_spat = np.array([100., 300., 500., 700., 900.])
+    wave = np.column_stack([wave0[npix//2] + 0.04*(spat-500) + (wave0-wave0[npix//2])*(1+2e-5*(spat-500))
+                            for spat in slit_spat])
+    spec = np.column_stack([np.interp(wave[:,slit], wave0, flux0, left=0., right=0.)
+                            for slit in range(slit_spat.size)])
+    # Record the slits that are brute forced
+    brute = []
+    run_brute_loop = autoid.HolyGrail.run_brute_loop
+    def _run_brute_loop(self, slit, *args, **kwargs):
+        brute.append(slit)
+        return run_brute_loop(self, slit, *args, **kwargs)
+    monkeypatch.setattr(autoid.HolyGrail, 'run_brute_loop', _run_brute_loop)
+    par = pypeitpar.WavelengthSolutionPar(lamps=['CdI','HgI','HeI'], nseed_slits=3)
+    arcfitter = autoid.HolyGrail(spec, par=par, slit_spat=slit_spat)
+    # Only the seeds are brute forced; the held-out slits are refined from the multislit prediction
+    seeds = np.array([0, 2, 4])
+    assert sorted(brute) == seeds.tolist()
+    _, final_fit = arcfitter.get_results()
+    model = arcfitter.fit_multislit(seeds)
+    for slit in [1, 3]:
+        assert final_fit[str(slit)]['rms'] < par['rms_threshold']
+        # Predicted solution against the true one
+        pred_dict, pred_fit = arcfitter.predict_slit(slit, arcfitter._det_weak[str(slit)], model, seeds)
+        assert pred_dict['acceptable']
+        assert pred_dict['nmatch'] >= 10
+        assert np.abs(pred_dict['bwv'] - wave[npix//2,slit]) < 2*disp
+        assert np.abs(pred_dict['bdisp']/disp - 1) < 0.01
+        # Refined solution against the true one, away from the unconstrained ends
+        assert np.median(np.abs(final_fit[str(slit)]['wave_soln'][600:2000] - wave[600:2000,slit])) < 1.5*disp
@@ -0,0 +1,26 @@
+# Module to run tests on the BitMask class
+
+import numpy as np
+
+from pypeit.bitmask import BitMask
+
+
+def test_flagged():
+    bm = BitMask(['A', 'B', 'C'])
+    value = np.array([0, 1, 2, 4, 6, 7], dtype=bm.minimum_dtype(asuint=True))
+    assert np.array_equal(bm.flagged(value, flag='B'), [False, False, True, False, True, True])
+    assert np.array_equal(bm.flagged(value, flag=['A', 'C']), [False, True, False, True, True, True])
+    assert np.array_equal(bm.flagged(value), value > 0)
+
+
+def test_turn_on_off_where():
+    bm = BitMask(['A', 'B', 'C'])
+    value = np.zeros((3,4), dtype=bm.minimum_dtype(asuint=True))
+    indx = np.zeros(value.shape, dtype=bool)
+    indx[1,:] = True
+    bm.turn_on_where(value, indx, ['A', 'C'])
+    assert value.dtype == np.uint8, 'Bitmask type should not change'
+    assert np.array_equal(value[1,:], np.full(4, 5)) and not np.any(value[indx == False])
+    bm.turn_off_where(value, True, 'A')
+    assert np.array_equal(bm.flagged(value, flag='C'), indx)
+    assert not np.any(bm.flagged(value, flag='A'))
@@ -116,6 +116,27 @@ def test_load():
 '''
 
 
+def test_load_hdulists(tmpdir):
+    """ Loading from already opened files gives the same spectra """
+    from astropy.io import fits
+    from astropy.table import Table
+    files = []
+    for ii in range(2):
+        hdus = [fits.PrimaryHDU()]
+        for jj in range(3):
+            wave = np.linspace(5000., 6000., 100) + ii
+            hdus.append(fits.table_to_hdu(Table(dict(OPT_WAVE=wave, OPT_COUNTS=wave/1000.+jj,
+                                                     OPT_COUNTS_SIG=np.full(100, 0.1)))))
+        files.append(str(tmpdir.join('spec1d_{:d}.fits'.format(ii))))
+        fits.HDUList(hdus).writeto(files[-1])
+    hdulists = {fname: fits.open(fname) for fname in files}
+    for exten in [1, 3]:
+        spectra = coadd.load_spec(files, iextensions=exten, flux=False)
+        hspectra = coadd.load_spec(files, iextensions=exten, flux=False, hdulists=hdulists)
+        for key in ['wave', 'flux', 'sig']:
+            assert np.array_equal(spectra.data[key], hspectra.data[key])
+
+
 def test_new_wave_grid():
     # Dummy spectrum
     dspec = dummy_spectra()
@@ -269,6 +290,20 @@ def test_1dcoadd():
     spec1d = coadd.one_d_coadd(rspec, smask, weights)
     assert spec1d.npix == 1740
 
+def test_rebin_arrays():
+    """ Test the array rebinning against linetools"""
+    dspec = dummy_spectra(s2n=10.)
+    cat_wave = coadd.new_wave_grid(dspec.data['wave'], wave_method='concatenate')
+    cat_wave = np.sort(cat_wave)
+    rspec = dspec.rebin(cat_wave*units.AA, all=True, do_sig=True, grow_bad_sig=True,
+                        masking='none')
+    fluxes, sigs = coadd.rebin_arrays(dspec.data['wave'], dspec.data['flux'].filled(0.),
+                                      dspec.data['sig'].filled(0.), cat_wave)
+    assert np.allclose(fluxes, rspec.data['flux'].filled(0.), rtol=1e-5, atol=1e-5)
+    assert np.allclose(sigs, rspec.data['sig'].filled(0.), rtol=1e-5, atol=1e-5)
+    assert np.array_equal(sigs > 0., rspec.data['sig'].filled(0.) > 0.)
+
+
 def test_cleancr():
     """ Test clean CR method"""
     # Setup
@@ -0,0 +1,101 @@
+# Module to run tests on the 2d coadds
+
+import numpy as np
+
+from astropy.io import fits
+
+from pypeit.core import coadd2d
+
+
+def synthetic_stack(nimgs=3, nspec=200, nspat=120, seed=1):
+    rand = np.random.RandomState(seed)
+    slitmask = np.full((nspec, nspat), -1, dtype=int)
+    slitmask[:, 20:50] = 0
+    slitmask[10:190, 70:105] = 1
+    spec_img = np.outer(np.arange(nspec), np.ones(nspat))
+    stack_dict = dict(slitmask=slitmask, specobjs_list=[None]*nimgs)
+    stack_dict['sciimg_stack'] = rand.normal(size=(nimgs, nspec, nspat)) + 10.
+    stack_dict['sciivar_stack'] = np.full((nimgs, nspec, nspat), 1.)
+    stack_dict['skymodel_stack'] = np.full((nimgs, nspec, nspat), 9.)
+    stack_dict['mask_stack'] = (rand.uniform(size=(nimgs, nspec, nspat)) < 0.01).astype(float)
+    stack_dict['tilts_stack'] = np.repeat((spec_img/(nspec-1))[None,:,:], nimgs, axis=0)
+    stack_dict['waveimg_stack'] = 5000. + np.arange(nimgs)[:,None,None]*0.3 + 2.*spec_img[None,:,:] \
+                                  + 0.01*np.arange(nspat)[None,None,:]
+    return stack_dict
+
+
+def test_load_slit_stacks(tmpdir):
+    stack_dict = synthetic_stack()
+    # Write the images as spec2d and master files
+    stream_dict = dict(slitmask=stack_dict['slitmask'], specobjs_list=stack_dict['specobjs_list'], det=1,
+                       spec2d_files=[], tiltfiles=[], waveimgfiles=[])
+    for ifile in range(len(stack_dict['specobjs_list'])):
+        hdus = [fits.PrimaryHDU()]
+        for key, ext in zip(['sciimg_stack', 'sciivar_stack', 'skymodel_stack', 'mask_stack'],
+                            ['PROCESSED', 'IVARMODEL', 'SKY', 'MASK']):
+            hdus.append(fits.ImageHDU(stack_dict[key][ifile], name='DET01-'+ext))
+        stream_dict['spec2d_files'].append(str(tmpdir.join('spec2d_{:d}.fits'.format(ifile))))
+        fits.HDUList(hdus).writeto(stream_dict['spec2d_files'][-1])
+        for key, mfiles in zip(['tilts_stack', 'waveimg_stack'], ['tiltfiles', 'waveimgfiles']):
+            stream_dict[mfiles].append(str(tmpdir.join('{:s}_{:d}.fits'.format(key, ifile))))
+            fits.PrimaryHDU(stack_dict[key][ifile]).writeto(stream_dict[mfiles][-1])
+    for islit in range(2):
+        slit_dict = coadd2d.load_slit_stacks(stack_dict, islit)
+        stream_slit_dict = coadd2d.load_slit_stacks(stream_dict, islit)
+        assert np.all(slit_dict['thismask_stack'][:, [0,-1], :].any(axis=(0,2)))
+        for key in slit_dict.keys():
+            assert np.array_equal(slit_dict[key], stream_slit_dict[key])
+
+
+def test_coadd2d_subimage():
+    stack_dict = synthetic_stack()
+    nimgs, nspec, nspat = stack_dict['sciimg_stack'].shape
+    wave_grid = np.arange(4990., 5410., 1.5)
+    islit = 1
+    trace_stack = np.full((nimgs, nspec), 87.) + np.arange(nimgs)[:,None]
+    weights = np.ones((nimgs, nspec))
+    # Full images
+    full = coadd2d.coadd2d(trace_stack, stack_dict['sciimg_stack'], stack_dict['sciivar_stack'],
+                           stack_dict['skymodel_stack'], stack_dict['mask_stack'] == 0,
+                           stack_dict['tilts_stack'], stack_dict['waveimg_stack'],
+                           np.repeat((stack_dict['slitmask'] == islit)[None,:,:], nimgs, axis=0),
+                           weights=weights, wave_grid=wave_grid)
+    # Sub-image containing the slit
+    slit_dict = coadd2d.load_slit_stacks(stack_dict, islit)
+    spec_slice, spat_slice = slit_dict['spec_slice'], slit_dict['spat_slice']
+    sub = coadd2d.coadd2d(trace_stack[:, spec_slice] - spat_slice.start, slit_dict['sciimg_stack'],
+                          slit_dict['sciivar_stack'], slit_dict['skymodel_stack'], slit_dict['mask_stack'] == 0,
+                          slit_dict['tilts_stack'], slit_dict['waveimg_stack'], slit_dict['thismask_stack'],
+                          weights=weights[:, spec_slice], wave_grid=wave_grid)
+    for key in full.keys():
+        assert np.allclose(full[key], sub[key], equal_nan=True), key
+
+
+def test_coadd2d_slits_nproc():
+    from pypeit import specobjs
+    stack_dict = synthetic_stack()
+    nimgs, nspec, nspat = stack_dict['sciimg_stack'].shape
+    rand = np.random.RandomState(2)
+    stack_dict['tslits_dict'] = dict(slit_left=np.outer(np.ones(nspec), [20., 70.]))
+    # One object near the center of each slit in each exposure
+    stack_dict['specobjs_list'] = []
+    for iexp in range(nimgs):
+        sobjs = []
+        for slit, spat in zip([0, 1], [35., 87.]):
+            specobj = specobjs.SpecObj((nspec, nspat), [0.2, 0.8], [0, nspec], slitid=slit)
+            specobj.objid = 1
+            specobj.trace_spat = np.full(nspec, spat + iexp)
+            specobj.optimal['COUNTS'] = 10. + rand.normal(size=nspec)
+            specobj.optimal['COUNTS_SIG'] = np.ones(nspec)
+            specobj.optimal['WAVE'] = stack_dict['waveimg_stack'][iexp, :, int(spat)]
+            specobj.optimal['MASK'] = np.ones(nspec, dtype=bool)
+            sobjs.append(specobj)
+        stack_dict['specobjs_list'].append(specobjs.SpecObjs(sobjs))
+    wave_grid = np.arange(4990., 5410., 1.5)
+    objid = np.ones(nimgs, dtype=int)
+    serial = coadd2d.coadd2d_slits(stack_dict, objid, wave_grid, nproc=1)
+    parallel = coadd2d.coadd2d_slits(stack_dict, objid, wave_grid, nproc=2)
+    assert len(serial) == len(parallel) == 2
+    for coadd_serial, coadd_parallel in zip(serial, parallel):
+        for key in coadd_serial.keys():
+            assert np.array_equal(coadd_serial[key], coadd_parallel[key], equal_nan=True), key
@@ -0,0 +1,95 @@
+# Module to run tests on the object finding and extraction routines
+
+import numpy as np
+
+from pypeit.core import extract, pixels
+
+
+def synthetic_echelle(nspec=500, nspat=200, seed=1):
+    rand = np.random.RandomState(seed)
+    slit_left = np.outer(np.ones(nspec), [10., 75., 140.]) + np.linspace(0., 5., nspec)[:,None]
+    slit_righ = slit_left + 50.
+    tslits_dict = dict(slit_left=slit_left, slit_righ=slit_righ, nspec=nspec, nspat=nspat, pad=0, nslits=3,
+                       spec_min=np.zeros(3), spec_max=np.full(3, nspec-1.))
+    slitmask = pixels.tslits2mask(tslits_dict)
+    # One object slightly off the center of each order
+    spat = np.arange(nspat)[None,:]
+    slitcen = (slit_left + slit_righ)/2.
+    image = np.sum([50.*np.exp(-0.5*((spat - slitcen[:,iord:iord+1] - 3.)/2.)**2) for iord in range(3)], axis=0)
+    image += rand.normal(size=image.shape)
+    return image, np.ones_like(image), slitmask, slit_left, slit_righ
+
+
+def test_ech_objfind_seed():
+    image, ivar, slitmask, slit_left, slit_righ = synthetic_echelle()
+    kwargs = dict(order_vec=np.arange(3), plate_scale=np.full(3, 0.2))
+    sobjs, _ = extract.ech_objfind(image, ivar, slitmask, slit_left, slit_righ, **kwargs)
+    assert len(sobjs) == 3
+    assert np.array_equal(sobjs.ech_orderindx, np.arange(3))
+    # Seeding with the objects found in a first pass recovers the same traces
+    sobjs_seed, _ = extract.ech_objfind(image, ivar, slitmask, slit_left, slit_righ, seed_sobjs=sobjs, **kwargs)
+    assert len(sobjs_seed) == 3
+    for spec, spec_seed in zip(sobjs, sobjs_seed):
+        assert spec.ech_orderindx == spec_seed.ech_orderindx
+        assert np.allclose(spec.trace_spat, spec_seed.trace_spat, atol=1e-3)
+
+
+def test_asymbox2_weights():
+    rand = np.random.RandomState(2)
+    nspec, nspat = 50, 40
+    image = rand.normal(size=(nspec, nspat))
+    left = rand.uniform(2., 20., (nspec, 3))
+    right = left + rand.uniform(1., 10., (nspec, 3))
+    ycen = np.outer(np.arange(nspec), np.ones(3, dtype=int))
+    weight, bigy, fullspot = extract.asymbox2_weights(left, right, ycen, nspec, nspat)
+    fextract = np.sum(weight*image[bigy, fullspot], axis=-1)
+    # Direct integral of the image over [left, right], each pixel covering [spat-0.5, spat+0.5]
+    spat = np.arange(nspat)
+    overlap = np.clip(np.fmin(right[:,:,None], spat + 0.5) - np.fmax(left[:,:,None], spat - 0.5), 0., 1.)
+    assert np.allclose(fextract, np.sum(overlap*image[:,None,:], axis=-1))
+
+
+def test_extract_optimal_batch():
+    from pypeit import specobjs
+    rand = np.random.RandomState(3)
+    nspec, nspat, box_radius = 300, 120, 4.
+    spec_vec = np.arange(nspec)
+    spat_img = np.outer(np.ones(nspec), np.arange(nspat))
+    # Three objects with slightly tilted traces and Gaussian profiles
+    traces = np.column_stack([cen + 0.01*spec_vec for cen in [25.3, 58.6, 90.1]])
+    oprof = np.exp(-0.5*((spat_img[:,:,None] - traces[:,None,:])/2.)**2)
+    oprof[np.abs(spat_img[:,:,None] - traces[:,None,:]) > 10.] = 0.
+    oprof /= np.sum(oprof, axis=1)[:,None,:]
+    skyimg = np.full((nspec, nspat), 50.)
+    objimg = np.sum(oprof*np.array([500., 200., 80.])[None,None,:], axis=2)
+    ivar = 1./(skyimg + objimg + 4.)
+    sciimg = skyimg + objimg + rand.normal(size=(nspec, nspat))/np.sqrt(ivar)
+    mask = np.ones((nspec, nspat), dtype=bool)
+    waveimg = 4000. + np.outer(spec_vec, np.ones(nspat))
+    rn2_img = np.full((nspec, nspat), 4.)
+
+    def make_sobjs():
+        sobjs = []
+        for iobj in range(traces.shape[1]):
+            specobj = specobjs.SpecObj((nspec, nspat), [0., 1.], [0, nspec])
+            specobj.trace_spat = traces[:,iobj]
+            specobj.trace_spec = spec_vec
+            sobjs.append(specobj)
+        return sobjs
+
+    batch = make_sobjs()
+    extract.extract_optimal_batch(sciimg, ivar, mask, waveimg, skyimg, rn2_img, oprof, box_radius, batch)
+    single = make_sobjs()
+    for iobj, specobj in enumerate(single):
+        extract.extract_optimal(sciimg, ivar, mask, waveimg, skyimg, rn2_img, oprof[:,:,iobj], box_radius, specobj)
+    for iobj in range(traces.shape[1]):
+        for ext in ['optimal', 'boxcar']:
+            for key in getattr(batch[iobj], ext).keys():
+                assert np.allclose(getattr(batch[iobj], ext)[key], getattr(single[iobj], ext)[key]), key
+        # Horne optimal extraction on the full images
+        prof = oprof[:,:,iobj]
+        flux_opt = np.sum(ivar*(sciimg - skyimg)*prof, axis=1)/np.sum(ivar*prof**2, axis=1)
+        assert np.allclose(batch[iobj].optimal['COUNTS'], flux_opt)
+        # Boxcar extraction of the sky-subtracted image
+        flux_box = extract.extract_boxcar(sciimg - skyimg, traces[:,iobj], box_radius)
+        assert np.allclose(batch[iobj].boxcar['COUNTS'], flux_box)
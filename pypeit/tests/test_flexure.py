@@ -13,6 +13,7 @@ import pytest
 import numpy as np
 
 from linetools.spectra.io import readspec
+from linetools.spectra.xspectrum1d import XSpectrum1D
 
 import pypeit
 from pypeit.core import wave
@@ -48,3 +49,76 @@ def test_flex_shift():
 #    pyplot.show()
     assert np.abs(flex_dict['shift'] - 43.7) < 0.1
 
+
+
+def test_flex_shift_batch():
+    obj_spec = readspec(data_path('obj_lrisb_600_sky.fits'))
+    arx_file = pypeit.__path__[0]+'/data/sky_spec/sky_LRISb_600.fits'
+    arx_spec = readspec(arx_file)
+    # Same sky with the wavelength solution off by a pixel
+    dwave = np.gradient(obj_spec.wavelength.value)
+    obj_spec2 = XSpectrum1D.from_tuple((obj_spec.wavelength.value + dwave, obj_spec.flux.value))
+    flex_dicts = wave.flex_shift_batch([obj_spec, obj_spec2], arx_spec, mxshft=60)
+    assert np.abs(flex_dicts[0]['shift'] - 43.7) < 0.1
+    assert np.abs(flex_dicts[1]['shift'] - flex_dicts[0]['shift'] + 1.0) < 0.05
+    # Consistent with measuring it alone
+    assert np.abs(flex_dicts[1]['shift'] - wave.flex_shift(obj_spec2, arx_spec, mxshft=60)['shift']) < 0.01
+    # Applying the shifts
+    new_wave = wave.shift_wavelengths(np.array([obj_spec.wavelength.value, obj_spec2.wavelength.value]),
+                                      np.array([flex_dicts[0]['shift'], flex_dicts[1]['shift']]))
+    assert np.allclose(new_wave[0], new_wave[1], atol=0.05*np.median(dwave))
+
+
+def test_flex_archive_cache(monkeypatch):
+    from collections import OrderedDict
+    monkeypatch.setattr(wave, '_flex_archive', OrderedDict())
+    obj_spec = readspec(data_path('obj_lrisb_600_sky.fits'))
+    arx_file = pypeit.__path__[0]+'/data/sky_spec/sky_LRISb_600.fits'
+    arx_spec = wave.load_sky_spectrum(arx_file)
+    flex_dict = wave.flex_shift_batch([obj_spec], arx_spec, mxshft=60, sky_file=arx_file)[0]
+    assert np.abs(flex_dict['shift'] - wave.flex_shift(obj_spec, arx_spec, mxshft=60)['shift']) < 1e-6
+    assert len(wave._flex_archive) == 1
+    # A grid offset by a fraction of a pixel reuses the prepared archive
+    dwave = 0.1*np.gradient(obj_spec.wavelength.value)
+    obj_spec2 = XSpectrum1D.from_tuple((obj_spec.wavelength.value + dwave, obj_spec.flux.value))
+    flex_dict2 = wave.flex_shift_batch([obj_spec2], arx_spec, mxshft=60, sky_file=arx_file)[0]
+    assert len(wave._flex_archive) == 1
+    assert flex_dict2['arx_spec'] is flex_dict['arx_spec']
+    assert np.abs(flex_dict2['shift'] - wave.flex_shift(obj_spec2, arx_spec, mxshft=60)['shift']) < 0.02
+
+
+def test_flexure_qa_products(tmpdir):
+    from astropy import units
+    from pypeit import specobjs
+    from pypeit.core import qa
+    obj_spec = readspec(data_path('obj_lrisb_600_sky.fits'))
+    arx_file = pypeit.__path__[0]+'/data/sky_spec/sky_LRISb_600.fits'
+    sobjs = []
+    for slit in range(2):
+        specobj = specobjs.SpecObj((2048, 2048), [0, 100], slit, det=1, objtype='science', slitid=slit)
+        specobj.spat_pixpos = 100*slit
+        specobj.set_idx()
+        specobj.boxcar['WAVE'] = obj_spec.wavelength.value*units.AA
+        specobj.boxcar['COUNTS_SKY'] = obj_spec.flux.value
+        sobjs.append(specobj)
+    sobjs = specobjs.SpecObjs(sobjs)
+    maskslits = np.zeros(2, dtype=bool)
+    flex_list = wave.flexure_obj(sobjs, maskslits, 'boxcar', arx_file, mxshft=60)
+    products = wave.flexure_qa_products(sobjs, maskslits, flex_list)
+    assert [qa_dict['slit'] for qa_dict in products] == [0, 1]
+    # The products are plain arrays that can be handed to a QA worker
+    assert not isinstance(products[0]['sky_spec'][0], units.Quantity)
+    assert np.abs(products[0]['shift'][0] - 43.7) < 0.1
+    # Render them synchronously and in a QA worker process, which needs the products to be picklable
+    pngs = []
+    for nproc in [0, 1]:
+        out_dir = str(tmpdir.join('nproc{:d}'.format(nproc)))
+        os.makedirs(os.path.join(out_dir, 'QA', 'PNGs'))
+        qa.start_qa_queue(nproc)
+        try:
+            wave.flexure_qa(sobjs, maskslits, 'test', 1, flex_list, out_dir=out_dir)
+        finally:
+            assert qa.finish_qa_queue() == []
+        pngs.append(sorted(os.listdir(os.path.join(out_dir, 'QA', 'PNGs'))))
+    assert len(pngs[0]) == 4
+    assert pngs[1] == pngs[0]
@@ -110,3 +110,139 @@ def test_extinction_correction():
     # Test
     np.testing.assert_allclose(flux_corr[0], 4.47095192)
 
+
+
+def test_standard_spectrum_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('PYPEIT_CACHE', str(tmpdir))
+    monkeypatch.setattr(flux, '_std_spectra', {})
+    std_dict = flux.find_standard_file('05:06:36.6', '52:52:01.0')
+    flux.load_standard_file(std_dict)
+    fil = flux.resource_filename('pypeit', std_dict['cal_file'] + '.gz')
+    assert os.path.isfile(flux.std_spectrum_file(fil))
+    # Same as parsing the archived file
+    wave, flam = flux.read_standard_spectrum(fil, std_dict['fmt'])
+    assert np.array_equal(std_dict['wave'].value, wave) and np.array_equal(std_dict['flux'].value, flam)
+    # Reload from disk
+    monkeypatch.setattr(flux, '_std_spectra', {})
+    bwave, bflam = flux.load_standard_spectrum(fil, std_dict['fmt'])
+    assert np.array_equal(bwave, wave) and np.array_equal(bflam, flam)
+    # The stored extinction curves cannot be modified by the caller
+    extinct = flux.load_extinction_data(121.6428, 37.3413889)
+    extinct['mag_ext'][0] = 0.
+    np.testing.assert_allclose(flux.load_extinction_data(121.6428, 37.3413889)['mag_ext'][0], 1.084)
+
+
+def test_sensfunc_basis_cache(monkeypatch):
+    monkeypatch.setattr(flux, '_sensfunc_basis', flux.OrderedDict())
+    monkeypatch.setattr(flux, 'SENSFUNC_BASIS_CACHE_SIZE', 2)
+    logfits = []
+    for wave0 in [4000., 5000., 6000., 4000.]:
+        wave = np.linspace(wave0, wave0+2000., 1000)
+        magfunc = 0.1*np.sin((wave-wave0)/300.)
+        breakpoints, bkspace = flux.sensfunc_breakpoints(wave, np.ones(wave.size, dtype=bool), 1000., 2.)
+        logfits.append(flux.fit_sensfunc_bspline(wave, magfunc, np.full(wave.size, 1e4),
+                                                 np.ones(wave.size, dtype=bool),
+                                                 breakpoints, bkspace)[0])
+        np.testing.assert_allclose(logfits[-1], magfunc, atol=1e-3)
+        assert len(flux._sensfunc_basis) <= 2
+    # The first grid was dropped and recomputed, with the same fit
+    assert [key[1] for key in flux._sensfunc_basis.keys()] == [6000., 4000.]
+    assert np.array_equal(logfits[0], logfits[-1])
+
+
+def write_spec1d_files(tmpdir, echelle=False):
+    from astropy.io import fits
+    from astropy.table import Table
+    rand = np.random.RandomState(1)
+    spec1d_files, flux_files = [], []
+    for ii in range(2):
+        hdus = [fits.PrimaryHDU()]
+        hdus[0].header['AIRMASS'] = 1.2 + ii/10.
+        hdus[0].header['EXPTIME'] = 600.
+        for jj in range(3):
+            wave = np.linspace(3500., 10500., 1000) + jj
+            counts_ivar = rand.uniform(0., 2., 1000)
+            counts_ivar[:10] = 0.
+            tbl = Table(dict(TRACE=np.full(1000, 10.*jj), OPT_WAVE=wave, OPT_COUNTS=rand.normal(size=1000),
+                             OPT_COUNTS_IVAR=counts_ivar, BOX_WAVE=wave, BOX_COUNTS=rand.normal(size=1000),
+                             BOX_COUNTS_IVAR=counts_ivar))
+            hdus.append(fits.table_to_hdu(tbl))
+            if echelle:
+                hdus[-1].name = 'SPAT{:04d}-ORDER{:04d}-DET01'.format(10*jj, jj)
+                hdus[-1].header['ECHOINDX'] = jj
+            else:
+                hdus[-1].name = 'SPAT{:04d}-SLIT0100-DET01'.format(10*jj)
+        spec1d_files.append(str(tmpdir.join('spec1d_{:d}.fits'.format(ii))))
+        flux_files.append(str(tmpdir.join('spec1d_{:d}_flux.fits'.format(ii))))
+        fits.HDUList(hdus).writeto(spec1d_files[-1])
+    return spec1d_files, flux_files
+
+
+def test_flux_spec1d_files(tmpdir):
+    wave_sens = np.linspace(3000., 11000., 500)
+    sens_dict = dict(wave=wave_sens, sensfunc=1e-2*(1. + wave_sens/1e4))
+    spec1d_files, flux_files = write_spec1d_files(tmpdir)
+    flux.flux_spec1d_files(spec1d_files, {'0': sens_dict}, 121.6428, 37.3413889, flux_files=flux_files)
+    # Same as fluxing the spectra one at a time
+    for spec1d_file, flux_file in zip(spec1d_files, flux_files):
+        sobjs, head0 = load.load_specobjs(spec1d_file)
+        fobjs, _ = load.load_specobjs(flux_file)
+        for sobj, fobj in zip(sobjs, fobjs):
+            flux.apply_sensfunc(sobj, sens_dict, head0['AIRMASS'], head0['EXPTIME'],
+                                longitude=121.6428, latitude=37.3413889)
+            for extract in ['boxcar', 'optimal']:
+                for key in ['FLAM', 'FLAM_SIG', 'FLAM_IVAR']:
+                    assert np.array_equal(getattr(sobj, extract)[key], getattr(fobj, extract)[key])
+    # Fluxing again updates the columns in place
+    flux.flux_spec1d_files(flux_files, {'0': sens_dict}, 121.6428, 37.3413889)
+    _fobjs, _ = load.load_specobjs(flux_files[-1])
+    assert np.array_equal(_fobjs[0].optimal['FLAM'], fobjs[0].optimal['FLAM'])
+
+
+def test_flux_spec1d_files_echelle(tmpdir):
+    wave_sens = np.linspace(3000., 11000., 500)
+    telluric = np.ones(wave_sens.size)
+    telluric[200:220] = 0.5
+    # No sensitivity function for the last order
+    sens_dict = {str(iord): dict(wave=wave_sens, sensfunc=1e-2*(1. + (iord+1)*wave_sens/1e4), telluric=telluric,
+                                 ech_orderindx=iord) for iord in range(2)}
+    sens_dict['meta'] = dict(nslits=2)
+    spec1d_files, flux_files = write_spec1d_files(tmpdir, echelle=True)
+    flux.flux_spec1d_files(spec1d_files, sens_dict, 121.6428, 37.3413889, flux_files=flux_files,
+                           telluric_correct=True, echelle=True)
+    # Same as fluxing the spectra one at a time, as in FluxSpec.Echelle.flux_science
+    for spec1d_file, flux_file in zip(spec1d_files, flux_files):
+        sobjs, head0 = load.load_specobjs(spec1d_file)
+        fobjs, _ = load.load_specobjs(flux_file)
+        for sobj, fobj in zip(sobjs, fobjs):
+            if sobj.ech_orderindx >= sens_dict['meta']['nslits']:
+                assert 'FLAM' not in fobj.optimal.keys()
+                continue
+            flux.apply_sensfunc(sobj, sens_dict[str(sobj.ech_orderindx)], head0['AIRMASS'], head0['EXPTIME'],
+                                telluric_correct=True, longitude=121.6428, latitude=37.3413889)
+            for extract in ['boxcar', 'optimal']:
+                for key in ['FLAM', 'FLAM_SIG', 'FLAM_IVAR']:
+                    assert np.array_equal(getattr(sobj, extract)[key], getattr(fobj, extract)[key])
+
+
+def test_joint_standard_sensfunc():
+    rand = np.random.RandomState(3)
+    waves, fluxes, ivars, flux_stds = [], [], [], []
+    for wmin in [3500., 3600.]:
+        wave = np.linspace(wmin, 10000., 4096)
+        flux_std = 10.*(wave/5000.)**-2
+        counts = flux_std*100.*np.exp(-0.5*((wave-6500.)/2500.)**2)
+        fluxes.append(counts*(1.+0.01*rand.normal(size=wave.size)))
+        ivars.append(1./(0.01*counts)**2)
+        waves.append(wave)
+        flux_stds.append(flux_std)
+    kwargs = dict(resolution=2000., nresln=1.5, upper=3., lower=3.)
+    # A single standard gives the same as standard_sensfunc
+    sensfunc, masktot = flux.standard_sensfunc(waves[0], fluxes[0], ivars[0], flux_stds[0], telluric=False,
+                                               **kwargs)
+    sensfuncs, masktots = flux.joint_standard_sensfunc(waves[:1], fluxes[:1], ivars[:1], flux_stds[:1], **kwargs)
+    assert np.allclose(sensfuncs[0], sensfunc, rtol=1e-10) and np.array_equal(masktots[0], masktot)
+    # Both standards at once
+    sensfuncs, _ = flux.joint_standard_sensfunc(waves, fluxes, ivars, flux_stds, **kwargs)
+    for wave, sensfunc in zip(waves, sensfuncs):
+        assert np.median(np.abs(sensfunc/(0.01*np.exp(0.5*((wave-6500.)/2500.)**2)) - 1.)) < 0.005
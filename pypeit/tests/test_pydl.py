@@ -26,3 +26,19 @@ def test_bsplinetodict():
 
     assert np.max(np.array(bspline_dict['breakpoints'])-bspline_fromdict.breakpoints) == 0.
 
+
+
+def test_bspline_intrv():
+    """ Test the vectorized search for the breakpoint interval of each x
+    """
+    x = np.sort(np.random.rand(500))
+    sset = bspline(x, bkspace=0.05)
+    indx = sset.intrv(x)
+    gb = sset.breakpoints[sset.mask]
+    n = gb.size - sset.nord
+    assert np.all(np.diff(indx) >= 0)
+    assert indx.min() >= sset.nord - 1 and indx.max() <= n - 1
+    # Each x lies in (gb[indx], gb[indx+1]]
+    interior = (indx > sset.nord - 1) & (indx < n - 1)
+    assert np.all(x[interior] > gb[indx[interior]])
+    assert np.all(x[interior] <= gb[indx[interior]+1])
@@ -8,6 +8,8 @@ import os
 
 import pytest
 
+import numpy as np
+
 from pypeit.par import pypeitpar
 from pypeit.par.util import parse_pypeit_file
 from pypeit.spectrographs.util import load_spectrograph
@@ -45,8 +47,20 @@ def test_spectrographs():
 def test_reduce():
     pypeitpar.ReducePar()
 
+def test_precision():
+    p = pypeitpar.ReducePar()
+    assert p['precision'] == 'double', 'Default should be double precision'
+    assert pypeitpar.ReducePar.image_dtype(p['precision']) == np.float64
+    p = pypeitpar.ReducePar(precision='single')
+    assert pypeitpar.ReducePar.image_dtype(p['precision']) == np.float32
+
 def test_wavelengthsolution():
     pypeitpar.WavelengthSolutionPar()
+    assert pypeitpar.WavelengthSolutionPar()['nproc'] == 1
+    with pytest.raises(ValueError):
+        pypeitpar.WavelengthSolutionPar(nproc=0)
+    with pytest.raises(ValueError):
+        pypeitpar.WavelengthSolutionPar(ncand_arxiv=0)
 
 def test_traceslits():
     pypeitpar.TraceSlitsPar()
@@ -28,3 +28,15 @@ def test_get_dimen():
     assert (len(pages) == 4) and (pages[0][0] * pages[0][1] == maxp+1) and (pages[1][0] * pages[1][1] == maxp+1) \
         and (pages[2][0] * pages[2][1] == maxp + 1) and (pages[3][0] * pages[3][1] == 1)
     assert (len(npp) == 4) and (npp[0] == maxp) and (npp[1] == maxp) and (npp[2] == maxp) and (npp[3] == 1)
+
+
+
+def test_qa_queue():
+    # The plots are rendered in a worker process and failed plots are reported
+    qa.start_qa_queue(1)
+    qa.submit_qa(qa.get_dimen, 5)
+    qa.submit_qa(qa.get_dimen, 'a')
+    errors = qa.finish_qa_queue()
+    assert len(errors) == 1 and isinstance(errors[0], TypeError)
+    # The queue is stopped
+    assert qa._qa_executor is None and len(qa._qa_futures) == 0
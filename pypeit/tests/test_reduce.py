@@ -0,0 +1,43 @@
+# Module to run tests on the Reduce classes
+
+import numpy as np
+
+from pypeit import reduce, specobjs
+from pypeit.spectrographs.util import load_spectrograph
+
+
+def synthetic_multislit(nspec=400, nspat=150, seed=3):
+    rand = np.random.RandomState(seed)
+    slit_left = np.outer(np.ones(nspec), [10., 80.])
+    slit_righ = np.outer(np.ones(nspec), [65., 140.])
+    tslits_dict = dict(slit_left=slit_left, slit_righ=slit_righ, slitcen=(slit_left+slit_righ)/2., nspec=nspec,
+                       nspat=nspat, pad=0, nslits=2, spec_min=np.zeros(2), spec_max=np.full(2, nspec-1.))
+    spec_img, spat_img = np.mgrid[:nspec, :nspat].astype(float)
+    sky = 100. + 20.*np.sin(spec_img/15.)
+    obj = 300.*np.exp(-0.5*((spat_img - 37.)/2.5)**2) + 150.*np.exp(-0.5*((spat_img - 112.)/2.5)**2)
+    rn2img = np.full((nspec, nspat), 9.)
+    sciivar = 1./(sky + obj + rn2img)
+    sciimg = sky + obj + rand.normal(size=(nspec, nspat))/np.sqrt(sciivar)
+    return tslits_dict, sciimg, sciivar, sky, rn2img, spec_img/(nspec-1), 4000. + 2.*spec_img
+
+
+def test_local_skysub_extract_nproc():
+    spectrograph = load_spectrograph('shane_kast_blue')
+    tslits_dict, sciimg, sciivar, sky, rn2img, tilts, waveimg = synthetic_multislit()
+    results = []
+    for nproc in [1, 2]:
+        par = spectrograph.default_pypeit_par()
+        par['scienceimage']['nproc'] = nproc
+        redux = reduce.instantiate_me(spectrograph, tslits_dict, np.zeros(sciimg.shape, dtype=int), par)
+        sobjs, nobj, skymask = redux.find_objects(sciimg - sky, sciivar)
+        assert nobj == 2
+        results.append(redux.local_skysub_extract(sciimg, sciivar, tilts, waveimg, sky, rn2img, sobjs))
+    # Identical models, masks and extractions for any nproc
+    for serial, parallel in zip(results[0][:4], results[1][:4]):
+        assert np.array_equal(serial, parallel)
+    for sobj_serial, sobj_parallel in zip(results[0][4], results[1][4]):
+        assert sobj_serial.slitid == sobj_parallel.slitid
+        assert np.array_equal(sobj_serial.optimal['COUNTS'], sobj_parallel.optimal['COUNTS'])
+        assert np.array_equal(sobj_serial.boxcar['COUNTS'], sobj_parallel.boxcar['COUNTS'])
+    # Both slits were extracted
+    assert np.all(np.median(results[0][1][:, [37, 112]], axis=0) > 100.)
@@ -0,0 +1,34 @@
+# Module to run tests on the ScienceImage class
+
+import os
+
+import numpy as np
+
+from pypeit import scienceimage
+from pypeit.par import pypeitpar
+from pypeit.spectrographs.util import load_spectrograph
+
+
+def data_path(filename):
+    data_dir = os.path.join(os.path.dirname(__file__), 'files')
+    return os.path.join(data_dir, filename)
+
+
+def test_proc_single_precision():
+    spectrograph = load_spectrograph('shane_kast_blue')
+    files = [data_path('b1.fits.gz'), data_path('b27.fits.gz')]
+    bpm = np.zeros((2048, 350), dtype=int)
+    images = {}
+    for precision in ['double', 'single']:
+        sciI = scienceimage.ScienceImage(spectrograph, files, det=1,
+                                         dtype=pypeitpar.ReducePar.image_dtype(precision))
+        images[precision] = sciI.proc('overscan', None, bpm)
+    sciimg, sciivar, rn2img, mask, crmask = images['single']
+    assert sciimg.dtype == sciivar.dtype == rn2img.dtype == np.float32
+    assert images['double'][0].dtype == np.float64
+    # Science-equivalent results: differences far below the noise, and the same masks
+    assert np.max(np.abs(sciimg - images['double'][0])*np.sqrt(images['double'][1])) < 1e-3
+    assert np.allclose(sciivar, images['double'][1], rtol=1e-5)
+    assert np.allclose(rn2img, images['double'][2], rtol=1e-5)
+    assert np.array_equal(mask, images['double'][3])
+    assert np.array_equal(crmask, images['double'][4])
@@ -20,6 +20,7 @@ from pypeit.scripts import coadd_1dspec
 from pypeit.scripts import view_fits
 from pypeit.scripts import chk_edges
 from pypeit.scripts import show_1dspec
+from pypeit.scripts import build_kdtree
 from pypeit.tests.tstutils import dev_suite_required
 from pypeit import ginga
 
@@ -64,6 +65,18 @@ def test_view_fits():
     pargs = view_fits.parser([spec_file, '--list'])
 
 
+def test_build_kdtree(tmpdir, monkeypatch):
+    from pypeit.core.wavecal import waveio
+    monkeypatch.setenv('PYPEIT_CACHE', str(tmpdir))
+    pargs = build_kdtree.parser(['--polygon', '3'])
+    build_kdtree.main(pargs)
+    patternfile, indexfile = waveio.pattern_store_files(3, 10)
+    assert os.path.isfile(patternfile) and os.path.isfile(indexfile)
+    # The tree is built from the memory mapped store
+    tree, index = waveio.load_tree(polygon=3, numsearch=10)
+    assert tree.n == index.shape[0]
+
+
 def test_coadd():
     coadd_file = data_path('coadd_UGC3672A_red.yaml')
     args = coadd_1dspec.parser([coadd_file])
@@ -43,3 +43,13 @@ def test_calc_ivar():
     res = utils.calc_ivar(x)
     assert np.array_equal(res, np.array([0.0, 0.0, 0.0, 10.0, 1.0]))
     assert np.array_equal(utils.calc_ivar(res), np.array([0.0, 0.0, 0.0, 0.1, 1.0]))
+
+
+def test_parallel_map():
+    """ Parallel results are returned in input order and match the serial results
+    """
+    args = [(i, 2) for i in range(20)]
+    serial = utils.parallel_map(np.power, args)
+    threaded = utils.parallel_map(np.power, args, nproc=4)
+    assert serial == [i**2 for i in range(20)]
+    assert threaded == serial
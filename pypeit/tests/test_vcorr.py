@@ -71,3 +71,16 @@ def test_geocorrect(fitstbl):
     #assert np.isclose(helio, -9.3344957, rtol=1e-5)  # Original
     assert np.isclose(specObjs[0].boxcar['WAVE'][0].value, 3999.877589008, rtol=1e-8)
 
+
+
+def test_geomotion_cache(monkeypatch):
+    from collections import OrderedDict
+    monkeypatch.setattr(wave, '_geomotion_vel', OrderedDict())
+    monkeypatch.setattr(wave, 'GEOMOTION_CACHE_SIZE', 2)
+    radec = SkyCoord(RA, DEC, unit=(units.hourangle, units.deg), frame='icrs')
+    vel = [wave.geomotion_calculate(radec, Time(mjd + 0.1*i, format='mjd'), lon, lat, alt, 'heliocentric')
+           for i in range(3)]
+    # Only the most recently used velocities are kept
+    assert len(wave._geomotion_vel) == 2
+    assert wave.geomotion_calculate(radec, Time(mjd + 0.2, format='mjd'), lon, lat, alt, 'heliocentric') == vel[2]
+    assert len(wave._geomotion_vel) == 2
@@ -0,0 +1,118 @@
+# Module to run tests on the wavelength calibration utilities
+
+import os
+
+import numpy as np
+
+from pypeit.core.wavecal import wvutils
+
+
+def synthetic_arc(nspec=1024, nlines=40, seed=1234):
+    rand = np.random.RandomState(seed)
+    pix = np.arange(nspec)
+    cen = rand.uniform(20, nspec-20, nlines)
+    amp = rand.uniform(100., 2000., nlines)
+    arc = 10.0 + np.sum(amp[:,None]*np.exp(-0.5*((pix[None,:]-cen[:,None])/1.7)**2), axis=0)
+    return arc
+
+
+def test_xcorr_stretch_grid():
+    arc1 = synthetic_arc()
+    y2 = wvutils.shift_and_stretch(arc1, 0.0, 1.0)
+    y1 = wvutils.shift_and_stretch(arc1, 7.0, 1.01)
+    cands = wvutils.xcorr_stretch_grid(y1, y2, (-20., 20.), (0.97, 1.03))
+    shift, stretch, corr = cands[0]
+    # The grid evaluates the same objective as zerolag_shift_stretch
+    assert np.isclose(corr, -wvutils.zerolag_shift_stretch((shift, stretch), y1, y2))
+    assert shift == 7.0
+    assert int(y1.size*stretch) == int(y1.size*1.01)
+
+
+def test_xcorr_shift_stretch():
+    arc1 = synthetic_arc()
+    arc2 = wvutils.shift_and_stretch(arc1, 5.4, 1.012)
+    success, shift, stretch, corr, shift_cc, corr_cc = wvutils.xcorr_shift_stretch(arc2, arc1)
+    assert success == 1
+    assert np.abs(shift - 5.4) < 0.1
+    assert np.abs(stretch - 1.012) < 2./arc1.size
+    assert corr >= corr_cc
+
+
+def test_reid_arxiv_products(tmpdir, monkeypatch):
+    from pypeit.core.wavecal import waveio
+    arxiv_file = 'gemini_gnirs.json'
+    monkeypatch.setenv('PYPEIT_CACHE', str(tmpdir))
+    monkeypatch.setattr(waveio, '_reid_arxiv_products', {})
+    products = waveio.load_reid_arxiv_products(arxiv_file, 1022, sigdetect=5., fwhm=4.)
+    prodfile = waveio.reid_arxiv_products_file(arxiv_file, 1022, 5., 4., 1e10)
+    assert os.path.isfile(prodfile) and prodfile.startswith(str(tmpdir))
+    assert products['spec'].shape[0] == 1022
+    # Same as detecting the lines on the fly
+    _, det_arxiv = wvutils.arxiv_lines_from_spec(products['spec'], sigdetect=5., fwhm=4.)
+    # Reload from disk
+    monkeypatch.setattr(waveio, '_reid_arxiv_products', {})
+    reloaded = waveio.load_reid_arxiv_products(arxiv_file, 1022, sigdetect=5., fwhm=4.)
+    for key in det_arxiv.keys():
+        assert np.array_equal(det_arxiv[key], reloaded['det_arxiv'][key])
+    assert np.array_equal(products['spec_cont_sub'], reloaded['spec_cont_sub'])
+    # An unusable cache directory falls back to computing the products in memory
+    open(os.path.join(str(tmpdir), 'notadir'), 'w').close()
+    monkeypatch.setenv('PYPEIT_CACHE', os.path.join(str(tmpdir), 'notadir'))
+    monkeypatch.setattr(waveio, '_reid_arxiv_products', {})
+    inmemory = waveio.load_reid_arxiv_products(arxiv_file, 1022, sigdetect=5., fwhm=4.)
+    assert np.array_equal(products['spec_cont_sub'], inmemory['spec_cont_sub'])
+
+
+def test_rank_arxiv_candidates():
+    spec_arxiv = np.stack([synthetic_arc(seed=seed) for seed in range(8)], axis=1)
+    finger_arxiv = wvutils.arc_fingerprint(spec_arxiv - 10.)
+    spec = wvutils.shift_and_stretch(spec_arxiv[:,5], 12.0, 1.02) - 10.
+    order, score = wvutils.rank_arxiv_candidates(spec, finger_arxiv)
+    assert order[0] == 5
+    assert score[5] > 0.8
+
+
+def test_select_lstsrch():
+    from pypeit.core.wavecal import patterns
+    rand = np.random.RandomState(42)
+    detlines = np.sort(rand.uniform(0., 1000., 15))
+    linelist = np.sort(np.concatenate([4000. + 1.5*detlines[2:12], rand.uniform(3800., 5800., 10)]))
+    for generate_patterns in [patterns.triangles, patterns.quadrangles]:
+        sols5 = generate_patterns(detlines, linelist, 1000, 5, 5, 1.0)
+        for lstsrch in [3, 4]:
+            dindex, lindex, wvcen, disps = generate_patterns(detlines, linelist, 1000, 5, lstsrch, 1.0)
+            sdindex, slindex, swvcen, sdisps = patterns.select_lstsrch(sols5, lstsrch)
+            # Only rows with a match have a non-zero dispersion
+            gd, sgd = disps > 0, sdisps > 0
+            assert np.array_equal(dindex[gd], sdindex[sgd]) and np.array_equal(lindex[gd], slindex[sgd])
+            assert np.array_equal(wvcen[gd], swvcen[sgd])
+
+
+def test_match_nearest():
+    rand = np.random.RandomState(7)
+    ref = rand.uniform(0., 100., 40)
+    values = np.concatenate([rand.uniform(-5., 105., 60), ref[:5]])
+    indx, diff = wvutils.match_nearest(ref, values)
+    assert np.array_equal(indx, [np.argmin(np.abs(ref - val)) for val in values])
+    assert np.allclose(diff, np.abs(ref[indx] - values))
+
+
+def test_line_catalogue(tmpdir, monkeypatch):
+    from pypeit.core.wavecal import waveio
+    monkeypatch.setenv('PYPEIT_CACHE', str(tmpdir))
+    monkeypatch.setattr(waveio, '_line_catalogue', {})
+    monkeypatch.setattr(waveio, '_line_lists', {})
+    for line_file, NIST in [(waveio.line_path+'ThAr_lines.dat', False), (waveio.line_path+'UNKNWNs.dat', False),
+                            (waveio.nist_path+'ArI_vacuum.ascii', True)]:
+        line_list = waveio.load_line_list(line_file, NIST=NIST)
+        assert os.path.isfile(waveio.line_catalogue_file())
+        # Same as parsing the ASCII table
+        ascii_list = waveio.read_line_list(line_file, NIST=NIST)
+        assert line_list.colnames == ascii_list.colnames
+        for key in ascii_list.colnames:
+            assert line_list[key].dtype == ascii_list[key].dtype
+            assert np.array_equal(np.ma.getmaskarray(line_list[key]), np.ma.getmaskarray(ascii_list[key]))
+            assert np.array_equal(np.ma.getdata(line_list[key]), np.ma.getdata(ascii_list[key]))
+    # Returned line lists are copies
+    line_list.remove_column('wave')
+    assert 'wave' in waveio.load_line_list(line_file, NIST=True).colnames
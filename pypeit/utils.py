@@ -3,6 +3,8 @@
 import itertools
 import matplotlib
 
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
 import numpy as np
 
 from scipy.optimize import curve_fit
@@ -305,7 +307,7 @@ def bspline_fit(x,y,order=3,knots=None,everyn=20,xmin=None,xmax=None,w=None,bksp
 # and make them explicit
 def bspline_profile(xdata, ydata, invvar, profile_basis, inmask = None, upper=5, lower=5,
                     maxiter=25, nord = 4, bkpt=None, fullbkpt=None,
-                    relative=None, kwargs_bspline={}, kwargs_reject={}):
+                    relative=None, bspline_action=None, kwargs_bspline={}, kwargs_reject={}):
     """
     Create a B-spline in the least squares sense with rejection, using a model profile
 
@@ -335,6 +337,10 @@ def bspline_profile(xdata, ydata, invvar, profile_basis, inmask = None, upper=5,
      relative : class:`numpy.ndarray`
         Array of integer indices to be used for computing the reduced chi^2 of the fits, which then is used as a scale factor for
          the upper,lower rejection thresholds
+     bspline_action : tuple
+        Precomputed (action, lower, upper) as returned by :func:`pypeit.core.pydl.bspline.action` for xdata and
+        the breakpoints of this fit (i.e. fullbkpt). This allows the B-spline basis to be reused between fits to the
+        same xdata with different profile_basis. It is only used while none of the breakpoints have been masked.
      kwargs_bspline : dict
        Passed to bspline
      kwargs_reject : dict
@@ -433,7 +439,10 @@ def bspline_profile(xdata, ydata, invvar, profile_basis, inmask = None, upper=5,
 
             # we'll do the fit right here..............
             if error != 0:
-                bf1, laction, uaction = sset.action(xdata)
+                if bspline_action is not None and sset.mask.all():
+                    bf1, laction, uaction = bspline_action
+                else:
+                    bf1, laction, uaction = sset.action(xdata)
                 if np.any(bf1 == -2) or (bf1.size !=nx*nord):
                     msgs.error("BSPLINE_ACTION failed!")
                 action = np.copy(action_multiple)
@@ -1271,6 +1280,41 @@ def robust_optimize(ydata, fitfunc, arg_dict, maxiter=10, inmask=None, sigma=Non
 
     return result, ymodel, outmask
 
+def parallel_map(func, args, nproc=1, threads=True):
+    """
+    Apply a function to a list of argument tuples, optionally using a pool
+    of workers.
+
+    The results are always returned in the order of the input argument
+    list, independent of the order in which the individual calls finish,
+    so that the output is deterministic.
+
+    Args:
+        func (callable):
+            Function to call.
+        args (list):
+            List of argument tuples; func is called as func(*args[i]).
+        nproc (int, optional):
+            Number of workers.  If nproc is None, nproc <= 1, or there
+            is only one set of arguments, the calls are executed
+            serially in the calling process.
+        threads (bool, optional):
+            Use a pool of threads.  This avoids copying large images to
+            the workers and is appropriate for functions dominated by
+            numpy/scipy calls.  If False, a pool of processes is used,
+            in which case func and args must be picklable.
+
+    Returns:
+        list: The result of func for each element of args.
+    """
+    if nproc is None or nproc <= 1 or len(args) <= 1:
+        return [func(*a) for a in args]
+    Executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with Executor(max_workers=min(nproc, len(args))) as executor:
+        futures = [executor.submit(func, *a) for a in args]
+        return [f.result() for f in futures]
+
+
 def subsample(frame):
     """
     Used by LACosmic
@@ -3,6 +3,7 @@
 
 import os
 import inspect
+import functools
 import numpy as np
 
 #from importlib import reload
@@ -10,6 +11,7 @@ import numpy as np
 from matplotlib import pyplot as plt
 import copy
 from pypeit import msgs
+from pypeit import utils
 from pypeit import masterframe
 from pypeit.core import arc, qa, pixels
 from pypeit.core.wavecal import autoid, waveio
@@ -42,6 +44,11 @@ class WaveCalib(masterframe.MasterFrame):
         reuse_masters (bool, optional):  Load from disk if possible
         redux_path (str, optional):  For QA
         msbpm (ndarray, optional): Bad pixel mask image
+        prev_wv_calib (dict, optional): Wavelength calibration of an
+            earlier calibration group with the same setup and detector.
+            If provided, the solutions of its slits are updated for the
+            drift of the arc (see :func:`track_drift`) and only the
+            slits that cannot be tracked are solved from scratch.
 
     Attributes:
         frametype : str
@@ -64,7 +71,8 @@ class WaveCalib(masterframe.MasterFrame):
     frametype = 'wv_calib'
 
     def __init__(self, msarc, tslits_dict, spectrograph, par, binspectral=None, det=1,
-                 master_key=None, master_dir=None, reuse_masters=False, redux_path=None, msbpm=None):
+                 master_key=None, master_dir=None, reuse_masters=False, redux_path=None, msbpm=None,
+                 prev_wv_calib=None):
 
         # MasterFrame
         masterframe.MasterFrame.__init__(self, self.frametype, master_key,
@@ -82,6 +90,7 @@ class WaveCalib(masterframe.MasterFrame):
         self.redux_path = redux_path
         self.det = det
         self.master_key = master_key
+        self.prev_wv_calib = prev_wv_calib
 
         # Attributes
         self.steps = []    # steps executed
@@ -186,16 +195,18 @@ class WaveCalib(masterframe.MasterFrame):
                 final_fit[str(slit)] = ifinal_fit.copy()
         elif method == 'basic':
             final_fit = {}
-            for slit in ok_mask:
-                status, ngd_match, match_idx, scores, ifinal_fit = \
-                    autoid.basic(arccen[:, slit], self.par['lamps'], self.par['wv_cen'], self.par['disp'],
-                                 nonlinear_counts = self.nonlinear_counts)
+            # Slits are solved in parallel when nproc > 1; the results are collected in slit order
+            basic = functools.partial(autoid.basic, nonlinear_counts=self.nonlinear_counts)
+            results = utils.parallel_map(basic, [(arccen[:, slit], self.par['lamps'], self.par['wv_cen'],
+                                                  self.par['disp']) for slit in ok_mask], nproc=self.par['nproc'])
+            for slit, (status, ngd_match, match_idx, scores, ifinal_fit) in zip(ok_mask, results):
                 final_fit[str(slit)] = ifinal_fit.copy()
                 if status != 1:
                     self.maskslits[slit] = True
         elif method == 'holy-grail':
             # Sometimes works, sometimes fails
-            arcfitter = autoid.HolyGrail(arccen, par=self.par, ok_mask=ok_mask)
+            slit_spat = None if self.slitcen is None else self.slitcen[self.slitcen.shape[0]//2, :]
+            arcfitter = autoid.HolyGrail(arccen, par=self.par, ok_mask=ok_mask, slit_spat=slit_spat)
             patt_dict, final_fit = arcfitter.get_results()
         elif method == 'reidentify':
             # Now preferred
@@ -207,7 +218,8 @@ class WaveCalib(masterframe.MasterFrame):
                 msgs.error("You must specify binspectral for the full_template method!")
             final_fit = autoid.full_template(arccen, self.par, ok_mask, self.det,
                                                      self.binspectral,
-                                                     nsnippet=self.par['nsnippet'])
+                                                     nsnippet=self.par['nsnippet'],
+                                                     nproc=self.par['nproc'])
 
         else:
             msgs.error('Unrecognized wavelength calibration method: {:}'.format(method))
@@ -228,6 +240,62 @@ class WaveCalib(masterframe.MasterFrame):
         # Return
         return self.wv_calib
 
+    def track_drift(self, arccen, prev_wv_calib, skip_QA=False):
+        """
+        Update the solutions of an earlier wavelength calibration for
+        the drift of the arc in each slit
+
+        Wrapper to autoid.track_drift.  A slit is tracked only if its arc
+        cross-correlates with the earlier arc above drift_cc_thresh and
+        the refit RMS is below rms_threshold.
+
+        Args:
+            arccen (ndarray): (nspec, nslit) Arc spectra
+            prev_wv_calib (dict): Earlier wavelength calibration
+            skip_QA (bool, optional)
+
+        Returns:
+            dict: Solutions of the tracked slits
+        """
+        ok_mask = np.where(~self.maskslits)[0]
+        line_list = waveio.load_line_lists(self.par['lamps'])
+
+        def slit_param(key, slit):
+            value = self.par[key]
+            return value[slit] if isinstance(value, (list, np.ndarray)) else value
+
+        def track_slit(slit):
+            prev_fit = prev_wv_calib.get(str(slit))
+            if prev_fit is None or len(prev_fit) == 0:
+                return None
+            return autoid.track_drift(arccen[:, slit], prev_fit, line_list, cc_thresh=self.par['drift_cc_thresh'],
+                                      drift_window=self.par['drift_window'],
+                                      cc_local_thresh=self.par['cc_local_thresh'], nlocal_cc=self.par['nlocal_cc'],
+                                      match_toler=self.par['match_toler'], func=self.par['func'],
+                                      n_first=self.par['n_first'], sigrej_first=self.par['sigrej_first'],
+                                      n_final=slit_param('n_final', slit), sigrej_final=self.par['sigrej_final'],
+                                      sigdetect=slit_param('sigdetect', slit), fwhm=self.par['fwhm'],
+                                      nonlinear_counts=self.nonlinear_counts)
+
+        tracked = {}
+        results = utils.parallel_map(track_slit, [(slit,) for slit in ok_mask], nproc=self.par['nproc'])
+        for slit, final_fit in zip(ok_mask, results):
+            if final_fit is None or final_fit['rms'] > slit_param('rms_threshold', slit):
+                msgs.info('Could not track the drift of slit {0:d}; it will be solved from scratch'.format(slit))
+                continue
+            tracked[str(slit)] = final_fit
+        msgs.info('Tracked the drift of {0:d}/{1:d} slits from the earlier wavelength calibration'.format(
+                  len(tracked), len(ok_mask)))
+
+        # QA
+        if not skip_QA:
+            for key in tracked.keys():
+                outfile = qa.set_qa_filename(self.master_key, 'arc_fit_qa', slit=int(key), out_dir=self.redux_path)
+                autoid.arc_fit_qa(tracked[key], outfile=outfile)
+        # Step
+        self.steps.append(inspect.stack()[0][3])
+        return tracked
+
     def echelle_2dfit(self, wv_calib, debug=False, skip_QA=False):
         """
         Evaluate 2-d wavelength solution for echelle data. Unpacks wv_calib for slits to be input into  arc.fit2darc
@@ -402,8 +470,9 @@ class WaveCalib(masterframe.MasterFrame):
         Code flow:
           1. Extract 1D arc spectra down the center of each slit/order
           2. Load the parameters guiding wavelength calibration
-          3. Generate the 1D wavelength fits
-          4. Generate a mask
+          3. Track the drift of an earlier wavelength calibration, if provided
+          4. Generate the 1D wavelength fits of the remaining slits
+          5. Generate a mask
 
         Args:
             skip_QA : bool, optional
@@ -416,8 +485,20 @@ class WaveCalib(masterframe.MasterFrame):
         # Extract an arc down each slit
         self.arccen, self.maskslits = self.extract_arcs(self.slitcen, self.slitmask, self.msarc, self.inmask)
 
-        # Fill up the calibrations and generate QA
-        self.wv_calib = self.build_wv_calib(self.arccen, self.par['method'], skip_QA=skip_QA)
+        # Update the earlier wavelength calibration for the drift of the arcs
+        tracked = {}
+        if self.prev_wv_calib is not None:
+            tracked = self.track_drift(self.arccen, self.prev_wv_calib, skip_QA=skip_QA)
+            for key in tracked.keys():
+                self.maskslits[int(key)] = True
+
+        # Fill up the calibrations of the remaining slits and generate QA
+        if np.any(~self.maskslits):
+            self.wv_calib = self.build_wv_calib(self.arccen, self.par['method'], skip_QA=skip_QA)
+        else:
+            self.wv_calib = {}
+        self.wv_calib.update(tracked)
+        self.make_maskslits(len(self.maskslits))
 
         # Return
         if self.par['echelle'] is True: